@@ -97,6 +97,9 @@ class GenerateReportRequest(BaseModel):
     selectedReport: str
     fromDate: str
     toDate: str
+    cursor: Optional[str] = None
+    limit: Optional[int] = None
+    exportFormat: Optional[Literal["csv", "xlsx"]] = None  # download the whole range instead of a JSON page
 
 
 class AddExpenseRequest(BaseModel):
@@ -1,12 +1,17 @@
+import asyncio
+import os
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
 
+from db import warm_up_tenant_pools, start_audit_writer, stop_audit_writer, migrate_all_tenants
+from helpers import JSONResponse, NEXT_CURSOR_HEADER
 from routes import *
-from utils import flatbed
-from utils.conn import close_all_pools
+from utils import flatbed, set_current_db
+from utils.conn import close_all_pools, RequestConnectionMiddleware
+from utils.events import close_change_listeners
+from utils.logger import start_log_sink, stop_log_sink
 
 # CORS Configuration
 origins = [
@@ -14,16 +19,37 @@ origins = [
     # "https://parda.af",  # Add your production frontend URL here
 ]
 
+# Pre-create tenant pools before accepting traffic (e.g. DB_WARMUP=true in production)
+WARMUP_POOLS = os.getenv("DB_WARMUP", "false").lower() == "true"
+WARMUP_TIMEOUT_SECONDS = int(os.getenv("DB_WARMUP_TIMEOUT", 30))
+
+# Apply pending tenant migrations before accepting traffic, instead of running tasks.migrations on deploy
+MIGRATE_ON_STARTUP = os.getenv("DB_MIGRATE", "false").lower() == "true"
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    start_log_sink()
+    start_audit_writer()
+    if MIGRATE_ON_STARTUP:
+        await migrate_all_tenants()
+    if WARMUP_POOLS:
+        set_current_db("pardaaf_main")
+        try:
+            await asyncio.wait_for(warm_up_tenant_pools(), WARMUP_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            await flatbed('warning', "Pool warm-up timed out, continuing startup")
     yield  # App is running
+    await close_change_listeners()
+    await stop_audit_writer()
+    await stop_log_sink()  # needs the pools to write the last entries
     await close_all_pools()
 
 
 # Create FastAPI app
 app = FastAPI(
     lifespan=lifespan,
+    default_response_class=JSONResponse,  # orjson-backed, see helpers.serialization
     title="pardaBase API",
     description="Backend for pardaBase curtains admin system App",
     version="1.1.0",
@@ -39,8 +65,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods (GET, POST, etc.)
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["ETag", NEXT_CURSOR_HEADER],  # readable by browser clients
 )
 
+# One pooled connection per request and tenant, shared by all db/* calls of that request
+app.add_middleware(RequestConnectionMiddleware)
+
 # Mount HTTP routes
 routers = [
     login_router,
@@ -0,0 +1,193 @@
+"""
+Time to turn result sets into response bodies: the hand-written helpers that
+helpers/format_list.py used before (copied below as the reference), encoded as
+Starlette's JSONResponse did, against the generated RowMapper functions encoded
+by helpers.serialization, on synthetic asyncpg Records.
+
+    python -m benchmarks.row_mappers [rows]
+"""
+import gc
+import json
+import random
+import re
+import sys
+import time
+from datetime import date, datetime, timezone, timedelta
+
+from helpers.format_list import BILL_MAPPER, ROLL_MAPPER, RECENT_ACTIVITY_MAPPER, GENERIC_MAPPER, \
+    SPECIAL_KEY_MAPPINGS
+from helpers.serialization import dumps_json, orjson
+
+try:
+    from asyncpg.protocol.protocol import _create_record
+except ImportError:  # not exposed by this asyncpg; dicts take the mappers' by-key path instead
+    _create_record = None
+
+
+# --- Reference: the per-row helpers as they were ---
+
+def format_date(val):
+    if isinstance(val, datetime):
+        if val.tzinfo is not None:
+            return val.isoformat(timespec='seconds')
+        return val.isoformat(timespec='seconds')
+    if isinstance(val, date):
+        return val.isoformat()
+    return val
+
+
+def legacy_make_bill_dic(data):
+    return {
+        "billCode": data["bill_code"],
+        "billDate": format_date(data["bill_date"]),
+        "dueDate": format_date(data["due_date"]),
+        "customerName": data["customer_name"],
+        "customerNumber": data["customer_number"],
+        "price": data["price"],
+        "paid": data["paid"],
+        "remaining": data["remaining"],
+        "fabrics": data["fabrics"],
+        "parts": data["parts"],
+        "status": data["status"],
+        "salesman": data["salesman"],
+        "salesmanName": data["salesman_name"],
+        "tailor": data["tailor"],
+        "tailorName": data["tailor_name"],
+        "additionalData": data["additional_data"],
+        "installation": data["installation"]
+    }
+
+
+def legacy_make_roll_dic(data):
+    archived = data.get("archived")
+    roll = {
+        "productCode": data["product_code"],
+        "rollCode": data["roll_code"],
+        "quantityInCm": data["quantity"],
+        "colorLetter": data["color"],
+        "imageUrl": data["image_url"],
+        "costPerMetre": data["cost_per_metre"],
+    }
+    if archived is not None:
+        roll["archived"] = archived
+    return roll
+
+
+def legacy_make_activity_dic(data):
+    return {
+        "id": data["id"],
+        "date": format_date(data["date"]),
+        "username": data["username"],
+        "action": data["action"],
+    }
+
+
+def legacy_to_camel_case(s):
+    parts = re.split(r'[_\- ]+', s)
+    return parts[0].lower() + ''.join(word.capitalize() for word in parts[1:])
+
+
+LEGACY_TRANSFORMERS = {
+    "created_at": format_date,
+    "updated_at": format_date,
+    "salary_start_date": format_date,
+    "last_calculated_date": format_date,
+    "bill_date": format_date,
+    "due_date": format_date,
+    "date": format_date,
+    "target_user_id": str,
+    "fetched_at": format_date,
+    "rate": float
+}
+
+
+def legacy_format_dict(data):
+    formatted = {}
+    for k, v in data.items():
+        camel_key = SPECIAL_KEY_MAPPINGS.get(k, legacy_to_camel_case(k))
+        if k in LEGACY_TRANSFORMERS and v is not None:
+            v = LEGACY_TRANSFORMERS[k](v)
+        formatted[camel_key] = v
+    return formatted
+
+
+# --- Synthetic result sets ---
+
+def legacy_render(content):
+    # starlette.responses.JSONResponse.render
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def records(columns, rows):
+    if _create_record is None:
+        return [dict(zip(columns, row)) for row in rows]
+    mapping = {column: i for i, column in enumerate(columns)}
+    return [_create_record(mapping, tuple(row)) for row in rows]
+
+
+def synthetic_results(count):
+    rnd = random.Random(42)
+    now = datetime(2025, 3, 14, 10, 21, 7, tzinfo=timezone.utc)
+    bill_columns = ("bill_code", "bill_date", "due_date", "customer_name", "customer_number", "price", "paid",
+                    "remaining", "fabrics", "parts", "status", "salesman", "salesman_name", "tailor", "tailor_name",
+                    "additional_data", "installation")
+    bills = records(bill_columns, ([
+        f"B{i}", (now - timedelta(days=i % 700)).date(), (now + timedelta(days=i % 30)).date(),
+        rnd.choice(["احمد", "Mariam", "محمود"]), f"07{rnd.randrange(10 ** 8):08d}", 12000, 5000, 7000,
+        '[{"code": "P1R2", "metres": 4}]', '[]', rnd.choice(["pending", "cut", "ready"]), "s1", "Salesman",
+        "t1", "Tailor", None, "none"] for i in range(count)))
+    roll_columns = ("product_code", "roll_code", "quantity", "color", "image_url", "cost_per_metre", "archived")
+    rolls = records(roll_columns, ([
+        f"P{rnd.randrange(5000)}", f"R{i}", rnd.randrange(5000), rnd.choice("ABCDEFGH"), None,
+        rnd.randrange(100, 2000), rnd.random() < 0.1] for i in range(count)))
+    activity_columns = ("id", "date", "username", "action")
+    activities = records(activity_columns, ([
+        i, now - timedelta(minutes=i), "admin", f"Bill updated: B{i}"] for i in range(count)))
+    fx_columns = ("id", "base_currency", "quote_currency", "rate", "source", "fetched_at", "is_manual")
+    fx_rates = records(fx_columns, ([
+        i, "USD", "AFN", 70.25, "Open Exchange Rates", now, False] for i in range(count)))
+    return {"bills": bills, "rolls": rolls, "activities": activities, "fx rates": fx_rates}
+
+
+def best_of(runs, function, rows):
+    timings = []
+    gc.disable()  # as timeit does: collections triggered by the 100k new dicts would dominate the noise
+    try:
+        for _ in range(runs):
+            started = time.perf_counter()
+            function(rows)
+            timings.append(time.perf_counter() - started)
+    finally:
+        gc.enable()
+    return min(timings)
+
+
+def main(count=100_000, runs=5):
+    results = synthetic_results(count)
+    cases = [
+        ("bills", legacy_make_bill_dic, BILL_MAPPER),
+        ("rolls", legacy_make_roll_dic, ROLL_MAPPER),
+        ("activities", legacy_make_activity_dic, RECENT_ACTIVITY_MAPPER),
+        ("fx rates", legacy_format_dict, GENERIC_MAPPER),
+    ]
+
+    kind = "Records" if _create_record is not None else "dicts"
+    encoder = "orjson" if orjson is not None else "json (orjson not installed)"
+    print(f"{count} {kind} per result set, best of {runs}, encoded with {encoder}")
+    print(f"{'':<12} {'helpers':>10} {'mapper':>10} {'speedup':>8}")
+    for name, make_dic, mapper in cases:
+        def legacy(rows):
+            return legacy_render([make_dic(row) for row in rows])
+
+        def current(rows):
+            return dumps_json(mapper(rows))
+
+        rows = results[name]
+        assert legacy(rows) == current(rows)
+        before = best_of(runs, legacy, rows)
+        after = best_of(runs, current, rows)
+        print(f"{name:<12} {before * 1000:>7.0f} ms {after * 1000:>7.0f} ms {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,92 @@
+"""
+Payload size and encode time of /get-inventory-lists in each negotiable format,
+on a synthetic tenant of 50k rolls over 5k products.
+
+    python -m benchmarks.sync_payload [rolls] [products]
+"""
+import asyncio
+import random
+import sys
+import time
+
+from helpers.streaming import COLUMNAR_JSON_MEDIA_TYPE, COLUMNAR_MSGPACK_MEDIA_TYPE, NDJSON_MEDIA_TYPE, \
+    msgpack, zstandard, streaming_response
+
+BATCH_SIZE = 500  # as db.changes.SYNC_STREAM_BATCH_SIZE
+
+
+def synthetic_tenant(roll_count, product_count):
+    rnd = random.Random(42)
+    stamp = "2025-03-14T10:21:07.123456+04:30"
+    products = [{
+        "productCode": f"P{i}",
+        "name": rnd.choice(["پرده مخمل", "Blackout", "Sheer voile", "پرده حریر", "Linen"]) + f" {i}",
+        "categoryIndex": rnd.randrange(8),
+        "quantityInCm": rnd.randrange(0, 500000),
+        "pricePerMetre": rnd.randrange(200, 3000),
+        "description": rnd.choice([None, "", "Imported, 280cm height"]),
+        "imageUrl": f"https://cdn.example.com/tenant/product/P{i}.webp" if rnd.random() < 0.6 else None,
+        "archived": rnd.random() < 0.05,
+        "createdAt": stamp,
+        "updatedAt": stamp,
+    } for i in range(1, product_count + 1)]
+    rolls = [{
+        "productCode": f"P{rnd.randrange(1, product_count + 1)}",
+        "rollCode": f"R{i}",
+        "quantityInCm": rnd.randrange(0, 5000),
+        "colorLetter": rnd.choice("ABCDEFGH"),
+        "imageUrl": f"https://cdn.example.com/tenant/roll/R{i}.webp" if rnd.random() < 0.3 else None,
+        "costPerMetre": rnd.randrange(100, 2000),
+        "archived": rnd.random() < 0.1,
+        "createdAt": stamp,
+        "updatedAt": stamp,
+    } for i in range(1, roll_count + 1)]
+    return products, rolls
+
+
+async def sections(products, rolls):
+    yield "cursor", "WzEsMTIzNDU2XQ"
+    yield "full", True
+    for key, rows in (("products", products), ("rolls", rolls)):
+        yield key, []
+        for i in range(0, len(rows), BATCH_SIZE):
+            yield key, rows[i:i + BATCH_SIZE]
+    yield "deletedProducts", []
+    yield "deletedRolls", []
+
+
+async def encode(products, rolls, headers):
+    started = time.perf_counter()
+    response = await streaming_response(sections(products, rolls), headers)
+    size = 0
+    async for chunk in response.body_iterator:
+        size += len(chunk)
+    return size, time.perf_counter() - started
+
+
+async def main(roll_count=50_000, product_count=5_000):
+    products, rolls = synthetic_tenant(roll_count, product_count)
+    variants = [("json (current)", "application/json", None),
+                ("json + gzip", "application/json", "gzip"),
+                ("ndjson", NDJSON_MEDIA_TYPE, None),
+                ("columnar json", COLUMNAR_JSON_MEDIA_TYPE, None),
+                ("columnar json + gzip", COLUMNAR_JSON_MEDIA_TYPE, "gzip")]
+    if zstandard is not None:
+        variants.append(("columnar json + zstd", COLUMNAR_JSON_MEDIA_TYPE, "zstd"))
+    if msgpack is not None:
+        variants += [("columnar msgpack", COLUMNAR_MSGPACK_MEDIA_TYPE, None),
+                     ("columnar msgpack + gzip", COLUMNAR_MSGPACK_MEDIA_TYPE, "gzip")]
+        if zstandard is not None:
+            variants.append(("columnar msgpack + zstd", COLUMNAR_MSGPACK_MEDIA_TYPE, "zstd"))
+
+    print(f"{roll_count} rolls, {product_count} products")
+    baseline = None
+    for name, media_type, encoding in variants:
+        headers = {"accept": media_type, "accept-encoding": encoding or "identity"}
+        size, seconds = min([await encode(products, rolls, headers) for _ in range(3)], key=lambda r: r[1])
+        baseline = baseline or size
+        print(f"{name:<26} {size / 1024:>9.0f} KiB {size / baseline:>6.1%} {seconds * 1000:>8.0f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(*(int(arg) for arg in sys.argv[1:])))
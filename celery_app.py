@@ -20,7 +20,7 @@ celery_app.conf.beat_schedule = {
         'schedule': crontab(hour=19, minute=0),  # Run daily at 7:00 PM
     },
     'daily-notify-salesman-tailor': {
-        'task': 'tasks.user.scheduled_notify_salesman_tailor',
+        'task': 'tasks.notification.scheduled_notify_salesman_tailor',
         'schedule': crontab(hour=9, minute=0),  # Run daily at 9:00 AM
     },
     'daily-backup-all-tenants': {
@@ -54,6 +54,22 @@ celery_app.conf.beat_schedule = {
     'fetch-current_rates': {
         'task': 'tasks.exchange.scheduled_fetch_current_rates',
         'schedule': crontab(minute=37),
+    },
+    'daily-migrate-tenants': {
+        'task': 'tasks.migrations.migrate_tenants',
+        'schedule': crontab(hour=1, minute=45),  # before the nightly tasks that rely on the migrated tables
+    },
+    'daily-backfill-search-keys': {
+        'task': 'tasks.search_keys.backfill_search_keys',
+        'schedule': crontab(hour=2, minute=0),  # catches bills written outside db.bill, e.g. by SQL procedures
+    },
+    'daily-reconcile-product-stock': {
+        'task': 'tasks.stock.reconcile_stock',
+        'schedule': crontab(hour=2, minute=30),
+    },
+    'daily-verify-dashboard-counters': {
+        'task': 'tasks.dashboard.verify_counters',
+        'schedule': crontab(hour=3, minute=0),  # after the stock reconciliation, whose totals it sums
     }
 }
 
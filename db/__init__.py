@@ -18,28 +18,35 @@ from .bill import insert_new_bill, update_bill, get_bill_ps, search_bills_list,
     search_bills_list_filtered, remove_bill_ps, update_bill_status_ps, \
     update_bill_tailor_ps, add_payment_bill_ps, get_payment_history_ps, \
     check_bill_status_ps, save_notify_bill_status_ps, get_chat_ids_for_bill, \
-    delete_notify_records_for_bill, check_due_add_notification_for_related_staff
+    delete_notify_records_for_bill, check_due_add_notification_for_related_staff, \
+    search_bills_by_key, backfill_bill_search_keys
 from .user import insert_new_user, update_user, check_username_password, \
     get_users_data, update_users_password, remember_users_action, \
     get_users_list_ps, remove_user_ps, edit_employment_info_ps, \
     get_employment_info_ps, get_profile_data_ps, check_username_and_set_chat_id, \
     get_emails_high_clearance_users_ps
 from .dashboard import search_recent_activities_list, get_dashboard_data_ps, \
-    get_recent_activities_preview
+    get_recent_activities_preview, get_dashboard_snapshot, invalidate_dashboard
 from .expense import search_expenses_list_filtered, insert_new_expense, \
     update_expense, remove_expense_ps
 from .order import insert_new_online_order, subscribe_newsletter_ps, \
     unsubscribe_newsletter_ps, confirm_email_newsletter_ps
-from .report import report_recent_activities_list, report_tags_list
+from .report import report_recent_activities_list, report_tags_list, stream_report_rows, REPORT_EXPORTS
 from .sync import insert_update_sync, get_sync, fetch_tailors_list, \
     fetch_salesmen_list, fetch_suppliers_list, fetch_users_list, \
-    fetch_entities_list
+    fetch_entities_list, get_reference_lists, LIST_FETCHERS, get_sync_versions, get_list_versions
 from .payment import add_payment_to_user, add_payment_to_supplier, \
     get_supplier_payment_history_ps, get_user_payment_history_ps, \
     add_payment_to_entity
-from .main import get_gallery_db_name, get_all_gallery_db_names
+from .stock import reconcile_product_stock
+from .counters import verify_dashboard_counters
+from .main import get_gallery_db_name, get_all_gallery_db_names, warm_up_tenant_pools
 from .miscellaneous import add_miscellaneous_record_ps, \
     search_miscellaneous_records
 from .earning import add_earning_to_user, get_users_earning_history_ps
 from .notification import get_notifications_for_user_ps
 from .exchange import update_fx_rates_in_db, get_fx_current_rate
+from .audit import start_audit_writer, stop_audit_writer, flush_user_actions
+from .search_index import get_search_index, PRODUCT_FIELDS, BILL_FIELDS
+from .changes import stream_inventory_changes
+from .migrations import migrate_tenant, migrate_all_tenants
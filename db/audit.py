@@ -0,0 +1,110 @@
+import asyncio
+import os
+from collections import deque
+from datetime import datetime, timezone
+
+from utils import flatbed, set_current_db
+from utils.conn import connection_context, current_db, get_connection, in_unit_of_work, release_connection
+from .queries import register_query
+
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", 5000))  # beyond this actions are written inline
+AUDIT_BATCH_SIZE = 500  # flush early once this many actions are waiting
+AUDIT_FLUSH_INTERVAL_SECONDS = float(os.getenv("AUDIT_FLUSH_INTERVAL", 1))
+
+INSERT_USER_ACTION_AT = register_query("insert_user_action_at", """
+    INSERT INTO user_actions (
+        user_id,
+        action,
+        date
+    ) VALUES ($1, $2, $3)
+""", params=("uuid", "text", "timestamptz"))
+
+# Actions waiting to be written: (db_name, user_id, action, date)
+_queue = deque()
+
+_writer_task = None
+_wakeup = None
+_stopping = False
+
+
+async def queue_user_action(user_id, action):
+    """
+    Queue a user_actions row for the current tenant, stamped with the current time.
+    Inside a unit_of_work the row is inserted in its transaction instead, so it
+    commits, or rolls back, with the write it records. When the queue is full the
+    row is written inline too, so no action is lost.
+    """
+    row = (user_id, action, datetime.now(timezone.utc))
+    if in_unit_of_work() or len(_queue) >= AUDIT_QUEUE_SIZE:
+        async with connection_context() as conn:
+            await INSERT_USER_ACTION_AT.execute(conn, *row)
+        return
+
+    _queue.append((current_db.get(), *row))
+    _ensure_writer()
+    if len(_queue) >= AUDIT_BATCH_SIZE:
+        _wakeup.set()
+
+
+def _ensure_writer():
+    global _writer_task, _wakeup
+    loop = asyncio.get_running_loop()
+    if _writer_task is None or _writer_task.done() or _writer_task.get_loop() is not loop:
+        _wakeup = asyncio.Event()
+        _writer_task = loop.create_task(_write_forever(_wakeup))
+
+
+async def _write_forever(wakeup):
+    while True:
+        try:
+            await asyncio.wait_for(wakeup.wait(), AUDIT_FLUSH_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        wakeup.clear()
+        await flush_user_actions()
+        if _stopping:
+            return
+
+
+async def _copy_rows(db_name, rows):
+    set_current_db(db_name)  # only affects this task's context
+    try:
+        conn = await get_connection()
+        try:
+            await conn.copy_records_to_table("user_actions", records=rows, columns=("user_id", "action", "date"))
+        finally:
+            await release_connection(conn)
+    except Exception as e:
+        # Put the batch back for the next flush while there is room
+        room = AUDIT_QUEUE_SIZE - len(_queue)
+        _queue.extendleft((db_name, *row) for row in reversed(rows[:max(room, 0)]))
+        await flatbed('exception', f"In flush_user_actions for {db_name} ({len(rows)} rows, "
+                                   f"{max(len(rows) - room, 0)} dropped): {e}")
+
+
+async def flush_user_actions():
+    """Write every queued action, one COPY per tenant."""
+    by_db = {}
+    while _queue:
+        db_name, *row = _queue.popleft()
+        by_db.setdefault(db_name, []).append(tuple(row))
+    if by_db:
+        await asyncio.gather(*(_copy_rows(db_name, rows) for db_name, rows in by_db.items()))
+
+
+def start_audit_writer():
+    """Start writing queued actions in the background on the running loop (also started lazily)."""
+    _ensure_writer()
+
+
+async def stop_audit_writer():
+    """Stop the background writer and write out whatever is still queued."""
+    global _writer_task, _stopping
+    if _writer_task is not None and not _writer_task.done():
+        # Let the writer finish its current flush rather than cancelling it mid-COPY
+        _stopping = True
+        _wakeup.set()
+        await _writer_task
+        _stopping = False
+    _writer_task = None
+    await flush_user_actions()
@@ -1,12 +1,252 @@
 import datetime
-import json
 from typing import Optional
 from zoneinfo import ZoneInfo
 
-from helpers import make_bill_dic, parse_date, is_uuid
+from helpers import make_bill_dic, parse_date, normalize_name, normalize_phone, Keyset
 from utils import flatbed
 from utils.conn import connection_context
-
+from .queries import register_query
+from .sync import bump_sync_versions
+from .dashboard import invalidate_dashboard
+from .search_index import refresh_bill, forget_bill, BILL_DOC_SELECT, BILL_DOC_COLUMNS, SEARCH_RESULT_LIMIT
+
+INSERT_BILL = register_query("insert_bill", """
+    INSERT INTO bills (
+        bill_date,
+        due_date,
+        customer_name,
+        customer_number,
+        price,
+        paid,
+        remaining,
+        status,
+        fabrics,
+        parts,
+        salesman,
+        tailor,
+        additional_data,
+        installation,
+        payment_history,
+        customer_name_key,
+        customer_number_key
+    ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9::jsonb, $10::jsonb, $11, $12, $13::jsonb, $14, $15::jsonb, $16, $17)
+    RETURNING bill_code
+""", params=("date", "date", "text", "text", "int", "int", "int", "text", "jsonb", "jsonb", "text", "text",
+             "jsonb", "text", "jsonb", "text", "text"), columns=("bill_code",))
+
+# One statement, appending the changes to price and paid to payment_history server-side,
+# as the update_bill_payment procedure does: the history never travels to the client and
+# back, and the row lock makes concurrent edits append after each other. In SET, b.price
+# and b.paid are the values from before the update.
+UPDATE_BILL = register_query("update_bill", """
+    UPDATE bills b
+    SET due_date = $1,
+        customer_name = $2,
+        customer_number = $3,
+        price = $4,
+        paid = $5,
+        remaining = $6,
+        status = $7,
+        fabrics = $8::jsonb,
+        parts = $9::jsonb,
+        salesman = $10,
+        tailor = $11,
+        additional_data = $12::jsonb,
+        installation = $13,
+        customer_name_key = $14,
+        customer_number_key = $15,
+        payment_history = COALESCE(b.payment_history, '[]'::jsonb)
+            || CASE WHEN $4::int IS NOT NULL AND $4::int IS DISTINCT FROM b.price THEN jsonb_build_array(
+                   jsonb_build_object('type', 'price_changed', 'from', b.price, 'to', $4::int,
+                                      'edited_by', $17::text, 'timestamp', $18::text))
+               ELSE '[]'::jsonb END
+            || CASE WHEN $5::int IS NOT NULL AND $5::int IS DISTINCT FROM b.paid THEN jsonb_build_array(
+                   jsonb_build_object('type', 'payment_edited', 'from', b.paid, 'to', $5::int,
+                                      'edited_by', $17::text, 'timestamp', $18::text))
+               ELSE '[]'::jsonb END,
+        updated_at = NOW()
+    WHERE b.bill_code = $16
+    RETURNING b.bill_code
+""", params=("date", "text", "text", "int", "int", "int", "text", "jsonb", "jsonb", "text", "text", "jsonb",
+             "text", "text", "text", "text", "text", "text"), columns=("bill_code",))
+
+BILL_STATUS = register_query("bill_status", "SELECT status FROM bills WHERE bill_code = $1",
+                             params=("text",), columns=("status",))
+
+UPDATE_BILL_STATUS = register_query("update_bill_status", """
+    UPDATE bills
+    SET status = $1,
+        updated_at = now()
+    WHERE bill_code = $2
+""", params=("text", "text"))
+
+INSERT_NOTIFY_BILL_STATUS = register_query("insert_notify_bill_status", """
+    INSERT INTO notify_bill_status (chat_id, bill_code)
+    VALUES ($1, $2)
+    ON CONFLICT DO NOTHING;
+""", params=("bigint", "text"))
+
+NOTIFY_CHAT_IDS = register_query("notify_chat_ids", "SELECT chat_id FROM notify_bill_status WHERE bill_code = $1",
+                                 params=("text",), columns=("chat_id",))
+
+DELETE_NOTIFY_RECORDS = register_query("delete_notify_records", "DELETE FROM notify_bill_status WHERE bill_code = $1",
+                                       params=("text",))
+
+UPDATE_BILL_TAILOR = register_query("update_bill_tailor", """
+    WITH updated_bill AS (
+        UPDATE bills
+        SET tailor = $1,
+            updated_at = now()
+        WHERE bill_code = $2
+        RETURNING tailor
+    )
+    SELECT 
+        COALESCE(u.full_name, ub.tailor) AS tailor_full_name
+    FROM updated_bill ub
+    LEFT JOIN users u 
+        ON is_uuid(ub.tailor) AND u.user_id = ub.tailor::uuid;
+""", params=("text", "text"), columns=("tailor_full_name",))
+
+ADD_BILL_PAYMENT = register_query("add_bill_payment", "CALL update_bill_payment($1, $2, $3);",
+                                  params=("text", "int", "text"))
+
+SEARCH_BILLS = register_query("search_bills", "SELECT * FROM search_bills_list($1, $2);",
+                              params=("text", "int"))
+
+# The search_bills_list_filtered function's rows, newest first on (bill_date, bill_code),
+# after the previous page's last row; see helpers.Keyset. A NULL limit lists them all.
+SEARCH_BILLS_FILTERED = register_query("search_bills_filtered", """
+    SELECT * FROM search_bills_list_filtered($1, $2) b
+    WHERE (b.bill_date, b.bill_code) < (COALESCE($3, 'infinity'::date), COALESCE($4, ''))
+    ORDER BY b.bill_date DESC, b.bill_code DESC
+    LIMIT $5
+""", params=("int", "int", "date", "text", "int"))
+
+BILL_BY_CODE = register_query("bill_by_code", "SELECT * FROM search_bills_list($1, $2, 1, true);",
+                              params=("text", "int"))
+
+BILL_PAYMENT_HISTORY = register_query("bill_payment_history",
+                                      "SELECT payment_history from bills where bill_code = $1;",
+                                      params=("text",), columns=("payment_history",))
+
+# Keyset pages of the history newest first, on each event's position in the array (1 = oldest)
+BILL_PAYMENT_HISTORY_PAGE = register_query("bill_payment_history_page", """
+    SELECT e.n, e.event
+    FROM bills b, jsonb_array_elements(b.payment_history) WITH ORDINALITY AS e(event, n)
+    WHERE b.bill_code = $1 AND jsonb_typeof(b.payment_history) = 'array'
+      AND e.n < COALESCE($2, 9223372036854775807)
+    ORDER BY e.n DESC
+    LIMIT $3
+""", params=("text", "bigint", "int"), columns=("n", "event"))
+
+OVERDUE_REMINDER_DAYS = 30  # bills overdue for longer are left to the bills list
+
+# Reminder windows of check_due_add_notification_for_related_staff: name, first and last
+# due day relative to today, notification type, and message ({bill_code} / {due_date} filled in)
+DUE_REMINDER_WINDOWS = (
+    ("overdue", -OVERDUE_REMINDER_DAYS, -1, "bill_overdue_alert",
+     "یادآوری: آخرین تاریخ تحویل بل شماره {bill_code} ({due_date}) گذشته است. لطفاً آن را آماده سازید."),
+    ("today", 0, 0, "bill_due_alert",
+     "یادآوری: امروز آخرین تاریخ تحویل بل شماره {bill_code} است. لطفاً آن را آماده سازید."),
+    ("tomorrow", 1, 1, "bill_due_alert",
+     "یادآوری: سبا آخرین تاریخ تحویل بل شماره {bill_code} است. لطفاً آن را آماده سازید."),
+)
+
+# Every window in one statement: open bills due in a window, a notification for each of
+# their salesman and tailor that is a user, inserted unless already there, counted per window
+NOTIFY_DUE_BILLS = register_query("notify_due_bills", """
+    WITH windows AS (
+        SELECT *
+        FROM unnest($1::text[], $2::int[], $3::int[], $4::text[], $5::text[])
+            AS w(name, first_day, last_day, type, message)
+    ), due AS (
+        SELECT DISTINCT
+            w.name,
+            w.type,
+            b.bill_code,
+            replace(replace(w.message, '{bill_code}', b.bill_code), '{due_date}', b.due_date::text) AS message,
+            t.target::uuid AS target_user_id
+        FROM windows w
+        JOIN bills b ON b.due_date BETWEEN CURRENT_DATE + w.first_day AND CURRENT_DATE + w.last_day
+        CROSS JOIN LATERAL (VALUES (b.salesman), (b.tailor)) AS t(target)
+        WHERE b.status NOT IN ('ready', 'delivered', 'canceled')
+        AND is_uuid(t.target)
+    ), inserted AS (
+        INSERT INTO notifications (type, reference, message, target_user_id)
+        SELECT type, bill_code, message, target_user_id FROM due
+        ON CONFLICT DO NOTHING
+        RETURNING type, reference, message, target_user_id
+    )
+    SELECT w.name, COUNT(d.name) AS created
+    FROM windows w
+    LEFT JOIN (
+        inserted i
+        JOIN due d ON (d.type, d.bill_code, d.message, d.target_user_id)
+            = (i.type, i.reference, i.message, i.target_user_id)
+    ) ON d.name = w.name
+    GROUP BY w.name
+""", params=("text[]", "int[]", "int[]", "text[]", "text[]"), columns=("name", "created"))
+
+DELETE_BILL = register_query("delete_bill", "DELETE FROM bills WHERE bill_code = $1", params=("text",))
+
+# Normalized customer name / number keys (see helpers.normalize), range scanned through text_pattern_ops
+# indexes so prefix lookups stay indexed with bound parameters
+BILLS_BY_NAME_KEY = register_query("bills_by_name_key", BILL_DOC_SELECT + """
+    WHERE b.customer_name_key ~>=~ $1 AND b.customer_name_key ~<~ $2
+    ORDER BY b.bill_date DESC
+    LIMIT $3
+""", params=("text", "text", "int"), columns=BILL_DOC_COLUMNS)
+
+BILLS_BY_NUMBER_KEY = register_query("bills_by_number_key", BILL_DOC_SELECT + """
+    WHERE b.customer_number_key ~>=~ $1 AND b.customer_number_key ~<~ $2
+    ORDER BY b.bill_date DESC
+    LIMIT $3
+""", params=("text", "text", "int"), columns=BILL_DOC_COLUMNS)
+
+# Tenant migrations (db/migrations.py): the columns, filled by fill_bill_search_keys, then each
+# index built without blocking writes to bills. The ALTER gives up rather than queue writes behind it.
+ADD_BILL_SEARCH_KEY_COLUMNS = register_query("add_bill_search_key_columns", """
+    SET LOCAL lock_timeout = '5s';
+    ALTER TABLE bills
+        ADD COLUMN IF NOT EXISTS customer_name_key text,
+        ADD COLUMN IF NOT EXISTS customer_number_key text;
+""", params=())
+
+# A concurrent build that failed leaves an invalid index behind, which IF NOT EXISTS would keep
+DROP_BILL_NAME_KEY_INDEX = register_query("drop_bill_name_key_index",
+                                          "DROP INDEX CONCURRENTLY IF EXISTS bills_customer_name_key_idx",
+                                          params=())
+
+CREATE_BILL_NAME_KEY_INDEX = register_query("create_bill_name_key_index", """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS bills_customer_name_key_idx
+    ON bills (customer_name_key text_pattern_ops)
+""", params=())
+
+DROP_BILL_NUMBER_KEY_INDEX = register_query("drop_bill_number_key_index",
+                                            "DROP INDEX CONCURRENTLY IF EXISTS bills_customer_number_key_idx",
+                                            params=())
+
+CREATE_BILL_NUMBER_KEY_INDEX = register_query("create_bill_number_key_index", """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS bills_customer_number_key_idx
+    ON bills (customer_number_key text_pattern_ops)
+""", params=())
+
+BILL_SEARCH_KEY_SOURCES = register_query("bill_search_key_sources", """
+    SELECT bill_code, customer_name, customer_number, customer_name_key, customer_number_key
+    FROM bills
+    WHERE bill_code > $1
+    ORDER BY bill_code
+    LIMIT $2
+""", params=("text", "int"),
+    columns=("bill_code", "customer_name", "customer_number", "customer_name_key", "customer_number_key"))
+
+UPDATE_BILL_SEARCH_KEYS = register_query("update_bill_search_keys", """
+    UPDATE bills b
+    SET customer_name_key = k.name_key,
+        customer_number_key = k.number_key
+    FROM unnest($1::text[], $2::text[], $3::text[]) AS k(bill_code, name_key, number_key)
+    WHERE b.bill_code = k.bill_code
+""", params=("text[]", "text[]", "text[]"))
 
 async def insert_new_bill(
         bill_date: Optional[str] = None,
@@ -34,38 +274,17 @@ async def insert_new_bill(
                 due_date = parse_date(due_date)
 
             kabul_tz = ZoneInfo("Asia/Kabul")
-            payment_history = json.dumps([
+            payment_history = [
                 {
                     "type": "initial",
                     "price": price,
                     "paid": paid,
                     "timestamp": datetime.datetime.now(kabul_tz).isoformat()
                 }
-            ])
-
-            sql_insert = """
-                INSERT INTO bills (
-                    bill_date,
-                    due_date,
-                    customer_name,
-                    customer_number,
-                    price,
-                    paid,
-                    remaining,
-                    status,
-                    fabrics,
-                    parts,
-                    salesman,
-                    tailor,
-                    additional_data,
-                    installation,
-                    payment_history
-                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9::jsonb, $10::jsonb, $11, $12, $13::jsonb, $14, $15::jsonb)
-                RETURNING bill_code
-            """
-
-            bill_code = await conn.fetchval(
-                sql_insert,
+            ]
+
+            bill_code = await INSERT_BILL.fetchval(
+                conn,
                 bill_date,
                 due_date,
                 customer_name,
@@ -80,9 +299,15 @@ async def insert_new_bill(
                 tailor,
                 additional_data,
                 installation,
-                payment_history
+                payment_history,
+                normalize_name(customer_name),
+                normalize_phone(customer_number)
             )
-            return bill_code
+            if bill_code:
+                await bump_sync_versions(conn, ["bills"])
+                await refresh_bill(conn, bill_code)
+        await invalidate_dashboard()
+        return bill_code
     except Exception as e:
         await flatbed('exception', f"In insert_new_bill: {e}")
         return None
@@ -107,70 +332,16 @@ async def update_bill(
 ) -> Optional[str]:
     try:
         async with connection_context() as conn:
-            # Fetch existing data
-            row = await conn.fetchrow(
-                "SELECT price, paid, payment_history FROM bills WHERE bill_code = $1", bill_code
-            )
-
-            if not row:
-                return None
-
-            old_price = row['price']
-            old_paid = row['paid']
-            history_raw = row['payment_history']
-            history = json.loads(history_raw) if history_raw else []
-
-            # Build history updates
-            kabul_tz = ZoneInfo("Asia/Kabul")
-            now = datetime.datetime.now(kabul_tz).isoformat()
-            updates = []
-
-            if price is not None and price != old_price:
-                updates.append({
-                    "type": "price_changed",
-                    "from": old_price,
-                    "to": price,
-                    "edited_by": username,
-                    "timestamp": now
-                })
-
-            if paid is not None and paid != old_paid:
-                updates.append({
-                    "type": "payment_edited",
-                    "from": old_paid,
-                    "to": paid,
-                    "edited_by": username,
-                    "timestamp": now
-                })
-
-            # Append to existing history
-            new_history = history + updates if updates else history
-
             if due_date:
                 due_date = datetime.datetime.strptime(due_date, "%Y-%m-%d").date() if isinstance(due_date,
                                                                                                  str) else due_date
 
-            sql_update = """
-                UPDATE bills
-                SET due_date = $1,
-                    customer_name = $2,
-                    customer_number = $3,
-                    price = $4,
-                    paid = $5,
-                    remaining = $6,
-                    status = $7,
-                    fabrics = $8::jsonb,
-                    parts = $9::jsonb,
-                    salesman = $10,
-                    tailor = $11,
-                    additional_data = $12::jsonb,
-                    installation = $13,
-                    payment_history = $14::jsonb,
-                    updated_at = NOW()
-                WHERE bill_code = $15
-            """
-            await conn.execute(
-                sql_update,
+            # Changes to price and paid are appended to payment_history by the same statement
+            kabul_tz = ZoneInfo("Asia/Kabul")
+            now = datetime.datetime.now(kabul_tz).isoformat()
+
+            updated = await UPDATE_BILL.fetchval(
+                conn,
                 due_date,
                 customer_name,
                 customer_number,
@@ -184,10 +355,18 @@ async def update_bill(
                 tailor,
                 additional_data,
                 installation,
-                json.dumps(new_history),
+                normalize_name(customer_name),
+                normalize_phone(customer_number),
                 bill_code,
+                username,
+                now,
             )
-            return bill_code
+            if not updated:
+                return None
+            await bump_sync_versions(conn, ["bills"])
+            await refresh_bill(conn, bill_code)
+        await invalidate_dashboard()
+        return bill_code
     except Exception as e:
         await flatbed('exception', f"In update_bill: {e}")
         return None
@@ -207,22 +386,18 @@ async def update_bill_status_ps(bill_code: str, new_status: str) -> str | None:
     try:
         async with connection_context() as conn:
             # Step 1: Get current status
-            sql_select = "SELECT status FROM bills WHERE bill_code = $1"
-            previous_status = await conn.fetchval(sql_select, bill_code)
+            previous_status = await BILL_STATUS.fetchval(conn, bill_code)
 
             if previous_status is None:
                 return None  # Bill not found
 
             # Step 2: Perform update
-            sql_update = """
-                UPDATE bills
-                SET status = $1,
-                    updated_at = now()
-                WHERE bill_code = $2
-            """
-            await conn.execute(sql_update, new_status, bill_code)
+            await UPDATE_BILL_STATUS.execute(conn, new_status, bill_code)
+            await bump_sync_versions(conn, ["bills"])
+            await refresh_bill(conn, bill_code)
 
-            return previous_status
+        await invalidate_dashboard()
+        return previous_status
 
     except Exception as e:
         await flatbed('exception', f"In update_bill_status_ps: {e}")
@@ -241,11 +416,7 @@ async def check_bill_status_ps(bill_code: str):
     """
     try:
         async with connection_context() as conn:
-            sql_query = """
-                SELECT status from bills
-                WHERE bill_code = $1
-            """
-            status = await conn.fetchval(sql_query, bill_code)
+            status = await BILL_STATUS.fetchval(conn, bill_code)
 
             return status
     except Exception as e:
@@ -266,12 +437,7 @@ async def save_notify_bill_status_ps(chat_id: int, bill_code: str):
     """
     try:
         async with connection_context() as conn:
-            sql_insert = """
-                INSERT INTO notify_bill_status (chat_id, bill_code)
-                VALUES ($1, $2)
-                ON CONFLICT DO NOTHING;
-            """
-            await conn.execute(sql_insert, chat_id, bill_code)
+            await INSERT_NOTIFY_BILL_STATUS.execute(conn, chat_id, bill_code)
 
             return True
     except Exception as e:
@@ -281,17 +447,13 @@ async def save_notify_bill_status_ps(chat_id: int, bill_code: str):
 
 async def get_chat_ids_for_bill(bill_code: str) -> list[int]:
     async with connection_context() as conn:
-        rows = await conn.fetch(
-            "SELECT chat_id FROM notify_bill_status WHERE bill_code = $1", bill_code
-        )
+        rows = await NOTIFY_CHAT_IDS.fetch(conn, bill_code)
         return [row["chat_id"] for row in rows]
 
 
 async def delete_notify_records_for_bill(bill_code: str):
     async with connection_context() as conn:
-        await conn.execute(
-            "DELETE FROM notify_bill_status WHERE bill_code = $1", bill_code
-        )
+        await DELETE_NOTIFY_RECORDS.execute(conn, bill_code)
 
 
 async def update_bill_tailor_ps(bill_code: str, tailor: str) -> Optional[str]:
@@ -300,21 +462,9 @@ async def update_bill_tailor_ps(bill_code: str, tailor: str) -> Optional[str]:
     """
     try:
         async with connection_context() as conn:
-            sql_update = """
-                WITH updated_bill AS (
-                    UPDATE bills
-                    SET tailor = $1,
-                        updated_at = now()
-                    WHERE bill_code = $2
-                    RETURNING tailor
-                )
-                SELECT 
-                    COALESCE(u.full_name, ub.tailor) AS tailor_full_name
-                FROM updated_bill ub
-                LEFT JOIN users u 
-                    ON is_uuid(ub.tailor) AND u.user_id = ub.tailor::uuid;
-            """
-            updated_tailor_name = await conn.fetchval(sql_update, tailor, bill_code)
+            updated_tailor_name = await UPDATE_BILL_TAILOR.fetchval(conn, tailor, bill_code)
+            await bump_sync_versions(conn, ["bills"])
+            await refresh_bill(conn, bill_code)
             return updated_tailor_name  # Will be None if not updated
     except Exception as e:
         await flatbed('exception', f"In update_bill_tailor_ps: {e}")
@@ -335,10 +485,11 @@ async def add_payment_bill_ps(bill_code: str, amount: int, username: str) -> boo
     """
     try:
         async with connection_context() as conn:
-            sql_query = "CALL update_bill_payment($1, $2, $3);"
-
-            await conn.execute(sql_query, bill_code, amount, username)
-            return True  # If execution reaches here, the update was successful
+            await ADD_BILL_PAYMENT.execute(conn, bill_code, amount, username)
+            await bump_sync_versions(conn, ["bills"])
+            await refresh_bill(conn, bill_code)
+        await invalidate_dashboard()
+        return True  # If execution reaches here, the update was successful
     except Exception as e:
         await flatbed('exception', f"In add_payment_bill_ps: {e}")
         return False
@@ -360,8 +511,7 @@ async def search_bills_list(search_query, search_by):
     """
     try:
         async with connection_context() as conn:
-            query = "SELECT * FROM search_bills_list($1, $2);"
-            bills_list = await conn.fetch(query, search_query, search_by)
+            bills_list = await SEARCH_BILLS.fetch(conn, search_query, search_by)
             return bills_list  # Returns a list of asyncpg Record objects
 
     except Exception as e:
@@ -369,22 +519,91 @@ async def search_bills_list(search_query, search_by):
         raise
 
 
-async def search_bills_list_filtered(_date, state):
+async def search_bills_by_key(search_query, search_by, limit=SEARCH_RESULT_LIMIT):
+    """
+    Retrieve bills whose normalized customer name or number starts with the
+    normalized search query, through the key column indexes.
+
+    Parameters:
+    - search_query (str): Name or phone number in any spelling or format.
+    - search_by (int): 1 for 'customer_name', 2 for 'customer_number'.
+
+    Returns:
+    - List of records, newest bill first, shaped like search_bills_list rows.
+    """
+    query, key = (BILLS_BY_NUMBER_KEY, normalize_phone(search_query)) if search_by == 2 \
+        else (BILLS_BY_NAME_KEY, normalize_name(search_query))
+    if not key:
+        return []
+    try:
+        async with connection_context() as conn:
+            # Every key starting with `key` sorts below `key` with its last character bumped
+            return await query.fetch(conn, key, key[:-1] + chr(ord(key[-1]) + 1), limit)
+
+    except Exception as e:
+        await flatbed('exception', f"In search_bills_by_key: {e}")
+        raise
+
+
+async def backfill_bill_search_keys(batch_size: int = 1000) -> int:
+    """
+    (Re)compute every bill's customer keys in batches, writing only rows whose
+    keys changed. Safe to rerun, e.g. after the normalization rules change.
+
+    Returns:
+    - Number of bills whose keys were updated.
     """
-    Retrieve bills list based on a date or state filter.
+    async with connection_context() as conn:
+        return await fill_bill_search_keys(conn, batch_size)
+
+
+async def fill_bill_search_keys(conn, batch_size: int = 1000) -> int:
+    """
+    backfill_bill_search_keys on a given connection, as the tenant migration
+    runs it. Outside a transaction each batch commits on its own, so its rows
+    are locked only while it runs.
+    """
+    updated = 0
+    last_code = ""
+    while True:
+        rows = await BILL_SEARCH_KEY_SOURCES.fetch(conn, last_code, batch_size)
+        if not rows:
+            return updated
+        last_code = rows[-1]["bill_code"]
+
+        codes, name_keys, number_keys = [], [], []
+        for row in rows:
+            name_key = normalize_name(row["customer_name"])
+            number_key = normalize_phone(row["customer_number"])
+            if name_key != row["customer_name_key"] or number_key != row["customer_number_key"]:
+                codes.append(row["bill_code"])
+                name_keys.append(name_key)
+                number_keys.append(number_key)
+        if codes:
+            await UPDATE_BILL_SEARCH_KEYS.execute(conn, codes, name_keys, number_keys)
+            updated += len(codes)
+
+
+async def search_bills_list_filtered(_date, state, cursor=None, limit=None):
+    """
+    Retrieve a page of the bills list based on a date or state filter.
 
     Parameters:
     - date (int): The date filter for bills list.
-    - state (int): The index for the state of the bill:
+    - state (int): The index for the state of the bill.
+    - cursor (str): Cursor of the page, from the previous page; None for the first.
+    - limit (int): Page size, capped to PAGE_SIZE_MAX. Without cursor and limit the whole list.
 
     Returns:
-    - List of records from the bills table that match the criteria.
+    - Tuple of the page's records from the bills table that match the criteria,
+      and the cursor of the next page (None on the last one).
     """
+    keyset = Keyset(cursor, limit, [_date, state], sort_column="bill_date", key_column="bill_code",
+                    sort_type=datetime.date)
     try:
         async with connection_context() as conn:
-            query = "SELECT * FROM search_bills_list_filtered($1, $2);"
-            bills_list = await conn.fetch(query, _date, state)
-            return bills_list  # Returns a list of asyncpg Record objects
+            bills_list = await SEARCH_BILLS_FILTERED.fetch(conn, _date, state, *keyset.args)
+            return keyset.page(bills_list)
 
     except Exception as e:
         await flatbed('exception', f"In search_bills_list_filtered: {e}")
@@ -403,8 +622,7 @@ async def get_bill_ps(code):
     """
     try:
         async with connection_context() as conn:
-            query = "SELECT * FROM search_bills_list($1, $2, 1, true);"
-            data = await conn.fetchrow(query, code, 0)
+            data = await BILL_BY_CODE.fetchrow(conn, code, 0)
 
             if data:
                 bill = make_bill_dic(data)
@@ -417,86 +635,54 @@ async def get_bill_ps(code):
         return None
 
 
-async def get_payment_history_ps(code):
+async def get_payment_history_ps(code, cursor=None, limit=None):
     """
-    Retrieve payment history based on code (Async Version for asyncpg).
+    Retrieve a bill's payment history: all of it, oldest event first, as clients
+    from before paging expect, or with a cursor or limit a page of it, newest first.
 
     Parameters:
     - code (str): The code for the specified bill.
+    - cursor (str): Cursor of the page, from the previous page; None for the first.
+    - limit (int): Page size, capped to PAGE_SIZE_MAX.
 
     Returns:
-    - str: payment history.
+    - Tuple of the payment history entries and the cursor of the next page
+      (None on the last one, and without paging).
     """
+    keyset = Keyset(cursor, limit, [code], sort_column="n", key_column="n", sort_type=int)
     try:
         async with connection_context() as conn:
-            query = "SELECT payment_history::TEXT from bills where bill_code = $1;"
-            payment_history = await conn.fetchrow(query, code)
-
-            if payment_history:
-                return payment_history["payment_history"]
-
-            return None
+            if keyset.limit is None:
+                return await BILL_PAYMENT_HISTORY.fetchval(conn, code) or [], None
+            after_n, _, row_limit = keyset.args
+            events, next_cursor = keyset.page(await BILL_PAYMENT_HISTORY_PAGE.fetch(conn, code, after_n, row_limit))
+            return [event["event"] for event in events], next_cursor
 
     except Exception as e:
         await flatbed('exception', f"In get_payment_history_ps: {e}")
-        return None
+        raise
 
 
-async def check_due_add_notification_for_related_staff(days_before_due: int = 1):
+async def check_due_add_notification_for_related_staff(windows=DUE_REMINDER_WINDOWS):
     """
-    Notify salesman and tailor when a bill is close to due_date.
+    Notify salesman and tailor of the bills that are overdue or close to due_date,
+    in one statement for all reminder windows. A notification already sent isn't repeated.
 
     Args:
-        days_before_due (int): How many days before due_date to send reminders.
-                               Default = 1 (tomorrow).
+        windows: Reminder windows, as in DUE_REMINDER_WINDOWS.
     Returns:
-        int: number of notifications created
+        dict: number of notifications created per window name
     """
     try:
         async with connection_context() as conn:
-            # 1. Select bills that are due today or within the given window
-            query = """
-                SELECT bill_code, due_date, customer_name, salesman, tailor
-                FROM bills
-                WHERE due_date = CURRENT_DATE + $1::interval
-                AND status NOT IN ('ready', 'delivered', 'canceled');
-            """
-            # PostgreSQL interval, e.g. '1 day'
-            overdue_bills = await conn.fetch(query, f'{days_before_due} days')
-
-            if not overdue_bills:
-                return 0
-
-            notifications = []
-            for bill in overdue_bills:
-                bill_code = bill["bill_code"]
-                due_date = bill["due_date"]
-
-                # Choose Persian message depending on days_before_due
-                if days_before_due == 1:
-                    msg = f"یادآوری: سبا آخرین تاریخ تحویل بل شماره {bill_code} است. لطفاً آن را آماده سازید."
-                elif days_before_due == 0:
-                    msg = f"یادآوری: امروز آخرین تاریخ تحویل بل شماره {bill_code} است. لطفاً آن را آماده سازید."
-                else:
-                    msg = f"یادآوری: آخرین تاریخ تحویل بل شماره {bill_code} {due_date} می‌باشد. لطفاً آن را آماده سازید."
-
-                # Only notify if it's a UUID
-                if bill["salesman"] and is_uuid(bill["salesman"]):
-                    notifications.append(("bill_due_alert", bill_code, msg, bill["salesman"]))
-                if bill["tailor"] and is_uuid(bill["tailor"]):
-                    notifications.append(("bill_due_alert", bill_code, msg, bill["tailor"]))
-
-            # 2. Insert notifications (avoid duplicates)
-            if notifications:
-                insert_query = """
-                    INSERT INTO notifications (type, reference, message, target_user_id)
-                    VALUES ($1, $2, $3, $4)
-                    ON CONFLICT DO NOTHING;
-                """
-                for _type, reference, message, target_user_id in notifications:
-                    await conn.execute(insert_query, _type, reference, message, target_user_id)
-
-            return len(notifications)
+            names, first_days, last_days, types, messages = (list(column) for column in zip(*windows))
+            rows = await NOTIFY_DUE_BILLS.fetch(conn, names, first_days, last_days, types, messages)
+            created = {row["name"]: row["created"] for row in rows}
+
+            if any(created.values()):
+                await bump_sync_versions(conn, ["notifications"])
+
+            return created
 
     except Exception as e:
         await flatbed('exception', f"In check_due_add_notification_for_related_staff: {e}")
@@ -506,7 +692,10 @@ async def check_due_add_notification_for_related_staff(days_before_due: int = 1)
 async def remove_bill_ps(code):
     try:
         async with connection_context() as conn:
-            await conn.execute("DELETE FROM bills WHERE bill_code = $1", code)
+            await DELETE_BILL.execute(conn, code)
+            await bump_sync_versions(conn, ["bills"])
+        forget_bill(code)
+        await invalidate_dashboard()
         return True
     except Exception as e:
         await flatbed('exception', f"in remove_bill_ps: {e}")
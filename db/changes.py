@@ -0,0 +1,156 @@
+from helpers import encode_cursor, decode_cursor
+from utils import flatbed
+from utils.conn import connection_context
+from .queries import register_query
+from .sync import bump_sync_versions
+
+CURSOR_VERSION = 2
+SYNC_STREAM_BATCH_SIZE = 500  # rows read from the server-side cursor at a time
+
+# One row per product/roll ever seen: the transaction that last changed it and whether it is gone.
+# Created and seeded with every existing product and roll by a tenant migration (db/migrations.py).
+CREATE_CHANGE_LOG = register_query("create_inventory_changes", """
+    CREATE TABLE IF NOT EXISTS inventory_changes (
+        kind text NOT NULL,
+        code text NOT NULL,
+        deleted boolean NOT NULL DEFAULT false,
+        txid bigint NOT NULL DEFAULT txid_current(),
+        changed_at timestamptz NOT NULL DEFAULT now(),
+        PRIMARY KEY (kind, code)
+    );
+    CREATE INDEX IF NOT EXISTS inventory_changes_txid_idx ON inventory_changes (txid);
+    INSERT INTO inventory_changes (kind, code)
+    SELECT 'product', product_code FROM products
+    UNION ALL
+    SELECT 'roll', roll_code FROM rolls
+    ON CONFLICT DO NOTHING;
+""", params=())
+
+# Stamped with the writing transaction's id: writers never wait on each other here, and
+# a reader finds what committed since its last snapshot by the ids that snapshot didn't see
+RECORD_CHANGES = register_query("record_inventory_changes", """
+    INSERT INTO inventory_changes (kind, code, deleted, txid)
+    SELECT c.kind, c.code, c.deleted, txid_current()
+    FROM unnest($1::text[], $2::text[], $3::bool[]) AS c(kind, code, deleted)
+    ON CONFLICT (kind, code) DO UPDATE
+    SET deleted = EXCLUDED.deleted,
+        txid = EXCLUDED.txid,
+        changed_at = now()
+""", params=("text[]", "text[]", "bool[]"))
+
+# Every transaction below a snapshot's xmin had ended when it was taken, so what it didn't
+# see was written by transactions from xmin on. Those it did see are sent again, which is harmless.
+CHANGES_SINCE = register_query("inventory_changes_since", """
+    SELECT kind, code, deleted
+    FROM inventory_changes
+    WHERE txid >= $1
+""", params=("bigint",), columns=("kind", "code", "deleted"))
+
+# First query of the reader's transaction, so these are the bounds of the snapshot it reads in
+SNAPSHOT_BOUNDS = register_query("inventory_changes_snapshot", """
+    SELECT txid_snapshot_xmin(s) AS xmin, txid_snapshot_xmax(s) AS xmax
+    FROM txid_current_snapshot() s
+""", params=(), columns=("xmin", "xmax"))
+
+ROLL_PRODUCT_CODE = register_query("roll_product_code", "SELECT product_code FROM rolls WHERE roll_code = $1",
+                                   params=("text",), columns=("product_code",))
+
+# Same rows as products_for_sync / rolls_for_sync, for the codes named by the change log (NULL: all)
+PRODUCTS_BY_CODES = register_query("products_for_sync_by_codes", """
+    SELECT
+        p.*,
+        COALESCE(s.quantity, 0) AS quantity
+    FROM products p
+    LEFT JOIN product_stock s ON s.product_code = p.product_code
+    WHERE $1::text[] IS NULL OR p.product_code = ANY($1)
+""", params=("text[]",))
+
+ROLLS_BY_CODES = register_query("rolls_for_sync_by_codes", """
+    SELECT
+        r.*,
+        pi.cost_per_metre
+    FROM rolls r
+    LEFT JOIN purchase_items pi ON r.purchase_item_id = pi.id
+    WHERE $1::text[] IS NULL OR r.roll_code = ANY($1)
+""", params=("text[]",))
+
+async def record_changes(conn, changes):
+    """
+    Log (kind, code, deleted) changes for sync clients, kind being 'product' or 'roll'.
+
+    Call inside the transaction of the write itself: the change then commits or
+    rolls back with it.
+    """
+    if not changes:
+        return
+    kinds, codes, deleted = zip(*changes)
+    await RECORD_CHANGES.execute(conn, list(kinds), list(codes), list(deleted))
+    await bump_sync_versions(conn, ["inventory"])
+
+
+async def record_roll_change(conn, roll_code, product_code=None, deleted=False):
+    """Log a roll change, and its product's, whose quantity is the sum of its rolls."""
+    changes = [("roll", roll_code, deleted)]
+    if product_code is None:
+        product_code = await ROLL_PRODUCT_CODE.fetchval(conn, roll_code)
+    if product_code is not None:
+        changes.append(("product", product_code, False))
+    await record_changes(conn, changes)
+
+
+def _cursor_xmin(cursor):
+    values = decode_cursor(cursor) if cursor else None
+    if not values or len(values) != 2 or values[0] != CURSOR_VERSION or not isinstance(values[1], int):
+        return None
+    return values[1]
+
+
+async def stream_inventory_changes(cursor: str = None, batch_size: int = SYNC_STREAM_BATCH_SIZE):
+    """
+    Products and rolls changed since `cursor`, plus the codes deleted since then,
+    read through server-side cursors so a tenant's inventory is never held in memory.
+
+    Without a usable cursor (first sync, or one this server can't read) every
+    product and roll is returned with full=True, telling the client to replace its copy.
+
+    Yields (key, value) pairs in this order: ("cursor", next cursor), ("full", bool),
+    then batches of at most `batch_size` as ("products", [records]), ("rolls", [records]),
+    ("deletedProducts", [codes]) and ("deletedRolls", [codes]). Everything comes from one
+    repeatable-read snapshot, so the cursor matches what was sent.
+    """
+    since = _cursor_xmin(cursor)
+    try:
+        async with connection_context() as conn:
+            async with conn.transaction(isolation="repeatable_read", readonly=True):
+                snapshot = await SNAPSHOT_BOUNDS.fetchrow(conn)
+                if since is not None and since > snapshot["xmax"]:
+                    since = None  # issued by another cluster, e.g. before a restore
+
+                live = {"product": None, "roll": None}  # None selects every row for a full sync
+                deleted = {"product": [], "roll": []}
+                if since is not None:
+                    live = {"product": [], "roll": []}
+                    for change in await CHANGES_SINCE.fetch(conn, since):
+                        (deleted if change["deleted"] else live)[change["kind"]].append(change["code"])
+
+                yield "cursor", encode_cursor(CURSOR_VERSION, snapshot["xmin"])
+                yield "full", since is None
+
+                # Every key is yielded at least once, if only with an empty batch
+                for key, query, codes in (("products", PRODUCTS_BY_CODES, live["product"]),
+                                          ("rolls", ROLLS_BY_CODES, live["roll"])):
+                    yield key, []
+                    if codes == []:
+                        continue
+                    rows = await query.cursor(conn, codes)
+                    while batch := await rows.fetch(batch_size):
+                        yield key, batch
+
+                for key, codes in (("deletedProducts", deleted["product"]), ("deletedRolls", deleted["roll"])):
+                    yield key, []
+                    for i in range(0, len(codes), batch_size):
+                        yield key, codes[i:i + batch_size]
+
+    except Exception as e:
+        await flatbed("exception", f"In stream_inventory_changes: {e}")
+        raise
@@ -0,0 +1,289 @@
+import time
+
+from utils import flatbed
+from utils.conn import connection_context, current_db
+from .queries import register_query
+
+KABUL_DAY = "(now() AT TIME ZONE 'Asia/Kabul')::date"
+COUNTER_FOLD_INTERVAL_SECONDS = 60  # a dashboard read folds the deltas at most this often per tenant
+
+COUNTER_COLUMNS = ("total_products", "total_rolls", "inventory_value", "bills_pending", "bills_cut",
+                   "bills_with_tailor", "bills_ready", "total_revenue", "outstanding_dues", "drafts_count")
+
+# The stored procedure get_dashboard_data() stays the definition of every figure: the counters
+# start from it and verify_dashboard_counters checks them against it, correcting and reporting
+# whatever the triggers below count differently.
+EXPECTED = f"""
+    SELECT {", ".join(f"{column}::bigint AS {column}" for column in (*COUNTER_COLUMNS, "today_expenses"))}
+    FROM get_dashboard_data()
+"""
+
+# Adds a delta row's figures to the row of the same transaction
+_ACCUMULATE = ", ".join(f"{column} = d.{column} + EXCLUDED.{column}" for column in COUNTER_COLUMNS)
+
+# Triggers keep the counters in step with every write, inside the write's own transaction,
+# including those made by stored procedures (e.g. update_bill_payment). Each adds the new
+# row's share and takes back the old row's, into a delta row of its own transaction, so
+# concurrent writers never wait on each other's counter updates. Readers add the deltas to
+# the counters, and fold_dashboard_counters moves them in from time to time.
+# Created, together with the initial figures, by a tenant migration (db/migrations.py)
+# while writes to the counted tables wait, so no write is counted twice or missed.
+CREATE_DASHBOARD_COUNTERS = register_query("create_dashboard_counters", f"""
+    CREATE TABLE IF NOT EXISTS dashboard_counters (
+        id boolean PRIMARY KEY DEFAULT true CHECK (id),
+        {", ".join(f"{column} bigint NOT NULL DEFAULT 0" for column in COUNTER_COLUMNS)},
+        updated_at timestamptz NOT NULL DEFAULT now()
+    );
+    CREATE TABLE IF NOT EXISTS dashboard_daily_expenses (
+        day date PRIMARY KEY,
+        amount bigint NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS dashboard_counter_deltas (
+        txid bigint PRIMARY KEY,
+        {", ".join(f"{column} bigint NOT NULL DEFAULT 0" for column in COUNTER_COLUMNS)}
+    );
+    CREATE TABLE IF NOT EXISTS dashboard_expense_deltas (
+        txid bigint NOT NULL,
+        day date NOT NULL,
+        amount bigint NOT NULL DEFAULT 0,
+        PRIMARY KEY (txid, day)
+    );
+
+    CREATE OR REPLACE FUNCTION dashboard_count_bills() RETURNS trigger LANGUAGE plpgsql AS $fn$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND (OLD.status, OLD.paid, OLD.remaining)
+                IS NOT DISTINCT FROM (NEW.status, NEW.paid, NEW.remaining) THEN
+            RETURN NULL;
+        END IF;
+        INSERT INTO dashboard_counter_deltas AS d (txid, bills_pending, bills_cut, bills_with_tailor, bills_ready,
+                                                   total_revenue, outstanding_dues)
+        SELECT
+            txid_current(),
+            COALESCE(SUM(sign) FILTER (WHERE status = 'pending'), 0),
+            COALESCE(SUM(sign) FILTER (WHERE status = 'cut'), 0),
+            COALESCE(SUM(sign) FILTER (WHERE status = 'with_tailor'), 0),
+            COALESCE(SUM(sign) FILTER (WHERE status = 'ready'), 0),
+            COALESCE(SUM(sign * paid) FILTER (WHERE status IS DISTINCT FROM 'canceled'), 0),
+            COALESCE(SUM(sign * GREATEST(remaining, 0)) FILTER (WHERE status IS DISTINCT FROM 'canceled'), 0)
+        FROM (
+            SELECT 1, NEW.status, NEW.paid, NEW.remaining WHERE TG_OP <> 'DELETE'
+            UNION ALL
+            SELECT -1, OLD.status, OLD.paid, OLD.remaining WHERE TG_OP <> 'INSERT'
+        ) AS r(sign, status, paid, remaining)
+        ON CONFLICT (txid) DO UPDATE SET {_ACCUMULATE};
+        RETURN NULL;
+    END
+    $fn$;
+
+    CREATE OR REPLACE FUNCTION dashboard_count_products() RETURNS trigger LANGUAGE plpgsql AS $fn$
+    BEGIN
+        INSERT INTO dashboard_counter_deltas AS d (txid, total_products)
+        VALUES (txid_current(),
+                CASE WHEN TG_OP <> 'DELETE' AND NEW.archived IS NOT TRUE THEN 1 ELSE 0 END
+                - CASE WHEN TG_OP <> 'INSERT' AND OLD.archived IS NOT TRUE THEN 1 ELSE 0 END)
+        ON CONFLICT (txid) DO UPDATE SET {_ACCUMULATE};
+        RETURN NULL;
+    END
+    $fn$;
+
+    CREATE OR REPLACE FUNCTION dashboard_count_stock() RETURNS trigger LANGUAGE plpgsql AS $fn$
+    BEGIN
+        INSERT INTO dashboard_counter_deltas AS d (txid, total_rolls, inventory_value)
+        VALUES (txid_current(),
+                CASE WHEN TG_OP <> 'DELETE' THEN NEW.active_rolls ELSE 0 END
+                - CASE WHEN TG_OP <> 'INSERT' THEN OLD.active_rolls ELSE 0 END,
+                CASE WHEN TG_OP <> 'DELETE' THEN NEW.stock_value ELSE 0 END
+                - CASE WHEN TG_OP <> 'INSERT' THEN OLD.stock_value ELSE 0 END)
+        ON CONFLICT (txid) DO UPDATE SET {_ACCUMULATE};
+        RETURN NULL;
+    END
+    $fn$;
+
+    CREATE OR REPLACE FUNCTION dashboard_count_drafts() RETURNS trigger LANGUAGE plpgsql AS $fn$
+    BEGIN
+        INSERT INTO dashboard_counter_deltas AS d (txid, drafts_count)
+        VALUES (txid_current(),
+                CASE WHEN TG_OP <> 'DELETE' AND NEW.status = 'draft' THEN 1 ELSE 0 END
+                - CASE WHEN TG_OP <> 'INSERT' AND OLD.status = 'draft' THEN 1 ELSE 0 END)
+        ON CONFLICT (txid) DO UPDATE SET {_ACCUMULATE};
+        RETURN NULL;
+    END
+    $fn$;
+
+    CREATE OR REPLACE FUNCTION dashboard_count_expenses() RETURNS trigger LANGUAGE plpgsql AS $fn$
+    BEGIN
+        INSERT INTO dashboard_expense_deltas AS t (txid, day, amount)
+        SELECT txid_current(), day, SUM(amount)
+        FROM (
+            SELECT (NEW.created_at AT TIME ZONE 'Asia/Kabul')::date, NEW.amount WHERE TG_OP <> 'DELETE'
+            UNION ALL
+            SELECT (OLD.created_at AT TIME ZONE 'Asia/Kabul')::date, -OLD.amount WHERE TG_OP <> 'INSERT'
+        ) AS r(day, amount)
+        GROUP BY day
+        ON CONFLICT (txid, day) DO UPDATE SET amount = t.amount + EXCLUDED.amount;
+        RETURN NULL;
+    END
+    $fn$;
+
+    LOCK TABLE bills, products, product_stock, cut_fabric_tx, expenses IN SHARE ROW EXCLUSIVE MODE;
+
+    DROP TRIGGER IF EXISTS dashboard_count_bills ON bills;
+    CREATE TRIGGER dashboard_count_bills
+        AFTER INSERT OR DELETE OR UPDATE OF status, paid, remaining ON bills
+        FOR EACH ROW EXECUTE FUNCTION dashboard_count_bills();
+    DROP TRIGGER IF EXISTS dashboard_count_products ON products;
+    CREATE TRIGGER dashboard_count_products
+        AFTER INSERT OR DELETE OR UPDATE OF archived ON products
+        FOR EACH ROW EXECUTE FUNCTION dashboard_count_products();
+    DROP TRIGGER IF EXISTS dashboard_count_stock ON product_stock;
+    CREATE TRIGGER dashboard_count_stock
+        AFTER INSERT OR DELETE OR UPDATE OF active_rolls, stock_value ON product_stock
+        FOR EACH ROW EXECUTE FUNCTION dashboard_count_stock();
+    DROP TRIGGER IF EXISTS dashboard_count_drafts ON cut_fabric_tx;
+    CREATE TRIGGER dashboard_count_drafts
+        AFTER INSERT OR DELETE OR UPDATE OF status ON cut_fabric_tx
+        FOR EACH ROW EXECUTE FUNCTION dashboard_count_drafts();
+    DROP TRIGGER IF EXISTS dashboard_count_expenses ON expenses;
+    CREATE TRIGGER dashboard_count_expenses
+        AFTER INSERT OR DELETE OR UPDATE OF amount, created_at ON expenses
+        FOR EACH ROW EXECUTE FUNCTION dashboard_count_expenses();
+
+    DELETE FROM dashboard_counters;
+    DELETE FROM dashboard_counter_deltas;
+    DELETE FROM dashboard_expense_deltas;
+    DELETE FROM dashboard_daily_expenses;
+    WITH expected AS ({EXPECTED}), counters AS (
+        INSERT INTO dashboard_counters ({", ".join(COUNTER_COLUMNS)})
+        SELECT {", ".join(COUNTER_COLUMNS)} FROM expected
+    )
+    INSERT INTO dashboard_daily_expenses (day, amount)
+    SELECT {KABUL_DAY}, today_expenses FROM expected;
+""", params=())
+
+# The counters plus the deltas not folded in yet, and today's expenses likewise
+DASHBOARD_COUNTERS = register_query("dashboard_counters", f"""
+    SELECT
+        {", ".join(f"(c.{column} + d.{column})::bigint AS {column}" for column in COUNTER_COLUMNS)},
+        e.amount::bigint AS today_expenses
+    FROM dashboard_counters c,
+    (
+        SELECT {", ".join(f"COALESCE(SUM({column}), 0) AS {column}" for column in COUNTER_COLUMNS)}
+        FROM dashboard_counter_deltas
+    ) d,
+    (
+        SELECT COALESCE(SUM(amount), 0) AS amount
+        FROM (
+            SELECT amount FROM dashboard_daily_expenses WHERE day = {KABUL_DAY}
+            UNION ALL
+            SELECT amount FROM dashboard_expense_deltas WHERE day = {KABUL_DAY}
+        ) today
+    ) e
+""", params=(), columns=(*COUNTER_COLUMNS, "today_expenses"))
+
+# Only committed deltas are seen and deleted; a transaction still writing keeps its row
+FOLD_COUNTER_DELTAS = register_query("fold_dashboard_counter_deltas", f"""
+    WITH moved AS (
+        DELETE FROM dashboard_counter_deltas RETURNING *
+    ), totals AS (
+        SELECT {", ".join(f"COALESCE(SUM({column}), 0) AS {column}" for column in COUNTER_COLUMNS)}
+        FROM moved
+    )
+    UPDATE dashboard_counters c
+    SET {", ".join(f"{column} = c.{column} + t.{column}" for column in COUNTER_COLUMNS)},
+        updated_at = now()
+    FROM totals t
+    WHERE EXISTS (SELECT 1 FROM moved)
+""", params=())
+
+FOLD_EXPENSE_DELTAS = register_query("fold_dashboard_expense_deltas", """
+    WITH moved AS (
+        DELETE FROM dashboard_expense_deltas RETURNING day, amount
+    )
+    INSERT INTO dashboard_daily_expenses AS t (day, amount)
+    SELECT day, SUM(amount) FROM moved GROUP BY day
+    ON CONFLICT (day) DO UPDATE SET amount = t.amount + EXCLUDED.amount
+""", params=())
+
+# Writers wait while the verification compares, so what it corrects is real drift.
+# In the order fold_dashboard_counters takes them.
+LOCK_COUNTED_TABLES = register_query("lock_counted_tables", """
+    LOCK TABLE bills, products, product_stock, cut_fabric_tx, expenses, dashboard_counter_deltas,
+        dashboard_counters, dashboard_expense_deltas, dashboard_daily_expenses IN SHARE ROW EXCLUSIVE MODE
+""", params=())
+
+# Once the deltas are folded in: the counters next to what get_dashboard_data() says
+COUNTERS_WITH_EXPECTED = register_query("dashboard_counters_expected", f"""
+    SELECT
+        {", ".join(f"c.{column}, g.{column} AS expected_{column}" for column in COUNTER_COLUMNS)},
+        COALESCE(e.amount, 0) AS today_expenses, g.today_expenses AS expected_today_expenses
+    FROM dashboard_counters c
+    CROSS JOIN ({EXPECTED}) g
+    LEFT JOIN dashboard_daily_expenses e ON e.day = {KABUL_DAY}
+""", params=(), columns=tuple(name for column in (*COUNTER_COLUMNS, "today_expenses")
+                               for name in (column, f"expected_{column}")))
+
+SET_DASHBOARD_COUNTERS = register_query("set_dashboard_counters", f"""
+    UPDATE dashboard_counters
+    SET {", ".join(f"{column} = ${i}" for i, column in enumerate(COUNTER_COLUMNS, 1))},
+        updated_at = now()
+""", params=("bigint",) * len(COUNTER_COLUMNS))
+
+SET_TODAY_EXPENSES = register_query("set_dashboard_today_expenses", f"""
+    INSERT INTO dashboard_daily_expenses (day, amount) VALUES ({KABUL_DAY}, $1)
+    ON CONFLICT (day) DO UPDATE SET amount = EXCLUDED.amount
+""", params=("bigint",))
+
+# Per tenant: when a dashboard read last folded the deltas in
+_last_fold = {}
+
+
+async def fold_dashboard_counters():
+    """Move the committed per-transaction deltas into the counters, so readers have few to add up."""
+    async with connection_context() as conn, conn.transaction():
+        await FOLD_COUNTER_DELTAS.execute(conn)
+        await FOLD_EXPENSE_DELTAS.execute(conn)
+
+
+async def get_dashboard_counters():
+    """The current tenant's dashboard counters and today's expenses: one row, no aggregation of the tables."""
+    db_name = current_db.get()
+    now = time.monotonic()
+    if now - _last_fold.get(db_name, 0.0) > COUNTER_FOLD_INTERVAL_SECONDS:
+        _last_fold[db_name] = now
+        try:
+            await fold_dashboard_counters()
+        except Exception as e:
+            # The deltas stay and are still added up below
+            await flatbed('exception', f"In fold_dashboard_counters: {e}")
+    async with connection_context() as conn:
+        return await DASHBOARD_COUNTERS.fetchrow(conn)
+
+
+async def verify_dashboard_counters():
+    """
+    Compare the counters with get_dashboard_data() and correct whatever differs,
+    e.g. after a restore, a trigger that was disabled, or a figure the triggers
+    count differently from the procedure. Writes to the counted tables wait for
+    it to finish.
+
+    Returns:
+    - dict: {counter: (counted value, expected value)} for each corrected counter,
+      "today_expenses" included.
+    """
+    try:
+        async with connection_context() as conn, conn.transaction():
+            await LOCK_COUNTED_TABLES.execute(conn)
+            await FOLD_COUNTER_DELTAS.execute(conn)
+            await FOLD_EXPENSE_DELTAS.execute(conn)
+            row = await COUNTERS_WITH_EXPECTED.fetchrow(conn)
+            drift = {column: (row[column], row[f"expected_{column}"])
+                     for column in (*COUNTER_COLUMNS, "today_expenses")
+                     if row[column] != row[f"expected_{column}"]}
+            if drift.keys() - {"today_expenses"}:
+                await SET_DASHBOARD_COUNTERS.execute(conn, *(row[f"expected_{column}"] for column in COUNTER_COLUMNS))
+            if "today_expenses" in drift:
+                await SET_TODAY_EXPENSES.execute(conn, row["expected_today_expenses"])
+            return drift
+    except Exception as e:
+        await flatbed('exception', f"In verify_dashboard_counters: {e}")
+        raise
@@ -1,53 +1,105 @@
-from helpers import get_date_range
+import asyncio
+import os
+import time
+
+from helpers import get_date_range, get_formatted_recent_activities_list, Keyset
+from redisdb.dashboard import get_dashboard_generation_redis, bump_dashboard_generation_redis, \
+    get_dashboard_snapshot_redis, set_dashboard_snapshot_redis
 from utils import flatbed
-from utils.conn import connection_context
+from utils.conn import after_commit, connection_context, current_db, request_scope
+from .queries import register_query
+from .counters import get_dashboard_counters
+from .sync import redis_up, redis_failed
+
+DASHBOARD_FRESH_SECONDS = int(os.getenv("DASHBOARD_FRESH", 30))  # served without a rebuild
+DASHBOARD_STALE_SECONDS = int(os.getenv("DASHBOARD_STALE", 300))  # served while a rebuild runs in the background
+
+# Keyset pages newest first, on (date, id); see helpers.Keyset
+ADMIN_RECORDS_IN_RANGE = register_query("admin_records_in_range", """
+    SELECT 
+        ar.id,
+        ar.date,
+        u.username,
+        ar.action
+    FROM user_actions ar
+    LEFT JOIN users u ON ar.user_id = u.user_id
+    WHERE ar.date >= $1 AND ar.date <= $2
+      AND (ar.date, ar.id) < (COALESCE($3, 'infinity'::timestamptz), COALESCE($4, 0))
+    ORDER BY ar.date DESC, ar.id DESC
+    LIMIT $5
+""", params=("timestamptz", "timestamptz", "timestamptz", "int", "int"), columns=("id", "date", "username", "action"))
+
+ADMIN_RECORDS_RECENT = register_query("admin_records_recent", """
+    SELECT 
+        ar.id,
+        ar.date,
+        u.username,
+        ar.action
+    FROM user_actions ar
+    LEFT JOIN users u ON ar.user_id = u.user_id
+    WHERE (ar.date, ar.id) < (COALESCE($1, 'infinity'::timestamptz), COALESCE($2, 0))
+    ORDER BY ar.date DESC, ar.id DESC
+    LIMIT $3
+""", params=("timestamptz", "int", "int"), columns=("id", "date", "username", "action"))
+
+# Per tenant: (generation, built_at unix time, dashboard data with recentActivities)
+_snapshots = {}
+
+# In-flight snapshot builds, so concurrent requests on a cold tenant share one
+_snapshot_builds = {}
 
 
 async def get_dashboard_data_ps():
     """
-    Retrieve dashboard data from the stored procedure `get_dashboard_data`.
+    Retrieve dashboard data from the dashboard counters, kept up to date by the
+    writes themselves (see db/counters.py): a single-row read.
 
     Returns:
-    - dict: A dictionary containing dashboard data from the stored procedure `get_dashboard_data`.
+    - dict: A dictionary containing dashboard data.
     """
     try:
-        async with connection_context() as conn:
-            query = "SELECT * FROM get_dashboard_data();"
-            data = await conn.fetchrow(query)
-
-            if not data:
-                raise ValueError("No data returned from get_dashboard_data()")
-
-            dashboard_data = {
-                "totalProducts": data["total_products"],
-                "totalRolls": data["total_rolls"],
-                "inventoryValue": data["inventory_value"],
-                "billsPending": data["bills_pending"],
-                "billsCut": data["bills_cut"],
-                "billsWithTailor": data["bills_with_tailor"],
-                "billsReady": data["bills_ready"],
-                "totalRevenue": data["total_revenue"],
-                "outstandingDues": data["outstanding_dues"],
-                "todayExpenses": data["today_expenses"],
-                "draftsCount": data["drafts_count"],
-            }
-            return dashboard_data
+        data = await get_dashboard_counters()
+
+        if not data:
+            raise ValueError("No dashboard counters row")
+
+        dashboard_data = {
+            "totalProducts": data["total_products"],
+            "totalRolls": data["total_rolls"],
+            "inventoryValue": data["inventory_value"],
+            "billsPending": data["bills_pending"],
+            "billsCut": data["bills_cut"],
+            "billsWithTailor": data["bills_with_tailor"],
+            "billsReady": data["bills_ready"],
+            "totalRevenue": data["total_revenue"],
+            "outstandingDues": data["outstanding_dues"],
+            "todayExpenses": data["today_expenses"],
+            "draftsCount": data["drafts_count"],
+        }
+        return dashboard_data
 
     except Exception as e:
         await flatbed('exception', f"In get_dashboard_data_ps: {e}")
         raise
 
 
-async def search_recent_activities_list(_date):
+async def search_recent_activities_list(_date, cursor=None, limit=None):
     """
-    Retrieve recent activities list filtered by date range.
+    Retrieve a page of the recent activities list filtered by date range.
+
+    Returns:
+    - Tuple of the page's records and the cursor of the next page (None on the last one).
     """
     date_range = get_date_range(_date)
-    query, params = build_admin_records_query(date_range)
+    keyset = Keyset(cursor, limit, [_date], sort_column="date")
 
     try:
         async with connection_context() as conn:
-            return await conn.fetch(query, *params)
+            if date_range:
+                rows = await ADMIN_RECORDS_IN_RANGE.fetch(conn, *date_range, *keyset.args)
+            else:
+                rows = await ADMIN_RECORDS_RECENT.fetch(conn, *keyset.args)
+            return keyset.page(rows)
     except Exception as e:
         await flatbed('exception', f"In search_recent_activities_list: {e}")
         raise
@@ -57,39 +109,99 @@ async def get_recent_activities_preview(limit=4):
     """
     Retrieve recent activities preview.
     """
-    query, params = build_admin_records_query(limit=limit)
-
     try:
         async with connection_context() as conn:
-            return await conn.fetch(query, *params)
+            return await ADMIN_RECORDS_RECENT.fetch(conn, None, None, limit)
     except Exception as e:
         await flatbed('exception', f"In get_recent_activities_preview: {e}")
         raise
 
 
-def build_admin_records_query(date_range=None, limit=None):
-    """
-    Build SQL query for fetching admin records.
-    """
-    query = """
-        SELECT 
-            ar.id,
-            ar.date,
-            u.username,
-            ar.action
-        FROM user_actions ar
-        LEFT JOIN users u ON ar.user_id = u.user_id
-        WHERE 1=1
-    """
-    params = []
 
-    if date_range:
-        query += " AND ar.date >= $1 AND ar.date <= $2"
-        params.extend(date_range)
+async def _build_snapshot(db_name, generation):
+    # Runs as its own task; never borrow the request's scoped connection, the request may end first.
+    # Without it the two queries also get a connection each and run concurrently.
+    request_scope.set(None)
+    current_db.set(db_name)
+    data, activities_data = await asyncio.gather(get_dashboard_data_ps(), get_recent_activities_preview())
+    data["recentActivities"] = get_formatted_recent_activities_list(activities_data)
+
+    built_at = time.time()
+    _snapshots[db_name] = (generation, built_at, data)
+    if redis_up():
+        try:
+            await set_dashboard_snapshot_redis(db_name, generation, {"builtAt": built_at, "data": data},
+                                               DASHBOARD_STALE_SECONDS)
+        except Exception as e:
+            await redis_failed("dashboard snapshot caching", e)
+    return data
 
-    query += " ORDER BY ar.date DESC"
 
-    if limit:
-        query += f" LIMIT {limit}"
+def _forget_snapshot_build(key, task):
+    if _snapshot_builds.get(key) is task:
+        del _snapshot_builds[key]
+    if not task.cancelled():
+        task.exception()  # retrieved by the waiters, mark it seen if there were none
 
-    return query, params
+
+def _start_snapshot_build(db_name, generation):
+    key = (db_name, generation)
+    task = _snapshot_builds.get(key)
+    if task is None:
+        task = _snapshot_builds[key] = asyncio.get_running_loop().create_task(_build_snapshot(db_name, generation))
+        task.add_done_callback(lambda t: _forget_snapshot_build(key, t))
+    return task
+
+
+async def get_dashboard_snapshot():
+    """
+    The current tenant's dashboard data with its recentActivities preview, cached
+    in process and in Redis until invalidate_dashboard() is called by a write.
+
+    A snapshot younger than DASHBOARD_FRESH_SECONDS is served as is; one younger
+    than DASHBOARD_STALE_SECONDS is served while a fresh one is built in the
+    background, which also picks up changes that invalidate nothing (e.g. the
+    activity log). Older or invalidated snapshots are rebuilt before answering.
+    """
+    db_name = current_db.get()
+    entry = _snapshots.get(db_name)
+    generation = entry[0] if entry else "0"  # if Redis is unavailable, this worker's copy is all there is
+
+    if redis_up():
+        try:
+            generation = await get_dashboard_generation_redis(db_name)
+            if entry is None or entry[0] != generation:
+                cached = await get_dashboard_snapshot_redis(db_name, generation)
+                entry = (generation, cached["builtAt"], cached["data"]) if cached else None
+                if entry:
+                    _snapshots[db_name] = entry
+        except Exception as e:
+            await redis_failed("dashboard snapshot lookup", e)
+
+    age = time.time() - entry[1] if entry and entry[0] == generation else None
+    if age is None or age > DASHBOARD_STALE_SECONDS:
+        return await asyncio.shield(_start_snapshot_build(db_name, generation))
+    if age > DASHBOARD_FRESH_SECONDS:
+        _start_snapshot_build(db_name, generation)
+    return entry[2]
+
+
+async def invalidate_dashboard():
+    """
+    Drop the current tenant's dashboard snapshot, in every worker. Call once a write
+    that changes the dashboard (bills, rolls, cut fabric, expenses) has committed;
+    inside a unit_of_work it happens when the unit of work commits.
+    Never raises: the snapshot then simply ages out.
+    """
+    db_name = current_db.get()
+    if not after_commit(_drop_dashboard_snapshot, db_name):
+        await _drop_dashboard_snapshot(db_name)
+
+
+async def _drop_dashboard_snapshot(db_name):
+    _snapshots.pop(db_name, None)
+    if redis_up():
+        try:
+            await bump_dashboard_generation_redis(db_name)
+        except Exception as e:
+            await redis_failed("dashboard invalidation", e)
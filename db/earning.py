@@ -2,22 +2,50 @@ from typing import Optional
 
 from utils import flatbed
 from utils.conn import connection_context
+from .queries import register_query
+
+INSERT_USER_EARNING = register_query("insert_user_earning", """
+    WITH inserted AS (
+        INSERT INTO user_earnings (user_id, amount, earning_type, reference, note, added_by)
+        VALUES ($1, $2, $3, $4, $5, $6)
+        RETURNING user_id
+    )
+    SELECT u.username
+    FROM inserted i
+    JOIN users u ON u.user_id = i.user_id;
+""", params=("uuid", "int", "text", "text", "text", "text"), columns=("username",))
+
+CALCULATE_DUE_SALARIES = register_query(
+    "calculate_due_salaries", "SELECT * FROM calculate_all_due_salaries_with_report();")
+
+USER_EARNING_HISTORY = register_query("user_earning_history", """
+    SELECT 
+        ue.id,
+        ue.amount,
+        ue.earning_type,
+        ue.reference,
+        ue.note,
+        ue.created_at,
+        CASE 
+            WHEN ue.added_by = 'automated' THEN 'automated'
+            WHEN is_uuid(ue.added_by) THEN u.username
+            ELSE ue.added_by
+        END AS added_by_display
+    FROM user_earnings ue
+    LEFT JOIN users u
+        ON is_uuid(ue.added_by) 
+        AND ue.added_by = u.user_id::text
+    WHERE ue.user_id = $1
+    ORDER BY ue.created_at DESC;
+""", params=("uuid",),
+    columns=("id", "amount", "earning_type", "reference", "note", "created_at", "added_by_display"))
 
 
 async def add_earning_to_user(user_id, amount, earning_type, reference, note, added_by) -> Optional[str]:
     try:
         async with connection_context() as conn:
-            sql_insert = """
-                WITH inserted AS (
-                    INSERT INTO user_earnings (user_id, amount, earning_type, reference, note, added_by)
-                    VALUES ($1, $2, $3, $4, $5, $6)
-                    RETURNING user_id
-                )
-                SELECT u.username
-                FROM inserted i
-                JOIN users u ON u.user_id = i.user_id;
-            """
-            username = await conn.fetchval(sql_insert, user_id, amount, earning_type, reference, note, added_by)
+            username = await INSERT_USER_EARNING.fetchval(conn, user_id, amount, earning_type, reference, note,
+                                                          added_by)
 
             return username
     except Exception as e:
@@ -28,10 +56,7 @@ async def add_earning_to_user(user_id, amount, earning_type, reference, note, ad
 async def calculate_all_due_salaries_with_report_ps():
     try:
         async with connection_context() as conn:
-            sql_query = """
-                SELECT * FROM calculate_all_due_salaries_with_report();
-            """
-            result = await conn.fetchrow(sql_query)
+            result = await CALCULATE_DUE_SALARIES.fetchrow(conn)
 
             return result
     except Exception as e:
@@ -51,27 +76,7 @@ async def get_users_earning_history_ps(user_id: str):
     """
     try:
         async with connection_context() as conn:
-            query = """
-            SELECT 
-                ue.id,
-                ue.amount,
-                ue.earning_type,
-                ue.reference,
-                ue.note,
-                ue.created_at,
-                CASE 
-                    WHEN ue.added_by = 'automated' THEN 'automated'
-                    WHEN is_uuid(ue.added_by) THEN u.username
-                    ELSE ue.added_by
-                END AS added_by_display
-            FROM user_earnings ue
-            LEFT JOIN users u
-                ON is_uuid(ue.added_by) 
-                AND ue.added_by = u.user_id::text
-            WHERE ue.user_id = $1
-            ORDER BY ue.created_at DESC;
-            """
-            earnings_history = await conn.fetch(query, user_id)
+            earnings_history = await USER_EARNING_HISTORY.fetch(conn, user_id)
 
             return earnings_history or None
 
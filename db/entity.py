@@ -3,6 +3,51 @@ from typing import Optional
 from helpers.format_list import make_entity_dic, make_entity_details_dic
 from utils import flatbed
 from utils.conn import connection_context
+from .queries import register_query
+from .sync import insert_update_sync
+
+INSERT_ENTITY = register_query("insert_entity", """
+    INSERT INTO entities (name, phone, address, notes) 
+    VALUES ($1, $2, $3, $4)
+    RETURNING id
+""", params=("text", "text", "text", "text"), columns=("id",))
+
+UPDATE_ENTITY = register_query("update_entity", """
+    UPDATE entities
+    SET name = $1, phone = $2, address = $3, notes = $4
+    WHERE id = $5
+    RETURNING id
+""", params=("text", "text", "text", "text", "int"), columns=("id",))
+
+ENTITY_BY_ID = register_query("entity_by_id", """
+    SELECT * FROM entities
+    WHERE id = $1
+""", params=("int",))
+
+ALL_ENTITIES = register_query("all_entities", "SELECT * FROM entities;")
+
+ENTITY_DETAILS = register_query("entity_details", """
+    SELECT
+        -- payable: what you owe them (in minus any offsets)
+        COALESCE(SUM(CASE WHEN direction = 'in' AND currency = 'AFN' THEN amount ELSE 0 END), 0)
+        AS payable_total_afn,
+        COALESCE(SUM(CASE WHEN direction = 'in' AND currency = 'USD' THEN amount ELSE 0 END), 0) 
+        AS payable_total_usd,
+        COALESCE(SUM(CASE WHEN direction = 'in' AND currency = 'CNY' THEN amount ELSE 0 END), 0)
+        AS payable_total_cny,
+
+        -- receivable: what they owe you (out minus any offsets)
+        COALESCE(SUM(CASE WHEN direction = 'out' AND currency = 'AFN' THEN amount ELSE 0 END), 0)
+        AS receivable_total_afn,
+        COALESCE(SUM(CASE WHEN direction = 'out' AND currency = 'USD' THEN amount ELSE 0 END), 0)
+        AS receivable_total_usd,
+        COALESCE(SUM(CASE WHEN direction = 'out' AND currency = 'CNY' THEN amount ELSE 0 END), 0)
+        AS receivable_total_cny
+    FROM misc_transactions
+    WHERE entity_id = $1
+""", params=("int",))
+
+DELETE_ENTITY = register_query("delete_entity", "DELETE FROM entities WHERE id = $1", params=("int",))
 
 
 async def insert_new_entity(
@@ -27,13 +72,9 @@ async def insert_new_entity(
     try:
         async with connection_context() as conn:
 
-            sql_insert = """
-                INSERT INTO entities (name, phone, address, notes) 
-                VALUES ($1, $2, $3, $4)
-                RETURNING id
-            """
-
-            entity_id = await conn.fetchval(sql_insert, name, phone, address, notes)
+            entity_id = await INSERT_ENTITY.fetchval(conn, name, phone, address, notes)
+            if entity_id:
+                await insert_update_sync("entities")
             return entity_id
 
     except Exception as e:
@@ -64,14 +105,9 @@ async def update_entity(
     try:
         async with connection_context() as conn:
 
-            sql_update = f"""
-                UPDATE entities
-                SET name = $1, phone = $2, address = $3, notes = $4
-                WHERE id = $5
-                RETURNING id
-            """
-
-            entity_id = await conn.fetchval(sql_update, name, phone, address, notes, idToEdit)
+            entity_id = await UPDATE_ENTITY.fetchval(conn, name, phone, address, notes, idToEdit)
+            if entity_id:
+                await insert_update_sync("entities")
             return entity_id
 
     except Exception as e:
@@ -82,10 +118,7 @@ async def update_entity(
 async def get_entity_ps(entity_id: int):
     try:
         async with connection_context() as conn:
-            data = await conn.fetchrow("""
-                               SELECT * FROM entities
-                               WHERE id = $1
-                           """, entity_id)
+            data = await ENTITY_BY_ID.fetchrow(conn, entity_id)
             if data:
                 entity = make_entity_dic(data)
                 return entity
@@ -105,8 +138,7 @@ async def get_entities_list_ps():
     """
     try:
         async with connection_context() as conn:
-            query = "SELECT * FROM entities;"
-            entities_list = await conn.fetch(query)
+            entities_list = await ALL_ENTITIES.fetch(conn)
             return entities_list  # Returns a list of asyncpg Record objects
 
     except Exception as e:
@@ -120,27 +152,7 @@ async def get_entity_details_ps(entity_id: int):
      """
     try:
         async with connection_context() as conn:
-            data = await conn.fetchrow(
-                """
-                SELECT
-                    -- payable: what you owe them (in minus any offsets)
-                    COALESCE(SUM(CASE WHEN direction = 'in' AND currency = 'AFN' THEN amount ELSE 0 END), 0)
-                    AS payable_total_afn,
-                    COALESCE(SUM(CASE WHEN direction = 'in' AND currency = 'USD' THEN amount ELSE 0 END), 0) 
-                    AS payable_total_usd,
-                    COALESCE(SUM(CASE WHEN direction = 'in' AND currency = 'CNY' THEN amount ELSE 0 END), 0)
-                    AS payable_total_cny,
-                    
-                    -- receivable: what they owe you (out minus any offsets)
-                    COALESCE(SUM(CASE WHEN direction = 'out' AND currency = 'AFN' THEN amount ELSE 0 END), 0)
-                    AS receivable_total_afn,
-                    COALESCE(SUM(CASE WHEN direction = 'out' AND currency = 'USD' THEN amount ELSE 0 END), 0)
-                    AS receivable_total_usd,
-                    COALESCE(SUM(CASE WHEN direction = 'out' AND currency = 'CNY' THEN amount ELSE 0 END), 0)
-                    AS receivable_total_cny
-                FROM misc_transactions
-                WHERE entity_id = $1
-            """, entity_id)
+            data = await ENTITY_DETAILS.fetchrow(conn, entity_id)
 
             return make_entity_details_dic(data)
 
@@ -152,7 +164,8 @@ async def get_entity_details_ps(entity_id: int):
 async def remove_entity_ps(entity_id: int):
     try:
         async with connection_context() as conn:
-            await conn.execute("DELETE FROM entities WHERE id = $1", entity_id)
+            await DELETE_ENTITY.execute(conn, entity_id)
+        await insert_update_sync("entities")
         return True
     except Exception as e:
         await flatbed('exception', f"in remove_entity_ps: {e}")
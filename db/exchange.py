@@ -3,6 +3,25 @@ from typing import Optional
 from helpers.format_list import format_dict
 from utils import flatbed
 from utils.conn import connection_context
+from .queries import register_query
+
+UPSERT_FX_RATE = register_query("upsert_fx_rate", """
+    INSERT INTO fx_current_rates 
+        (base_currency, quote_currency, rate, source, fetched_at, is_manual)
+    VALUES ($1, $2, $3, $4, now(), false)
+    ON CONFLICT (base_currency, quote_currency) 
+    DO UPDATE SET 
+        rate = EXCLUDED.rate,
+        fetched_at = now(),
+        source = EXCLUDED.source,
+        is_manual = false;
+""", params=("text", "text", "numeric", "text"))
+
+FX_CURRENT_RATE = register_query("fx_current_rate", """
+    SELECT * from fx_current_rates
+    WHERE base_currency = $1
+    AND quote_currency = $2;
+""", params=("text", "text"))
 
 
 async def update_fx_rates_in_db(rates) -> bool:
@@ -11,18 +30,6 @@ async def update_fx_rates_in_db(rates) -> bool:
     """
     try:
         async with connection_context() as conn:
-            sql_upsert = """
-                    INSERT INTO fx_current_rates 
-                        (base_currency, quote_currency, rate, source, fetched_at, is_manual)
-                    VALUES ($1, $2, $3, $4, now(), false)
-                    ON CONFLICT (base_currency, quote_currency) 
-                    DO UPDATE SET 
-                        rate = EXCLUDED.rate,
-                        fetched_at = now(),
-                        source = EXCLUDED.source,
-                        is_manual = false;
-                """
-
             base_currency = "USD"
             source = "Open Exchange Rates"
 
@@ -33,7 +40,7 @@ async def update_fx_rates_in_db(rates) -> bool:
                 for quote, rate in rates.items()
             ]
 
-            await conn.executemany(sql_upsert, values)
+            await UPSERT_FX_RATE.executemany(conn, values)
 
             return True
     except Exception as e:
@@ -50,13 +57,7 @@ async def get_fx_current_rate(
     """
     try:
         async with connection_context() as conn:
-            sql_query = """
-                        SELECT * from fx_current_rates
-                        WHERE base_currency = $1
-                        AND quote_currency = $2;
-                    """
-
-            data = await conn.fetchrow(sql_query, base_currency, quote_currency)
+            data = await FX_CURRENT_RATE.fetchrow(conn, base_currency, quote_currency)
             print(data)
             if not data:
                 return None
@@ -1,20 +1,45 @@
 from typing import Optional
 
+from helpers import Keyset
 from utils import flatbed
 from utils.conn import connection_context
+from .queries import register_query
+from .dashboard import invalidate_dashboard
+
+INSERT_EXPENSE = register_query("insert_expense", """
+    INSERT INTO expenses (category_index, description, amount, currency, added_by)
+    VALUES ($1, $2, $3, $4, $5)
+    RETURNING id;
+""", params=("int", "text", "int", "text", "text"), columns=("id",))
+
+UPDATE_EXPENSE = register_query("update_expense", """
+    UPDATE expenses
+    SET category_index = $1,
+        description = $2,
+        amount = $3,
+        updated_at = NOW()
+    WHERE id = $4
+""", params=("int", "text", "int", "int"))
+
+# Keyset pages newest first, on (date, id); see helpers.Keyset. The ordering and
+# limit are applied to the function's result, so only the page leaves the database.
+SEARCH_EXPENSES_FILTERED = register_query("search_expenses_filtered", """
+    SELECT * FROM search_expenses_list_filtered($1, $2) e
+    WHERE (e.date, e.id) < (COALESCE($3, 'infinity'::timestamptz), COALESCE($4, 0))
+    ORDER BY e.date DESC, e.id DESC
+    LIMIT $5
+""", params=("int", "int", "timestamptz", "int", "int"))
+
+DELETE_EXPENSE = register_query("delete_expense", "DELETE FROM expenses WHERE id = $1", params=("int",))
 
 
 async def insert_new_expense(category_index, description, amount, currency, added_by) -> Optional[str]:
     try:
         async with connection_context() as conn:
-            sql_insert = """
-                INSERT INTO expenses (category_index, description, amount, currency, added_by)
-                VALUES ($1, $2, $3, $4, $5)
-                RETURNING id;
-            """
-            expense_id = await conn.fetchval(sql_insert, category_index, description, amount, currency, added_by)
-
-            return expense_id
+            expense_id = await INSERT_EXPENSE.fetchval(conn, category_index, description, amount, currency, added_by)
+
+        await invalidate_dashboard()
+        return expense_id
     except Exception as e:
         await flatbed('exception', f"In insert_new_expense: {e}")
         return None
@@ -23,43 +48,39 @@ async def insert_new_expense(category_index, description, amount, currency, adde
 async def update_expense(_id, category_index, description, amount) -> Optional[str]:
     try:
         async with connection_context() as conn:
-            sql_update = """
-                UPDATE expenses
-                SET category_index = $1,
-                    description = $2,
-                    amount = $3,
-                    updated_at = NOW()
-                WHERE id = $4
-            """
-            await conn.execute(
-                sql_update,
+            await UPDATE_EXPENSE.execute(
+                conn,
                 category_index,
                 description,
                 amount,
                 _id
             )
-            return _id
+        await invalidate_dashboard()
+        return _id
     except Exception as e:
         await flatbed('exception', f"In update_expense: {e}")
         return None
 
 
-async def search_expenses_list_filtered(_date, category):
+async def search_expenses_list_filtered(_date, category, cursor=None, limit=None):
     """
-    Retrieve expenses list based on a date or type filter.
+    Retrieve a page of the expenses list based on a date or type filter.
 
     Parameters:
     - date (int): The date filter for expenses list.
     - category (int): The index for the category of the expense:
+    - cursor (str): Cursor of the page, from the previous page; None for the first.
+    - limit (int): Page size, capped to PAGE_SIZE_MAX.
 
     Returns:
-    - List of records from the expenses table that match the criteria.
+    - Tuple of the page's records from the expenses table that match the criteria,
+      and the cursor of the next page (None on the last one).
     """
+    keyset = Keyset(cursor, limit, [_date, category], sort_column="date")
     try:
         async with connection_context() as conn:
-            query = "SELECT * FROM search_expenses_list_filtered($1, $2);"
-            expenses_list = await conn.fetch(query, _date, category)
-            return expenses_list  # Returns a list of asyncpg Record objects
+            expenses_list = await SEARCH_EXPENSES_FILTERED.fetch(conn, _date, category, *keyset.args)
+            return keyset.page(expenses_list)
 
     except Exception as e:
         await flatbed('exception', f"In search_expenses_list_filtered: {e}")
@@ -69,7 +90,8 @@ async def search_expenses_list_filtered(_date, category):
 async def remove_expense_ps(expense_id):
     try:
         async with connection_context() as conn:
-            await conn.execute("DELETE FROM expenses WHERE id = $1", expense_id)
+            await DELETE_EXPENSE.execute(conn, expense_id)
+        await invalidate_dashboard()
         return True
     except Exception as e:
         await flatbed('exception', f"in remove_expense_ps: {e}")
@@ -2,6 +2,18 @@ from typing import Optional
 
 from utils import upload_image_to_r2, flatbed, delete_image_from_r2
 from utils.conn import connection_context
+from .queries import Query, register_query
+from .changes import record_changes
+from .search_index import refresh_product, refresh_roll
+
+IMAGE_UPDATE_QUERIES = {
+    "product": register_query("update_product_image", "UPDATE products SET image_url = $1 WHERE product_code = $2",
+                              params=("text", "text")),
+    "roll": register_query("update_roll_image", "UPDATE rolls SET image_url = $1 WHERE roll_code = $2",
+                           params=("text", "text")),
+    "user": register_query("update_user_image", "UPDATE users SET image_url = $1 WHERE username = $2",
+                           params=("text", "text")),
+}
 
 
 async def handle_image_update(_type: str, tenant: str, code: str, status: str,
@@ -14,10 +26,12 @@ async def handle_image_update(_type: str, tenant: str, code: str, status: str,
 
 async def update_image_bucket_db(_type: str, tenant: str, code: str, image_data: bytes) -> Optional[str]:
     try:
+        query = get_image_update_query(_type)
+        image_url = await upload_image_to_r2(_type, tenant, code, image_data)
         async with connection_context() as conn:
-            sql = get_image_update_sql(_type)
-            image_url = await upload_image_to_r2(_type, tenant, code, image_data)
-            await conn.execute(sql, image_url, code)
+            async with conn.transaction():
+                await query.execute(conn, image_url, code)
+                await _record_image_change(conn, _type, code)
             return image_url
     except Exception as e:
         await flatbed('exception', f"In update_image_bucket_db: {e}")
@@ -26,22 +40,30 @@ async def update_image_bucket_db(_type: str, tenant: str, code: str, image_data:
 
 async def remove_image_bucket_db(_type: str, tenant: str, code: str) -> Optional[str]:
     try:
+        query = get_image_update_query(_type)
+        await delete_image_from_r2(_type, tenant, code)
         async with connection_context() as conn:
-            sql = get_image_update_sql(_type)
-            await delete_image_from_r2(_type, tenant, code)
-            await conn.execute(sql, None, code)
+            async with conn.transaction():
+                await query.execute(conn, None, code)
+                await _record_image_change(conn, _type, code)
             return "Success"
     except Exception as e:
         await flatbed('exception', f"In remove_image_bucket_db: {e}")
         return "Failed"
 
 
-def get_image_update_sql(_type: str) -> str:
+def get_image_update_query(_type: str) -> Query:
+    query = IMAGE_UPDATE_QUERIES.get(_type)
+    if query is None:
+        raise ValueError(f"Unsupported type for image update: {_type}")
+    return query
+
+
+async def _record_image_change(conn, _type: str, code: str):
+    # Image changes don't touch updated_at; the change log and search index still need them
     if _type == "product":
-        return "UPDATE products SET image_url = $1 WHERE product_code = $2"
+        await record_changes(conn, [("product", code, False)])
+        await refresh_product(conn, code)
     elif _type == "roll":
-        return "UPDATE rolls SET image_url = $1 WHERE roll_code = $2"
-    elif _type == "user":
-        return "UPDATE users SET image_url = $1 WHERE username = $2"
-    else:
-        raise ValueError(f"Unsupported type for image update: {_type}")
+        await record_changes(conn, [("roll", code, False)])
+        await refresh_roll(conn, code)
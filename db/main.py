@@ -1,5 +1,25 @@
-from utils import flatbed
-from utils.conn import connection_context
+from utils import flatbed, set_current_db
+from utils.conn import connection_context, warm_up_pools
+from .bill import SEARCH_BILLS, SEARCH_BILLS_FILTERED
+from .product import SEARCH_PRODUCTS, SEARCH_PRODUCTS_FILTERED
+from .queries import register_query
+from .search_index import build_search_index, SEARCH_INDEX_MAX_TENANTS
+
+GALLERY_DB_NAME = register_query("gallery_db_name", """
+    SELECT db_name FROM galleries WHERE gallery_codename = lower($1)
+""", params=("text",), columns=("db_name",))
+
+ALL_GALLERY_DB_NAMES = register_query("all_gallery_db_names",
+                                      "SELECT db_name FROM galleries WHERE db_name IS NOT NULL",
+                                      columns=("db_name",))
+
+# Statements most requests hit first, prepared on each tenant's first connection at warm-up
+HOT_STATEMENTS = [
+    SEARCH_PRODUCTS.sql,
+    SEARCH_BILLS.sql,
+    SEARCH_BILLS_FILTERED.sql,
+    SEARCH_PRODUCTS_FILTERED.sql,
+]
 
 
 async def get_gallery_db_name(gallery_codename):
@@ -14,9 +34,7 @@ async def get_gallery_db_name(gallery_codename):
         """
     try:
         async with connection_context() as conn:
-            db_name = await conn.fetchval("""
-                SELECT db_name FROM galleries WHERE gallery_codename = lower($1)
-            """, gallery_codename)
+            db_name = await GALLERY_DB_NAME.fetchval(conn, gallery_codename)
 
             if not db_name:
                 return None  # Username not found, abort
@@ -33,9 +51,37 @@ async def get_all_gallery_db_names():
     """
     try:
         async with connection_context() as conn:
-            query = "SELECT db_name FROM galleries WHERE db_name IS NOT NULL"
-            rows = await conn.fetch(query)
+            rows = await ALL_GALLERY_DB_NAMES.fetch(conn)
             return [r["db_name"] for r in rows]
     except Exception as e:
         await flatbed('exception', f"In get_all_gallery_db_names: {e}")
         return None
+
+
+async def warm_up_tenant_pools():
+    """
+    Pre-create connection pools for all galleries, prepare their hot statements
+    and build their search indexes.
+    """
+    try:
+        set_current_db("pardaaf_main")
+        db_names = await get_all_gallery_db_names()
+        if not db_names:
+            return {}
+
+        results = await warm_up_pools(db_names, HOT_STATEMENTS)
+        warmed = [db_name for db_name, ok in results.items() if ok][:SEARCH_INDEX_MAX_TENANTS]
+        for db_name in warmed:
+            try:
+                await build_search_index(db_name)
+            except Exception as e:
+                results[db_name] = False
+                await flatbed('exception', f"In warm_up_tenant_pools, search index for {db_name}: {e}")
+
+        failed = [db_name for db_name, ok in results.items() if not ok]
+        if failed:
+            await flatbed('warning', f"In warm_up_tenant_pools, failed for: {failed}")
+        return results
+    except Exception as e:
+        await flatbed('exception', f"In warm_up_tenant_pools: {e}")
+        return {}
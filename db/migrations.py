@@ -0,0 +1,95 @@
+from utils import flatbed, set_current_db
+from utils.conn import connect_unpooled
+from .bill import ADD_BILL_SEARCH_KEY_COLUMNS, DROP_BILL_NAME_KEY_INDEX, CREATE_BILL_NAME_KEY_INDEX, \
+    DROP_BILL_NUMBER_KEY_INDEX, CREATE_BILL_NUMBER_KEY_INDEX, fill_bill_search_keys
+from .changes import CREATE_CHANGE_LOG
+from .counters import CREATE_DASHBOARD_COUNTERS
+from .main import get_all_gallery_db_names
+from .queries import Query, register_query
+from .stock import CREATE_PRODUCT_STOCK
+
+MIGRATIONS_LOCK = 7_310_000  # advisory lock serializing migration runs within a tenant database
+
+# Schema changes of the tenant databases, applied in this order and each only once per
+# database. A migration is a list of steps run one after the other: statements, each in a
+# transaction of its own, so a statement may be e.g. a CREATE INDEX CONCURRENTLY, or async
+# functions of the connection, e.g. a backfill in batches. The migration is recorded once
+# they all succeeded. Steps must be safe to rerun, as a migration that failed halfway starts
+# over on the next run.
+MIGRATIONS = (
+    ("0001_inventory_changes", (CREATE_CHANGE_LOG,)),
+    ("0002_product_stock", (CREATE_PRODUCT_STOCK,)),
+    ("0003_dashboard_counters", (CREATE_DASHBOARD_COUNTERS,)),  # counts product_stock, so after it
+    ("0004_bill_search_keys", (ADD_BILL_SEARCH_KEY_COLUMNS, fill_bill_search_keys)),
+    ("0005_bills_customer_name_key_idx", (DROP_BILL_NAME_KEY_INDEX, CREATE_BILL_NAME_KEY_INDEX)),
+    ("0006_bills_customer_number_key_idx", (DROP_BILL_NUMBER_KEY_INDEX, CREATE_BILL_NUMBER_KEY_INDEX)),
+)
+
+ENSURE_MIGRATIONS_TABLE = register_query("ensure_schema_migrations", """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        name text PRIMARY KEY,
+        applied_at timestamptz NOT NULL DEFAULT now()
+    )
+""", params=())
+
+# Held by the session until its connection closes, so concurrent runs (e.g. workers starting together) take turns
+MIGRATIONS_SESSION_LOCK = register_query("schema_migrations_lock", "SELECT pg_advisory_lock($1)",
+                                         params=("bigint",))
+
+APPLIED_MIGRATIONS = register_query("applied_schema_migrations", "SELECT name FROM schema_migrations",
+                                    params=(), columns=("name",))
+
+RECORD_MIGRATION = register_query("record_schema_migration", """
+    INSERT INTO schema_migrations (name) VALUES ($1)
+    ON CONFLICT DO NOTHING
+""", params=("text",))
+
+
+async def migrate_tenant(db_name):
+    """
+    Apply the migrations a tenant database doesn't have yet, on a connection
+    outside the pools, so requests never wait on it for a connection.
+
+    Returns:
+    - List of the names of the migrations applied.
+    """
+    applied = []
+    conn = await connect_unpooled(db_name)
+    try:
+        await MIGRATIONS_SESSION_LOCK.execute(conn, MIGRATIONS_LOCK)
+        await ENSURE_MIGRATIONS_TABLE.execute(conn)
+        done = {row["name"] for row in await APPLIED_MIGRATIONS.fetch(conn)}
+        for name, steps in MIGRATIONS:
+            if name in done:
+                continue
+            for step in steps:
+                if isinstance(step, Query):
+                    await step.execute(conn)
+                else:
+                    await step(conn)
+            await RECORD_MIGRATION.execute(conn, name)
+            applied.append(name)
+        return applied
+    finally:
+        await conn.close()
+
+
+async def migrate_all_tenants():
+    """
+    Apply the pending migrations of every gallery database. A tenant that fails
+    is reported and left for the next run; the others are still migrated.
+
+    Returns:
+    - dict: {db_name: list of the migrations applied, or None if it failed}
+    """
+    set_current_db("pardaaf_main")
+    results = {}
+    for db_name in await get_all_gallery_db_names() or ():
+        try:
+            results[db_name] = await migrate_tenant(db_name)
+            if results[db_name]:
+                await flatbed("info", f"Migrated {db_name}: {', '.join(results[db_name])}")
+        except Exception as e:
+            results[db_name] = None
+            await flatbed("exception", f"In migrate_all_tenants, {db_name}: {e}")
+    return results
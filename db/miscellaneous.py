@@ -2,6 +2,51 @@ from typing import Optional
 
 from utils import flatbed
 from utils.conn import connection_context
+from .queries import register_query
+
+INSERT_MISC_TRANSACTION = register_query("insert_misc_transaction", """
+    WITH inserted AS (
+        INSERT INTO misc_transactions (
+            supplier_id, entity_id, transaction_type,
+            amount, currency, direction, note, created_by
+        )
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+        RETURNING supplier_id, entity_id
+    )
+    SELECT COALESCE(s.name, e.name) AS name
+    FROM inserted i
+    LEFT JOIN suppliers s ON s.id = i.supplier_id
+    LEFT JOIN entities e ON e.id = i.entity_id;
+""", params=("int", "int", "text", "int", "text", "text", "text", "uuid"), columns=("name",))
+
+MISC_RECORDS_SELECT = """
+    SELECT
+        mt.id,
+        mt.transaction_type,
+        mt.amount,
+        mt.currency,
+        mt.direction,
+        mt.note,
+        u.username AS created_by,
+        mt.created_at
+    FROM misc_transactions mt
+    LEFT JOIN users u ON mt.created_by = u.user_id
+"""
+
+MISC_RECORDS_COLUMNS = ("id", "transaction_type", "amount", "currency", "direction", "note", "created_by",
+                        "created_at")
+
+# Keyed by the owner type the records are searched for
+MISC_RECORDS = {
+    "supplier": register_query("misc_records_for_supplier", MISC_RECORDS_SELECT + """
+        WHERE mt.supplier_id = $1 AND mt.direction = $2
+        ORDER BY mt.created_at DESC;
+    """, params=("int", "text"), columns=MISC_RECORDS_COLUMNS),
+    "entity": register_query("misc_records_for_entity", MISC_RECORDS_SELECT + """
+        WHERE mt.entity_id = $1 AND mt.direction = $2
+        ORDER BY mt.created_at DESC;
+    """, params=("int", "text"), columns=MISC_RECORDS_COLUMNS),
+}
 
 
 async def add_miscellaneous_record_ps(
@@ -16,22 +61,8 @@ async def add_miscellaneous_record_ps(
 ) -> Optional[str]:
     try:
         async with connection_context() as conn:
-            sql_insert = """
-                WITH inserted AS (
-                    INSERT INTO misc_transactions (
-                        supplier_id, entity_id, transaction_type,
-                        amount, currency, direction, note, created_by
-                    )
-                    VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
-                    RETURNING supplier_id, entity_id
-                )
-                SELECT COALESCE(s.name, e.name) AS name
-                FROM inserted i
-                LEFT JOIN suppliers s ON s.id = i.supplier_id
-                LEFT JOIN entities e ON e.id = i.entity_id;
-            """
-            return await conn.fetchval(
-                sql_insert,
+            return await INSERT_MISC_TRANSACTION.fetchval(
+                conn,
                 supplier_id, entity_id, transaction_type,
                 amount, currency, direction, note, created_by
             )
@@ -54,30 +85,11 @@ async def search_miscellaneous_records(_id: int, _type: str, direction: str):
     """
     try:
         async with connection_context() as conn:
-            if _type == "supplier":
-                where_clause = "mt.supplier_id = $1 AND mt.direction = $2"
-            elif _type == "entity":
-                where_clause = "mt.entity_id = $1 AND mt.direction = $2"
-            else:
+            query = MISC_RECORDS.get(_type)
+            if query is None:
                 raise ValueError("type must be 'supplier' or 'entity'")
 
-            query = f"""
-                SELECT
-                    mt.id,
-                    mt.transaction_type,
-                    mt.amount,
-                    mt.currency,
-                    mt.direction,
-                    mt.note,
-                    u.username AS created_by,
-                    mt.created_at
-                FROM misc_transactions mt
-                LEFT JOIN users u ON mt.created_by = u.user_id
-                WHERE {where_clause}
-                ORDER BY mt.created_at DESC;
-            """
-
-            misc_records = await conn.fetch(query, _id, direction)
+            misc_records = await query.fetch(conn, _id, direction)
             return misc_records  # Returns a list of asyncpg Record objects
 
     except Exception as e:
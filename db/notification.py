@@ -3,6 +3,19 @@ from typing import Optional
 from helpers import parse_date
 from utils import flatbed
 from utils.conn import connection_context
+from .queries import register_query
+
+NOTIFICATIONS_FOR_USER = register_query("notifications_for_user", """
+    select *
+    from notifications n
+    where (
+       (n.target_user_id is not null and n.target_user_id = $1::uuid)
+    or (n.target_roles is not null and $2 = any(n.target_roles))
+    )
+    and ($3::timestamptz is null or n.created_at > $3::timestamptz)
+    order by n.created_at desc
+    limit 50;
+""", params=("uuid", "int", "timestamptz"))
 
 
 async def get_notifications_for_user_ps(user_id: str, level: int, old_sync: Optional[str] = None):
@@ -13,18 +26,7 @@ async def get_notifications_for_user_ps(user_id: str, level: int, old_sync: Opti
 
     try:
         async with connection_context() as conn:
-            query = """
-                select *
-                from notifications n
-                where (
-                   (n.target_user_id is not null and n.target_user_id = $1::uuid)
-                or (n.target_roles is not null and $2 = any(n.target_roles))
-                )
-                and ($3::timestamptz is null or n.created_at > $3::timestamptz)
-                order by n.created_at desc
-                limit 50;
-            """
-            notifications_list = await conn.fetch(query, user_id, level, old_sync)
+            notifications_list = await NOTIFICATIONS_FOR_USER.fetch(conn, user_id, level, old_sync)
             return notifications_list  # list of asyncpg.Record
 
     except Exception as e:
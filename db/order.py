@@ -2,6 +2,50 @@ from typing import Optional
 
 from utils import flatbed
 from utils.conn import connection_context
+from .queries import register_query
+
+INSERT_ONLINE_ORDER = register_query("insert_online_order", """
+    INSERT INTO online_orders (
+        first_name,
+        last_name,
+        phone,
+        email,
+        country,
+        address,
+        city,
+        state,
+        zip_code,
+        payment_method,
+        cart_items,
+        total_amount,
+        notes
+    ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11::jsonb, $12, $13)
+    RETURNING id
+""", params=("text", "text", "text", "text", "text", "text", "text", "text", "text", "text", "jsonb", "int", "text"),
+    columns=("id",))
+
+NEWSLETTER_EMAIL = register_query("newsletter_email", """
+    SELECT token, is_verified 
+    FROM newsletter_emails 
+    WHERE email = $1
+""", params=("text",), columns=("token", "is_verified"))
+
+INSERT_NEWSLETTER_EMAIL = register_query("insert_newsletter_email", """
+    INSERT INTO newsletter_emails (email)
+    VALUES ($1)
+    RETURNING token
+""", params=("text",), columns=("token",))
+
+VERIFY_NEWSLETTER_EMAIL = register_query("verify_newsletter_email", """
+    UPDATE newsletter_emails
+    SET is_verified = TRUE
+    where token = $1
+""", params=("uuid",))
+
+DELETE_NEWSLETTER_EMAIL = register_query("delete_newsletter_email", """
+    DELETE FROM newsletter_emails
+    WHERE token = $1
+""", params=("uuid",))
 
 
 async def insert_new_online_order(
@@ -21,27 +65,8 @@ async def insert_new_online_order(
 ) -> Optional[str]:
     try:
         async with connection_context() as conn:
-            sql_insert = """
-                INSERT INTO online_orders (
-                    first_name,
-                    last_name,
-                    phone,
-                    email,
-                    country,
-                    address,
-                    city,
-                    state,
-                    zip_code,
-                    payment_method,
-                    cart_items,
-                    total_amount,
-                    notes
-                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11::jsonb, $12, $13)
-                RETURNING id
-            """
-
-            order_id = await conn.fetchval(
-                sql_insert,
+            order_id = await INSERT_ONLINE_ORDER.fetchval(
+                conn,
                 first_name,
                 last_name,
                 phone,
@@ -71,12 +96,7 @@ async def subscribe_newsletter_ps(
             email_lower = email.lower()
 
             # Check if the email already exists and whether it is verified
-            sql_check = """
-                SELECT token, is_verified 
-                FROM newsletter_emails 
-                WHERE email = $1
-            """
-            existing_email = await conn.fetchrow(sql_check, email_lower)
+            existing_email = await NEWSLETTER_EMAIL.fetchrow(conn, email_lower)
 
             if existing_email:
                 # If email exists and is verified
@@ -86,12 +106,7 @@ async def subscribe_newsletter_ps(
                 return existing_email["token"]
 
             # Insert the new email and return the generated token
-            sql_insert = """
-                INSERT INTO newsletter_emails (email)
-                VALUES ($1)
-                RETURNING token
-            """
-            token = await conn.fetchval(sql_insert, email_lower)
+            token = await INSERT_NEWSLETTER_EMAIL.fetchval(conn, email_lower)
             return token
 
     except Exception as e:
@@ -104,13 +119,7 @@ async def confirm_email_newsletter_ps(
 ) -> bool:
     try:
         async with connection_context() as conn:
-            sql_update = """
-                UPDATE newsletter_emails
-                SET is_verified = TRUE
-                where token = $1
-            """
-
-            await conn.execute(sql_update, token)
+            await VERIFY_NEWSLETTER_EMAIL.execute(conn, token)
             return True
     except Exception as e:
         await flatbed('exception', f"In confirm_email_newsletter_ps: {e}")
@@ -122,12 +131,7 @@ async def unsubscribe_newsletter_ps(
 ) -> bool:
     try:
         async with connection_context() as conn:
-            sql_delete = """
-                DELETE FROM newsletter_emails
-                WHERE token = $1
-            """
-
-            await conn.execute(sql_delete, token)
+            await DELETE_NEWSLETTER_EMAIL.execute(conn, token)
             return True
     except Exception as e:
         await flatbed('exception', f"In unsubscribe_newsletter_ps: {e}")
@@ -3,22 +3,75 @@ from typing import Optional
 
 from utils import flatbed
 from utils.conn import connection_context
+from .queries import register_query
+
+INSERT_USER_PAYMENT = register_query("insert_user_payment", """
+    WITH inserted AS (
+        INSERT INTO user_payments (user_id, amount, currency, note, payed_by)
+        VALUES ($1, $2, $3, $4, $5)
+        RETURNING user_id
+    )
+    SELECT u.username
+    FROM inserted i
+    JOIN users u ON u.user_id = i.user_id;
+""", params=("uuid", "int", "text", "text", "uuid"), columns=("username",))
+
+INSERT_SUPPLIER_PAYMENT = register_query("insert_supplier_payment", """
+    WITH inserted AS (
+        INSERT INTO supplier_payments (supplier_id, amount, currency, note, payed_by)
+        VALUES ($1, $2, $3, $4, $5)
+        RETURNING supplier_id
+    )
+    SELECT s.name
+    FROM inserted i
+    JOIN suppliers s ON s.id = i.supplier_id;
+""", params=("int", "int", "text", "text", "uuid"), columns=("name",))
+
+INSERT_ENTITY_TRANSACTION = register_query("insert_entity_transaction", """
+    WITH inserted AS (
+        INSERT INTO misc_transactions (entity_id, transaction_type,
+         amount, currency, direction, note, created_by)
+        VALUES ($1, $2, $3, $4, $5, $6, $7)
+        RETURNING entity_id
+    )
+    SELECT e.name
+    FROM inserted i
+    JOIN entities e ON e.id = i.entity_id;
+""", params=("int", "text", "int", "text", "text", "text", "uuid"), columns=("name",))
+
+SUPPLIER_PAYMENT_HISTORY = register_query("supplier_payment_history", """
+    SELECT sp.id,
+           sp.amount,
+           sp.currency,
+           sp.note,
+           u.full_name AS payed_by_name,
+           sp.created_at
+    FROM supplier_payments sp
+    LEFT JOIN users u
+    ON sp.payed_by = u.user_id
+    WHERE sp.supplier_id = $1
+    ORDER BY sp.created_at DESC;
+""", params=("int",), columns=("id", "amount", "currency", "note", "payed_by_name", "created_at"))
+
+USER_PAYMENT_HISTORY = register_query("user_payment_history", """
+    SELECT up.id,
+           up.amount,
+           up.currency,
+           up.note,
+           u.full_name AS payed_by_name,
+           up.created_at
+    FROM user_payments up
+    LEFT JOIN users u
+    ON up.payed_by = u.user_id
+    WHERE up.user_id = $1
+    ORDER BY up.created_at DESC;
+""", params=("uuid",), columns=("id", "amount", "currency", "note", "payed_by_name", "created_at"))
 
 
 async def add_payment_to_user(userId, amount, currency, note, payed_by) -> Optional[str]:
     try:
         async with connection_context() as conn:
-            sql_insert = """
-                WITH inserted AS (
-                    INSERT INTO user_payments (user_id, amount, currency, note, payed_by)
-                    VALUES ($1, $2, $3, $4, $5)
-                    RETURNING user_id
-                )
-                SELECT u.username
-                FROM inserted i
-                JOIN users u ON u.user_id = i.user_id;
-            """
-            username = await conn.fetchval(sql_insert, userId, amount, currency, note, payed_by)
+            username = await INSERT_USER_PAYMENT.fetchval(conn, userId, amount, currency, note, payed_by)
 
             return username
     except Exception as e:
@@ -29,17 +82,7 @@ async def add_payment_to_user(userId, amount, currency, note, payed_by) -> Optio
 async def add_payment_to_supplier(supplierId, amount, currency, note, payed_by) -> Optional[str]:
     try:
         async with connection_context() as conn:
-            sql_insert = """
-                WITH inserted AS (
-                    INSERT INTO supplier_payments (supplier_id, amount, currency, note, payed_by)
-                    VALUES ($1, $2, $3, $4, $5)
-                    RETURNING supplier_id
-                )
-                SELECT s.name
-                FROM inserted i
-                JOIN suppliers s ON s.id = i.supplier_id;
-            """
-            supplier_name = await conn.fetchval(sql_insert, supplierId, amount, currency, note, payed_by)
+            supplier_name = await INSERT_SUPPLIER_PAYMENT.fetchval(conn, supplierId, amount, currency, note, payed_by)
 
             return supplier_name
     except Exception as e:
@@ -50,19 +93,8 @@ async def add_payment_to_supplier(supplierId, amount, currency, note, payed_by)
 async def add_payment_to_entity(entity_id, amount, currency, note, created_by) -> Optional[str]:
     try:
         async with connection_context() as conn:
-            sql_insert = """
-                WITH inserted AS (
-                    INSERT INTO misc_transactions (entity_id, transaction_type,
-                     amount, currency, direction, note, created_by)
-                    VALUES ($1, $2, $3, $4, $5, $6, $7)
-                    RETURNING entity_id
-                )
-                SELECT e.name
-                FROM inserted i
-                JOIN entities e ON e.id = i.entity_id;
-            """
-            entity_name = await conn.fetchval(sql_insert, entity_id, "payment",
-                                              amount, currency, "out", note, created_by)
+            entity_name = await INSERT_ENTITY_TRANSACTION.fetchval(conn, entity_id, "payment",
+                                                                   amount, currency, "out", note, created_by)
 
             return entity_name
     except Exception as e:
@@ -82,20 +114,7 @@ async def get_supplier_payment_history_ps(supplier_id: int):
     """
     try:
         async with connection_context() as conn:
-            query = """
-                SELECT sp.id,
-                       sp.amount,
-                       sp.currency,
-                       sp.note,
-                       u.full_name AS payed_by_name,
-                       sp.created_at
-                FROM supplier_payments sp
-                LEFT JOIN users u
-                ON sp.payed_by = u.user_id
-                WHERE sp.supplier_id = $1
-                ORDER BY sp.created_at DESC;
-            """
-            payment_history = await conn.fetch(query, supplier_id)
+            payment_history = await SUPPLIER_PAYMENT_HISTORY.fetch(conn, supplier_id)
 
             return payment_history or None
 
@@ -117,20 +136,7 @@ async def get_user_payment_history_ps(user_id: str):
     try:
         user_id = uuid.UUID(user_id)
         async with connection_context() as conn:
-            query = """
-                SELECT up.id,
-                       up.amount,
-                       up.currency,
-                       up.note,
-                       u.full_name AS payed_by_name,
-                       up.created_at
-                FROM user_payments up
-                LEFT JOIN users u
-                ON up.payed_by = u.user_id
-                WHERE up.user_id = $1
-                ORDER BY up.created_at DESC;
-            """
-            payment_history = await conn.fetch(query, user_id)
+            payment_history = await USER_PAYMENT_HISTORY.fetch(conn, user_id)
 
             return payment_history or None
 
@@ -1,31 +1,122 @@
 from helpers import make_roll_dic, make_product_dic, parse_date
 from utils import flatbed
 from utils.conn import connection_context
+from .queries import register_query
+from .changes import record_changes
+from .dashboard import invalidate_dashboard
+from .search_index import refresh_product, forget_product
+
+INSERT_PRODUCT = register_query("insert_product", """
+    INSERT INTO products (
+        name,
+        category,
+        price_per_metre,
+        description,
+        material,
+        fabric_height_cm,
+        weight_per_metre,
+        opacity_level,
+        texture
+    ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+    RETURNING product_code
+""", params=("text", "int", "int", "text", "text", "int", "int", "text", "text"), columns=("product_code",))
+
+UPDATE_PRODUCT = register_query("update_product", """
+    UPDATE products
+    SET name = $1,
+    category = $2,
+    price_per_metre = $3, description = $4,
+    material = $5, fabric_height_cm = $6, weight_per_metre = $7,
+    opacity_level = $8, texture = $9,
+    updated_at = now()
+    WHERE product_code = $10
+    RETURNING product_code
+""", params=("text", "int", "int", "text", "text", "int", "int", "text", "text", "text"), columns=("product_code",))
+
+SEARCH_PRODUCTS = register_query("search_products", "SELECT * FROM search_products_list($1, $2);",
+                                 params=("text", "int"))
+
+PRODUCT_BY_CODE = register_query("product_by_code", "SELECT * FROM search_products_list($1, 0, 1, true);",
+                                 params=("text",))
+
+PRODUCTS_FOR_SYNC = register_query("products_for_sync", """
+    SELECT 
+        p.*,
+        COALESCE(s.quantity, 0) AS quantity
+    FROM products p
+    LEFT JOIN product_stock s ON s.product_code = p.product_code
+    WHERE (
+        $1::timestamptz IS NULL
+        OR (p.updated_at IS NOT NULL AND p.updated_at > $1)
+    )
+""", params=("timestamptz",))
+
+SEARCH_PRODUCTS_FILTERED = register_query("search_products_filtered",
+                                          "SELECT * FROM search_products_list_filtered($1, $2);",
+                                          params=("int", "int"))
+
+ROLL_COLUMNS = ("product_code", "roll_code", "quantity", "color", "image_url", "cost_per_metre", "archived")
+
+PRODUCT_ROLL = register_query("product_roll", """
+    SELECT
+        r.product_code,
+        r.roll_code,
+        r.quantity,
+        r.color,
+        r.image_url,
+        pi.cost_per_metre,
+        r.archived
+    FROM rolls r
+    LEFT JOIN purchase_items pi ON r.purchase_item_id = pi.id
+    WHERE r.product_code = $1 AND r.roll_code = $2 AND ($3 OR r.archived = false)
+""", params=("text", "text", "bool"), columns=ROLL_COLUMNS)
+
+ROLL_BY_CODE = register_query("roll_by_code", """
+    SELECT
+        r.product_code,
+        r.roll_code,
+        r.quantity,
+        r.color,
+        r.image_url,
+        pi.cost_per_metre,
+        r.archived
+    FROM rolls r
+    LEFT JOIN purchase_items pi ON r.purchase_item_id = pi.id
+    WHERE r.roll_code = $1 AND ($2 OR r.archived = false)
+""", params=("text", "bool"), columns=ROLL_COLUMNS)
+
+DELETE_PRODUCT = register_query("delete_product", "DELETE FROM products WHERE product_code = $1", params=("text",))
+
+PRODUCT_ROLL_CODES = register_query("product_roll_codes", "SELECT roll_code FROM rolls WHERE product_code = $1",
+                                    params=("text",), columns=("roll_code",))
+
+ARCHIVE_PRODUCT_ROLLS = register_query("archive_product_rolls", """
+    UPDATE rolls
+    SET archived = TRUE, updated_at = now()
+    WHERE product_code = $1
+    RETURNING roll_code
+""", params=("text",), columns=("roll_code",))
+
+ARCHIVE_PRODUCT = register_query("archive_product", """
+    UPDATE products
+    SET archived = TRUE, updated_at = now()
+    WHERE product_code = $1
+""", params=("text",))
 
 
 async def insert_new_product(name, category_index, price, description,
                              material, fabric_height_cm, weight_per_metre, opacity_level, texture):
     try:
-        async with connection_context() as conn:
-            sql_insert = """
-                INSERT INTO products (
-                    name,
-                    category,
-                    price_per_metre,
-                    description,
-                    material,
-                    fabric_height_cm,
-                    weight_per_metre,
-                    opacity_level,
-                    texture
-                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
-                RETURNING product_code
-            """
-            product_code = await conn.fetchval(sql_insert, name, category_index, price,
-                                               description, material, fabric_height_cm,
-                                               weight_per_metre, opacity_level, texture)
-
-            return product_code
+        async with connection_context() as conn, conn.transaction():
+            product_code = await INSERT_PRODUCT.fetchval(conn, name, category_index, price,
+                                                         description, material, fabric_height_cm,
+                                                         weight_per_metre, opacity_level, texture)
+            if product_code:
+                await record_changes(conn, [("product", product_code, False)])
+                await refresh_product(conn, product_code)
+
+        await invalidate_dashboard()
+        return product_code
     except Exception as e:
         await flatbed('exception', f"In insert_new_product: {e}")
         return None
@@ -34,22 +125,14 @@ async def insert_new_product(name, category_index, price, description,
 async def update_product(codeToEdit, name, category_index, price, description,
                          material, fabric_height_cm, weight_per_metre, opacity_level, texture):
     try:
-        async with connection_context() as conn:
-            sql_update = """
-                UPDATE products
-                SET name = $1,
-                category = $2,
-                price_per_metre = $3, description = $4,
-                material = $5, fabric_height_cm = $6, weight_per_metre = $7,
-                opacity_level = $8, texture = $9,
-                updated_at = now()
-                WHERE product_code = $10
-                RETURNING product_code
-            """
-            product_code = await conn.fetchval(sql_update, name, category_index,
-                                               price, description, material,
-                                               fabric_height_cm, weight_per_metre,
-                                               opacity_level, texture, codeToEdit)
+        async with connection_context() as conn, conn.transaction():
+            product_code = await UPDATE_PRODUCT.fetchval(conn, name, category_index,
+                                                         price, description, material,
+                                                         fabric_height_cm, weight_per_metre,
+                                                         opacity_level, texture, codeToEdit)
+            if product_code:
+                await record_changes(conn, [("product", product_code, False)])
+                await refresh_product(conn, product_code)
 
             return product_code
     except Exception as e:
@@ -70,8 +153,7 @@ async def search_products_list(search_query, search_by):
     """
     try:
         async with connection_context() as conn:
-            query = "SELECT * FROM search_products_list($1, $2);"
-            products_list = await conn.fetch(query, search_query, search_by)
+            products_list = await SEARCH_PRODUCTS.fetch(conn, search_query, search_by)
             return products_list  # Returns a list of asyncpg Record objects
 
     except Exception as e:
@@ -85,7 +167,7 @@ async def get_products_list_for_sync(old_sync: str):
     Parameters:
         old_sync (str): The last sync date (ISO string). If None/empty → fetch all.
     Includes:
-        - quantity (sum of rolls)
+        - quantity (sum of rolls, as kept in product_stock)
 
     Returns:
         List of records from the products table.
@@ -94,20 +176,7 @@ async def get_products_list_for_sync(old_sync: str):
         async with connection_context() as conn:
             old_sync_dt = parse_date(old_sync) if old_sync else None
 
-            query = """
-                SELECT 
-                    p.*,
-                    COALESCE(SUM(r.quantity), 0) AS quantity
-                FROM products p
-                LEFT JOIN rolls r ON r.product_code = p.product_code
-                WHERE (
-                    $1::timestamptz IS NULL
-                    OR (p.updated_at IS NOT NULL AND p.updated_at > $1)
-                )
-                GROUP BY p.product_code
-            """
-
-            products_list = await conn.fetch(query, old_sync_dt)
+            products_list = await PRODUCTS_FOR_SYNC.fetch(conn, old_sync_dt)
             return products_list
 
     except Exception as e:
@@ -128,8 +197,7 @@ async def search_products_list_filtered(stock_condition, category):
     """
     try:
         async with connection_context() as conn:
-            query = "SELECT * FROM search_products_list_filtered($1, $2);"
-            expenses_list = await conn.fetch(query, stock_condition, category)
+            expenses_list = await SEARCH_PRODUCTS_FILTERED.fetch(conn, stock_condition, category)
             return expenses_list  # Returns a list of asyncpg Record objects
 
     except Exception as e:
@@ -196,8 +264,7 @@ async def get_product_and_roll_ps(code, include_archived: bool = False):
                 product_code, roll_code = upper_code, None
 
             # Fetch the product
-            query_product = "SELECT * FROM search_products_list($1, 0, 1, true);"
-            product = await conn.fetchrow(query_product, product_code)
+            product = await PRODUCT_BY_CODE.fetchrow(conn, product_code)
 
             if not product:
                 return None
@@ -206,23 +273,7 @@ async def get_product_and_roll_ps(code, include_archived: bool = False):
 
             # Fetch the specific roll
             if roll_code:
-                query_roll = """
-                SELECT
-                    r.product_code,
-                    r.roll_code,
-                    r.quantity,
-                    r.color,
-                    r.image_url,
-                    pi.cost_per_metre,
-                    r.archived
-                FROM rolls r
-                LEFT JOIN purchase_items pi ON r.purchase_item_id = pi.id
-                WHERE r.product_code = $1 AND r.roll_code = $2
-                """
-                if not include_archived:
-                    query_roll += " AND r.archived = false"
-
-                roll = await conn.fetchrow(query_roll, product_code, roll_code)
+                roll = await PRODUCT_ROLL.fetchrow(conn, product_code, roll_code, include_archived)
 
                 if roll:
                     roll_dict = make_roll_dic(roll)
@@ -241,23 +292,7 @@ async def get_roll_and_product_ps(code, include_archived: bool = False):
             roll_code = code.upper()
 
             # Fetch the specific roll
-            query_roll = """
-            SELECT
-                r.product_code,
-                r.roll_code,
-                r.quantity,
-                r.color,
-                r.image_url,
-                pi.cost_per_metre,
-                r.archived
-            FROM rolls r
-            LEFT JOIN purchase_items pi ON r.purchase_item_id = pi.id
-            WHERE r.roll_code = $1
-            """
-            if not include_archived:
-                query_roll += " AND r.archived = false"
-
-            roll = await conn.fetchrow(query_roll, roll_code)
+            roll = await ROLL_BY_CODE.fetchrow(conn, roll_code, include_archived)
 
             if not roll:
                 return None
@@ -265,8 +300,7 @@ async def get_roll_and_product_ps(code, include_archived: bool = False):
             roll_dict = make_roll_dic(roll)
 
             # Fetch the product
-            query_product = "SELECT * FROM search_products_list($1, 0, 1, true);"
-            product = await conn.fetchrow(query_product, roll_dict["productCode"])
+            product = await PRODUCT_BY_CODE.fetchrow(conn, roll_dict["productCode"])
 
             if not product:
                 return None
@@ -325,8 +359,12 @@ async def get_roll_and_product_ps(code, include_archived: bool = False):
 
 async def remove_product_ps(code):
     try:
-        async with connection_context() as conn:
-            await conn.execute("DELETE FROM products WHERE product_code = $1", code)
+        async with connection_context() as conn, conn.transaction():
+            roll_codes = [row["roll_code"] for row in await PRODUCT_ROLL_CODES.fetch(conn, code)]
+            await DELETE_PRODUCT.execute(conn, code)
+            await record_changes(conn, [("product", code, True), *(("roll", rc, True) for rc in roll_codes)])
+        forget_product(code)
+        await invalidate_dashboard()
         return True
     except Exception as e:
         await flatbed('exception', f"in remove_product_ps: {e}")
@@ -335,17 +373,13 @@ async def remove_product_ps(code):
 
 async def archive_product_ps(code):
     try:
-        async with connection_context() as conn:
-            await conn.execute("""
-                UPDATE rolls
-                SET archived = TRUE, updated_at = now()
-                WHERE product_code = $1
-            """, code)
-            await conn.execute("""
-                UPDATE products
-                SET archived = TRUE, updated_at = now()
-                WHERE product_code = $1
-            """, code)
+        async with connection_context() as conn, conn.transaction():
+            roll_codes = [row["roll_code"] for row in await ARCHIVE_PRODUCT_ROLLS.fetch(conn, code)]
+            await ARCHIVE_PRODUCT.execute(conn, code)
+            await record_changes(conn, [("product", code, False), *(("roll", rc, False) for rc in roll_codes)])
+        forget_product(code)
+        await refresh_product(None, code)  # still found by code, like search_products_list(code, 0, 1, true)
+        await invalidate_dashboard()
         return True
     except Exception as e:
         await flatbed('exception', f"in archive_product_ps: {e}")
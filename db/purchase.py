@@ -1,7 +1,111 @@
 from typing import Optional, Any
 
+from helpers import Keyset
 from utils import flatbed
 from utils.conn import connection_context
+from .queries import register_query
+from .changes import record_changes
+from .dashboard import invalidate_dashboard
+from .search_index import refresh_roll
+
+INSERT_PURCHASE = register_query("insert_purchase", """
+    WITH inserted AS (
+        INSERT INTO purchases (
+            supplier_id,
+            total_amount,
+            currency,
+            description,
+            created_by
+        ) VALUES ($1, $2, $3, $4, $5)
+        RETURNING id, created_at, updated_at, created_by
+    )
+    SELECT 
+        inserted.id,
+        inserted.created_at,
+        inserted.updated_at,
+        users.full_name AS created_by_name
+    FROM inserted
+    JOIN users ON users.user_id = inserted.created_by
+""", params=("int", "int", "text", "text", "uuid"), columns=("id", "created_at", "updated_at", "created_by_name"))
+
+UPDATE_PURCHASE = register_query("update_purchase", """
+    UPDATE purchases
+    SET supplier_id = $1,
+        total_amount = $2,
+        currency = $3,
+        description = $4,
+        updated_at = NOW()
+    WHERE id = $5
+    RETURNING id, updated_at
+""", params=("int", "int", "text", "text", "int"), columns=("id", "updated_at"))
+
+INSERT_PURCHASE_ITEM = register_query("insert_purchase_item", """
+    INSERT INTO purchase_items (
+        purchase_id,
+        product_code,
+        cost_per_metre
+    ) VALUES ($1, $2, $3)
+    RETURNING id
+""", params=("int", "text", "int"), columns=("id",))
+
+UPDATE_PURCHASE_ITEM = register_query("update_purchase_item", """
+    UPDATE purchase_items
+    SET purchase_id = $1,
+        product_code = $2,
+        cost_per_metre = $3
+    WHERE id = $4
+    RETURNING id
+""", params=("int", "text", "int", "int"), columns=("id",))
+
+# Rolls cut from a purchase item carry its cost_per_metre
+PURCHASE_ITEM_ROLLS = register_query("purchase_item_rolls", """
+    SELECT roll_code, product_code FROM rolls WHERE purchase_item_id = $1
+""", params=("int",), columns=("roll_code", "product_code"))
+
+# Keyset pages newest first, on (created_at, id); see helpers.Keyset. The ordering and
+# limit are applied to the function's result, so only the page leaves the database.
+SEARCH_PURCHASES_FILTERED = register_query("search_purchases_filtered", """
+    SELECT * FROM search_purchases_list_filtered($1) p
+    WHERE (p.created_at, p.id) < (COALESCE($2, 'infinity'::timestamptz), COALESCE($3, 0))
+    ORDER BY p.created_at DESC, p.id DESC
+    LIMIT $4
+""", params=("int", "timestamptz", "int", "int"))
+
+PURCHASES_FOR_SUPPLIER = register_query("purchases_for_supplier", """
+    SELECT
+        p.id,
+        p.supplier_id,
+        s.name AS supplier_name,
+        p.total_amount,
+        p.currency,
+        p.description,
+        p.created_at,
+        p.updated_at,
+        u.username AS created_by
+    FROM purchases p
+    LEFT JOIN users u ON p.created_by = u.user_id
+    LEFT JOIN suppliers s ON p.supplier_id = s.id
+    WHERE
+        p.archived = false AND p.supplier_id = $1
+    ORDER BY p.created_at DESC;
+""", params=("int",),
+    columns=("id", "supplier_id", "supplier_name", "total_amount", "currency", "description", "created_at",
+             "updated_at", "created_by"))
+
+PURCHASE_ITEMS = register_query("purchase_items", """
+    SELECT pi.*, p.name AS product_name, p.category as category_index
+    FROM purchase_items pi
+    JOIN products p ON pi.product_code = p.product_code
+    WHERE pi.purchase_id = $1;
+""", params=("int",))
+
+DELETE_PURCHASE = register_query("delete_purchase", "DELETE FROM purchases WHERE id = $1", params=("int",))
+
+ARCHIVE_PURCHASE = register_query("archive_purchase", """
+    UPDATE purchases
+    SET archived = TRUE, updated_at = now()
+    WHERE id = $1
+""", params=("int",))
 
 
 async def insert_new_purchase(
@@ -14,28 +118,8 @@ async def insert_new_purchase(
     try:
         async with connection_context() as conn:
 
-            sql_insert = """
-                WITH inserted AS (
-                    INSERT INTO purchases (
-                        supplier_id,
-                        total_amount,
-                        currency,
-                        description,
-                        created_by
-                    ) VALUES ($1, $2, $3, $4, $5)
-                    RETURNING id, created_at, updated_at, created_by
-                )
-                SELECT 
-                    inserted.id,
-                    inserted.created_at,
-                    inserted.updated_at,
-                    users.full_name AS created_by_name
-                FROM inserted
-                JOIN users ON users.user_id = inserted.created_by
-            """
-
-            row = await conn.fetchrow(
-                sql_insert,
+            row = await INSERT_PURCHASE.fetchrow(
+                conn,
                 supplier_id,
                 total_amount,
                 currency,
@@ -61,18 +145,8 @@ async def update_purchase(
     try:
         async with connection_context() as conn:
 
-            sql_update = """
-                UPDATE purchases
-                SET supplier_id = $1,
-                    total_amount = $2,
-                    currency = $3,
-                    description = $4,
-                    updated_at = NOW()
-                WHERE id = $5
-                RETURNING id, updated_at
-            """
-            row = await conn.fetchrow(
-                sql_update,
+            row = await UPDATE_PURCHASE.fetchrow(
+                conn,
                 supplier_id,
                 total_amount,
                 currency,
@@ -96,17 +170,8 @@ async def insert_new_purchase_item(
     try:
         async with connection_context() as conn:
 
-            sql_insert = """
-                INSERT INTO purchase_items (
-                    purchase_id,
-                    product_code,
-                    cost_per_metre
-                ) VALUES ($1, $2, $3)
-                RETURNING id
-            """
-
-            purchase_item_id = await conn.fetchval(
-                sql_insert,
+            purchase_item_id = await INSERT_PURCHASE_ITEM.fetchval(
+                conn,
                 purchase_id,
                 product_code,
                 cost_per_metre
@@ -127,27 +192,26 @@ async def update_purchase_item(
         cost_per_metre: int
 ) -> int | None:
     try:
-        async with connection_context() as conn:
+        async with connection_context() as conn, conn.transaction():
 
-            sql_update = """
-                UPDATE purchase_items
-                SET purchase_id = $1,
-                    product_code = $2,
-                    cost_per_metre = $3
-                WHERE id = $4
-                RETURNING id
-            """
-            purchase_item_id = await conn.fetchval(
-                sql_update,
+            purchase_item_id = await UPDATE_PURCHASE_ITEM.fetchval(
+                conn,
                 purchase_id,
                 productCode,
                 cost_per_metre,
                 id_to_edit
             )
             if purchase_item_id:
-                return purchase_item_id
-            else:
-                return None
+                rolls = await PURCHASE_ITEM_ROLLS.fetch(conn, purchase_item_id)
+                await record_changes(conn, [("roll", roll["roll_code"], False) for roll in rolls] +
+                                     [("product", code, False) for code in {roll["product_code"] for roll in rolls}])
+        if purchase_item_id:
+            for roll in rolls:
+                await refresh_roll(None, roll["roll_code"])  # cost_per_metre
+            await invalidate_dashboard()  # inventory value at cost
+            return purchase_item_id
+        else:
+            return None
     except Exception as e:
         await flatbed('exception', f"In update_purchase_item: {e}")
         return None
@@ -177,21 +241,24 @@ async def update_purchase_item(
 #         raise
 
 
-async def search_purchases_list_filtered(_date):
+async def search_purchases_list_filtered(_date, cursor=None, limit=None):
     """
-    Retrieve purchases list based on a date filter.
+    Retrieve a page of the purchases list based on a date filter.
 
     Parameters:
     - date (int): The date filter for purchases list.
+    - cursor (str): Cursor of the page, from the previous page; None for the first.
+    - limit (int): Page size, capped to PAGE_SIZE_MAX.
 
     Returns:
-    - List of records from the purchases table that match the criteria.
+    - Tuple of the page's records from the purchases table that match the criteria,
+      and the cursor of the next page (None on the last one).
     """
+    keyset = Keyset(cursor, limit, [_date])
     try:
         async with connection_context() as conn:
-            query = "SELECT * FROM search_purchases_list_filtered($1);"
-            purchases_list = await conn.fetch(query, _date)
-            return purchases_list  # Returns a list of asyncpg Record objects
+            purchases_list = await SEARCH_PURCHASES_FILTERED.fetch(conn, _date, *keyset.args)
+            return keyset.page(purchases_list)
 
     except Exception as e:
         await flatbed('exception', f"In search_purchases_list_filtered: {e}")
@@ -210,25 +277,7 @@ async def search_purchases_list_for_supplier(supplier_id):
     """
     try:
         async with connection_context() as conn:
-            query = """
-            SELECT
-                p.id,
-                p.supplier_id,
-                s.name AS supplier_name,
-                p.total_amount,
-                p.currency,
-                p.description,
-                p.created_at,
-                p.updated_at,
-                u.username AS created_by
-            FROM purchases p
-            LEFT JOIN users u ON p.created_by = u.user_id
-            LEFT JOIN suppliers s ON p.supplier_id = s.id
-            WHERE
-                p.archived = false AND p.supplier_id = $1
-            ORDER BY p.created_at DESC;
-            """
-            purchases_list = await conn.fetch(query, supplier_id)
+            purchases_list = await PURCHASES_FOR_SUPPLIER.fetch(conn, supplier_id)
             return purchases_list  # Returns a list of asyncpg Record objects
 
     except Exception as e:
@@ -248,13 +297,7 @@ async def get_purchase_items_ps(purchase_id):
     """
     try:
         async with connection_context() as conn:
-            query = """
-                SELECT pi.*, p.name AS product_name, p.category as category_index
-                FROM purchase_items pi
-                JOIN products p ON pi.product_code = p.product_code
-                WHERE pi.purchase_id = $1;
-            """
-            purchase_items = await conn.fetch(query, purchase_id)
+            purchase_items = await PURCHASE_ITEMS.fetch(conn, purchase_id)
             return purchase_items  # Each record includes product_name
 
     except Exception as e:
@@ -292,7 +335,7 @@ async def get_purchase_items_ps(purchase_id):
 async def remove_purchase_ps(purchase_id):
     try:
         async with connection_context() as conn:
-            await conn.execute("DELETE FROM purchases WHERE id = $1", purchase_id)
+            await DELETE_PURCHASE.execute(conn, purchase_id)
         return True
     except Exception as e:
         await flatbed('exception', f"in remove_purchase_ps: {e}")
@@ -302,11 +345,7 @@ async def remove_purchase_ps(purchase_id):
 async def archive_purchase_ps(purchase_id):
     try:
         async with connection_context() as conn:
-            await conn.execute("""
-            UPDATE purchases
-            SET archived = TRUE, updated_at = now()
-            WHERE id = $1
-            """, purchase_id)
+            await ARCHIVE_PURCHASE.execute(conn, purchase_id)
         return True
     except Exception as e:
         await flatbed('exception', f"in archive_purchase_ps: {e}")
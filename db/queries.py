@@ -0,0 +1,104 @@
+import time
+from typing import Optional, Sequence
+
+from utils.conn import STATEMENT_CACHE_SIZE
+
+# Every statement the db/ layer runs, by name
+QUERIES = {}
+
+# Per query name: calls, errors and execution time
+query_stats = {}
+
+
+class Query:
+    """
+    A named SQL statement with fixed text.
+
+    The text never changes between calls, so asyncpg prepares it lazily the
+    first time it runs on a connection and serves it from that connection's
+    statement cache afterwards. The cache is sized to hold every registered query.
+    """
+
+    __slots__ = ("name", "sql", "params", "columns", "timeout", "stats")
+
+    def __init__(self, name: str, sql: str, params: Sequence[str], columns: Sequence[str],
+                 timeout: Optional[float]):
+        self.name = name
+        self.sql = sql
+        self.params = tuple(params)
+        self.columns = tuple(columns)
+        self.timeout = timeout
+        self.stats = {"calls": 0, "errors": 0, "totalTime": 0.0, "maxTime": 0.0}
+
+    def __repr__(self):
+        return f"<Query {self.name}>"
+
+    async def fetch(self, conn, *args):
+        return await self._run(conn.fetch, args)
+
+    async def fetchrow(self, conn, *args):
+        return await self._run(conn.fetchrow, args)
+
+    async def fetchval(self, conn, *args):
+        return await self._run(conn.fetchval, args)
+
+    async def execute(self, conn, *args):
+        return await self._run(conn.execute, args)
+
+    async def executemany(self, conn, args_list):
+        for args in args_list:
+            self._check_args(args)
+        return await self._timed(conn.executemany(self.sql, args_list, timeout=self.timeout))
+
+    def cursor(self, conn, *args, prefetch: Optional[int] = None):
+        """Server-side cursor over the statement; must be used inside a transaction."""
+        self._check_args(args)
+        return conn.cursor(self.sql, *args, prefetch=prefetch, timeout=self.timeout)
+
+    def _check_args(self, args):
+        if len(args) != len(self.params):
+            raise TypeError(f"Query {self.name} takes {len(self.params)} parameters "
+                            f"({', '.join(self.params)}), got {len(args)}")
+
+    async def _run(self, method, args):
+        self._check_args(args)
+        return await self._timed(method(self.sql, *args, timeout=self.timeout))
+
+    async def _timed(self, awaitable):
+        stats = self.stats
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        except Exception:
+            stats["errors"] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            stats["calls"] += 1
+            stats["totalTime"] += elapsed
+            stats["maxTime"] = max(stats["maxTime"], elapsed)
+
+
+def register_query(name: str, sql: str, params: Sequence[str] = (), columns: Sequence[str] = (),
+                   timeout: Optional[float] = None) -> Query:
+    """
+    Register a statement once, at import time.
+
+    Args:
+        name (str): Unique query name, used for metrics.
+        sql (str): Statement text with $n placeholders. Must not be built per call.
+        params (Sequence[str]): Postgres type of each $n parameter, in order.
+        columns (Sequence[str]): Columns of the returned rows (empty for SELECT * or no rows).
+        timeout (Optional[float]): Statement timeout in seconds.
+
+    Returns:
+        Query: The registered query.
+    """
+    if name in QUERIES:
+        raise ValueError(f"Query {name} is already registered")
+    if len(QUERIES) >= STATEMENT_CACHE_SIZE:
+        raise RuntimeError(f"More queries registered than DB_STATEMENT_CACHE_SIZE ({STATEMENT_CACHE_SIZE}) holds")
+
+    query = QUERIES[name] = Query(name, sql, params, columns, timeout)
+    query_stats[name] = query.stats
+    return query
@@ -1,40 +1,85 @@
-from helpers import parse_date
+from helpers import parse_date, Keyset
 from utils import flatbed
 from utils.conn import connection_context
+from .queries import register_query
 
+REPORT_EXPORT_BATCH_SIZE = 1000  # rows read from the server-side cursor at a time
 
-async def report_recent_activities_list(from_date, to_date):
+# Keyset pages newest first, on (date, id); see helpers.Keyset
+REPORT_ACTIVITIES = register_query("report_activities", """
+    SELECT 
+        ua.id,
+        ua.date,
+        u.username,
+        ua.action
+    FROM user_actions ua
+    LEFT JOIN users u ON ua.user_id = u.user_id
+    WHERE ua.date >= $1 AND ua.date <= $2
+      AND (ua.date, ua.id) < (COALESCE($3, 'infinity'::timestamptz), COALESCE($4, 0))
+    ORDER BY ua.date DESC, ua.id DESC
+    LIMIT $5
+""", params=("timestamptz", "timestamptz", "timestamptz", "int", "int"), columns=("id", "date", "username", "action"))
+
+# The whole range, for exports read through a server-side cursor
+REPORT_ACTIVITIES_EXPORT = register_query("report_activities_export", """
+    SELECT 
+        ua.id,
+        ua.date,
+        u.username,
+        ua.action
+    FROM user_actions ua
+    LEFT JOIN users u ON ua.user_id = u.user_id
+    WHERE ua.date >= $1 AND ua.date <= $2
+    ORDER BY ua.date DESC, ua.id DESC
+""", params=("timestamptz", "timestamptz"), columns=("id", "date", "username", "action"))
+
+REPORT_TAGS = register_query("report_tags", """
+    SELECT
+        (rolls.product_code || rolls.roll_code) AS full_code,
+        products.name AS product_name,
+        products.category AS category,
+        rolls.color AS color,
+        rolls.created_at AS created_at,
+        rolls.image_url AS image_url
+    FROM
+        rolls
+    INNER JOIN
+        products
+    ON
+        rolls.product_code = products.product_code
+    WHERE
+        rolls.created_at >= $1 AND rolls.created_at <= $2
+    ORDER BY
+        rolls.created_at
+""", params=("timestamptz", "timestamptz"),
+    columns=("full_code", "product_name", "category", "color", "created_at", "image_url"))
+
+
+async def report_recent_activities_list(from_date, to_date, cursor=None, limit=None):
     """
-    Retrieve recent activities list according to start and end dates.
+    Retrieve a page of the recent activities list according to start and end dates.
 
     Parameters:
     - from_date (str|date): Start date.
     - to_date (str|date): End date.
+    - cursor (str): Cursor of the page, from the previous page; None for the first.
+    - limit (int): Page size, capped to PAGE_SIZE_MAX.
 
     Returns:
-    - List of records from the user_actions table that match the criteria.
+    - Tuple of the page's records from the user_actions table that match the criteria,
+      and the cursor of the next page (None on the last one).
     """
+    keyset = Keyset(cursor, limit, [str(from_date), str(to_date)], sort_column="date")
+
     if from_date:
         from_date = parse_date(from_date)
 
     if to_date:
         to_date = parse_date(to_date)
 
-    query = """
-        SELECT 
-            ua.id,
-            ua.date,
-            u.username,
-            ua.action
-        FROM user_actions ua
-        LEFT JOIN users u ON ua.user_id = u.user_id
-        WHERE ua.date >= $1 AND ua.date <= $2
-        ORDER BY ua.date DESC
-    """
-
     try:
         async with connection_context() as conn:
-            return await conn.fetch(query, from_date, to_date)
+            return keyset.page(await REPORT_ACTIVITIES.fetch(conn, from_date, to_date, *keyset.args))
     except Exception as e:
         await flatbed('exception', f"In report_recent_activities_list: {e}")
         raise
@@ -49,29 +94,37 @@ async def report_tags_list(from_date, to_date):
 
     to_date = parse_date(to_date)
 
-    query = """
-    SELECT
-        (rolls.product_code || rolls.roll_code) AS full_code,
-        products.name AS product_name,
-        products.category AS category,
-        rolls.color AS color,
-        rolls.created_at AS created_at,
-        rolls.image_url AS image_url
-    FROM
-        rolls
-    INNER JOIN
-        products
-    ON
-        rolls.product_code = products.product_code
-    WHERE
-        rolls.created_at >= $1 AND rolls.created_at <= $2
-    ORDER BY
-        rolls.created_at
+    try:
+        async with connection_context() as conn:
+            return await REPORT_TAGS.fetch(conn, from_date, to_date)
+    except Exception as e:
+        await flatbed('exception', f"In report_tags_list: {e}")
+        raise
+
+
+# Per report: the export query and its column titles, named like the JSON report's fields
+REPORT_EXPORTS = {
+    "activities": (REPORT_ACTIVITIES_EXPORT, ("id", "date", "username", "action")),
+    "tags": (REPORT_TAGS, ("fullCode", "productName", "categoryIndex", "colorLetter", "createdAt", "imageUrl")),
+}
+
+
+async def stream_report_rows(report, from_date, to_date, batch_size=REPORT_EXPORT_BATCH_SIZE):
+    """
+    Rows of a report between the dates, in batches of at most `batch_size` value tuples,
+    read through a server-side cursor so even a multi-year range is never held in memory.
+    The report's column titles are REPORT_EXPORTS[report][1].
     """
+    query, _ = REPORT_EXPORTS[report]
+    from_date = parse_date(from_date)
+    to_date = parse_date(to_date)
 
     try:
         async with connection_context() as conn:
-            return await conn.fetch(query, from_date, to_date)
+            async with conn.transaction(isolation="repeatable_read", readonly=True):
+                rows = await query.cursor(conn, from_date, to_date)
+                while batch := await rows.fetch(batch_size):
+                    yield [tuple(row.values()) for row in batch]
     except Exception as e:
-        await flatbed('exception', f"In report_tags_list: {e}")
+        await flatbed('exception', f"In stream_report_rows: {e}")
         raise
@@ -1,25 +1,180 @@
-from typing import Optional, List, Any
+from typing import Optional, List, Any, Tuple
 
-from helpers import get_date_range, parse_date
+from helpers import get_date_range, parse_date, Keyset
 from utils import flatbed
 from utils.conn import connection_context
+from .queries import register_query
+from .changes import record_roll_change
+from .dashboard import invalidate_dashboard
+from .search_index import refresh_roll
+
+INSERT_ROLL = register_query("insert_roll", """
+    INSERT INTO rolls (
+        product_code,
+        purchase_item_id,
+        quantity,
+        color
+    ) VALUES ($1, $2, $3, $4)
+    RETURNING roll_code
+""", params=("text", "int", "int", "text"), columns=("roll_code",))
+
+UPDATE_ROLL = register_query("update_roll", """
+    UPDATE rolls
+    SET quantity = $1,
+        color = $2, updated_at = now()
+    WHERE roll_code = $3
+""", params=("int", "text", "text"))
+
+INSERT_CUT_FABRIC_TX = register_query("insert_cut_fabric_tx", """
+    INSERT INTO cut_fabric_tx (
+        roll_code,
+        bill_code,
+        quantity,
+        comment,
+        created_by,
+        status
+    ) VALUES ($1, $2, $3, $4, $5, $6)
+    RETURNING roll_code
+""", params=("text", "text", "int", "text", "uuid", "text"), columns=("roll_code",))
+
+CUT_FABRIC_DRAFTS = register_query("cut_fabric_drafts", """
+    SELECT 
+        tx.id,
+        tx.roll_code,
+        tx.bill_code,
+        u.username AS created_by,
+        tx.quantity,
+        tx.status,
+        tx.comment,
+        tx.created_at
+    FROM cut_fabric_tx tx
+    JOIN users u ON tx.created_by = u.user_id
+    WHERE tx.status = $1
+    ORDER BY tx.created_at
+""", params=("text",),
+    columns=("id", "roll_code", "bill_code", "created_by", "quantity", "status", "comment", "created_at"))
+
+CUTTING_HISTORY_COLUMNS = ("id", "roll_code", "bill_code", "created_by", "quantity", "status", "comment",
+                           "reviewed_by", "reviewed_at", "created_at")
+
+CUTTING_HISTORY_SELECT = """
+    SELECT tx.id,
+        tx.roll_code,
+        tx.bill_code,
+        u.username AS created_by,
+        tx.quantity,
+        tx.status,
+        tx.comment,
+        ru.username AS reviewed_by,
+        tx.reviewed_at,
+        tx.created_at
+    FROM   cut_fabric_tx tx
+    LEFT JOIN   users u ON tx.created_by = u.user_id
+    LEFT JOIN users ru ON tx.reviewed_by = ru.user_id
+"""
+
+
+def _cutting_history_page(first: int) -> str:
+    # Keyset page newest first on (created_at, id), its parameters numbered from `first`; see helpers.Keyset
+    return f"""
+        AND (tx.created_at, tx.id) < (COALESCE(${first}, 'infinity'::timestamptz), COALESCE(${first + 1}, 0))
+        ORDER BY tx.created_at DESC, tx.id DESC
+        LIMIT ${first + 2};
+    """
+
+
+CUTTING_HISTORY_PAGE_PARAMS = ("timestamptz", "int", "int")
+
+# One fixed statement per filter combination: (status given, date range given)
+CUTTING_HISTORY = {
+    (False, False): register_query("cutting_history", CUTTING_HISTORY_SELECT + """
+        WHERE tx.status <> 'draft'
+    """ + _cutting_history_page(1), params=CUTTING_HISTORY_PAGE_PARAMS, columns=CUTTING_HISTORY_COLUMNS),
+    (True, False): register_query("cutting_history_by_status", CUTTING_HISTORY_SELECT + """
+        WHERE tx.status = $1
+    """ + _cutting_history_page(2), params=("text", *CUTTING_HISTORY_PAGE_PARAMS), columns=CUTTING_HISTORY_COLUMNS),
+    (False, True): register_query("cutting_history_in_range", CUTTING_HISTORY_SELECT + """
+        WHERE tx.status <> 'draft' AND tx.created_at BETWEEN $1 AND $2
+    """ + _cutting_history_page(3), params=("timestamptz", "timestamptz", *CUTTING_HISTORY_PAGE_PARAMS),
+        columns=CUTTING_HISTORY_COLUMNS),
+    (True, True): register_query("cutting_history_by_status_in_range", CUTTING_HISTORY_SELECT + """
+        WHERE tx.status = $1 AND tx.created_at BETWEEN $2 AND $3
+    """ + _cutting_history_page(4), params=("text", "timestamptz", "timestamptz", *CUTTING_HISTORY_PAGE_PARAMS),
+        columns=CUTTING_HISTORY_COLUMNS),
+}
+
+CUTTING_HISTORY_FOR_ROLL = register_query("cutting_history_for_roll", CUTTING_HISTORY_SELECT + """
+    where tx.roll_code = $1
+    ORDER BY tx.created_at DESC;
+""", params=("text",), columns=CUTTING_HISTORY_COLUMNS)
+
+UPDATE_CUT_FABRIC_TX_STATUS = register_query("update_cut_fabric_tx_status", """
+    UPDATE cut_fabric_tx
+    SET status = $1,
+    reviewed_by = $2::uuid,
+    reviewed_at = now()
+    WHERE id = $3
+    RETURNING roll_code
+""", params=("text", "uuid", "int"), columns=("roll_code",))
+
+ROLLS_FOR_SYNC = register_query("rolls_for_sync", """
+    SELECT 
+        r.*,
+        pi.cost_per_metre
+    FROM rolls r
+    LEFT JOIN purchase_items pi ON r.purchase_item_id = pi.id
+    WHERE (
+        $1::timestamptz IS NULL
+        OR (r.updated_at > $1)
+    )
+""", params=("timestamptz",))
+
+ROLLS_FOR_PRODUCT = register_query("rolls_for_product", """
+    SELECT 
+        r.product_code, 
+        r.roll_code, 
+        r.quantity, 
+        r.color, 
+        r.image_url,
+        pi.cost_per_metre
+    FROM rolls r
+    LEFT JOIN purchase_items pi ON r.purchase_item_id = pi.id
+    WHERE r.product_code = $1 AND r.archived = false
+""", params=("text",), columns=("product_code", "roll_code", "quantity", "color", "image_url", "cost_per_metre"))
+
+ROLLS_FOR_PURCHASE_ITEM = register_query("rolls_for_purchase_item", """
+    SELECT 
+        r.product_code, 
+        r.roll_code, 
+        r.quantity, 
+        r.color, 
+        r.image_url,
+        pi.cost_per_metre
+    FROM rolls r
+    LEFT JOIN purchase_items pi ON r.purchase_item_id = pi.id
+    WHERE r.purchase_item_id = $1 AND r.archived = false
+""", params=("int",), columns=("product_code", "roll_code", "quantity", "color", "image_url", "cost_per_metre"))
+
+DELETE_ROLL = register_query("delete_roll", "DELETE FROM rolls WHERE roll_code = $1 RETURNING product_code",
+                             params=("text",), columns=("product_code",))
+
+ARCHIVE_ROLL = register_query("archive_roll", """
+    UPDATE rolls
+    SET archived = TRUE, updated_at = now()
+    WHERE roll_code = $1
+""", params=("text",))
 
 
 async def insert_new_roll(product_code, purchase_item_id, quantity, color_letter):
     try:
-        async with connection_context() as conn:
-            sql_insert = """
-                INSERT INTO rolls (
-                    product_code,
-                    purchase_item_id,
-                    quantity,
-                    color
-                ) VALUES ($1, $2, $3, $4)
-                RETURNING roll_code
-            """
-            roll_code = await conn.fetchval(sql_insert, product_code, purchase_item_id, quantity, color_letter)
-
-            return roll_code
+        async with connection_context() as conn, conn.transaction():
+            roll_code = await INSERT_ROLL.fetchval(conn, product_code, purchase_item_id, quantity, color_letter)
+            if roll_code:
+                await record_roll_change(conn, roll_code, product_code)
+                await refresh_roll(conn, roll_code)
+
+        await invalidate_dashboard()
+        return roll_code
     except Exception as e:
         await flatbed('exception', f"In insert_new_roll: {e}")
         return None
@@ -27,16 +182,13 @@ async def insert_new_roll(product_code, purchase_item_id, quantity, color_letter
 
 async def update_roll(codeToEdit, quantity, color_letter):
     try:
-        async with connection_context() as conn:
-            sql_update = """
-                UPDATE rolls
-                SET quantity = $1,
-                    color = $2, updated_at = now()
-                WHERE roll_code = $3
-            """
-            await conn.execute(sql_update, quantity, color_letter, codeToEdit)
-
-            return codeToEdit
+        async with connection_context() as conn, conn.transaction():
+            await UPDATE_ROLL.execute(conn, quantity, color_letter, codeToEdit)
+            await record_roll_change(conn, codeToEdit)
+            await refresh_roll(conn, codeToEdit)
+
+        await invalidate_dashboard()
+        return codeToEdit
     except Exception as e:
         await flatbed('exception', f"In update_roll: {e}")
         return None
@@ -69,20 +221,9 @@ async def add_cut_fabric_tx(
     comment: Optional[str] = None,
 ) -> bool:
     try:
-        async with connection_context() as conn:
-            sql_insert = """
-                INSERT INTO cut_fabric_tx (
-                    roll_code,
-                    bill_code,
-                    quantity,
-                    comment,
-                    created_by,
-                    status
-                ) VALUES ($1, $2, $3, $4, $5, $6)
-                RETURNING roll_code
-            """
-            returned_roll_code = await conn.fetchval(
-                sql_insert,
+        async with connection_context() as conn, conn.transaction():
+            returned_roll_code = await INSERT_CUT_FABRIC_TX.fetchval(
+                conn,
                 roll_code,
                 bill_code,
                 quantity,
@@ -90,8 +231,12 @@ async def add_cut_fabric_tx(
                 created_by,
                 status
             )
+            if returned_roll_code is not None:
+                await record_roll_change(conn, returned_roll_code)
+                await refresh_roll(conn, returned_roll_code)
 
-            return returned_roll_code is not None
+        await invalidate_dashboard()
+        return returned_roll_code is not None
     except Exception as e:
         await flatbed('exception', f"In add_cut_fabric_tx: {e}")
         raise e
@@ -106,22 +251,7 @@ async def get_drafts_list_ps():
     """
     try:
         async with connection_context() as conn:
-            query = """
-                SELECT 
-                    tx.id,
-                    tx.roll_code,
-                    tx.bill_code,
-                    u.username AS created_by,
-                    tx.quantity,
-                    tx.status,
-                    tx.comment,
-                    tx.created_at
-                FROM cut_fabric_tx tx
-                JOIN users u ON tx.created_by = u.user_id
-                WHERE tx.status = $1
-                ORDER BY tx.created_at
-            """
-            drafts_list = await conn.fetch(query, 'draft')
+            drafts_list = await CUT_FABRIC_DRAFTS.fetch(conn, 'draft')
             return drafts_list
 
     except Exception as e:
@@ -131,49 +261,31 @@ async def get_drafts_list_ps():
 
 async def get_cutting_history_list_ps(
     status: Optional[str] = None,   # None / 'all' → every status except 'draft'
-    date_idx: Optional[int] = None
-):
-    clauses: List[str] = []
-    params:  List[Any] = []
+    date_idx: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    A page of the cutting history and the cursor of the next page (None on the last one).
+    """
+    params: List[Any] = []
 
-    # status filter
-    if status and status.lower() not in {"all", ""}:
+    # status filter; without one every status except 'draft'
+    has_status = bool(status and status.lower() not in {"all", ""})
+    if has_status:
         params.append(status)
-        clauses.append(f"tx.status = ${len(params)}")
-    else:
-        clauses.append("tx.status <> 'draft'")
 
     # date filter
     dr = get_date_range(date_idx)
     if dr:
-        start, end = dr
-        params += [start, end]
-        # placeholders are the two most‑recent params we just appended
-        clauses.append(f"tx.created_at BETWEEN ${len(params)-1} AND ${len(params)}")
-
-    where_sql = "WHERE " + " AND ".join(clauses)
-
-    sql = f"""
-        SELECT tx.id,
-            tx.roll_code,
-            tx.bill_code,
-            u.username AS created_by,
-            tx.quantity,
-            tx.status,
-            tx.comment,
-            ru.username AS reviewed_by,
-            tx.reviewed_at,
-            tx.created_at
-        FROM   cut_fabric_tx tx
-        LEFT JOIN   users u ON tx.created_by = u.user_id
-        LEFT JOIN users ru ON tx.reviewed_by = ru.user_id
-        {where_sql}
-        ORDER BY tx.created_at DESC;
-    """
+        params += list(dr)
+
+    query = CUTTING_HISTORY[(has_status, dr is not None)]
+    keyset = Keyset(cursor, limit, [status if has_status else None, date_idx])
 
     try:
         async with connection_context() as conn:
-            return await conn.fetch(sql, *params)
+            return keyset.page(await query.fetch(conn, *params, *keyset.args))
     except Exception as exc:
         await flatbed("exception", f"get_cutting_history_list_ps: {exc}")
         raise
@@ -182,27 +294,9 @@ async def get_cutting_history_list_ps(
 async def get_cutting_history_list_for_roll_ps(
     code: str
 ):
-    sql = f"""
-        SELECT tx.id,
-            tx.roll_code,
-            tx.bill_code,
-            u.username AS created_by,
-            tx.quantity,
-            tx.status,
-            tx.comment,
-            ru.username AS reviewed_by,
-            tx.reviewed_at,
-            tx.created_at
-        FROM   cut_fabric_tx tx
-        LEFT JOIN   users u ON tx.created_by = u.user_id
-        LEFT JOIN users ru ON tx.reviewed_by = ru.user_id
-        where tx.roll_code = $1
-        ORDER BY tx.created_at DESC;
-    """
-
     try:
         async with connection_context() as conn:
-            return await conn.fetch(sql, code)
+            return await CUTTING_HISTORY_FOR_ROLL.fetch(conn, code)
     except Exception as exc:
         await flatbed("exception", f"get_cutting_history_list_for_roll_ps: {exc}")
         raise
@@ -214,18 +308,14 @@ async def update_cut_fabric_tx_status_ps(
         user_id: str
 ) -> bool:
     try:
-        async with connection_context() as conn:
-            sql_update = """
-                        UPDATE cut_fabric_tx
-                        SET status = $1,
-                        reviewed_by = $2::uuid,
-                        reviewed_at = now()
-                        WHERE id = $3
-                        RETURNING id
-                    """
-            return_id = await conn.fetchval(sql_update, status, user_id, _id)
-
-            return return_id is not None
+        async with connection_context() as conn, conn.transaction():
+            roll_code = await UPDATE_CUT_FABRIC_TX_STATUS.fetchval(conn, status, user_id, _id)
+            if roll_code is not None:
+                await record_roll_change(conn, roll_code)
+                await refresh_roll(conn, roll_code)
+
+        await invalidate_dashboard()
+        return roll_code is not None
 
     except Exception as e:
         await flatbed('exception', f"In update_cut_fabric_tx_status: {e}")
@@ -270,19 +360,7 @@ async def get_rolls_list_for_sync(old_sync: str):
         async with connection_context() as conn:
             last_sync_dt = parse_date(old_sync) if old_sync else None
 
-            query = """
-                SELECT 
-                    r.*,
-                    pi.cost_per_metre
-                FROM rolls r
-                LEFT JOIN purchase_items pi ON r.purchase_item_id = pi.id
-                WHERE (
-                    $1::timestamptz IS NULL
-                    OR (r.updated_at > $1)
-                )
-            """
-
-            rolls_list = await conn.fetch(query, last_sync_dt)
+            rolls_list = await ROLLS_FOR_SYNC.fetch(conn, last_sync_dt)
             return rolls_list
 
     except Exception as e:
@@ -302,19 +380,7 @@ async def search_rolls_for_product(product_code):
     """
     try:
         async with connection_context() as conn:
-            query = """
-            SELECT 
-                r.product_code, 
-                r.roll_code, 
-                r.quantity, 
-                r.color, 
-                r.image_url,
-                pi.cost_per_metre
-            FROM rolls r
-            LEFT JOIN purchase_items pi ON r.purchase_item_id = pi.id
-            WHERE r.product_code = $1 AND r.archived = false
-            """
-            rolls_list = await conn.fetch(query, product_code)
+            rolls_list = await ROLLS_FOR_PRODUCT.fetch(conn, product_code)
             return rolls_list  # Returns a list of asyncpg Record objects
 
     except Exception as e:
@@ -334,19 +400,7 @@ async def search_rolls_for_purchase_item(purchase_item_id):
     """
     try:
         async with connection_context() as conn:
-            query = """
-            SELECT 
-                r.product_code, 
-                r.roll_code, 
-                r.quantity, 
-                r.color, 
-                r.image_url,
-                pi.cost_per_metre
-            FROM rolls r
-            LEFT JOIN purchase_items pi ON r.purchase_item_id = pi.id
-            WHERE r.purchase_item_id = $1 AND r.archived = false
-            """
-            rolls_list = await conn.fetch(query, purchase_item_id)
+            rolls_list = await ROLLS_FOR_PURCHASE_ITEM.fetch(conn, purchase_item_id)
             return rolls_list  # Returns a list of asyncpg Record objects
 
     except Exception as e:
@@ -356,8 +410,12 @@ async def search_rolls_for_purchase_item(purchase_item_id):
 
 async def remove_roll_ps(code):
     try:
-        async with connection_context() as conn:
-            await conn.execute("DELETE FROM rolls WHERE roll_code = $1", code)
+        async with connection_context() as conn, conn.transaction():
+            product_code = await DELETE_ROLL.fetchval(conn, code)
+            if product_code is not None:
+                await record_roll_change(conn, code, product_code, deleted=True)
+            await refresh_roll(conn, code)
+        await invalidate_dashboard()
         return True
     except Exception as e:
         await flatbed('exception', f"in remove_roll_ps: {e}")
@@ -366,12 +424,11 @@ async def remove_roll_ps(code):
 
 async def archive_roll_ps(code):
     try:
-        async with connection_context() as conn:
-            await conn.execute("""
-            UPDATE rolls
-            SET archived = TRUE, updated_at = now()
-            WHERE roll_code = $1
-            """, code)
+        async with connection_context() as conn, conn.transaction():
+            await ARCHIVE_ROLL.execute(conn, code)
+            await record_roll_change(conn, code)
+            await refresh_roll(conn, code)
+        await invalidate_dashboard()
         return True
     except Exception as e:
         await flatbed('exception', f"in archive_roll_ps: {e}")
@@ -0,0 +1,451 @@
+import asyncio
+import heapq
+import json
+import math
+import os
+import time
+from collections import OrderedDict, defaultdict
+
+from helpers import make_product_dic, make_roll_dic, make_bill_dic, normalize_name, normalize_phone
+from utils import flatbed
+from utils.conn import after_commit, connection_context, current_db, request_scope
+from utils.events import RESYNC, subscribe_changes
+from .queries import register_query
+from .sync import stamped_here
+
+SEARCH_INDEX_TTL_SECONDS = int(os.getenv("SEARCH_INDEX_TTL", 300))  # rebuild in the background after this
+SEARCH_INDEX_REBUILD_GAP_SECONDS = 2  # under a stream of changes, rebuild at most this often
+SEARCH_INDEX_MAX_TENANTS = int(os.getenv("SEARCH_INDEX_MAX_TENANTS", 20))
+SEARCH_RESULT_LIMIT = 50
+BUILD_BATCH_SIZE = 500
+PREFIX_MAX_LEN = 12  # longer queries narrow prefix hits with startswith
+# Share of the query's trigrams a match must contain; codes and phones only match as substrings
+TRIGRAM_THRESHOLDS = {"code": 1.0, "name": 0.6, "phone": 1.0}
+
+# Searchable fields per search_by index, as used by search_products_list / search_bills_list
+PRODUCT_FIELDS = {0: "code", 1: "name"}
+BILL_FIELDS = {0: "code", 1: "name", 2: "phone"}
+
+# syncs keys of the data the index holds. This worker refreshes the index in place as it
+# writes inventory and bills; a change to them from another worker, or to the user names
+# shown on bills, makes the index stale.
+REFRESHED_IN_PLACE = {"inventory", "bills"}
+INDEXED_SYNC_KEYS = REFRESHED_IN_PLACE | {"users"}
+
+PRODUCT_DOCS = register_query("product_search_docs", """
+    SELECT
+        p.*,
+        COALESCE(s.quantity, 0) AS quantity
+    FROM products p
+    LEFT JOIN product_stock s ON s.product_code = p.product_code
+    WHERE $1::text IS NULL OR p.product_code = $1
+""", params=("text",))
+
+ROLL_DOCS = register_query("roll_search_docs", """
+    SELECT
+        r.product_code,
+        r.roll_code,
+        r.quantity,
+        r.color,
+        r.image_url,
+        pi.cost_per_metre
+    FROM rolls r
+    LEFT JOIN purchase_items pi ON r.purchase_item_id = pi.id
+    WHERE r.archived = false AND ($1::text IS NULL OR r.roll_code = $1)
+""", params=("text",), columns=("product_code", "roll_code", "quantity", "color", "image_url", "cost_per_metre"))
+
+# Bills as make_bill_dic expects them; also used by the keyed lookups in db/bill.py
+BILL_DOC_SELECT = """
+    SELECT
+        b.bill_code, b.bill_date, b.due_date, b.customer_name, b.customer_number,
+        b.price, b.paid, b.remaining, b.fabrics, b.parts, b.status,
+        b.salesman, COALESCE(su.full_name, b.salesman) AS salesman_name,
+        b.tailor, COALESCE(tu.full_name, b.tailor) AS tailor_name,
+        b.additional_data, b.installation
+    FROM bills b
+    LEFT JOIN users su ON is_uuid(b.salesman) AND su.user_id = b.salesman::uuid
+    LEFT JOIN users tu ON is_uuid(b.tailor) AND tu.user_id = b.tailor::uuid
+"""
+BILL_DOC_COLUMNS = ("bill_code", "bill_date", "due_date", "customer_name", "customer_number", "price", "paid",
+                    "remaining", "fabrics", "parts", "status", "salesman", "salesman_name", "tailor", "tailor_name",
+                    "additional_data", "installation")
+
+BILL_DOCS = register_query("bill_search_docs", BILL_DOC_SELECT + """
+    WHERE $1::text IS NULL OR b.bill_code = $1
+""", params=("text",), columns=BILL_DOC_COLUMNS)
+
+# Per tenant index, least recently used first
+search_indexes = OrderedDict()
+
+# In-flight index builds, so concurrent searches on a cold tenant share one build
+_index_builds = {}
+
+# Per tenant, how many changes the index doesn't hold have been notified so far
+_changes_seen = defaultdict(int)
+
+# Per indexed tenant, the task counting those changes
+_watchers = {}
+
+
+def _trigrams(text, padded=True):
+    # Indexed text is padded so fuzzy matches favour the start; queries aren't, so substrings still match
+    if padded:
+        text = f"  {text} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _score(query, query_grams, text, threshold):
+    """How well `text` matches `query`: exact > prefix > word prefix > substring > fuzzy."""
+    if not text:
+        return 0.0
+    if text == query:
+        return 4.0
+    if text.startswith(query):
+        return 3.0
+    if any(word.startswith(query) for word in text.split()):
+        return 2.5
+    if query in text:
+        return 2.0
+    shared = len(query_grams & _trigrams(text))
+    similarity = shared / len(query_grams) if query_grams else 0.0
+    return similarity if similarity >= threshold else 0.0
+
+
+class SearchIndex:
+    """
+    Prefix and trigram index over one tenant's products, rolls and bills, holding
+    the formatted search results so lookups need no database round trip.
+    """
+
+    def __init__(self):
+        self.products = {}  # product_code -> make_product_dic result
+        self.rolls = {}  # roll_code -> make_roll_dic result
+        self.bills = {}  # bill_code -> make_bill_dic result
+        self.fields = {}  # (kind, code) -> {field: normalized text}
+        self.prefixes = defaultdict(set)  # (kind, field, prefix) -> doc keys
+        self.grams = defaultdict(set)  # (kind, field, trigram) -> doc keys
+        self.built_at = time.monotonic()
+        self.changes_seen = 0  # _changes_seen when the build started
+
+    def _add_doc(self, key, fields):
+        self._remove_doc(key)
+        self.fields[key] = fields
+        for field, text in fields.items():
+            for term in {text, *text.split()}:
+                for i in range(1, min(len(term), PREFIX_MAX_LEN) + 1):
+                    self.prefixes[key[0], field, term[:i]].add(key)
+            for gram in _trigrams(text):
+                self.grams[key[0], field, gram].add(key)
+
+    def _remove_doc(self, key):
+        fields = self.fields.pop(key, None)
+        if fields is None:
+            return
+        for field, text in fields.items():
+            for term in {text, *text.split()}:
+                for i in range(1, min(len(term), PREFIX_MAX_LEN) + 1):
+                    self._discard(self.prefixes, (key[0], field, term[:i]), key)
+            for gram in _trigrams(text):
+                self._discard(self.grams, (key[0], field, gram), key)
+
+    @staticmethod
+    def _discard(postings, term, key):
+        keys = postings.get(term)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del postings[term]
+
+    def put_product(self, row):
+        product = make_product_dic(row)
+        self.products[product["productCode"]] = product
+        if row["archived"]:
+            # Still found by code, like search_products_list(code, 0, 1, true), but not searched
+            self._remove_doc(("product", product["productCode"]))
+            return
+        self._add_doc(("product", product["productCode"]), {
+            "code": normalize_name(product["productCode"]),
+            "name": normalize_name(product["name"]),
+        })
+
+    def drop_product(self, product_code):
+        self.products.pop(product_code, None)
+        self._remove_doc(("product", product_code))
+
+    def put_roll(self, row):
+        roll = make_roll_dic(row)
+        self.rolls[roll["rollCode"]] = roll
+
+    def drop_roll(self, roll_code):
+        self.rolls.pop(roll_code, None)
+
+    def put_bill(self, row):
+        bill = make_bill_dic(row)
+        self.bills[bill["billCode"]] = bill
+        self._add_doc(("bill", bill["billCode"]), {
+            "code": normalize_name(bill["billCode"]),
+            "name": normalize_name(bill["customerName"]),
+            "phone": normalize_phone(bill["customerNumber"]),
+        })
+
+    def drop_bill(self, bill_code):
+        self.bills.pop(bill_code, None)
+        self._remove_doc(("bill", bill_code))
+
+    def search(self, query, product_field=None, bill_field=None, limit=SEARCH_RESULT_LIMIT):
+        """
+        Ranked, merged products and bills matching `query` on the given fields
+        (None skips that kind). Returns copies that callers may modify.
+        """
+        fields = {"product": product_field, "bill": bill_field}
+        query = normalize_phone(query) if bill_field == "phone" else normalize_name(query)
+        if not query:
+            return []
+
+        ranked = []
+        for kind, field in fields.items():
+            if field is not None:
+                ranked += self._ranked(kind, field, query, limit)
+
+        results = []
+        for _, _, (kind, code) in heapq.nsmallest(limit, ranked):
+            doc = self.products[code] if kind == "product" else self.bills[code]
+            results.append(self._copy(doc))
+        return results
+
+    def _ranked(self, kind, field, query, limit):
+        """(-score, length, key) for docs of `kind` whose `field` matches the query."""
+        ranked = []
+        hits = self.prefixes.get((kind, field, query[:PREFIX_MAX_LEN]), ())
+        if len(query) <= PREFIX_MAX_LEN:
+            # Every hit starts with the query, as a whole or in one of its words
+            for key in hits:
+                text = self.fields[key][field]
+                ranked.append((-4.0 if text == query else -3.0 if text.startswith(query) else -2.5, len(text), key))
+            if len(ranked) >= limit:
+                return ranked  # fuzzy matches can't outrank these
+            hits = ()
+
+        query_grams = _trigrams(query, padded=False)
+        threshold = TRIGRAM_THRESHOLDS[field]
+        candidates = set(hits)
+        if query_grams:
+            # A doc holding `needed` of the grams must hold one of the rarest (len - needed + 1),
+            # so only those postings are scanned and the rest are membership checks
+            postings = sorted((self.grams.get((kind, field, gram), ()) for gram in query_grams), key=len)
+            needed = math.ceil(threshold * len(postings))
+            for key in set().union(*postings[:len(postings) - needed + 1]):
+                if sum(key in keys for keys in postings) >= needed:
+                    candidates.add(key)
+
+        seen = {key for _, _, key in ranked}
+        for key in candidates - seen:
+            text = self.fields[key][field]
+            score = _score(query, query_grams, text, threshold)
+            if score:
+                ranked.append((-score, len(text), key))
+        return ranked
+
+    def product_and_roll(self, product_code, roll_code=None):
+        """The product with its roll (if given and found) appended to rollsList, like get_product_and_roll_ps."""
+        product = self.products.get(product_code)
+        if product is None:
+            return None
+        product = self._copy(product)
+        roll = self.rolls.get(roll_code) if roll_code else None
+        if roll is not None and roll["productCode"] == product_code:
+            product["rollsList"].append(dict(roll))
+        return product
+
+    def roll_and_product(self, roll_code):
+        """The roll's product with the roll appended to rollsList, like get_roll_and_product_ps."""
+        roll = self.rolls.get(roll_code)
+        if roll is None:
+            return None
+        return self.product_and_roll(roll["productCode"], roll_code)
+
+    @staticmethod
+    def _copy(doc):
+        doc = dict(doc)
+        if "rollsList" in doc:
+            doc["rollsList"] = []
+        return doc
+
+
+async def _watch_changes(db_name, listening):
+    async with subscribe_changes(db_name) as queue:
+        listening.set()
+        while True:
+            item = await queue.get()
+            if item is not RESYNC:
+                change = json.loads(item)
+                if change["key"] not in INDEXED_SYNC_KEYS:
+                    continue
+                if change["key"] in REFRESHED_IN_PLACE and stamped_here(db_name, change["key"], change["version"]):
+                    continue
+            _changes_seen[db_name] += 1
+
+
+async def _start_watching(db_name):
+    """
+    Count the tenant's changes the index doesn't pick up by itself, from the change
+    notifications (utils/events.py). Returns once listening, so nothing committed
+    after an index build starts goes unnoticed. Costs the tenant's LISTEN connection.
+    """
+    task = _watchers.get(db_name)
+    if task is not None and not task.done():
+        return
+    listening = asyncio.Event()
+    task = _watchers[db_name] = asyncio.get_running_loop().create_task(_watch_changes(db_name, listening))
+    waiter = asyncio.ensure_future(listening.wait())
+    await asyncio.wait((task, waiter), return_when=asyncio.FIRST_COMPLETED)
+    waiter.cancel()
+
+
+def _stop_watching(db_name):
+    task = _watchers.pop(db_name, None)
+    if task is not None:
+        task.cancel()
+
+
+async def _build_index(db_name):
+    # Runs as its own task; never borrow the request's scoped connection, the request may end first
+    request_scope.set(None)
+    current_db.set(db_name)
+    await _start_watching(db_name)
+    index = SearchIndex()
+    index.changes_seen = _changes_seen[db_name]
+    async with connection_context() as conn:
+        products = await PRODUCT_DOCS.fetch(conn, None)
+        rolls = await ROLL_DOCS.fetch(conn, None)
+        bills = await BILL_DOCS.fetch(conn, None)
+
+    for rows, put in ((products, index.put_product), (rolls, index.put_roll), (bills, index.put_bill)):
+        for i, row in enumerate(rows):
+            put(row)
+            if i % BUILD_BATCH_SIZE == BUILD_BATCH_SIZE - 1:
+                await asyncio.sleep(0)  # let requests run between batches of a large tenant
+
+    search_indexes[db_name] = index
+    search_indexes.move_to_end(db_name)
+    while len(search_indexes) > SEARCH_INDEX_MAX_TENANTS:
+        evicted, _ = search_indexes.popitem(last=False)
+        _stop_watching(evicted)
+    return index
+
+
+def _forget_build(db_name, task):
+    if _index_builds.get(db_name) is task:
+        del _index_builds[db_name]
+
+
+def _start_build(db_name):
+    task = _index_builds.get(db_name)
+    if task is None:
+        task = _index_builds[db_name] = asyncio.get_running_loop().create_task(_build_index(db_name))
+        task.add_done_callback(lambda t: _forget_build(db_name, t))
+    return task
+
+
+async def build_search_index(db_name):
+    """Build (or rebuild) a tenant's search index now, e.g. at warm-up."""
+    return await asyncio.shield(_start_build(db_name))
+
+
+async def get_search_index(wait=True):
+    """
+    The current tenant's search index, built on first use. Once another worker
+    has changed the tenant's inventory or bills, or the index is older than
+    SEARCH_INDEX_TTL_SECONDS, it is still served while a fresh one is built in
+    the background.
+
+    With wait=False a tenant without an index gets None while the first build
+    runs in the background, for callers with an indexed database fallback.
+    """
+    db_name = current_db.get()
+    index = search_indexes.get(db_name)
+    if index is None:
+        if not wait:
+            _start_build(db_name)
+            return None
+        return await build_search_index(db_name)
+
+    search_indexes.move_to_end(db_name)
+    age = time.monotonic() - index.built_at
+    if age > SEARCH_INDEX_TTL_SECONDS or \
+            (index.changes_seen != _changes_seen[db_name] and age > SEARCH_INDEX_REBUILD_GAP_SECONDS):
+        _start_build(db_name)
+    return index
+
+
+async def _refresh(conn, query, code, put, drop):
+    index = search_indexes.get(current_db.get())
+    if index is None:
+        return
+    try:
+        if conn is None:
+            async with connection_context() as conn:
+                row = await query.fetchrow(conn, code)
+        else:
+            row = await query.fetchrow(conn, code)
+        if row:
+            put(index, row)
+        else:
+            drop(index, code)
+    except Exception as e:
+        index.built_at = 0  # rebuild on the next search
+        await flatbed('exception', f"In search index refresh for {code}: {e}")
+
+
+# The refreshes below re-read the row on the caller's connection, inside its transaction,
+# or, inside a unit_of_work, on a connection of their own once the unit of work commits
+
+async def refresh_product(conn, product_code):
+    """Re-read one product into the current tenant's index after a write (no-op if not indexed)."""
+    args = (PRODUCT_DOCS, product_code, SearchIndex.put_product, SearchIndex.drop_product)
+    if not after_commit(_refresh, None, *args):
+        await _refresh(conn, *args)
+
+
+async def _refresh_roll(conn, roll_code):
+    index = search_indexes.get(current_db.get())
+    if index is None:
+        return
+    roll = index.rolls.get(roll_code)
+    await _refresh(conn, ROLL_DOCS, roll_code, SearchIndex.put_roll, SearchIndex.drop_roll)
+    roll = index.rolls.get(roll_code) or roll  # archived or deleted rolls still count towards their product
+    if roll is not None:
+        await _refresh(conn, PRODUCT_DOCS, roll["productCode"], SearchIndex.put_product, SearchIndex.drop_product)
+
+
+async def refresh_roll(conn, roll_code):
+    """Re-read one roll, and its product's stock total, into the current tenant's index."""
+    if not after_commit(_refresh_roll, None, roll_code):
+        await _refresh_roll(conn, roll_code)
+
+
+async def refresh_bill(conn, bill_code):
+    """Re-read one bill into the current tenant's index after a write (no-op if not indexed)."""
+    args = (BILL_DOCS, bill_code, SearchIndex.put_bill, SearchIndex.drop_bill)
+    if not after_commit(_refresh, None, *args):
+        await _refresh(conn, *args)
+
+
+def forget_product(product_code):
+    index = search_indexes.get(current_db.get())
+    if index is not None:
+        for roll_code in [code for code, roll in index.rolls.items() if roll["productCode"] == product_code]:
+            index.drop_roll(roll_code)
+        index.drop_product(product_code)
+
+
+def forget_roll(roll_code):
+    index = search_indexes.get(current_db.get())
+    if index is not None:
+        index.drop_roll(roll_code)
+
+
+def forget_bill(bill_code):
+    index = search_indexes.get(current_db.get())
+    if index is not None:
+        index.drop_bill(bill_code)
@@ -0,0 +1,170 @@
+from utils import flatbed
+from utils.conn import connection_context
+from .queries import register_query
+
+# Value at purchase cost of a roll r whose purchase item is pi, rounded per roll so the
+# triggers below can add and take back each roll's share exactly
+ROLL_VALUE = "ROUND(r.quantity::numeric * pi.cost_per_metre / 100)"
+
+# Per product, from its rolls: total quantity (cm, archived rolls included, as the product
+# listings always reported it), count of rolls not archived, and their value at purchase cost
+STOCK_AGGREGATE = f"""
+    SELECT
+        p.product_code,
+        COALESCE(SUM(r.quantity), 0) AS quantity,
+        COUNT(r.roll_code) FILTER (WHERE NOT r.archived) AS active_rolls,
+        COALESCE(SUM({ROLL_VALUE}) FILTER (WHERE NOT r.archived), 0)::bigint AS stock_value
+    FROM products p
+    LEFT JOIN rolls r ON r.product_code = p.product_code
+    LEFT JOIN purchase_items pi ON r.purchase_item_id = pi.id
+"""
+
+# Triggers keep product_stock in step with every write to rolls, inside the write's own
+# transaction and including those made by stored procedures: each adds the new row's share
+# and takes back the old row's, so a write only locks the stock rows of its own products.
+# A purchase item's new cost revalues the rolls cut from it. Rows of deleted products are
+# dropped with them. Created, with the initial figures, by a tenant migration
+# (db/migrations.py) while writes to the counted tables wait, so none is counted twice or missed.
+CREATE_PRODUCT_STOCK = register_query("create_product_stock", f"""
+    CREATE TABLE IF NOT EXISTS product_stock (
+        product_code text PRIMARY KEY,
+        quantity bigint NOT NULL DEFAULT 0,
+        active_rolls int NOT NULL DEFAULT 0,
+        stock_value bigint NOT NULL DEFAULT 0,
+        updated_at timestamptz NOT NULL DEFAULT now()
+    );
+
+    CREATE OR REPLACE FUNCTION product_stock_count_rolls() RETURNS trigger LANGUAGE plpgsql AS $fn$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND (OLD.product_code, OLD.quantity, OLD.archived, OLD.purchase_item_id)
+                IS NOT DISTINCT FROM (NEW.product_code, NEW.quantity, NEW.archived, NEW.purchase_item_id) THEN
+            RETURN NULL;
+        END IF;
+        INSERT INTO product_stock AS s (product_code, quantity, active_rolls, stock_value)
+        SELECT
+            r.product_code,
+            COALESCE(SUM(r.sign * r.quantity), 0),
+            COALESCE(SUM(r.sign) FILTER (WHERE NOT r.archived), 0),
+            COALESCE(SUM(r.sign * {ROLL_VALUE}) FILTER (WHERE NOT r.archived), 0)
+        FROM (
+            SELECT 1, NEW.product_code, NEW.quantity, NEW.archived, NEW.purchase_item_id WHERE TG_OP <> 'DELETE'
+            UNION ALL
+            SELECT -1, OLD.product_code, OLD.quantity, OLD.archived, OLD.purchase_item_id WHERE TG_OP <> 'INSERT'
+        ) AS r(sign, product_code, quantity, archived, purchase_item_id)
+        LEFT JOIN purchase_items pi ON pi.id = r.purchase_item_id
+        WHERE EXISTS (SELECT 1 FROM products p WHERE p.product_code = r.product_code)
+        GROUP BY r.product_code
+        ON CONFLICT (product_code) DO UPDATE
+        SET quantity = s.quantity + EXCLUDED.quantity,
+            active_rolls = s.active_rolls + EXCLUDED.active_rolls,
+            stock_value = s.stock_value + EXCLUDED.stock_value,
+            updated_at = now();
+        RETURN NULL;
+    END
+    $fn$;
+
+    CREATE OR REPLACE FUNCTION product_stock_revalue() RETURNS trigger LANGUAGE plpgsql AS $fn$
+    BEGIN
+        UPDATE product_stock s
+        SET stock_value = s.stock_value + v.delta,
+            updated_at = now()
+        FROM (
+            SELECT
+                r.product_code,
+                SUM(COALESCE(ROUND(r.quantity::numeric * NEW.cost_per_metre / 100), 0)
+                    - COALESCE(ROUND(r.quantity::numeric * OLD.cost_per_metre / 100), 0)) AS delta
+            FROM rolls r
+            WHERE r.purchase_item_id = NEW.id AND NOT r.archived
+            GROUP BY r.product_code
+        ) v
+        WHERE s.product_code = v.product_code AND v.delta <> 0;
+        RETURN NULL;
+    END
+    $fn$;
+
+    CREATE OR REPLACE FUNCTION product_stock_forget() RETURNS trigger LANGUAGE plpgsql AS $fn$
+    BEGIN
+        DELETE FROM product_stock WHERE product_code = OLD.product_code;
+        RETURN NULL;
+    END
+    $fn$;
+
+    LOCK TABLE products, rolls, purchase_items IN SHARE ROW EXCLUSIVE MODE;
+
+    DROP TRIGGER IF EXISTS product_stock_count_rolls ON rolls;
+    CREATE TRIGGER product_stock_count_rolls
+        AFTER INSERT OR DELETE OR UPDATE OF product_code, quantity, archived, purchase_item_id ON rolls
+        FOR EACH ROW EXECUTE FUNCTION product_stock_count_rolls();
+    DROP TRIGGER IF EXISTS product_stock_revalue ON purchase_items;
+    CREATE TRIGGER product_stock_revalue
+        AFTER UPDATE OF cost_per_metre ON purchase_items
+        FOR EACH ROW WHEN (OLD.cost_per_metre IS DISTINCT FROM NEW.cost_per_metre)
+        EXECUTE FUNCTION product_stock_revalue();
+    DROP TRIGGER IF EXISTS product_stock_forget ON products;
+    CREATE TRIGGER product_stock_forget
+        AFTER DELETE ON products
+        FOR EACH ROW EXECUTE FUNCTION product_stock_forget();
+
+    DELETE FROM product_stock;
+    INSERT INTO product_stock (product_code, quantity, active_rolls, stock_value)
+    {STOCK_AGGREGATE}
+    GROUP BY p.product_code;
+""", params=())
+
+# Writers wait while the reconciliation recounts, so what it repairs is real drift
+LOCK_STOCK_TABLES = register_query("lock_stock_tables", """
+    LOCK TABLE products, rolls, purchase_items IN SHARE ROW EXCLUSIVE MODE
+""", params=())
+
+# Rewrites only the rows that differ from a full recount and drops those of deleted products,
+# returning old and new values (NULL new values for dropped rows). A product without a row
+# has no rolls yet as far as the triggers know, so it only drifted if it has some.
+RECONCILE_PRODUCT_STOCK = register_query("reconcile_product_stock", f"""
+    WITH actual AS (
+        {STOCK_AGGREGATE}
+        GROUP BY p.product_code
+    ), drifted AS (
+        SELECT a.*, s.quantity AS old_quantity, s.active_rolls AS old_active_rolls, s.stock_value AS old_stock_value
+        FROM actual a
+        LEFT JOIN product_stock s ON s.product_code = a.product_code
+        WHERE (COALESCE(s.quantity, 0), COALESCE(s.active_rolls, 0), COALESCE(s.stock_value, 0))
+              IS DISTINCT FROM (a.quantity, a.active_rolls, a.stock_value)
+    ), repaired AS (
+        INSERT INTO product_stock (product_code, quantity, active_rolls, stock_value)
+        SELECT product_code, quantity, active_rolls, stock_value FROM drifted
+        ON CONFLICT (product_code) DO UPDATE
+        SET quantity = EXCLUDED.quantity,
+            active_rolls = EXCLUDED.active_rolls,
+            stock_value = EXCLUDED.stock_value,
+            updated_at = now()
+    ), orphans AS (
+        DELETE FROM product_stock s
+        WHERE NOT EXISTS (SELECT 1 FROM products p WHERE p.product_code = s.product_code)
+        RETURNING s.product_code, s.quantity, s.active_rolls, s.stock_value
+    )
+    SELECT product_code, old_quantity, quantity, old_active_rolls, active_rolls, old_stock_value, stock_value
+    FROM drifted
+    UNION ALL
+    SELECT product_code, quantity, NULL, active_rolls, NULL, stock_value, NULL
+    FROM orphans
+    ORDER BY product_code
+""", params=(), columns=("product_code", "old_quantity", "quantity", "old_active_rolls", "active_rolls",
+                         "old_stock_value", "stock_value"))
+
+
+async def reconcile_product_stock():
+    """
+    Compare product_stock with a full recount and repair the products that drifted,
+    e.g. after a restore, a trigger that was disabled, or a purchase item's cost
+    edited while rolls of it were being added. Writes to rolls wait for it to finish.
+
+    Returns:
+    - List of records of the repaired products, with their old and recounted values.
+    """
+    try:
+        async with connection_context() as conn, conn.transaction():
+            await LOCK_STOCK_TABLES.execute(conn)
+            return await RECONCILE_PRODUCT_STOCK.fetch(conn)
+    except Exception as e:
+        await flatbed('exception', f"In reconcile_product_stock: {e}")
+        raise
@@ -3,6 +3,80 @@ from typing import Optional
 from helpers import make_supplier_dic, make_supplier_details_dic
 from utils import flatbed
 from utils.conn import connection_context
+from .queries import register_query
+from .sync import insert_update_sync
+
+INSERT_SUPPLIER = register_query("insert_supplier", """
+    INSERT INTO suppliers (name, phone, address, notes) 
+    VALUES ($1, $2, $3, $4)
+    RETURNING id
+""", params=("text", "text", "text", "text"), columns=("id",))
+
+UPDATE_SUPPLIER = register_query("update_supplier", """
+    UPDATE suppliers
+    SET name = $1, phone = $2, address = $3, notes = $4
+    WHERE id = $5
+    RETURNING id
+""", params=("text", "text", "text", "text", "int"), columns=("id",))
+
+SUPPLIER_BY_ID = register_query("supplier_by_id", """
+    SELECT * FROM suppliers
+    WHERE id = $1
+""", params=("int",))
+
+ALL_SUPPLIERS = register_query("all_suppliers", "SELECT * FROM suppliers;")
+
+SUPPLIER_DETAILS = register_query("supplier_details", """
+    WITH purchase_totals AS (
+        SELECT
+            SUM(CASE WHEN currency = 'AFN' THEN total_amount ELSE 0 END) AS purchases_total_afn,
+            SUM(CASE WHEN currency = 'USD' THEN total_amount ELSE 0 END) AS purchases_total_usd,
+            SUM(CASE WHEN currency = 'CNY' THEN total_amount ELSE 0 END) AS purchases_total_cny
+        FROM purchases
+        WHERE archived = FALSE AND supplier_id = $1
+    ),
+    payment_totals AS (
+        SELECT
+            SUM(CASE WHEN currency = 'AFN' THEN amount ELSE 0 END) AS total_paid_afn,
+            SUM(CASE WHEN currency = 'USD' THEN amount ELSE 0 END) AS total_paid_usd,
+            SUM(CASE WHEN currency = 'CNY' THEN amount ELSE 0 END) AS total_paid_cny
+        FROM supplier_payments
+        WHERE supplier_id = $1
+    ),
+    misc_totals AS (
+        SELECT
+            -- Payables (what you owe the supplier)
+            SUM(CASE WHEN direction = 'in'  AND currency = 'AFN' THEN amount ELSE 0 END) AS misc_payable_afn,
+            SUM(CASE WHEN direction = 'in'  AND currency = 'USD' THEN amount ELSE 0 END) AS misc_payable_usd,
+            SUM(CASE WHEN direction = 'in'  AND currency = 'CNY' THEN amount ELSE 0 END) AS misc_payable_cny,
+
+            -- Receivables (what supplier owes you)
+            SUM(CASE WHEN direction = 'out' AND currency = 'AFN' THEN amount ELSE 0 END) AS misc_receivable_afn,
+            SUM(CASE WHEN direction = 'out' AND currency = 'USD' THEN amount ELSE 0 END) AS misc_receivable_usd,
+            SUM(CASE WHEN direction = 'out' AND currency = 'CNY' THEN amount ELSE 0 END) AS misc_receivable_cny
+        FROM misc_transactions
+        WHERE supplier_id = $1
+    )
+    SELECT
+        COALESCE(pt.purchases_total_afn, 0) AS purchases_total_afn,
+        COALESCE(pt.purchases_total_usd, 0) AS purchases_total_usd,
+        COALESCE(pt.purchases_total_cny, 0) AS purchases_total_cny,
+        COALESCE(pay.total_paid_afn, 0) AS total_paid_afn,
+        COALESCE(pay.total_paid_usd, 0) AS total_paid_usd,
+        COALESCE(pay.total_paid_cny, 0) AS total_paid_cny,
+
+        -- Misc transactions split
+        COALESCE(mt.misc_payable_afn, 0)    AS payable_total_afn,
+        COALESCE(mt.misc_payable_usd, 0)    AS payable_total_usd,
+        COALESCE(mt.misc_payable_cny, 0)    AS payable_total_cny,
+        COALESCE(mt.misc_receivable_afn, 0) AS receivable_total_afn,
+        COALESCE(mt.misc_receivable_usd, 0) AS receivable_total_usd,
+        COALESCE(mt.misc_receivable_cny, 0) AS receivable_total_cny
+
+    FROM purchase_totals pt, payment_totals pay, misc_totals mt
+""", params=("int",))
+
+DELETE_SUPPLIER = register_query("delete_supplier", "DELETE FROM suppliers WHERE id = $1", params=("int",))
 
 
 async def insert_new_supplier(
@@ -27,13 +101,9 @@ async def insert_new_supplier(
     try:
         async with connection_context() as conn:
 
-            sql_insert = """
-                INSERT INTO suppliers (name, phone, address, notes) 
-                VALUES ($1, $2, $3, $4)
-                RETURNING id
-            """
-
-            supplier_id = await conn.fetchval(sql_insert, name, phone, address, notes)
+            supplier_id = await INSERT_SUPPLIER.fetchval(conn, name, phone, address, notes)
+            if supplier_id:
+                await insert_update_sync("suppliers")
             return supplier_id
 
     except Exception as e:
@@ -64,14 +134,9 @@ async def update_supplier(
     try:
         async with connection_context() as conn:
 
-            sql_update = f"""
-                UPDATE suppliers
-                SET name = $1, phone = $2, address = $3, notes = $4
-                WHERE id = $5
-                RETURNING id
-            """
-
-            supplier_id = await conn.fetchval(sql_update, name, phone, address, notes, idToEdit)
+            supplier_id = await UPDATE_SUPPLIER.fetchval(conn, name, phone, address, notes, idToEdit)
+            if supplier_id:
+                await insert_update_sync("suppliers")
             return supplier_id
 
     except Exception as e:
@@ -82,10 +147,7 @@ async def update_supplier(
 async def get_supplier_ps(supplier_id: int):
     try:
         async with connection_context() as conn:
-            data = await conn.fetchrow("""
-                               SELECT * FROM suppliers
-                               WHERE id = $1
-                           """, supplier_id)
+            data = await SUPPLIER_BY_ID.fetchrow(conn, supplier_id)
             if data:
                 supplier = make_supplier_dic(data)
                 return supplier
@@ -105,8 +167,7 @@ async def get_suppliers_list_ps():
     """
     try:
         async with connection_context() as conn:
-            query = "SELECT * FROM suppliers;"
-            suppliers_list = await conn.fetch(query)
+            suppliers_list = await ALL_SUPPLIERS.fetch(conn)
             return suppliers_list  # Returns a list of asyncpg Record objects
 
     except Exception as e:
@@ -121,55 +182,7 @@ async def get_supplier_details_ps(supplier_id: int):
      """
     try:
         async with connection_context() as conn:
-            data = await conn.fetchrow("""
-                WITH purchase_totals AS (
-                    SELECT
-                        SUM(CASE WHEN currency = 'AFN' THEN total_amount ELSE 0 END) AS purchases_total_afn,
-                        SUM(CASE WHEN currency = 'USD' THEN total_amount ELSE 0 END) AS purchases_total_usd,
-                        SUM(CASE WHEN currency = 'CNY' THEN total_amount ELSE 0 END) AS purchases_total_cny
-                    FROM purchases
-                    WHERE archived = FALSE AND supplier_id = $1
-                ),
-                payment_totals AS (
-                    SELECT
-                        SUM(CASE WHEN currency = 'AFN' THEN amount ELSE 0 END) AS total_paid_afn,
-                        SUM(CASE WHEN currency = 'USD' THEN amount ELSE 0 END) AS total_paid_usd,
-                        SUM(CASE WHEN currency = 'CNY' THEN amount ELSE 0 END) AS total_paid_cny
-                    FROM supplier_payments
-                    WHERE supplier_id = $1
-                ),
-                misc_totals AS (
-                    SELECT
-                        -- Payables (what you owe the supplier)
-                        SUM(CASE WHEN direction = 'in'  AND currency = 'AFN' THEN amount ELSE 0 END) AS misc_payable_afn,
-                        SUM(CASE WHEN direction = 'in'  AND currency = 'USD' THEN amount ELSE 0 END) AS misc_payable_usd,
-                        SUM(CASE WHEN direction = 'in'  AND currency = 'CNY' THEN amount ELSE 0 END) AS misc_payable_cny,
-                
-                        -- Receivables (what supplier owes you)
-                        SUM(CASE WHEN direction = 'out' AND currency = 'AFN' THEN amount ELSE 0 END) AS misc_receivable_afn,
-                        SUM(CASE WHEN direction = 'out' AND currency = 'USD' THEN amount ELSE 0 END) AS misc_receivable_usd,
-                        SUM(CASE WHEN direction = 'out' AND currency = 'CNY' THEN amount ELSE 0 END) AS misc_receivable_cny
-                    FROM misc_transactions
-                    WHERE supplier_id = $1
-                )
-                SELECT
-                    COALESCE(pt.purchases_total_afn, 0) AS purchases_total_afn,
-                    COALESCE(pt.purchases_total_usd, 0) AS purchases_total_usd,
-                    COALESCE(pt.purchases_total_cny, 0) AS purchases_total_cny,
-                    COALESCE(pay.total_paid_afn, 0) AS total_paid_afn,
-                    COALESCE(pay.total_paid_usd, 0) AS total_paid_usd,
-                    COALESCE(pay.total_paid_cny, 0) AS total_paid_cny,
-                    
-                    -- Misc transactions split
-                    COALESCE(mt.misc_payable_afn, 0)    AS payable_total_afn,
-                    COALESCE(mt.misc_payable_usd, 0)    AS payable_total_usd,
-                    COALESCE(mt.misc_payable_cny, 0)    AS payable_total_cny,
-                    COALESCE(mt.misc_receivable_afn, 0) AS receivable_total_afn,
-                    COALESCE(mt.misc_receivable_usd, 0) AS receivable_total_usd,
-                    COALESCE(mt.misc_receivable_cny, 0) AS receivable_total_cny
-                    
-                FROM purchase_totals pt, payment_totals pay, misc_totals mt
-            """, supplier_id)
+            data = await SUPPLIER_DETAILS.fetchrow(conn, supplier_id)
 
             if data:
                 supplier_details = make_supplier_details_dic(data)
@@ -184,7 +197,8 @@ async def get_supplier_details_ps(supplier_id: int):
 async def remove_supplier_ps(supplier_id: int):
     try:
         async with connection_context() as conn:
-            await conn.execute("DELETE FROM suppliers WHERE id = $1", supplier_id)
+            await DELETE_SUPPLIER.execute(conn, supplier_id)
+        await insert_update_sync("suppliers")
         return True
     except Exception as e:
         await flatbed('exception', f"in remove_supplier_ps: {e}")
@@ -1,30 +1,164 @@
+import asyncio
+import json
+import time
+from collections import deque
+
 from helpers import get_formatted_id_name_list, get_formatted_users_small_list
+from redisdb.lists import get_sync_versions_redis, set_sync_version_redis, fill_sync_versions_redis, \
+    get_cached_list_redis, set_cached_list_redis
 from utils import flatbed
-from utils.conn import connection_context
+from utils.conn import connection_context, current_db
+from utils.events import CHANGES_CHANNEL
+from .queries import register_query
+
+UPSERT_SYNC = register_query("upsert_sync", """
+    INSERT INTO syncs (key, value) VALUES (
+    $1, current_timestamp)
+    ON CONFLICT (key) DO UPDATE SET value = current_timestamp
+    RETURNING value;
+""", params=("text",), columns=("value",))
+
+GET_SYNC = register_query("get_sync", "SELECT value FROM syncs WHERE key = $1;",
+                          params=("text",), columns=("value",))
+
+GET_SYNCS = register_query("get_syncs", "SELECT key, value FROM syncs WHERE key = ANY($1::text[]);",
+                           params=("text[]",), columns=("key", "value"))
+
+ALL_SYNCS = register_query("all_syncs", "SELECT key, value FROM syncs;", columns=("key", "value"))
+
+# clock_timestamp: transactions that started together still stamp different versions
+BUMP_SYNCS = register_query("bump_syncs", """
+    INSERT INTO syncs (key, value)
+    SELECT key, clock_timestamp() FROM unnest($1::text[]) AS key
+    ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value
+    RETURNING key, value;
+""", params=("text[]",), columns=("key", "value"))
+
+# Delivered to the tenant's listeners (utils/events.py) when the transaction commits, never before
+NOTIFY_CHANGES = register_query("notify_changes", "SELECT pg_notify($1, payload) FROM unnest($2::text[]) AS payload",
+                                params=("text", "text[]"))
+
+SUPPLIERS_ID_NAME = register_query("suppliers_id_name", "SELECT id, name FROM suppliers;",
+                                   columns=("id", "name"))
+
+ACTIVE_SALESMEN = register_query("active_salesmen", """
+    SELECT u.user_id::TEXT, u.full_name
+    FROM public.users u
+    JOIN public.user_employment_info ei ON u.user_id = ei.user_id
+    WHERE ei.salesman_status = 'active';
+""", columns=("user_id", "full_name"))
+
+TAILORS = register_query("tailors", """
+    SELECT u.user_id::TEXT, u.full_name
+    FROM public.users u
+    JOIN public.user_employment_info ei ON u.user_id = ei.user_id
+    WHERE ei.tailor_type IS NOT NULL;
+""", columns=("user_id", "full_name"))
+
+USERS_ID_NAME = register_query("users_id_name", """
+    SELECT user_id::TEXT, full_name
+    FROM users
+""", columns=("user_id", "full_name"))
+
+ENTITIES_ID_NAME = register_query("entities_id_name", """
+    SELECT id, name
+    FROM entities
+""", columns=("id", "name"))
+
+
+REDIS_RETRY_SECONDS = 30  # after a Redis error, serve from process memory and Postgres for this long
+OWN_VERSIONS_KEPT = 1000
+
+# Version stamp in process: (db_name, list key) -> (version, list)
+_cached_lists = {}
+_redis_down_until = 0.0
+
+# Versions this worker stamped itself, (db_name, key, version): it updates its own
+# caches as it writes, so its listeners can skip their notifications
+_own_versions = deque(maxlen=OWN_VERSIONS_KEPT)
+
+
+def redis_up():
+    """False for REDIS_RETRY_SECONDS after a Redis error, so db/* caches skip Redis meanwhile."""
+    return time.monotonic() >= _redis_down_until
+
+
+async def redis_failed(context, e):
+    """Log a Redis error and stop using Redis for REDIS_RETRY_SECONDS."""
+    global _redis_down_until
+    _redis_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+    await flatbed('exception', f"In {context}: {e}")
+
+
+def _version(value):
+    # Full precision: two writes within a second must still give two versions
+    return value.isoformat() if value is not None else "0"
+
+
+async def _notify_changes(conn, versions):
+    """NOTIFY push subscribers of new syncs versions: one {"key", "version"} JSON payload per key."""
+    payloads = [json.dumps({"key": key, "version": _version(value)}) for key, value in versions.items()]
+    await NOTIFY_CHANGES.execute(conn, CHANGES_CHANNEL, payloads)
+    db_name = current_db.get()
+    _own_versions.extend((db_name, key, _version(value)) for key, value in versions.items())
+
+
+def stamped_here(db_name, key, version):
+    """Whether this worker stamped `version` of `key` (a version from a change notification)."""
+    return (db_name, key, version) in _own_versions
 
 
 async def insert_update_sync(key):
+    """
+    Stamp `key` in the syncs table with the current time, marking the data behind it
+    as changed, and publish the new version to Redis and push subscribers.
+    Call after the write has committed.
+    """
     try:
         async with connection_context() as conn:
-            sql_insert = """
-            INSERT INTO syncs (key, value) VALUES (
-            $1, current_timestamp)
-            ON CONFLICT (key) DO UPDATE SET value = current_timestamp
-            RETURNING value;
-            """
-            value = await conn.fetchval(sql_insert, key)
-
-            return value
+            value = await UPSERT_SYNC.fetchval(conn, key)
+            await _notify_changes(conn, {key: value})
     except Exception as e:
         await flatbed('exception', f"In insert_update_sync: {e}")
         return None
 
+    try:
+        await set_sync_version_redis(current_db.get(), key, _version(value))
+    except Exception as e:
+        # Readers may serve the old version until the Redis copy expires
+        await redis_failed(f"insert_update_sync publishing {key}", e)
+    return value
+
+
+async def bump_sync_versions(conn, keys):
+    """
+    Stamp syncs `keys` as changed on the caller's connection, inside its write
+    transaction, so the new version is visible, and pushed to subscribers,
+    exactly when the data is. Unlike insert_update_sync nothing is published to
+    Redis: these keys are only ever read from the syncs table (get_sync_versions).
+    """
+    rows = await BUMP_SYNCS.fetch(conn, list(keys))
+    await _notify_changes(conn, {row["key"]: row["value"] for row in rows})
+
+
+async def get_sync_versions(keys=None):
+    """
+    Current version of each syncs key (all keys when None), read from the syncs table.
+    Keys never stamped have version "0".
+    """
+    try:
+        async with connection_context() as conn:
+            rows = await ALL_SYNCS.fetch(conn) if keys is None else await GET_SYNCS.fetch(conn, list(keys))
+        return {key: "0" for key in keys or ()} | {row["key"]: _version(row["value"]) for row in rows}
+    except Exception as e:
+        await flatbed('exception', f"In get_sync_versions: {e}")
+        raise
+
 
 async def get_sync(key):
     try:
         async with connection_context() as conn:
-            query = "SELECT value FROM syncs WHERE key = $1;"
-            value = await conn.fetchval(query, key)
+            value = await GET_SYNC.fetchval(conn, key)
 
             return value
     except Exception as e:
@@ -41,8 +175,7 @@ async def fetch_suppliers_list():
     """
     try:
         async with connection_context() as conn:
-            query = "SELECT id, name FROM suppliers;"
-            suppliers_data = await conn.fetch(query)
+            suppliers_data = await SUPPLIERS_ID_NAME.fetch(conn)
             suppliers_list = get_formatted_id_name_list(suppliers_data)
             return suppliers_list  # Returns a list of asyncpg Record objects
 
@@ -60,13 +193,7 @@ async def fetch_salesmen_list():
     """
     try:
         async with connection_context() as conn:
-            query = """
-                SELECT u.user_id::TEXT, u.full_name
-                FROM public.users u
-                JOIN public.user_employment_info ei ON u.user_id = ei.user_id
-                WHERE ei.salesman_status = 'active';
-            """
-            salesmen_data = await conn.fetch(query)
+            salesmen_data = await ACTIVE_SALESMEN.fetch(conn)
             salesmen_list = get_formatted_users_small_list(salesmen_data)
             # Returns a list of asyncpg Record objects
             return salesmen_list
@@ -85,13 +212,7 @@ async def fetch_tailors_list():
     """
     try:
         async with connection_context() as conn:
-            query = """
-                SELECT u.user_id::TEXT, u.full_name
-                FROM public.users u
-                JOIN public.user_employment_info ei ON u.user_id = ei.user_id
-                WHERE ei.tailor_type IS NOT NULL;
-            """
-            tailors_data = await conn.fetch(query)
+            tailors_data = await TAILORS.fetch(conn)
             tailors_list = get_formatted_users_small_list(tailors_data)
             return tailors_list
 
@@ -109,11 +230,7 @@ async def fetch_users_list():
     """
     try:
         async with connection_context() as conn:
-            query = """
-                SELECT user_id::TEXT, full_name
-                FROM users
-            """
-            users_data = await conn.fetch(query)
+            users_data = await USERS_ID_NAME.fetch(conn)
             users_list = get_formatted_users_small_list(users_data)
             return users_list
 
@@ -131,14 +248,107 @@ async def fetch_entities_list():
     """
     try:
         async with connection_context() as conn:
-            query = """
-                SELECT id, name
-                FROM entities
-            """
-            entities_data = await conn.fetch(query)
+            entities_data = await ENTITIES_ID_NAME.fetch(conn)
             entities_list = get_formatted_id_name_list(entities_data)
             return entities_list
 
     except Exception as e:
         await flatbed('exception', f"In fetch_entities_list: {e}")
         raise
+
+
+# Reference lists served by /get-lists, with the syncs key their version follows
+LIST_FETCHERS = {
+    "suppliers": (fetch_suppliers_list, "suppliers"),
+    "salesmen": (fetch_salesmen_list, "users"),
+    "tailors": (fetch_tailors_list, "users"),
+    "users": (fetch_users_list, "users"),
+    "entities": (fetch_entities_list, "entities"),
+}
+
+
+async def _get_cached_sync_versions(db_name, sync_keys):
+    """Versions from Redis, falling back to (and refilling from) the syncs table for keys it lacks."""
+    versions = {}
+    if redis_up():
+        try:
+            versions = await get_sync_versions_redis(db_name, sync_keys)
+        except Exception as e:
+            await redis_failed("get_sync_versions reading Redis", e)
+
+    missing = [key for key in sync_keys if key not in versions]
+    if missing:
+        async with connection_context() as conn:
+            rows = await GET_SYNCS.fetch(conn, missing)
+        # A key never stamped gets version "0" until its first write
+        read = {key: "0" for key in missing} | {row["key"]: _version(row["value"]) for row in rows}
+        versions.update(read)
+        if redis_up():
+            try:
+                await fill_sync_versions_redis(db_name, read)
+            except Exception as e:
+                await redis_failed("get_sync_versions filling Redis", e)
+    return versions
+
+
+async def _load_list(db_name, key, version):
+    if redis_up():
+        try:
+            cached = await get_cached_list_redis(db_name, key, version)
+            if cached is not None:
+                return cached
+        except Exception as e:
+            await redis_failed(f"get_reference_lists reading Redis for {key}", e)
+
+    fetcher = LIST_FETCHERS[key][0]
+    value = await fetcher()
+    if redis_up():
+        try:
+            await set_cached_list_redis(db_name, key, version, value)
+        except Exception as e:
+            await redis_failed(f"get_reference_lists caching {key}", e)
+    return value
+
+
+async def get_list_versions(keys):
+    """
+    Version of each requested LIST_FETCHERS list, from Redis where possible:
+    what get_reference_lists serves and what /get-lists ETags are made of.
+    """
+    db_name = current_db.get()
+    versions = await _get_cached_sync_versions(db_name, sorted({LIST_FETCHERS[key][1] for key in keys}))
+    return {key: versions[LIST_FETCHERS[key][1]] for key in keys}
+
+
+async def get_reference_lists(keys, versions=None):
+    """
+    The requested LIST_FETCHERS lists for the current tenant, cached in process
+    and in Redis under the version of their syncs key. A warm call costs one
+    Redis round trip and no Postgres query; missing lists are fetched concurrently,
+    each on its own connection.
+
+    Parameters:
+    - versions: get_list_versions(keys), if the caller already has them.
+
+    Returns:
+        dict of list key -> formatted list, in the order of `keys`.
+    """
+    db_name = current_db.get()
+    if versions is None:
+        versions = await get_list_versions(keys)
+
+    results = {}
+    missing = []
+    for key in keys:
+        version = versions[key]
+        cached = _cached_lists.get((db_name, key))
+        if cached is not None and cached[0] == version:
+            results[key] = cached[1]
+        else:
+            missing.append((key, version))
+
+    loaded = await asyncio.gather(*(_load_list(db_name, key, version) for key, version in missing))
+    for (key, version), value in zip(missing, loaded):
+        _cached_lists[db_name, key] = (version, value)
+        results[key] = value
+    return {key: results[key] for key in keys}
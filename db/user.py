@@ -5,6 +5,82 @@ from helpers import make_employment_info_dic, make_profile_data_dic, parse_date
 from utils import flatbed
 from utils.conn import connection_context
 from utils.hasher import hash_password, check_password
+from .audit import queue_user_action
+from .queries import register_query
+from .sync import insert_update_sync
+
+ADD_USER = register_query("add_user", "SELECT add_new_user_procedure($1, $2, $3, $4)",
+                          params=("text", "text", "text", "int"))
+
+# A NULL password keeps the stored one
+UPDATE_USER = register_query("update_user", """
+    UPDATE users
+    SET full_name = $1, username = $2, level = $3, password = COALESCE($4, password)
+    WHERE username = $5
+    RETURNING user_id::text
+""", params=("text", "text", "int", "text", "text"), columns=("user_id",))
+
+UPDATE_EMPLOYMENT_INFO = register_query("update_employment_info", """
+    WITH updated AS (
+        UPDATE user_employment_info
+        SET salary_amount = $1,
+            salary_start_date = $2,
+            tailor_type = $3,
+            salesman_status = $4,
+            bill_bonus_percent = $5,
+            note = $6,
+            salary_cycle = $7,
+            is_active = $8
+        WHERE user_id = $9
+        RETURNING user_id
+    )
+    SELECT u.username
+    FROM updated
+    JOIN users u ON u.user_id = updated.user_id;
+""", params=("int", "date", "text", "text", "int", "text", "text", "bool", "uuid"), columns=("username",))
+
+USER_PASSWORD = register_query("user_password", """
+    SELECT password FROM users
+    WHERE username = lower($1)
+""", params=("text",), columns=("password",))
+
+USER_ID_BY_USERNAME = register_query("user_id_by_username", """
+    SELECT user_id FROM users WHERE username = lower($1)
+""", params=("text",), columns=("user_id",))
+
+SET_USER_TELEGRAM_ID = register_query("set_user_telegram_id", """
+    UPDATE users SET telegram_id = $1 WHERE user_id = $2
+""", params=("bigint", "uuid"))
+
+USER_DATA = register_query("user_data", """
+    SELECT user_id::varchar, full_name, level, image_url FROM users
+    WHERE username = lower($1)
+""", params=("text",), columns=("user_id", "full_name", "level", "image_url"))
+
+EMPLOYMENT_INFO = register_query("employment_info", """
+    SELECT id, user_id::TEXT, salary_amount, salary_start_date, tailor_type, salesman_status,
+     bill_bonus_percent, note, salary_cycle, last_calculated_date, is_active 
+     FROM user_employment_info
+    WHERE user_id = $1
+""", params=("uuid",), columns=("id", "user_id", "salary_amount", "salary_start_date", "tailor_type",
+                                "salesman_status", "bill_bonus_percent", "note", "salary_cycle",
+                                "last_calculated_date", "is_active"))
+
+PROFILE_DATA = register_query("profile_data", "SELECT * FROM get_profile_data($1);", params=("uuid",))
+
+UPDATE_USER_PASSWORD = register_query("update_user_password", """
+    UPDATE users
+    SET password = $1
+    WHERE username = lower($2)
+""", params=("text", "text"))
+
+USERS_LIST = register_query("users_list", "SELECT user_id::TEXT, full_name, username, level, image_url FROM users;",
+                            columns=("user_id", "full_name", "username", "level", "image_url"))
+
+HIGH_CLEARANCE_EMAILS = register_query("high_clearance_emails", "SELECT email_address FROM users WHERE level > 2;",
+                                       columns=("email_address",))
+
+DELETE_USER = register_query("delete_user", "DELETE FROM users WHERE username = $1", params=("text",))
 
 
 async def insert_new_user(full_name, username, password, level):
@@ -26,13 +102,15 @@ async def insert_new_user(full_name, username, password, level):
             # Hash the password before storing it (ensure it's not async)
             hashed_password = hash_password(password)
 
-            user_id = await conn.fetchval(
-                "SELECT add_new_user_procedure($1, $2, $3, $4)",
+            user_id = await ADD_USER.fetchval(
+                conn,
                 full_name,
                 username,
                 hashed_password,
                 level
             )
+            if user_id:
+                await insert_update_sync("users")
 
             return user_id
 
@@ -58,27 +136,11 @@ async def update_user(usernameToEdit: str, full_name: str, user_name: str,
     """
     try:
         async with connection_context() as conn:
-            # Base query
-            update_fields = ["full_name = $1", "username = $2, level = $3"]
-            values = [full_name, user_name, level]
-
-            # Conditional updates
-            index = 4  # Start at $4
-            if password:
-                update_fields.append(f"password = ${index}")
-                values.append(hash_password(password))  # Hash password before storage
-                index += 1
-
-            values.append(usernameToEdit)  # WHERE condition
-
-            sql_update = f"""
-                UPDATE users
-                SET {", ".join(update_fields)}
-                WHERE username = ${index}
-                RETURNING user_id::text
-            """
-
-            user_id = await conn.fetchval(sql_update, *values)
+            hashed_password = hash_password(password) if password else None
+
+            user_id = await UPDATE_USER.fetchval(conn, full_name, user_name, level, hashed_password, usernameToEdit)
+            if user_id:
+                await insert_update_sync("users")
             return user_id
 
     except Exception as e:
@@ -119,27 +181,10 @@ async def edit_employment_info_ps(
             if salary_start_date:
                 salary_start_date = parse_date(salary_start_date)
 
-            sql_update = """
-                WITH updated AS (
-                    UPDATE user_employment_info
-                    SET salary_amount = $1,
-                        salary_start_date = $2,
-                        tailor_type = $3,
-                        salesman_status = $4,
-                        bill_bonus_percent = $5,
-                        note = $6,
-                        salary_cycle = $7,
-                        is_active = $8
-                    WHERE user_id = $9
-                    RETURNING user_id
-                )
-                SELECT u.username
-                FROM updated
-                JOIN users u ON u.user_id = updated.user_id;
-            """
-
-            username = await conn.fetchval(sql_update, salary_amount, salary_start_date, tailor_type,
+            username = await UPDATE_EMPLOYMENT_INFO.fetchval(conn, salary_amount, salary_start_date, tailor_type,
                                            salesman_status, bill_bonus_percent, note, salary_cycle, is_active, user_id)
+            if username:
+                await insert_update_sync("users")  # salesmen and tailors lists
             return username
 
     except Exception as e:
@@ -160,10 +205,7 @@ async def check_username_password(username, password):
     """
     try:
         async with connection_context() as conn:
-            stored_password = await conn.fetchval("""
-                    SELECT password FROM users
-                    WHERE username = lower($1)
-                """, username)
+            stored_password = await USER_PASSWORD.fetchval(conn, username)
 
             if stored_password:
                 # Check the provided password against the stored hash
@@ -188,16 +230,12 @@ async def check_username_and_set_chat_id(username: str, chat_id: int):
         """
     try:
         async with connection_context() as conn:
-            stored_user_id = await conn.fetchval("""
-                SELECT user_id FROM users WHERE username = lower($1)
-            """, username)
+            stored_user_id = await USER_ID_BY_USERNAME.fetchval(conn, username)
 
             if not stored_user_id:
                 return False  # Username not found, abort.
 
-            await conn.execute("""
-                UPDATE users SET telegram_id = $1 WHERE user_id = $2
-            """, chat_id, stored_user_id)
+            await SET_USER_TELEGRAM_ID.execute(conn, chat_id, stored_user_id)
 
             return True
     except Exception as e:
@@ -208,10 +246,7 @@ async def check_username_and_set_chat_id(username: str, chat_id: int):
 async def get_users_data(username):
     try:
         async with connection_context() as conn:
-            data = await conn.fetchrow("""
-                               SELECT user_id::varchar, full_name, level, image_url FROM users
-                               WHERE username = lower($1)
-                           """, username)
+            data = await USER_DATA.fetchrow(conn, username)
             return data if data else None
     except Exception as e:
         await flatbed('exception', f"In get_users_data: {e}")
@@ -221,12 +256,7 @@ async def get_users_data(username):
 async def get_employment_info_ps(user_id):
     try:
         async with connection_context() as conn:
-            data = await conn.fetchrow("""
-                               SELECT id, user_id::TEXT, salary_amount, salary_start_date, tailor_type, salesman_status,
-                                bill_bonus_percent, note, salary_cycle, last_calculated_date, is_active 
-                                FROM user_employment_info
-                               WHERE user_id = $1
-                           """, user_id)
+            data = await EMPLOYMENT_INFO.fetchrow(conn, user_id)
             if not data:
                 return None
 
@@ -257,9 +287,7 @@ async def get_profile_data_ps(user_id: str):
         async with connection_context() as conn:
 
             user_id = uuid.UUID(user_id)
-            data = await conn.fetchrow("""
-                SELECT * FROM get_profile_data($1);
-                           """, user_id)
+            data = await PROFILE_DATA.fetchrow(conn, user_id)
             if not data:
                 return None
 
@@ -274,11 +302,7 @@ async def get_profile_data_ps(user_id: str):
 async def update_users_password(username, new_password):
     try:
         async with connection_context() as conn:
-            await conn.execute("""
-            UPDATE users
-            SET password = $1
-            WHERE username = lower($2)
-        """, new_password, username)
+            await UPDATE_USER_PASSWORD.execute(conn, new_password, username)
     except Exception as e:
         await flatbed('exception', f"In update_users_password: {e}")
         raise
@@ -293,8 +317,7 @@ async def get_users_list_ps():
     """
     try:
         async with connection_context() as conn:
-            query = "SELECT user_id::TEXT, full_name, username, level, image_url FROM users;"
-            users_list = await conn.fetch(query)
+            users_list = await USERS_LIST.fetch(conn)
             return users_list  # Returns a list of asyncpg Record objects
 
     except Exception as e:
@@ -311,8 +334,7 @@ async def get_emails_high_clearance_users_ps():
     """
     try:
         async with connection_context() as conn:
-            query = "SELECT email_address FROM users WHERE level > 2;"
-            records = await conn.fetch(query)
+            records = await HIGH_CLEARANCE_EMAILS.fetch(conn)
             emails_list = [r['email_address'] for r in records]  # extract email field
             return emails_list
 
@@ -324,7 +346,8 @@ async def get_emails_high_clearance_users_ps():
 async def remove_user_ps(username):
     try:
         async with connection_context() as conn:
-            await conn.execute("DELETE FROM users WHERE username = $1", username)
+            await DELETE_USER.execute(conn, username)
+        await insert_update_sync("users")
         return True
     except Exception as e:
         await flatbed('exception', f"in remove_user_ps: {e}")
@@ -333,20 +356,14 @@ async def remove_user_ps(username):
 
 async def remember_users_action(user_id, action):
     """
-        Remember users action
+        Remember users action. Inside a unit_of_work it is inserted in the
+        unit's transaction, committing with the write it records; otherwise it
+        is queued and written in batches by db.audit, so the request doesn't wait.
         :param user_id: user_id associated with the user.
         :param action: action performed by the user.
     """
-    # SQL query to
-    sql_insert = """
-            INSERT INTO user_actions (
-                user_id,
-                action
-            ) VALUES ($1, $2)
-        """
     try:
-        async with connection_context() as conn:
-            await conn.execute(sql_insert, user_id, action)
+        await queue_user_action(user_id, action)
     except Exception as e:
         await flatbed('exception', f"In remember_users_action: {e}")
         raise
@@ -1,5 +1,5 @@
 from .general import classify_image_upload, get_date_range, get_expense_cat_name, \
-    is_uuid
+    is_uuid, encode_cursor, decode_cursor
 from .format_list import get_formatted_search_results_list, get_formatted_users_list, \
     get_formatted_rolls_list, get_formatted_expenses_list, get_formatted_recent_activities_list, \
     make_product_dic, make_roll_dic, make_expense_dic, make_bill_dic, get_formatted_tags_list, \
@@ -12,3 +12,10 @@ from .format_list import get_formatted_search_results_list, get_formatted_users_
     get_formatted_rolls_for_sync_list, get_formatted_notifications_list
 from .format_mail import send_salary_report_email
 from .celery import run_async
+from .normalize import normalize_name, normalize_phone
+from .streaming import streaming_response, dict_sections, negotiate_payload, columnar_block
+from .etag import request_etag, etag_matches, etag_headers, not_modified_response
+from .pagination import Keyset, page_headers, NEXT_CURSOR_HEADER
+from .export import export_response, EXPORT_FORMATS
+from .mappers import RowMapper
+from .serialization import JSONResponse, dumps_json, loads_json, to_jsonable
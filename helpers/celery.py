@@ -11,4 +11,10 @@ def run_async(coro):
     except RuntimeError:
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
-    return loop.run_until_complete(coro)
+    from utils.logger import flush_logs  # utils imports this module
+
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        # The loop only runs while a task does, so write out what the task logged now
+        loop.run_until_complete(flush_logs())
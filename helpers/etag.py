@@ -0,0 +1,40 @@
+import hashlib
+import json
+
+from fastapi import Request
+from fastapi.responses import Response
+
+# Clients may keep responses but must revalidate them with If-None-Match before use
+ETAG_CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag over JSON-serializable parts; equal parts give equal tags."""
+    raw = json.dumps(parts, default=str, separators=(",", ":"), sort_keys=True)
+    return '"' + hashlib.blake2b(raw.encode(), digest_size=16).hexdigest() + '"'
+
+
+def request_etag(request: Request, tenant: str, versions: dict, *extra) -> str:
+    """
+    ETag for a GET response that is a function of the tenant's data versions
+    (syncs table) and the request's path and query string. `extra` adds anything
+    else the response depends on, e.g. the current date for date-relative filters.
+    """
+    return make_etag(tenant, request.url.path, sorted(request.query_params.multi_items()), versions, *extra)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match uses weak comparison: W/"x" matches "x"."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def etag_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": ETAG_CACHE_CONTROL}
+
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers=etag_headers(etag))
@@ -0,0 +1,159 @@
+import csv
+import io
+import re
+import zipfile
+from typing import AsyncIterator, Sequence
+from xml.sax.saxutils import escape
+
+from fastapi.responses import StreamingResponse
+
+from .format_list import format_date
+
+CSV_MEDIA_TYPE = "text/csv; charset=utf-8"
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+EXPORT_FORMATS = ("csv", "xlsx")
+
+XLSX_FLUSH_BYTES = 64 * 1024  # compressed sheet data is pushed to the client at least this often
+
+# Leading characters that make a spreadsheet app read a CSV cell as a formula
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+# Control characters XML 1.0 can't carry, even escaped
+_XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_XLSX_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+</Types>"""
+
+_XLSX_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>"""
+
+_XLSX_WORKBOOK = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>
+</workbook>"""
+
+_XLSX_WORKBOOK_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+</Relationships>"""
+
+_XLSX_SHEET_HEAD = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>"""
+
+_XLSX_SHEET_TAIL = "</sheetData></worksheet>"
+
+
+def _cell_text(value) -> str:
+    if value is None:
+        return ""
+    return str(format_date(value))
+
+
+def _csv_cell(value) -> str:
+    # Text typed by users (names, activity text) is kept as text: a leading ' stops
+    # Excel from running it as a formula. Numbers and dates are left as they are.
+    text = _cell_text(value)
+    if isinstance(value, str) and text.startswith(_FORMULA_PREFIXES):
+        return "'" + text
+    return text
+
+
+async def csv_chunks(header: Sequence[str], batches: AsyncIterator[Sequence[Sequence]]):
+    """
+    CSV text of the header and each batch of rows, one chunk per batch. Starts with a
+    byte order mark so spreadsheet apps read the (often non-Latin) text as UTF-8.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    yield ("\ufeff" + buffer.getvalue()).encode()
+    async for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_cell(value) for value in row] for row in batch)
+        yield buffer.getvalue().encode()
+
+
+class _Drain:
+    """Write-only file for ZipFile that hands out what was written so far."""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        self.size = 0
+        return data
+
+
+def _xlsx_row(values) -> str:
+    cells = []
+    for value in values:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            cells.append(f"<c><v>{value}</v></c>")
+        else:
+            text = escape(_XML_INVALID.sub("", _cell_text(value)))
+            cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return "<row>" + "".join(cells) + "</row>"
+
+
+async def xlsx_chunks(header: Sequence[str], batches: AsyncIterator[Sequence[Sequence]], sheet_name: str = "Report"):
+    """
+    A one-sheet XLSX workbook of the header and rows, written while the batches
+    arrive: the zip is produced without seeking (sizes go in data descriptors),
+    and its compressed output is handed on as it accumulates.
+    """
+    drain = _Drain()
+    with zipfile.ZipFile(drain, "w", compression=zipfile.ZIP_DEFLATED) as workbook:
+        workbook.writestr("[Content_Types].xml", _XLSX_CONTENT_TYPES)
+        workbook.writestr("_rels/.rels", _XLSX_RELS)
+        workbook.writestr("xl/workbook.xml", _XLSX_WORKBOOK.format(name=escape(sheet_name, {'"': "&quot;"})))
+        workbook.writestr("xl/_rels/workbook.xml.rels", _XLSX_WORKBOOK_RELS)
+        with workbook.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write((_XLSX_SHEET_HEAD + _xlsx_row(header)).encode())
+            async for batch in batches:
+                sheet.write("".join(_xlsx_row(row) for row in batch).encode())
+                if drain.size >= XLSX_FLUSH_BYTES:
+                    yield drain.take()
+            sheet.write(_XLSX_SHEET_TAIL.encode())
+    yield drain.take()
+
+
+async def export_response(header: Sequence[str], batches: AsyncIterator[Sequence[Sequence]], export_format: str,
+                          filename: str):
+    """
+    StreamingResponse downloading the rows as `filename`.csv or .xlsx. Like
+    streaming_response, the first batch is read before the response starts, so a
+    failing query ends in an error status rather than a truncated download.
+    """
+    first = await anext(batches, None)
+
+    async def replay():
+        if first is not None:
+            yield first
+        async for batch in batches:
+            yield batch
+
+    if export_format == "xlsx":
+        chunks, media_type = xlsx_chunks(header, replay()), XLSX_MEDIA_TYPE
+    else:
+        chunks, media_type = csv_chunks(header, replay()), CSV_MEDIA_TYPE
+    headers = {"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'}
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
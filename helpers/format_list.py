@@ -1,8 +1,9 @@
 #  Helper Functions
-import re
 from datetime import datetime, date
 from typing import Any, Iterable, Mapping, Callable, Optional, Dict, List, Union
 
+from .mappers import RowMapper, to_camel_case
+
 
 def format_timestamp(val: Any) -> Any:
     """Convert datetime → 'YYYY-MM-DD HH:MM:SS'; leave everything else unchanged.
@@ -17,9 +18,12 @@ def format_timestamp(val: Any) -> Any:
 def format_date(val: Any) -> Any:
     """Convert date/datetime → ISO format string; leave everything else unchanged.
     Handles both naive and timezone-aware datetimes (timestamptz)."""
+    cls = type(val)  # exact types first: the common case, and cheaper than isinstance
+    if cls is datetime:
+        return val.isoformat(timespec='seconds')  # Includes timezone info when aware
+    if cls is date:
+        return val.isoformat()
     if isinstance(val, datetime):
-        if val.tzinfo is not None:  # Timezone-aware datetime
-            return val.isoformat(timespec='seconds')  # Includes timezone info
         return val.isoformat(timespec='seconds')
     if isinstance(val, date):
         return val.isoformat()
@@ -54,6 +58,120 @@ def parse_date(val: Any) -> Optional[Union[date, datetime]]:
     return None
 
 
+SPECIAL_KEY_MAPPINGS = {
+    "product_code": "productCode",
+    "quantity": "quantityInCm",
+    "color": "colorLetter",
+    "category": "categoryIndex",
+    "added_by_display": "addedBy",
+    "payable_total_afn": "payableTotalAFN",
+    "payable_total_usd": "payableTotalUSD",
+    "payable_total_cny": "payableTotalCNY",
+    "receivable_total_afn": "receivableTotalAFN",
+    "receivable_total_usd": "receivableTotalUSD",
+    "receivable_total_cny": "receivableTotalCNY",
+    "purchases_total_afn": "purchasesTotalAFN",
+    "purchases_total_usd": "purchasesTotalUSD",
+    "purchases_total_cny": "purchasesTotalCNY",
+    "total_paid_afn": "totalPaidAFN",
+    "total_paid_usd": "totalPaidUSD",
+    "total_paid_cny": "totalPaidCNY"
+}
+
+# Dates and datetimes stay as they are: the response encoder (helpers.serialization)
+# writes them as format_date would, without a pass over every row
+TRANSFORMERS = {
+    "target_user_id": str,
+    "rate": float
+}
+
+
+def _mapper(name, fields=None, **kwargs) -> RowMapper:
+    # Plain column names are keyed by SPECIAL_KEY_MAPPINGS / camelCase and transformed by TRANSFORMERS
+    return RowMapper(name, fields, key_mappings=SPECIAL_KEY_MAPPINGS, transformers=TRANSFORMERS,
+                     none_safe=(format_timestamp,), **kwargs)
+
+
+# Every column of whatever rows it is given, see format_dict
+GENERIC_MAPPER = _mapper("generic")
+
+RECENT_ACTIVITY_MAPPER = _mapper("recent_activity", ("id", "date", "username", "action"))
+
+TAG_MAPPER = _mapper("tag", ("full_code", "product_name", "category", "color",
+                             ("createdAt", "created_at", format_timestamp), "image_url"))
+
+EXPENSE_MAPPER = _mapper("expense", ("id", "category_index", "description", "amount", "date", "added_by_display"))
+
+BILL_MAPPER = _mapper("bill", ("bill_code", "bill_date", "due_date", "customer_name", "customer_number", "price",
+                               "paid", "remaining", "fabrics", "parts", "status", "salesman", "salesman_name",
+                               "tailor", "tailor_name", "additional_data", "installation"))
+
+PRODUCT_MAPPER = _mapper("product", ("product_code", "name", "category", "quantity", "price_per_metre",
+                                     "description", "material", "fabric_height_cm", "weight_per_metre",
+                                     "opacity_level", "texture", "image_url", ("rollsList", None, list)))
+
+ROLL_MAPPER = _mapper("roll", ("product_code", "roll_code", "quantity", "color", "image_url", "cost_per_metre",
+                               "archived"), optional=("archived",))
+
+PRODUCT_FOR_SYNC_MAPPER = _mapper("product_for_sync", ("product_code", "name", "category", "quantity",
+                                                       "price_per_metre", "description", "image_url", "archived",
+                                                       "created_at", "updated_at"))
+
+ROLL_FOR_SYNC_MAPPER = _mapper("roll_for_sync", ("product_code", "roll_code", "quantity", "color", "image_url",
+                                                 "cost_per_metre", "archived", "created_at", "updated_at"))
+
+USER_MAPPER = _mapper("user", ("user_id", "full_name", "username", "level", "image_url"))
+
+USER_SMALL_MAPPER = _mapper("user_small", ("user_id", "full_name"))
+
+SUPPLIER_MAPPER = _mapper("supplier", ("id", "name", "phone", "address", "notes"))
+
+ENTITY_MAPPER = _mapper("entity", ("id", "name", "phone", "address", "notes"))
+
+SUPPLIER_DETAILS_MAPPER = _mapper("supplier_details", (
+    "purchases_total_afn", "purchases_total_usd", "purchases_total_cny",
+    "payable_total_afn", "payable_total_usd", "payable_total_cny",
+    "receivable_total_afn", "receivable_total_usd", "receivable_total_cny",
+    "total_paid_afn", "total_paid_usd", "total_paid_cny"))
+
+ENTITY_DETAILS_MAPPER = _mapper("entity_details", (
+    "payable_total_afn", "payable_total_usd", "payable_total_cny",
+    "receivable_total_afn", "receivable_total_usd", "receivable_total_cny"))
+
+ID_NAME_MAPPER = _mapper("id_name", ("id", "name"))
+
+PURCHASE_MAPPER = _mapper("purchase", ("id", "supplier_id", "supplier_name", "total_amount", "currency",
+                                       "description", "created_at", "updated_at", "created_by"))
+
+PURCHASE_ITEM_MAPPER = _mapper("purchase_item", ("id", "purchase_id", "category_index", "product_code",
+                                                 "product_name", "cost_per_metre", ("rollsList", None, list)))
+
+EMPLOYMENT_INFO_MAPPER = _mapper("employment_info", ("id", "user_id", "salary_amount", "salary_start_date",
+                                                     "tailor_type", "salesman_status", "bill_bonus_percent", "note",
+                                                     "salary_cycle", "last_calculated_date", "is_active"))
+
+PROFILE_DATA_MAPPER = _mapper("profile_data", ("total_earnings", "total_withdrawals"))
+
+PAYMENT_MAPPER = _mapper("payment", ("id", "amount", "currency", "note", "payed_by_name", "created_at"))
+
+MISC_MAPPER = _mapper("misc", ("id", "transaction_type", "amount", "currency", "direction", "note", "created_by",
+                               "created_at"))
+
+EARNING_MAPPER = _mapper("earning", ("id", "amount", "earning_type", "reference", "note", "created_at",
+                                     "added_by_display"))
+
+NOTIFICATION_MAPPER = _mapper("notification", ("id", "type", "reference", "message",
+                                               ("targetUserId", "target_user_id", str), "target_roles",
+                                               "created_at"))
+
+CUT_FABRIC_FIELDS = (("id", "id"), ("rollCode", "roll_code"), ("billCode", "bill_code"),
+                     ("createdBy", "created_by"), ("quantity", "quantity"), ("status", "status"),
+                     ("comment", "comment"), ("createdAt", "created_at"))
+
+# format_cut_fabric_records mappers, per (extra columns, transformer)
+_cut_fabric_mappers = {}
+
+
 def get_formatted_recent_activities_list(recent_activity_data):
     """
     Helper function to format recent activities data into JSON-compatible objects.
@@ -64,17 +182,7 @@ def get_formatted_recent_activities_list(recent_activity_data):
     Returns:
     - A list of formatted recent activities dictionaries.
     """
-    recent_activity_list = []
-    if recent_activity_data:
-        for data in recent_activity_data:
-            activity = {
-                "id": data["id"],
-                "date": format_date(data["date"]),
-                "username": data["username"],
-                "action": data["action"],
-            }
-            recent_activity_list.append(activity)
-    return recent_activity_list
+    return RECENT_ACTIVITY_MAPPER(recent_activity_data)
 
 
 def get_formatted_tags_list(tags_data):
@@ -87,19 +195,7 @@ def get_formatted_tags_list(tags_data):
     Returns:
     - A list of formatted tags dictionaries.
     """
-    tags_list = []
-    if tags_data:
-        for data in tags_data:
-            tag = {
-                "fullCode": data["full_code"],
-                "productName": data["product_name"],
-                "categoryIndex": data["category"],
-                "colorLetter": data["color"],
-                "createdAt": format_timestamp(data["created_at"]),
-                "imageUrl": data["image_url"]
-            }
-            tags_list.append(tag)
-    return tags_list
+    return TAG_MAPPER(tags_data)
 
 
 def get_formatted_expenses_list(expenses_data):
@@ -112,13 +208,7 @@ def get_formatted_expenses_list(expenses_data):
     Returns:
     - A list of formatted expenses dictionaries.
     """
-    expenses_list = []
-    if expenses_data:
-        for data in expenses_data:
-            search_result = make_expense_dic(data)
-            expenses_list.append(search_result)
-
-    return expenses_list
+    return EXPENSE_MAPPER(expenses_data)
 
 
 def get_formatted_search_results_list(products_data, bills_data):
@@ -132,18 +222,7 @@ def get_formatted_search_results_list(products_data, bills_data):
     Returns:
     - A list of formatted search_results dictionaries.
     """
-    search_results_list = []
-    if products_data:
-        for data in products_data:
-            search_result = make_product_dic(data)
-            search_results_list.append(search_result)
-
-    if bills_data:
-        for data in bills_data:
-            search_result = make_bill_dic(data)
-            search_results_list.append(search_result)
-
-    return search_results_list
+    return PRODUCT_MAPPER(products_data) + BILL_MAPPER(bills_data)
 
 
 def get_formatted_rolls_list(rolls_data):
@@ -156,12 +235,7 @@ def get_formatted_rolls_list(rolls_data):
     Returns:
     - A list of formatted rolls dictionaries.
     """
-    rolls_list = []
-    if rolls_data:
-        for data in rolls_data:
-            roll = make_roll_dic(data)
-            rolls_list.append(roll)
-    return rolls_list
+    return ROLL_MAPPER(rolls_data)
 
 
 def get_formatted_products_for_sync_list(products_data):
@@ -174,12 +248,7 @@ def get_formatted_products_for_sync_list(products_data):
     Returns:
     - A list of formatted products dictionaries.
     """
-    products_list = []
-    if products_data:
-        for data in products_data:
-            product = make_product_dic_for_sync(data)
-            products_list.append(product)
-    return products_list
+    return PRODUCT_FOR_SYNC_MAPPER(products_data)
 
 
 def get_formatted_rolls_for_sync_list(rolls_data):
@@ -192,12 +261,7 @@ def get_formatted_rolls_for_sync_list(rolls_data):
     Returns:
     - A list of formatted rolls dictionaries.
     """
-    rolls_list = []
-    if rolls_data:
-        for data in rolls_data:
-            roll = make_roll_dic_for_sync(data)
-            rolls_list.append(roll)
-    return rolls_list
+    return ROLL_FOR_SYNC_MAPPER(rolls_data)
 
 
 def get_formatted_users_list(users_data):
@@ -210,18 +274,7 @@ def get_formatted_users_list(users_data):
     Returns:
     - A list of formatted users dictionaries.
     """
-    users_list = []
-    if users_data:
-        for data in users_data:
-            user = {
-                "userId": data["user_id"],
-                "fullName": data["full_name"],
-                "username": data["username"],
-                "level": data["level"],
-                "imageUrl": data["image_url"]
-            }
-            users_list.append(user)
-    return users_list
+    return USER_MAPPER(users_data)
 
 
 def get_formatted_suppliers_list(suppliers_data):
@@ -234,12 +287,7 @@ def get_formatted_suppliers_list(suppliers_data):
     Returns:
     - A list of formatted suppliers dictionaries.
     """
-    suppliers_list = []
-    if suppliers_data:
-        for data in suppliers_data:
-            supplier = make_supplier_dic(data)
-            suppliers_list.append(supplier)
-    return suppliers_list
+    return SUPPLIER_MAPPER(suppliers_data)
 
 
 def get_formatted_entities_list(entities_data):
@@ -252,12 +300,7 @@ def get_formatted_entities_list(entities_data):
     Returns:
     - A list of formatted entities dictionaries.
     """
-    entities_list = []
-    if entities_data:
-        for data in entities_data:
-            entity = make_entity_dic(data)
-            entities_list.append(entity)
-    return entities_list
+    return ENTITY_MAPPER(entities_data)
 
 
 def get_formatted_purchases_list(purchases_data):
@@ -270,12 +313,7 @@ def get_formatted_purchases_list(purchases_data):
     Returns:
     - A list of formatted purchases dictionaries.
     """
-    purchases_list = []
-    if purchases_data:
-        for data in purchases_data:
-            purchase = make_purchase_dic(data)
-            purchases_list.append(purchase)
-    return purchases_list
+    return PURCHASE_MAPPER(purchases_data)
 
 
 def get_formatted_purchase_items(purchase_items_data):
@@ -288,12 +326,7 @@ def get_formatted_purchase_items(purchase_items_data):
     Returns:
     - A list of formatted purchase_items dictionaries.
     """
-    purchase_items = []
-    if purchase_items_data:
-        for data in purchase_items_data:
-            purchase_item = make_purchase_item_dic(data)
-            purchase_items.append(purchase_item)
-    return purchase_items
+    return PURCHASE_ITEM_MAPPER(purchase_items_data)
 
 
 def get_formatted_users_small_list(users_data):
@@ -306,12 +339,7 @@ def get_formatted_users_small_list(users_data):
     Returns:
     - A list of formatted users dictionaries.
     """
-    users_list = []
-    if users_data:
-        for data in users_data:
-            user = make_user_dic(data)
-            users_list.append(user)
-    return users_list
+    return USER_SMALL_MAPPER(users_data)
 
 
 def get_formatted_payments_list(payments_data):
@@ -324,12 +352,7 @@ def get_formatted_payments_list(payments_data):
     Returns:
     - A list of formatted payments dictionaries.
     """
-    payments_list = []
-    if payments_data:
-        for data in payments_data:
-            payment = make_payment_dic(data)
-            payments_list.append(payment)
-    return payments_list
+    return PAYMENT_MAPPER(payments_data)
 
 
 def get_formatted_misc_list(misc_records_data):
@@ -342,12 +365,7 @@ def get_formatted_misc_list(misc_records_data):
     Returns:
     - A list of formatted misc dictionaries.
     """
-    misc_list = []
-    if misc_records_data:
-        for data in misc_records_data:
-            misc = make_misc_dic(data)
-            misc_list.append(misc)
-    return misc_list
+    return MISC_MAPPER(misc_records_data)
 
 
 def get_formatted_earnings_list(raw_data):
@@ -360,12 +378,7 @@ def get_formatted_earnings_list(raw_data):
     Returns:
     - A list of formatted earning dictionaries.
     """
-    _list = []
-    if raw_data:
-        for data in raw_data:
-            dic = make_earning_dic(data)
-            _list.append(dic)
-    return _list
+    return EARNING_MAPPER(raw_data)
 
 
 def get_formatted_notifications_list(notifications_data):
@@ -378,12 +391,7 @@ def get_formatted_notifications_list(notifications_data):
     Returns:
     - A list of formatted notification dictionaries.
     """
-    notifications_list = []
-    if notifications_data:
-        for data in notifications_data:
-            notification = make_notification_dic(data)
-            notifications_list.append(notification)
-    return notifications_list
+    return NOTIFICATION_MAPPER(notifications_data)
 
 
 def get_formatted_id_name_list(pg_data):
@@ -396,12 +404,7 @@ def get_formatted_id_name_list(pg_data):
     Returns:
     - A list of formatted (id, name) dictionaries.
     """
-    _list = []
-    if pg_data:
-        for data in pg_data:
-            dic = make_id_name_dic(data)
-            _list.append(dic)
-    return _list
+    return ID_NAME_MAPPER(pg_data)
 
 
 def format_cut_fabric_records(
@@ -417,365 +420,107 @@ def format_cut_fabric_records(
     ----------
     rows        : iterable of Records
     extra       : mapping {dest_key: src_field} for additional columns
-    transformer : function applied to every value (defaults to _ts)
+    transformer : function applied to every value (defaults to format_timestamp)
 
     Returns
     -------
     List of dicts
     """
-    extra = extra or {}
-    xf = transformer or format_timestamp  # choose the transformer only once
-
-    formatted: List[Dict[str, Any]] = []
-    append = formatted.append  # local ref for speed in large loops
-
-    for r in rows or []:
-        d = {
-            "id": xf(r["id"]),
-            "rollCode": xf(r["roll_code"]),
-            "billCode": xf(r["bill_code"]),
-            "createdBy": xf(r["created_by"]),
-            "quantity": xf(r["quantity"]),
-            "status": xf(r["status"]),
-            "comment": xf(r["comment"]),
-            "createdAt": xf(r["created_at"]),
-        }
-        for dest_key, src_field in extra.items():
-            d[dest_key] = xf(r[src_field])
-        append(d)
-
-    return formatted
+    xf = transformer or format_timestamp
+    key = (tuple((extra or {}).items()), xf)
+    mapper = _cut_fabric_mappers.get(key)
+    if mapper is None:
+        fields = [(dest_key, src_field, xf) for dest_key, src_field in CUT_FABRIC_FIELDS + key[0]]
+        mapper = _cut_fabric_mappers[key] = RowMapper("cut_fabric", fields)
+    return mapper(rows)
 
 
 def make_bill_dic(data):
-    bill = {
-        "billCode": data["bill_code"],
-        "billDate": format_date(data["bill_date"]),
-        "dueDate": format_date(data["due_date"]),
-        "customerName": data["customer_name"],
-        "customerNumber": data["customer_number"],
-        "price": data["price"],
-        "paid": data["paid"],
-        "remaining": data["remaining"],
-        "fabrics": data["fabrics"],
-        "parts": data["parts"],
-        "status": data["status"],
-        "salesman": data["salesman"],
-        "salesmanName": data["salesman_name"],
-        "tailor": data["tailor"],
-        "tailorName": data["tailor_name"],
-        "additionalData": data["additional_data"],
-        "installation": data["installation"]
-    }
-    return bill
+    return BILL_MAPPER.one(data)
 
 
 def make_expense_dic(data):
-    expense = {
-        "id": data["id"],
-        "categoryIndex": data["category_index"],
-        "description": data["description"],
-        "amount": data["amount"],
-        "date": format_date(data["date"]),
-        "addedBy": data["added_by_display"]
-    }
-    return expense
+    return EXPENSE_MAPPER.one(data)
 
 
 def make_product_dic(data):
-    product = {
-        "productCode": data["product_code"],
-        "name": data["name"],
-        "categoryIndex": data["category"],
-        "quantityInCm": data["quantity"],
-        "pricePerMetre": data["price_per_metre"],
-        "description": data["description"],
-        "material": data["material"],
-        "fabricHeightCm": data["fabric_height_cm"],
-        "weightPerMetre": data["weight_per_metre"],
-        "opacityLevel": data["opacity_level"],
-        "texture": data["texture"],
-        "imageUrl": data["image_url"],
-        "rollsList": []
-    }
-    return product
+    return PRODUCT_MAPPER.one(data)
 
 
 def make_roll_dic(data):
-    archived = data.get("archived")
-
-    roll = {
-        "productCode": data["product_code"],
-        "rollCode": data["roll_code"],
-        "quantityInCm": data["quantity"],
-        "colorLetter": data["color"],
-        "imageUrl": data["image_url"],
-        "costPerMetre": data["cost_per_metre"],
-    }
-
-    if archived is not None:
-        roll["archived"] = archived
-
-    return roll
+    return ROLL_MAPPER.one(data)
 
 
 def make_supplier_dic(data):
-    supplier = {
-        "id": data["id"],
-        "name": data["name"],
-        "phone": data["phone"],
-        "address": data["address"],
-        "notes": data["notes"]
-    }
-    return supplier
+    return SUPPLIER_MAPPER.one(data)
 
 
 def make_entity_dic(data):
-    entity = {
-        "id": data["id"],
-        "name": data["name"],
-        "phone": data["phone"],
-        "address": data["address"],
-        "notes": data["notes"]
-    }
-    return entity
+    return ENTITY_MAPPER.one(data)
 
 
 def make_supplier_details_dic(data):
-    supplier_details = {
-        "purchasesTotalAFN": data["purchases_total_afn"],
-        "purchasesTotalUSD": data["purchases_total_usd"],
-        "purchasesTotalCNY": data["purchases_total_cny"],
-        "payableTotalAFN": data["payable_total_afn"],
-        "payableTotalUSD": data["payable_total_usd"],
-        "payableTotalCNY": data["payable_total_cny"],
-        "receivableTotalAFN": data["receivable_total_afn"],
-        "receivableTotalUSD": data["receivable_total_usd"],
-        "receivableTotalCNY": data["receivable_total_cny"],
-        "totalPaidAFN": data["total_paid_afn"],
-        "totalPaidUSD": data["total_paid_usd"],
-        "totalPaidCNY": data["total_paid_cny"]
-    }
-    return supplier_details
+    return SUPPLIER_DETAILS_MAPPER.one(data)
 
 
 def make_entity_details_dic(data):
-    entity_details = {
-        "payableTotalAFN": data["payable_total_afn"],
-        "payableTotalUSD": data["payable_total_usd"],
-        "payableTotalCNY": data["payable_total_cny"],
-        "receivableTotalAFN": data["receivable_total_afn"],
-        "receivableTotalUSD": data["receivable_total_usd"],
-        "receivableTotalCNY": data["receivable_total_cny"]
-    }
-    return entity_details
+    return ENTITY_DETAILS_MAPPER.one(data)
 
 
 def make_id_name_dic(data):
-    dic = {
-        "id": data["id"],
-        "name": data["name"]
-    }
-    return dic
+    return ID_NAME_MAPPER.one(data)
 
 
 def make_purchase_dic(data):
-    purchase = {
-        "id": data["id"],
-        "supplierId": data["supplier_id"],
-        "supplierName": data["supplier_name"],
-        "totalAmount": data["total_amount"],
-        "currency": data["currency"],
-        "description": data["description"],
-        "createdAt": format_date(data["created_at"]),
-        "updatedAt": format_date(data["updated_at"]),
-        "createdBy": data["created_by"]
-    }
-    return purchase
+    return PURCHASE_MAPPER.one(data)
 
 
 def make_purchase_item_dic(data):
-    purchase_item = {
-        "id": data["id"],
-        "purchaseId": data["purchase_id"],
-        "categoryIndex": data["category_index"],
-        "productCode": data["product_code"],
-        "productName": data["product_name"],
-        "costPerMetre": data["cost_per_metre"],
-        "rollsList": []
-    }
-    return purchase_item
+    return PURCHASE_ITEM_MAPPER.one(data)
 
 
 def make_employment_info_dic(data):
-    employment_info = {
-        "id": data["id"],
-        "userId": data["user_id"],
-        "salaryAmount": data["salary_amount"],
-        "salaryStartDate": format_date(data["salary_start_date"]),
-        "tailorType": data["tailor_type"],
-        "salesmanStatus": data["salesman_status"],
-        "billBonusPercent": data["bill_bonus_percent"],
-        "note": data["note"],
-        "salaryCycle": data["salary_cycle"],
-        "lastCalculatedDate": format_date(data["last_calculated_date"]),
-        "isActive": data["is_active"]
-    }
-    return employment_info
+    return EMPLOYMENT_INFO_MAPPER.one(data)
 
 
 def make_profile_data_dic(data):
-    profile_data = {
-        "totalEarnings": data["total_earnings"],
-        "totalWithdrawals": data["total_withdrawals"]
-    }
-    return profile_data
+    return PROFILE_DATA_MAPPER.one(data)
 
 
 def make_user_dic(data):
-    user = {
-        "userId": data["user_id"],
-        "fullName": data["full_name"]
-    }
-    return user
+    return USER_SMALL_MAPPER.one(data)
 
 
 def make_payment_dic(data):
-    payment = {
-        "id": data["id"],
-        "amount": data["amount"],
-        "currency": data["currency"],
-        "note": data["note"],
-        "payedByName": data["payed_by_name"],
-        "createdAt": format_date(data["created_at"])
-    }
-    return payment
+    return PAYMENT_MAPPER.one(data)
 
 
 def make_misc_dic(data):
-    misc = {
-        "id": data["id"],
-        "transactionType": data["transaction_type"],
-        "amount": data["amount"],
-        "currency": data["currency"],
-        "direction": data["direction"],
-        "note": data["note"],
-        "createdBy": data["created_by"],
-        "createdAt": format_date(data["created_at"])
-    }
-    return misc
+    return MISC_MAPPER.one(data)
 
 
 def make_earning_dic(data):
-    earning = {
-        "id": data["id"],
-        "amount": data["amount"],
-        "earningType": data["earning_type"],
-        "reference": data["reference"],
-        "note": data["note"],
-        "createdAt": format_date(data["created_at"]),
-        "addedBy": data["added_by_display"]
-    }
-    return earning
+    return EARNING_MAPPER.one(data)
 
 
 def make_notification_dic(data):
-    notification = {
-        "id": data["id"],
-        "type": data["type"],
-        "reference": data["reference"],
-        "message": data["message"],
-        "targetUserId": str(data["target_user_id"]),
-        "targetRoles": data["target_roles"],
-        "createdAt": format_date(data["created_at"])
-    }
-    return notification
+    return NOTIFICATION_MAPPER.one(data)
 
 
 def make_product_dic_for_sync(data):
     """Full product dictionary including all fields needed for offline sync."""
-    return {
-        "productCode": data["product_code"],
-        "name": data["name"],
-        "categoryIndex": data["category"],
-        "quantityInCm": data["quantity"],
-        "pricePerMetre": data["price_per_metre"],
-        "description": data["description"],
-        "imageUrl": data["image_url"],
-        "archived": data["archived"],
-        "createdAt": format_date(data["created_at"]),
-        "updatedAt": format_date(data["updated_at"])
-    }
+    return PRODUCT_FOR_SYNC_MAPPER.one(data)
 
 
 def make_roll_dic_for_sync(data):
     """Full roll dictionary including all fields needed for offline sync."""
-    return {
-        "productCode": data["product_code"],
-        "rollCode": data["roll_code"],
-        "quantityInCm": data["quantity"],
-        "colorLetter": data["color"],
-        "imageUrl": data["image_url"],
-        "costPerMetre": data["cost_per_metre"],
-        "archived": data["archived"],
-        "createdAt": format_date(data["created_at"]),
-        "updatedAt": format_date(data["updated_at"])
-    }
-
-
-SPECIAL_KEY_MAPPINGS = {
-    "product_code": "productCode",
-    "quantity": "quantityInCm",
-    "color": "colorLetter",
-    "category": "categoryIndex",
-    "added_by_display": "addedBy",
-    "payable_total_afn": "payableTotalAFN",
-    "payable_total_usd": "payableTotalUSD",
-    "payable_total_cny": "payableTotalCNY",
-    "receivable_total_afn": "receivableTotalAFN",
-    "receivable_total_usd": "receivableTotalUSD",
-    "receivable_total_cny": "receivableTotalCNY",
-    "purchases_total_afn": "purchasesTotalAFN",
-    "purchases_total_usd": "purchasesTotalUSD",
-    "purchases_total_cny": "purchasesTotalCNY",
-    "total_paid_afn": "totalPaidAFN",
-    "total_paid_usd": "totalPaidUSD",
-    "total_paid_cny": "totalPaidCNY"
-}
-
-TRANSFORMERS = {
-    "created_at": format_date,
-    "updated_at": format_date,
-    "salary_start_date": format_date,
-    "last_calculated_date": format_date,
-    "bill_date": format_date,
-    "due_date": format_date,
-    "date": format_date,
-    "target_user_id": str,
-    "fetched_at": format_date,
-    "rate": float
-}
+    return ROLL_FOR_SYNC_MAPPER.one(data)
 
 
 def format_dict(data: dict) -> dict:
-    formatted = {}
-    for k, v in data.items():
-        # Handle special naming
-        camel_key = SPECIAL_KEY_MAPPINGS.get(k, to_camel_case(k))
-
-        # Handle value transformation
-        if k in TRANSFORMERS and v is not None:
-            v = TRANSFORMERS[k](v)
-
-        formatted[camel_key] = v
-    return formatted
+    """Every column of a row, keyed by SPECIAL_KEY_MAPPINGS / camelCase and transformed by TRANSFORMERS."""
+    return GENERIC_MAPPER.one(data)
 
 
 def format_list(data_list: list[dict]) -> list[dict]:
-    return [format_dict(d) for d in data_list]
-
-
-def to_camel_case(s: str) -> str:
-    """Convert snake_case or kebab-case to camelCase."""
-    parts = re.split(r'[_\- ]+', s)
-    return parts[0].lower() + ''.join(word.capitalize() for word in parts[1:])
+    return GENERIC_MAPPER(data_list)
@@ -1,3 +1,5 @@
+import base64
+import json
 import os
 import uuid
 from datetime import timedelta, datetime
@@ -73,3 +75,19 @@ def is_uuid(value: str) -> bool:
         return True
     except (ValueError, TypeError):
         return False
+
+
+def encode_cursor(*values) -> str:
+    """Opaque, URL-safe cursor over JSON-serializable values; clients must pass it back unchanged."""
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Optional[list]:
+    """Values of a cursor made by encode_cursor, or None if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
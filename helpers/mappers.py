@@ -0,0 +1,118 @@
+import re
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+from asyncpg import Record
+
+# A field is a column name, named and transformed by the rules below, or
+# (key, column) / (key, column, transformer) to spell them out. A None column
+# makes the transformer a factory called for every row, e.g. ("rollsList", None, list).
+Field = Union[str, Tuple[str, Optional[str]], Tuple[str, Optional[str], Callable[[Any], Any]]]
+
+
+def to_camel_case(s: str) -> str:
+    """Convert snake_case or kebab-case to camelCase."""
+    parts = re.split(r'[_\- ]+', s)
+    return parts[0].lower() + ''.join(word.capitalize() for word in parts[1:])
+
+
+class RowMapper:
+    """
+    Converts result sets to JSON-ready dicts with a function generated for the
+    fields, specialized to the column set it meets and cached per column set:
+    asyncpg Records are read by position, other mappings by key, and every
+    key, transformer and position is resolved once instead of per row.
+
+    `fields` None maps every column of the rows with the naming rules
+    (key_mappings, else camelCase) and the transformers of `transformers`,
+    applied to values that aren't None; the `none_safe` ones, which pass None
+    through themselves, are called unguarded. `optional` columns are left out
+    of a row's dict when missing from the result or None in that row.
+    """
+
+    __slots__ = ("name", "fields", "optional", "key_mappings", "transformers", "none_safe", "_compiled")
+
+    def __init__(self, name: str, fields: Optional[Sequence[Field]] = None, *, optional: Sequence[str] = (),
+                 key_mappings: Mapping[str, str] = None, transformers: Mapping[str, Callable] = None,
+                 none_safe: Sequence[Callable] = ()):
+        self.name = name
+        self.fields = None if fields is None else tuple(fields)
+        self.optional = tuple(optional)
+        self.key_mappings = key_mappings or {}
+        self.transformers = transformers or {}
+        self.none_safe = tuple(none_safe)
+        self._compiled = {}  # (read by position, column names) -> generated function
+
+    def __repr__(self):
+        return f"<RowMapper {self.name}>"
+
+    def __call__(self, rows: Optional[Iterable[Mapping[str, Any]]]) -> List[Dict[str, Any]]:
+        """Dicts of a whole result set, whose rows share their columns."""
+        if not rows:
+            return []
+        rows = rows if isinstance(rows, (list, tuple)) else list(rows)
+        return self._function_for(rows[0])(rows)
+
+    def one(self, row: Mapping[str, Any]) -> Dict[str, Any]:
+        """Dict of a single row."""
+        return self._function_for(row)((row,))[0]
+
+    def _function_for(self, row):
+        key = (isinstance(row, Record), tuple(row.keys()))
+        function = self._compiled.get(key)
+        if function is None:
+            function = self._compiled[key] = self._compile(*key)
+        return function
+
+    def _resolve(self, columns) -> List[Tuple[str, Optional[str], Optional[Callable], bool]]:
+        # (key, column, transformer, transformer skips None) per field
+        if self.fields is None:
+            return [(self.key_mappings.get(column, to_camel_case(column)), column,
+                     self.transformers.get(column), True) for column in columns]
+        resolved = []
+        for field in self.fields:
+            if isinstance(field, str):
+                resolved.append((self.key_mappings.get(field, to_camel_case(field)), field,
+                                 self.transformers.get(field), True))
+            else:
+                key, column, *transformer = field
+                resolved.append((key, column, transformer[0] if transformer else None, False))
+        return resolved
+
+    def _compile(self, by_position: bool, columns: Tuple[str, ...]):
+        positions = {column: i for i, column in enumerate(columns)}
+        namespace = {}
+        entries = []
+        optional = []
+        for i, (key, column, transformer, skips_none) in enumerate(self._resolve(columns)):
+            if column is None:
+                namespace[f"_f{i}"] = transformer
+                entries.append((key, f"_f{i}()"))
+                continue
+            if column not in positions:
+                if column in self.optional:
+                    continue
+                raise KeyError(f"{self.name}: result has no column {column!r}")
+            value = f"r[{positions[column]}]" if by_position else f"r[{column!r}]"
+            if transformer is not None:
+                namespace[f"_t{i}"] = transformer
+                if skips_none and transformer not in self.none_safe:
+                    value = f"(_t{i}({value}) if {value} is not None else None)"
+                else:
+                    value = f"_t{i}({value})"
+            if column in self.optional:
+                optional.append((key, value))
+            else:
+                entries.append((key, value))
+
+        literal = "{" + ", ".join(f"{key!r}: {value}" for key, value in entries) + "}"
+        if not optional:
+            source = f"def map_rows(rows):\n    return [{literal} for r in rows]\n"
+        else:
+            lines = ["def map_rows(rows):", "    out = []", "    for r in rows:", f"        d = {literal}"]
+            for key, value in optional:
+                lines += [f"        v = {value}", "        if v is not None:", f"            d[{key!r}] = v"]
+            lines += ["        out.append(d)", "    return out"]
+            source = "\n".join(lines) + "\n"
+
+        exec(compile(source, f"<RowMapper {self.name}>", "exec"), namespace)
+        return namespace["map_rows"]
@@ -0,0 +1,56 @@
+import re
+
+# Arabic code points Persian/Dari keyboards and copy-pasted text mix in, folded to one canonical letter
+_LETTER_MAP = str.maketrans({
+    "ي": "ی",  # Arabic yeh -> Persian yeh
+    "ى": "ی",  # alef maksura -> Persian yeh
+    "ك": "ک",  # Arabic kaf -> keheh
+    "أ": "ا",  # alef with hamza above -> alef
+    "إ": "ا",  # alef with hamza below -> alef
+    "ة": "ه",  # teh marbuta -> heh
+    "\u200c": " ",  # zero width non-joiner, typed interchangeably with a space
+    "\u200d": None,  # zero width joiner
+    "\u0640": None,  # tatweel
+    **{chr(0x06f0 + i): str(i) for i in range(10)},  # Persian digits
+    **{chr(0x0660 + i): str(i) for i in range(10)},  # Arabic-Indic digits
+})
+
+# Harakat and superscript alef, which staff rarely type but pasted names may carry
+_DIACRITICS = re.compile("[ً-ٰٟ]")
+
+_NON_DIGITS = re.compile(r"\D")
+
+AFGHANISTAN_CALLING_CODE = "93"
+NATIONAL_NUMBER_LENGTH = 9  # e.g. 799123456
+
+
+def normalize_name(text) -> str:
+    """
+    Canonical search key for a name: Arabic letter variants folded to Persian,
+    diacritics, tatweel and ZWJ removed, ZWNJ treated as a space, digits in
+    ASCII, case folded and whitespace collapsed.
+    """
+    if not text:
+        return ""
+    text = _DIACRITICS.sub("", str(text).translate(_LETTER_MAP))
+    return " ".join(text.casefold().split())
+
+
+def normalize_phone(phone) -> str:
+    """
+    Canonical search key for an Afghan phone number: digits only, without the
+    +93 / 0093 / 93 calling code or the leading trunk 0, so 0799123456, +93799123456
+    and 799123456 share the key 799123456, and a partly typed +93799 gives 799.
+    A bare 93 is only taken for the calling code in numbers no longer than an
+    Afghan one; longer numbers keep all their digits.
+    """
+    if not phone:
+        return ""
+    text = str(phone).translate(_LETTER_MAP).strip()
+    digits = _NON_DIGITS.sub("", text)
+    if digits.startswith("00" + AFGHANISTAN_CALLING_CODE):
+        digits = digits[4:]
+    elif digits.startswith(AFGHANISTAN_CALLING_CODE) and \
+            (text.startswith("+") or len(digits) <= len(AFGHANISTAN_CALLING_CODE) + NATIONAL_NUMBER_LENGTH):
+        digits = digits[2:]
+    return digits.lstrip("0")
@@ -0,0 +1,97 @@
+import os
+from datetime import date, datetime
+from typing import Any, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+
+from .general import encode_cursor, decode_cursor
+
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", 100))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", 500))  # larger requested pages are capped to this
+PAGE_CURSOR_VERSION = 1
+
+# Paginated list responses keep their body a plain list; the cursor of the next page,
+# if there is one, comes in this header
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def page_size(limit: Optional[int]) -> int:
+    """Requested page size, defaulted and capped to PAGE_SIZE_MAX."""
+    if not limit or limit < 1:
+        return PAGE_SIZE_DEFAULT
+    return min(limit, PAGE_SIZE_MAX)
+
+
+class Keyset:
+    """
+    One page of a list ordered newest first on (sort column, key column), the key
+    making the order total so no row is skipped or repeated between pages.
+
+    The query takes the last row of the previous page and a row limit as its
+    final parameters and filters on the row comparison, e.g.
+
+        WHERE (t.created_at, t.id) < (COALESCE($n, 'infinity'), COALESCE($n+1, 0))
+        ORDER BY t.created_at DESC, t.id DESC
+        LIMIT $n+2
+
+    which the (created_at, id) index answers without reading the skipped rows.
+    The cursor also carries the list's filters (`scope`): a cursor is only
+    accepted back by the same list with the same filters.
+
+    Dates and datetimes are sorted on as `sort_type`, carried in the cursor as
+    ISO strings; an int or str sort column (e.g. an id, as both sort and key)
+    is carried as it is.
+
+    A request with neither cursor nor limit, as clients from before paging send,
+    gets the whole list: the limit parameter is then NULL, which is no limit.
+    """
+
+    __slots__ = ("scope", "sort_column", "key_column", "sort_type", "limit", "after")
+
+    def __init__(self, cursor: Optional[str], limit: Optional[int], scope: Sequence[Any],
+                 sort_column: str = "created_at", key_column: str = "id", sort_type: type = datetime):
+        self.scope = list(scope)
+        self.sort_column = sort_column
+        self.key_column = key_column
+        self.sort_type = sort_type
+        self.limit = page_size(limit) if cursor or limit is not None else None
+        self.after = self._decode(cursor) if cursor else (None, None)
+
+    def _decode(self, cursor: str) -> Tuple[Any, Any]:
+        values = decode_cursor(cursor)
+        try:
+            version, scope, sort_value, key = values
+            if version != PAGE_CURSOR_VERSION or scope != self.scope or not isinstance(key, (int, str)):
+                raise ValueError
+            if issubclass(self.sort_type, date):
+                return self.sort_type.fromisoformat(sort_value), key
+            if not isinstance(sort_value, self.sort_type) or isinstance(sort_value, bool):
+                raise ValueError
+            return sort_value, key
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    @property
+    def args(self) -> tuple:
+        """Last sort value, last key and row limit, the query's final parameters."""
+        # One row beyond the page tells whether there is a next one
+        return self.after[0], self.after[1], None if self.limit is None else self.limit + 1
+
+    def page(self, rows: list) -> Tuple[list, Optional[str]]:
+        """The page's rows and the cursor of the next page, None on the last one."""
+        if self.limit is None or len(rows) <= self.limit:
+            return rows, None
+        rows = rows[:self.limit]
+        last = rows[-1]
+        sort_value = last[self.sort_column]
+        if isinstance(sort_value, date):
+            sort_value = sort_value.isoformat()
+        return rows, encode_cursor(PAGE_CURSOR_VERSION, self.scope, sort_value, last[self.key_column])
+
+
+def page_headers(next_cursor: Optional[str], headers: Optional[dict] = None) -> dict:
+    """Response headers of a page, naming the next page's cursor if there is one."""
+    headers = dict(headers or {})
+    if next_cursor:
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+    return headers
@@ -0,0 +1,63 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import UUID
+
+from asyncpg import Record
+from fastapi.responses import JSONResponse as _JSONResponse
+
+try:
+    import orjson
+except ImportError:  # the stdlib encoder, with the same output, when orjson isn't installed
+    orjson = None
+
+# Datetimes as isoformat(timespec="seconds") gives them, the format the API always used
+ORJSON_OPTIONS = orjson.OPT_OMIT_MICROSECONDS | orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+
+def to_jsonable(value):
+    """
+    JSON-ready form of the values the encoders don't take natively: asyncpg
+    Records as dicts, Decimals as floats and, for encoders without native
+    support, dates and datetimes as ISO strings and UUIDs as strings.
+    """
+    if isinstance(value, Record):
+        return dict(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat(timespec="seconds")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps_json(value) -> bytes:
+    """Compact UTF-8 JSON of a value, dates, datetimes, UUIDs, Decimals and Records included."""
+    if orjson is not None:
+        return orjson.dumps(value, default=to_jsonable, option=ORJSON_OPTIONS)
+    return json.dumps(value, default=to_jsonable, ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode()
+
+
+def loads_json(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def json_param(value) -> str:
+    """
+    Text of a json/jsonb query parameter, the encoder of the connections' codecs.
+    A str is taken as JSON text already, as the bill forms send fabrics and parts.
+    """
+    if isinstance(value, str):
+        return value
+    return dumps_json(value).decode()
+
+
+class JSONResponse(_JSONResponse):
+    """JSONResponse rendered by dumps_json; the application's default response class."""
+
+    def render(self, content) -> bytes:
+        return dumps_json(content)
@@ -0,0 +1,212 @@
+import zlib
+from typing import AsyncIterator, Tuple, Any, Mapping
+
+from fastapi.responses import StreamingResponse
+
+from .serialization import dumps_json, to_jsonable
+
+try:
+    import msgpack
+except ImportError:  # columnar msgpack is only offered when installed
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # zstd is only offered when installed; gzip always is
+    zstandard = None
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+COLUMNAR_JSON_MEDIA_TYPE = "application/vnd.pardaaf.columnar+json"
+COLUMNAR_MSGPACK_MEDIA_TYPE = "application/vnd.pardaaf.columnar+msgpack"
+
+COMPRESS_FLUSH_BYTES = 64 * 1024  # compressed output is pushed to the client at least this often
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+async def json_object_chunks(sections: AsyncIterator[Tuple[str, Any]]):
+    """
+    Write (key, value) pairs as one JSON object while they arrive. List values
+    are batches: consecutive batches for the same key form one array, so a
+    client sees exactly the document a buffered JSONResponse would have sent.
+    """
+    open_key = None  # key of the array being written
+    keys_written = 0
+    array_empty = True
+    yield b"{"
+    async for key, value in sections:
+        is_batch = isinstance(value, list)
+        if key != open_key or not is_batch:
+            if open_key is not None:
+                yield b"]"
+                open_key = None
+            head = (b"," if keys_written else b"") + dumps_json(key) + b":"
+            keys_written += 1
+            if not is_batch:
+                yield head + dumps_json(value)
+                continue
+            open_key = key
+            array_empty = True
+            yield head + b"["
+        if value:
+            # The batch encoded as one array, its brackets dropped (same encoding as JSONResponse)
+            yield (b"" if array_empty else b",") + dumps_json(value)[1:-1]
+            array_empty = False
+    if open_key is not None:
+        yield b"]"
+    yield b"}"
+
+
+async def ndjson_chunks(sections: AsyncIterator[Tuple[str, Any]]):
+    """
+    Write (key, value) pairs as newline delimited JSON: consecutive plain values
+    share one {"key": value, ...} line, and each item of a list batch becomes its own
+    {"key": item} line.
+    """
+    header = {}
+    async for key, value in sections:
+        if not isinstance(value, list):
+            header[key] = value
+            continue
+        if header:
+            yield dumps_json(header) + b"\n"
+            header = {}
+        if value:
+            prefix = b"{" + dumps_json(key) + b":"
+            yield b"".join(prefix + dumps_json(item) + b"}\n" for item in value)
+    if header:
+        yield dumps_json(header) + b"\n"
+
+
+def columnar_block(rows):
+    """
+    One batch of same-keyed dicts as columns: {"fields": [...], "columns": [[...], ...]},
+    columns[i] holding every row's value for fields[i].
+    """
+    if not rows:
+        return {"fields": [], "columns": []}
+    fields = list(rows[0])
+    return {"fields": fields, "columns": [[row[field] for row in rows] for field in fields]}
+
+
+async def columnar_sections(sections: AsyncIterator[Tuple[str, Any]]):
+    """Turn each batch of dicts into a one-block list, leaving other values (e.g. lists of codes) as they are."""
+    async for key, value in sections:
+        if isinstance(value, list) and value and isinstance(value[0], dict):
+            value = [columnar_block(value)]
+        yield key, value
+
+
+async def msgpack_chunks(sections: AsyncIterator[Tuple[str, Any]]):
+    """
+    Write (key, value) pairs as a stream of msgpack [key, value] arrays; a reader
+    feeds them to msgpack.Unpacker and extends list values that repeat a key.
+    """
+    # Dates and datetimes as the JSON encodings write them, not msgpack's timestamp extension
+    packer = msgpack.Packer(default=to_jsonable, datetime=False)
+    async for key, value in sections:
+        yield packer.pack([key, value])
+
+
+async def dict_sections(content: Mapping[str, Any]):
+    """A plain dict as (key, value) sections, for responses built in memory."""
+    for key, value in content.items():
+        yield key, value
+
+
+async def _compressed(chunks, encoding):
+    if encoding == "zstd":
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+        sync_flush = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        sync_flush = zlib.Z_SYNC_FLUSH
+
+    pending = 0
+    async for chunk in chunks:
+        out = compressor.compress(chunk)
+        pending += len(chunk)
+        if pending >= COMPRESS_FLUSH_BYTES:
+            # Hand the client what we have instead of letting the compressor sit on it
+            out += compressor.flush(sync_flush)
+            pending = 0
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def _accepted(header: str) -> list:
+    """Media types or codings listed in an Accept / Accept-Encoding header, minus those with q=0."""
+    accepted = []
+    for item in (header or "").split(","):
+        value, *params = (part.strip() for part in item.split(";"))
+        if value and not any(param.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000") for param in params):
+            accepted.append(value.lower())
+    return accepted
+
+
+def negotiate_payload(headers: Mapping[str, str]) -> Tuple[str, str]:
+    """
+    (media type, content coding or None) for a response, from the request's
+    Accept and Accept-Encoding headers. Formats and codings whose optional
+    package isn't installed are never chosen.
+    """
+    accept = _accepted(headers.get("accept"))
+    if COLUMNAR_MSGPACK_MEDIA_TYPE in accept and msgpack is not None:
+        media_type = COLUMNAR_MSGPACK_MEDIA_TYPE
+    elif COLUMNAR_JSON_MEDIA_TYPE in accept:
+        media_type = COLUMNAR_JSON_MEDIA_TYPE
+    elif NDJSON_MEDIA_TYPE in accept:
+        media_type = NDJSON_MEDIA_TYPE
+    else:
+        media_type = "application/json"
+
+    codings = _accepted(headers.get("accept-encoding"))
+    if "zstd" in codings and zstandard is not None:
+        encoding = "zstd"
+    elif "gzip" in codings:
+        encoding = "gzip"
+    else:
+        encoding = None
+    return media_type, encoding
+
+
+async def streaming_response(sections: AsyncIterator[Tuple[str, Any]], headers: Mapping[str, str]):
+    """
+    StreamingResponse over (key, value) sections in the format the request asks for
+    (see negotiate_payload):
+
+    - application/json: one chunked JSON object, list values merged across batches
+    - application/x-ndjson: one line per list item, after a line of the plain values
+    - application/vnd.pardaaf.columnar+json / +msgpack: the JSON object, or a stream of
+      msgpack [key, value] arrays, with each batch of dicts sent as a columnar_block
+
+    compressed with zstd or gzip when Accept-Encoding allows.
+
+    The first section is read before the response starts, so a failure to open
+    the stream (e.g. the database is unreachable) still ends in an error status
+    rather than a truncated 200.
+    """
+    first = await anext(sections, None)
+
+    async def replay():
+        if first is not None:
+            yield first
+        async for section in sections:
+            yield section
+
+    media_type, encoding = negotiate_payload(headers)
+    if media_type == COLUMNAR_MSGPACK_MEDIA_TYPE:
+        chunks = msgpack_chunks(columnar_sections(replay()))
+    elif media_type == COLUMNAR_JSON_MEDIA_TYPE:
+        chunks = json_object_chunks(columnar_sections(replay()))
+    elif media_type == NDJSON_MEDIA_TYPE:
+        chunks = ndjson_chunks(replay())
+    else:
+        chunks = json_object_chunks(replay())
+
+    response_headers = {"Vary": "Accept, Accept-Encoding"}
+    if encoding is not None:
+        chunks = _compressed(chunks, encoding)
+        response_headers["Content-Encoding"] = encoding
+    return StreamingResponse(chunks, media_type=media_type, headers=response_headers)
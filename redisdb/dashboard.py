@@ -0,0 +1,32 @@
+from typing import Optional
+
+from helpers.serialization import dumps_json, loads_json
+from redisdb.connection import get_redis_connection
+
+DASHBOARD_GENERATION_TTL_SECONDS = 7 * 24 * 3600  # far longer than any snapshot lives
+
+
+async def get_dashboard_generation_redis(tenant: str) -> str:
+    """Current dashboard generation of the tenant; every invalidation moves it on."""
+    r = await get_redis_connection()
+    return await r.get(f"tenant:dashboard_generation:{tenant}") or "0"
+
+
+async def bump_dashboard_generation_redis(tenant: str):
+    r = await get_redis_connection()
+    name = f"tenant:dashboard_generation:{tenant}"
+    async with r.pipeline(transaction=True) as pipe:
+        pipe.incr(name)
+        pipe.expire(name, DASHBOARD_GENERATION_TTL_SECONDS)
+        await pipe.execute()
+
+
+async def get_dashboard_snapshot_redis(tenant: str, generation: str) -> Optional[dict]:
+    r = await get_redis_connection()
+    cached = await r.get(f"tenant:dashboard:{tenant}:{generation}")
+    return loads_json(cached) if cached is not None else None
+
+
+async def set_dashboard_snapshot_redis(tenant: str, generation: str, snapshot: dict, ttl: int):
+    r = await get_redis_connection()
+    await r.set(f"tenant:dashboard:{tenant}:{generation}", dumps_json(snapshot), ex=ttl)
@@ -0,0 +1,51 @@
+from typing import Optional
+
+from helpers.serialization import dumps_json, loads_json
+from redisdb.connection import get_redis_connection
+
+SYNC_VERSIONS_TTL_SECONDS = 24 * 3600  # re-read from the syncs table at least daily
+CACHED_LIST_TTL_SECONDS = 7 * 24 * 3600  # a new version gets a new key; old ones just expire
+
+
+async def get_sync_versions_redis(tenant: str, keys: list) -> dict:
+    """Cached syncs.value per key, as ISO strings; keys never cached are missing."""
+    r = await get_redis_connection()
+    values = await r.hmget(f"tenant:sync_versions:{tenant}", keys)
+    return {key: value for key, value in zip(keys, values) if value is not None}
+
+
+async def set_sync_version_redis(tenant: str, key: str, version: str):
+    """Record a version just written to the syncs table."""
+    r = await get_redis_connection()
+    name = f"tenant:sync_versions:{tenant}"
+    async with r.pipeline(transaction=True) as pipe:
+        pipe.hset(name, key, version)
+        pipe.expire(name, SYNC_VERSIONS_TTL_SECONDS)
+        await pipe.execute()
+
+
+async def fill_sync_versions_redis(tenant: str, versions: dict):
+    """
+    Cache versions read from the syncs table without overwriting any field:
+    a concurrent set_sync_version_redis carries a newer value than this read.
+    """
+    if not versions:
+        return
+    r = await get_redis_connection()
+    name = f"tenant:sync_versions:{tenant}"
+    async with r.pipeline(transaction=True) as pipe:
+        for key, version in versions.items():
+            pipe.hsetnx(name, key, version)
+        pipe.expire(name, SYNC_VERSIONS_TTL_SECONDS)
+        await pipe.execute()
+
+
+async def get_cached_list_redis(tenant: str, key: str, version: str) -> Optional[list]:
+    r = await get_redis_connection()
+    cached = await r.get(f"tenant:list:{tenant}:{key}:{version}")
+    return loads_json(cached) if cached is not None else None
+
+
+async def set_cached_list_redis(tenant: str, key: str, version: str, value: list):
+    r = await get_redis_connection()
+    await r.set(f"tenant:list:{tenant}:{key}:{version}", dumps_json(value), ex=CACHED_LIST_TTL_SECONDS)
@@ -1,15 +1,16 @@
 from typing import Optional
 
 from dotenv import load_dotenv
-from fastapi import APIRouter, Form, Depends
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Form, Depends, Request
 
 from Models import CodeRequest, UpdateBillStatusRequest, UpdateBillTailorRequest, AddPaymentBillRequest
 from db import insert_new_bill, remember_users_action, update_bill, get_bill_ps, search_bills_list_filtered, \
-    remove_bill_ps, update_bill_status_ps, update_bill_tailor_ps, add_payment_bill_ps, get_payment_history_ps
-from helpers import get_formatted_search_results_list
+    remove_bill_ps, update_bill_status_ps, update_bill_tailor_ps, add_payment_bill_ps, get_payment_history_ps, \
+    get_sync_versions
+from helpers import JSONResponse, get_formatted_search_results_list, get_date_range, request_etag, etag_matches, \
+    etag_headers, not_modified_response, page_headers
 from telegram import notify_if_applicable
-from utils import verify_jwt_user
+from utils import verify_jwt_user, unit_of_work
 
 router = APIRouter()
 load_dotenv(override=True)
@@ -34,28 +35,30 @@ async def add_or_edit_bill(
         installation: Optional[str] = Form(None),
         user_data: dict = Depends(verify_jwt_user(required_level=2))
 ):
-    if codeToEdit is None:
-        # CREATE NEW
-        code = await insert_new_bill(billDate, dueDate, customerName, customerNumber, price, paid, remaining, status,
-                                     fabrics, parts, salesman, tailor, additionalData, installation)
-        if not code:
-            return JSONResponse(content={
-                "result": False,
-                "code": code,
-                "name": customerName
-            })
-        await remember_users_action(user_data['user_id'], f"Bill Added: {code}")
-    else:
-        # UPDATE OLD
-        code = await update_bill(codeToEdit, dueDate, customerName, customerNumber, price, paid, remaining, status,
-                                 fabrics, parts, salesman, tailor, additionalData, installation, user_data['username'])
-        if not code:
-            return JSONResponse(content={
-                "result": False,
-                "code": code,
-                "name": customerName
-            })
-        await remember_users_action(user_data['user_id'], f"Bill updated: {code}")
+    async with unit_of_work():
+        if codeToEdit is None:
+            # CREATE NEW
+            code = await insert_new_bill(billDate, dueDate, customerName, customerNumber, price, paid, remaining,
+                                         status, fabrics, parts, salesman, tailor, additionalData, installation)
+            if not code:
+                return JSONResponse(content={
+                    "result": False,
+                    "code": code,
+                    "name": customerName
+                })
+            await remember_users_action(user_data['user_id'], f"Bill Added: {code}")
+        else:
+            # UPDATE OLD
+            code = await update_bill(codeToEdit, dueDate, customerName, customerNumber, price, paid, remaining,
+                                     status, fabrics, parts, salesman, tailor, additionalData, installation,
+                                     user_data['username'])
+            if not code:
+                return JSONResponse(content={
+                    "result": False,
+                    "code": code,
+                    "name": customerName
+                })
+            await remember_users_action(user_data['user_id'], f"Bill updated: {code}")
     return JSONResponse(content={
         "result": True,
         "code": code,
@@ -77,17 +80,28 @@ async def get_bill(
 
 @router.get("/bills-list-get")
 async def get_bills_list(
+        request: Request,
         date: int,
         state: int,
-        _: dict = Depends(verify_jwt_user(required_level=1))
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+        user_data: dict = Depends(verify_jwt_user(required_level=1))
 ):
     """
-    Retrieve a list of bills based on date or state.
+    Retrieve a page of bills based on date or state, newest first.
+    The next page's cursor, if any, is in the X-Next-Cursor header.
+    Answers 304 to an If-None-Match naming the current bills and users versions;
+    the date filters are relative to today, so the tag also changes at midnight.
     """
-    bills_data = await search_bills_list_filtered(date, state)
+    etag = request_etag(request, user_data['tenant'], await get_sync_versions(["bills", "users"]),
+                        get_date_range(date))
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified_response(etag)
+
+    bills_data, next_cursor = await search_bills_list_filtered(date, state, cursor, limit)
     bills_list = get_formatted_search_results_list(None, bills_data)
 
-    return JSONResponse(content=bills_list, status_code=200)
+    return JSONResponse(content=bills_list, status_code=200, headers=page_headers(next_cursor, etag_headers(etag)))
 
 
 @router.post("/add-payment-bill")
@@ -107,13 +121,17 @@ async def add_payment_bill(
 @router.get("/bill-payment-history-get")
 async def get_bill_payment_history(
         code: str,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
         _: dict = Depends(verify_jwt_user(required_level=1))
 ):
     """
-    Retrieve bill payment_history based on code.
+    Retrieve a bill's payment history based on code: all of it oldest first, or
+    with a cursor or limit a page of it newest first. The next page's cursor,
+    if any, is in the X-Next-Cursor header.
     """
-    payment_history = await get_payment_history_ps(code)
-    return JSONResponse(content=payment_history, status_code=200)
+    payment_history, next_cursor = await get_payment_history_ps(code, cursor, limit)
+    return JSONResponse(content=payment_history, status_code=200, headers=page_headers(next_cursor))
 
 
 @router.post("/update-bill-status")
@@ -124,12 +142,14 @@ async def update_bill_status(
     """
     Endpoint to update a bill's status.
     """
-    previous_status = await update_bill_status_ps(request.code, request.status)
-    result = previous_status is not None
+    async with unit_of_work():
+        previous_status = await update_bill_status_ps(request.code, request.status)
+        result = previous_status is not None
+        if result:
+            await remember_users_action(user_data['user_id'], f"Bill status updated: {request.code} "
+                                                              f"from {previous_status} to {request.status}")
     if result:
         await notify_if_applicable(request.code, previous_status, request.status)
-        await remember_users_action(user_data['user_id'], f"Bill status updated: "
-                                                          f"{request.code} from {previous_status} to {request.status}")
     return JSONResponse(content={"result": result}, status_code=200)
 
 
@@ -1,9 +1,10 @@
+from typing import Optional
+
 from dotenv import load_dotenv
 from fastapi import APIRouter, Depends
-from fastapi.responses import JSONResponse
 
-from db import get_dashboard_data_ps, get_recent_activities_preview, search_recent_activities_list
-from helpers import get_formatted_recent_activities_list
+from db import get_dashboard_snapshot, search_recent_activities_list
+from helpers import JSONResponse, get_formatted_recent_activities_list, page_headers
 from utils import verify_jwt_user
 
 router = APIRouter()
@@ -19,24 +20,23 @@ async def index():
 async def get_dashboard_data(
         _: dict = Depends(verify_jwt_user(required_level=1))
 ):
-    data = await get_dashboard_data_ps()
-    activities_data = await get_recent_activities_preview()
-    activities_list = get_formatted_recent_activities_list(activities_data)
-    data["recentActivities"] = activities_list
-
-    # Fetch data for the dashboard
+    # Cached snapshot, invalidated by the writes that change it
+    data = await get_dashboard_snapshot()
     return JSONResponse(content=data, status_code=200)
 
 
 @router.get("/recent-activities-list-get")
 async def get_recent_activity(
         _date: int,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
         _: dict = Depends(verify_jwt_user(required_level=3))
 ):
     """
-    Retrieve a list of recent activities.
+    Retrieve a page of recent activities, newest first.
+    The next page's cursor, if any, is in the X-Next-Cursor header.
     """
-    recent_activity_data = await search_recent_activities_list(_date)
+    recent_activity_data, next_cursor = await search_recent_activities_list(_date, cursor, limit)
     recent_activities_list = get_formatted_recent_activities_list(recent_activity_data)
 
-    return JSONResponse(content=recent_activities_list, status_code=200)
+    return JSONResponse(content=recent_activities_list, status_code=200, headers=page_headers(next_cursor))
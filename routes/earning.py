@@ -2,10 +2,9 @@ from typing import Optional
 
 from dotenv import load_dotenv
 from fastapi import APIRouter, Form, Depends
-from fastapi.responses import JSONResponse
 
 from db import add_earning_to_user, remember_users_action, get_users_earning_history_ps
-from helpers import get_formatted_earnings_list
+from helpers import JSONResponse, get_formatted_earnings_list
 from utils import verify_jwt_user
 
 router = APIRouter()
@@ -2,12 +2,11 @@ from typing import Optional
 
 from dotenv import load_dotenv
 from fastapi import Depends, APIRouter, Form
-from fastapi.responses import JSONResponse
 
 from Models import RemoveEntityRequest
 from db import insert_new_entity, remember_users_action, update_entity, get_entity_details_ps, remove_entity_ps, \
     get_entities_list_ps
-from helpers import get_formatted_entities_list
+from helpers import JSONResponse, get_formatted_entities_list
 from utils import verify_jwt_user
 
 router = APIRouter()
@@ -2,12 +2,11 @@ from typing import Optional
 
 from dotenv import load_dotenv
 from fastapi import APIRouter, Depends, Form
-from fastapi.responses import JSONResponse
 
 from Models import AddExpenseRequest, RemoveExpenseRequest
 from db import insert_new_expense, remember_users_action, update_expense, search_expenses_list_filtered, \
     remove_expense_ps
-from helpers import get_formatted_expenses_list
+from helpers import JSONResponse, get_formatted_expenses_list, page_headers
 from utils import verify_jwt_user
 
 router = APIRouter()
@@ -72,14 +71,17 @@ async def add_or_edit_expense(
 async def get_expenses_list(
         date: int,
         category: int,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
         _: dict = Depends(verify_jwt_user(required_level=1))
 ):
     """
-    Retrieve a list of expenses based on date and category.
+    Retrieve a page of expenses based on date and category, newest first.
+    The next page's cursor, if any, is in the X-Next-Cursor header.
     """
-    expenses_data = await search_expenses_list_filtered(date, category)
+    expenses_data, next_cursor = await search_expenses_list_filtered(date, category, cursor, limit)
     expenses_list = get_formatted_expenses_list(expenses_data)
-    return JSONResponse(content=expenses_list, status_code=200)
+    return JSONResponse(content=expenses_list, status_code=200, headers=page_headers(next_cursor))
 
 
 @router.post("/remove-expense")
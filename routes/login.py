@@ -1,9 +1,9 @@
 from dotenv import load_dotenv
 from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import JSONResponse
 
 from Models import RefreshTokenRequest, AuthRequest, ChangePasswordRequest
 from db import get_users_data, check_username_password, update_users_password
+from helpers import JSONResponse
 from utils import verify_refresh_token, create_jwt_token, create_refresh_token, set_db_from_tenant, verify_jwt_user
 from utils.hasher import hash_password
 
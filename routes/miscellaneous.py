@@ -2,10 +2,9 @@ from typing import Optional
 
 from dotenv import load_dotenv
 from fastapi import APIRouter, Form, Depends
-from fastapi.responses import JSONResponse
 
 from db import add_miscellaneous_record_ps, remember_users_action, search_miscellaneous_records, insert_new_expense
-from helpers import get_formatted_misc_list, get_expense_cat_name
+from helpers import JSONResponse, get_formatted_misc_list, get_expense_cat_name
 from utils import verify_jwt_user
 
 router = APIRouter()
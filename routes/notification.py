@@ -2,10 +2,9 @@ from typing import Optional
 
 from dotenv import load_dotenv
 from fastapi import APIRouter, Depends
-from fastapi.responses import JSONResponse
 
 from db import get_notifications_for_user_ps
-from helpers import get_formatted_notifications_list
+from helpers import JSONResponse, get_formatted_notifications_list
 from utils import verify_jwt_user
 
 router = APIRouter()
@@ -2,11 +2,12 @@ from typing import Optional
 
 from dotenv import load_dotenv
 from fastapi import APIRouter, Query, HTTPException, Depends
-from fastapi.responses import RedirectResponse, JSONResponse, HTMLResponse
+from fastapi.responses import RedirectResponse, HTMLResponse
 
 from Models import AddOnlineOrderRequest
 from db import insert_new_online_order, subscribe_newsletter_ps, confirm_email_newsletter_ps, unsubscribe_newsletter_ps, \
     get_fx_current_rate
+from helpers import JSONResponse
 from utils import send_mail_html, set_current_db, verify_jwt_user
 
 router = APIRouter()
@@ -2,11 +2,10 @@ from typing import Optional
 
 from dotenv import load_dotenv
 from fastapi import APIRouter, Form, Depends
-from fastapi.responses import JSONResponse
 
 from db import add_payment_to_user, remember_users_action, add_payment_to_supplier, add_payment_to_entity, \
     insert_new_expense, get_user_payment_history_ps, get_supplier_payment_history_ps
-from helpers import get_expense_cat_name, get_formatted_payments_list
+from helpers import JSONResponse, get_expense_cat_name, get_formatted_payments_list
 from utils import verify_jwt_user
 
 router = APIRouter()
@@ -2,15 +2,15 @@ import re
 from typing import Optional
 
 from dotenv import load_dotenv
-from fastapi import APIRouter, Form, File, UploadFile, Depends
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Form, File, UploadFile, Depends, Request
 
 from Models import RemoveRequest
 from db import insert_new_product, handle_image_update, remember_users_action, update_product, \
-    search_products_list_filtered, get_roll_and_product_ps, get_product_and_roll_ps, search_products_list, \
-    remove_product_ps, archive_product_ps
-from helpers import classify_image_upload, get_formatted_search_results_list
-from utils import verify_jwt_user, flatbed
+    search_products_list_filtered, get_roll_and_product_ps, get_product_and_roll_ps, get_search_index, \
+    PRODUCT_FIELDS, remove_product_ps, archive_product_ps, get_sync_versions
+from helpers import JSONResponse, classify_image_upload, get_formatted_search_results_list, request_etag, \
+    etag_matches, etag_headers, not_modified_response
+from utils import verify_jwt_user, flatbed, unit_of_work
 
 router = APIRouter()
 load_dotenv(override=True)
@@ -33,24 +33,26 @@ async def add_or_edit_product(
 ):
     image_status, image_data = await classify_image_upload(image)
 
-    if codeToEdit is None:
-        # CREATE NEW
-        product_code = await insert_new_product(name, categoryIndex, price, description,
+    async with unit_of_work():
+        if codeToEdit is None:
+            # CREATE NEW
+            product_code = await insert_new_product(name, categoryIndex, price, description,
+                                                    material, fabricHeightCm, weightPerMetre, opacityLevel, texture)
+            if not product_code:
+                return JSONResponse(content={"result": False, "code": product_code, "name": name})
+
+            await remember_users_action(user_data['user_id'], f"Product Added: {product_code}")
+        else:
+            # UPDATE EXISTING
+            product_code = await update_product(codeToEdit, name, categoryIndex, price, description,
                                                 material, fabricHeightCm, weightPerMetre, opacityLevel, texture)
-        if not product_code:
-            return JSONResponse(content={"result": False, "code": product_code, "name": name})
+            if not product_code:
+                return JSONResponse(content={"result": False, "code": product_code, "name": name})
 
-        await handle_image_update("product", user_data['tenant'], product_code, image_status, image_data)
-        await remember_users_action(user_data['user_id'], f"Product Added: {product_code}")
-    else:
-        # UPDATE EXISTING
-        product_code = await update_product(codeToEdit, name, categoryIndex, price, description,
-                                            material, fabricHeightCm, weightPerMetre, opacityLevel, texture)
-        if not product_code:
-            return JSONResponse(content={"result": False, "code": product_code, "name": name})
+            await remember_users_action(user_data['user_id'], f"Product updated: {product_code}")
 
-        await handle_image_update("product", user_data['tenant'], product_code, image_status, image_data)
-        await remember_users_action(user_data['user_id'], f"Product updated: {product_code}")
+    # After the commit: the upload to R2 mustn't hold the transaction and its locks open
+    await handle_image_update("product", user_data['tenant'], product_code, image_status, image_data)
 
     return JSONResponse(content={
         "result": True,
@@ -73,58 +75,71 @@ async def get_search_products_list(
     roll_code_pattern = re.fullmatch(r"(?i)p\d+r\d+", searchQuery)
     short_roll_code_pattern = re.fullmatch(r"(?i)r\d+", searchQuery)
 
+    index = await get_search_index()
+
     if roll_code_pattern:
-        product_data = await get_product_and_roll_ps(searchQuery)
+        product_code, roll_code = searchQuery.upper().split("R", 1)
+        product_data = index.product_and_roll(product_code, f"R{roll_code}")
         if product_data:
             results.append(product_data)
 
     elif short_roll_code_pattern:
         # Roll code like R2; get roll and product.
-        product_data = await get_roll_and_product_ps(searchQuery)
+        product_data = index.roll_and_product(searchQuery.upper())
         if product_data:
             results.append(product_data)
 
     elif product_code_pattern:
-        products = await search_products_list(searchQuery, 0)
-        results = get_formatted_search_results_list(products, None)
+        results = index.search(searchQuery, product_field=PRODUCT_FIELDS[0])
     else:
         # name or general string
-        products = await search_products_list(searchQuery, 1)
-        results = get_formatted_search_results_list(products, None)
+        results = index.search(searchQuery, product_field=PRODUCT_FIELDS[1])
 
     return JSONResponse(content=results, status_code=200)
 
 
 @router.get("/products-list-get")
 async def get_products_list(
+        request: Request,
         stockCondition: int,
         category: int,
-        _: dict = Depends(verify_jwt_user(required_level=1))
+        user_data: dict = Depends(verify_jwt_user(required_level=1))
 ):
     """
     Retrieve a list of products based on date and category.
+    Answers 304 to an If-None-Match naming the current inventory version.
     """
+    etag = request_etag(request, user_data['tenant'], await get_sync_versions(["inventory"]))
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified_response(etag)
+
     products_data = await search_products_list_filtered(stockCondition, category)
     products_list = get_formatted_search_results_list(products_data, None)
 
-    return JSONResponse(content=products_list, status_code=200)
+    return JSONResponse(content=products_list, status_code=200, headers=etag_headers(etag))
 
 
 @router.get("/product-and-roll-get")
 async def get_product_and_roll(
+        request: Request,
         code: str,
-        _: dict = Depends(verify_jwt_user(required_level=1))
+        user_data: dict = Depends(verify_jwt_user(required_level=1))
 ):
     """
     If *code* starts with “R” (roll code), call get_roll_and_product_ps;
     otherwise call get_product_and_roll_ps.
+    Answers 304 to an If-None-Match naming the current inventory version.
     """
+    etag = request_etag(request, user_data['tenant'], await get_sync_versions(["inventory"]))
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified_response(etag)
+
     if code and code[0].upper() == "R":
         product = await get_roll_and_product_ps(code, True)
     else:
         product = await get_product_and_roll_ps(code, True)
 
-    return JSONResponse(content=product, status_code=200)
+    return JSONResponse(content=product, status_code=200, headers=etag_headers(etag))
 
 
 @router.post("/remove-product")
@@ -2,13 +2,13 @@ from typing import Optional
 
 from dotenv import load_dotenv
 from fastapi import APIRouter, Form, Depends
-from fastapi.responses import JSONResponse
 
 from Models import RemovePurchaseRequest
 from db import (remember_users_action, insert_new_purchase, update_purchase, remove_purchase_ps,
                 archive_purchase_ps, insert_new_purchase_item, update_purchase_item,
                 search_purchases_list_filtered, search_purchases_list_for_supplier, get_purchase_items_ps)
-from helpers import format_timestamp, get_formatted_purchases_list, get_formatted_purchase_items
+from helpers import JSONResponse, format_timestamp, get_formatted_purchases_list, get_formatted_purchase_items, \
+    page_headers
 from utils import verify_jwt_user, flatbed
 
 router = APIRouter()
@@ -91,15 +91,18 @@ async def add_or_edit_purchase_item(
 @router.get("/purchases-list-get")
 async def get_purchases_list(
         date: int,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
         _: dict = Depends(verify_jwt_user(required_level=3))
 ):
     """
-    Retrieve a list of purchases based on date.
+    Retrieve a page of purchases based on date, newest first.
+    The next page's cursor, if any, is in the X-Next-Cursor header.
     """
-    purchases_data = await search_purchases_list_filtered(date)
+    purchases_data, next_cursor = await search_purchases_list_filtered(date, cursor, limit)
     purchases_list = get_formatted_purchases_list(purchases_data)
 
-    return JSONResponse(content=purchases_list, status_code=200)
+    return JSONResponse(content=purchases_list, status_code=200, headers=page_headers(next_cursor))
 
 
 @router.get("/purchases-list-for-supplier-get")
@@ -1,11 +1,11 @@
 from dotenv import load_dotenv
-from fastapi import APIRouter, Depends
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException
 
 from Models import GenerateReportRequest
 from db import remember_users_action, report_recent_activities_list, \
-    report_tags_list
-from helpers import get_formatted_recent_activities_list, get_formatted_tags_list
+    report_tags_list, stream_report_rows, REPORT_EXPORTS
+from helpers import JSONResponse, get_formatted_recent_activities_list, get_formatted_tags_list, page_headers, \
+    export_response
 from utils import verify_jwt_user
 
 router = APIRouter()
@@ -19,10 +19,18 @@ async def generate_report(
 ):
     """
     Endpoint to generate various reports.
+    The activities report is paged with the request's cursor and limit; the next
+    page's cursor, if any, is in the X-Next-Cursor header.
+    With an exportFormat (csv or xlsx) the whole range is streamed as a download instead.
     """
+    if request.exportFormat:
+        return await export_report(request, user_data)
+
     data = None
+    next_cursor = None
     if request.selectedReport == "activities":
-        recent_activity_data = await report_recent_activities_list(request.fromDate, request.toDate)
+        recent_activity_data, next_cursor = await report_recent_activities_list(
+            request.fromDate, request.toDate, request.cursor, request.limit)
         data = get_formatted_recent_activities_list(recent_activity_data)
     elif request.selectedReport == "tags":
         tags_data = await report_tags_list(request.fromDate, request.toDate)
@@ -30,4 +38,18 @@ async def generate_report(
     await remember_users_action(user_data['user_id'], f"generated Report: "
                                                       f"{request.selectedReport}"
                                                       f" from {request.fromDate} to {request.toDate}")
-    return JSONResponse(content=data, status_code=200)
+    return JSONResponse(content=data, status_code=200, headers=page_headers(next_cursor))
+
+
+async def export_report(request: GenerateReportRequest, user_data: dict):
+    if request.selectedReport not in REPORT_EXPORTS:
+        raise HTTPException(status_code=400, detail=f"Unknown report: {request.selectedReport}")
+
+    _, header = REPORT_EXPORTS[request.selectedReport]
+    # Before the export starts: its read-only transaction then holds the request's connection
+    await remember_users_action(user_data['user_id'], f"exported Report: "
+                                                      f"{request.selectedReport} as {request.exportFormat}"
+                                                      f" from {request.fromDate} to {request.toDate}")
+    rows = stream_report_rows(request.selectedReport, request.fromDate, request.toDate)
+    return await export_response(header, rows, request.exportFormat,
+                                 f"{request.selectedReport}-{request.fromDate}-{request.toDate}")
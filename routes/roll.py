@@ -2,14 +2,14 @@ from typing import Optional
 
 from dotenv import load_dotenv
 from fastapi import APIRouter, Form, UploadFile, File, Depends
-from fastapi.responses import JSONResponse
 
 from Models import RemoveRequest, UpdateRollRequest, UpdateCutFabricTXStatusRequest, CommentRequest
 from db import insert_new_roll, handle_image_update, remember_users_action, update_roll, remove_roll_ps, \
     archive_roll_ps, add_cut_fabric_tx, search_rolls_for_product, \
     get_cutting_history_list_for_roll_ps, get_cutting_history_list_ps, update_cut_fabric_tx_status_ps, \
     search_rolls_for_purchase_item, get_drafts_list_ps
-from helpers import classify_image_upload, get_formatted_rolls_list, format_cut_fabric_records
+from helpers import JSONResponse, classify_image_upload, get_formatted_rolls_list, format_cut_fabric_records, \
+    page_headers
 from utils import verify_jwt_user, flatbed
 
 router = APIRouter()
@@ -95,12 +95,15 @@ async def get_drafts_list(
 async def get_cutting_history_list(
         status: str,
         date: int,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
         _: dict = Depends(verify_jwt_user(required_level=3))
 ):
     """
-    Retrieve a list of cutting history.
+    Retrieve a page of cutting history, newest first.
+    The next page's cursor, if any, is in the X-Next-Cursor header.
     """
-    history_data = await get_cutting_history_list_ps(status, date)
+    history_data, next_cursor = await get_cutting_history_list_ps(status, date, cursor, limit)
     history_list = format_cut_fabric_records(
         history_data,
         extra={
@@ -109,7 +112,7 @@ async def get_cutting_history_list(
         }
     )
 
-    return JSONResponse(content=history_list, status_code=200)
+    return JSONResponse(content=history_list, status_code=200, headers=page_headers(next_cursor))
 
 
 @router.get("/roll-cutting-history-list-get")
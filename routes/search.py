@@ -2,10 +2,9 @@ import re
 
 from dotenv import load_dotenv
 from fastapi import APIRouter, Depends
-from fastapi.responses import JSONResponse
 
-from db import search_bills_list, get_product_and_roll_ps, get_roll_and_product_ps, search_products_list
-from helpers import get_formatted_search_results_list
+from db import get_search_index, PRODUCT_FIELDS, BILL_FIELDS, search_bills_by_key, search_products_list
+from helpers import JSONResponse, get_formatted_search_results_list
 from utils import verify_jwt_user
 
 router = APIRouter()
@@ -28,36 +27,46 @@ async def get_search_results_list(
     short_roll_code_pattern = re.fullmatch(r"(?i)r\d+", searchQuery)
     phone_number_pattern = re.fullmatch(r"\+?\d{4,14}", searchQuery)  # Intl. and local formats
 
+    # Code lookups wait for a cold tenant's index; name and phone lookups use the key columns meanwhile
+    by_code = bill_code_pattern or product_code_pattern or roll_code_pattern or short_roll_code_pattern
+    index = await get_search_index(wait=bool(by_code))
+
     if bill_code_pattern:
         # Search bill by code
-        bills_data = await search_bills_list(searchQuery, 0)
-        search_results_list = get_formatted_search_results_list(None, bills_data)
+        search_results_list = index.search(searchQuery, bill_field=BILL_FIELDS[0])
 
     elif roll_code_pattern:
-        product_data = await get_product_and_roll_ps(searchQuery)
+        product_code, roll_code = searchQuery.upper().split("R", 1)
+        product_data = index.product_and_roll(product_code, f"R{roll_code}")
         if product_data:
             search_results_list.append(product_data)
 
     elif short_roll_code_pattern:
         # Roll code like R2; get roll and product.
-        product_data = await get_roll_and_product_ps(searchQuery)
+        product_data = index.roll_and_product(searchQuery.upper())
         if product_data:
             search_results_list.append(product_data)
 
     elif product_code_pattern:
         # Search product by code
-        products_data = await search_products_list(searchQuery, 0)
-        search_results_list = get_formatted_search_results_list(products_data, None)
+        search_results_list = index.search(searchQuery, product_field=PRODUCT_FIELDS[0])
 
     elif phone_number_pattern:
         # Search bill by customer phone number
-        bills_data = await search_bills_list(searchQuery, 2)
-        search_results_list = get_formatted_search_results_list(None, bills_data)
+        if index is not None:
+            search_results_list = index.search(searchQuery, bill_field=BILL_FIELDS[2])
+        else:
+            bills_data = await search_bills_by_key(searchQuery, 2)
+            search_results_list = get_formatted_search_results_list(None, bills_data)
 
     else:
-        # General search (search both products and bills by name)
-        products_data = await search_products_list(searchQuery, 1)
-        bills_data = await search_bills_list(searchQuery, 1)
-        search_results_list = get_formatted_search_results_list(products_data, bills_data)
+        # General search (search both products and bills by name), ranked together
+        if index is not None:
+            search_results_list = index.search(searchQuery, product_field=PRODUCT_FIELDS[1],
+                                               bill_field=BILL_FIELDS[1])
+        else:
+            products_data = await search_products_list(searchQuery, 1)
+            bills_data = await search_bills_by_key(searchQuery, 1)
+            search_results_list = get_formatted_search_results_list(products_data, bills_data)
 
     return JSONResponse(content=search_results_list, status_code=200)
@@ -1,13 +1,13 @@
 from typing import Optional
 
 from dotenv import load_dotenv
-from fastapi import APIRouter, Form, Depends
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Form, Depends, Request
 
 from Models import RemoveSupplierRequest
 from db import insert_new_supplier, remember_users_action, update_supplier, get_suppliers_list_ps, remove_supplier_ps, \
-    get_supplier_details_ps, get_supplier_ps
-from helpers import get_formatted_suppliers_list
+    get_supplier_details_ps, get_supplier_ps, get_sync_versions
+from helpers import JSONResponse, get_formatted_suppliers_list, request_etag, etag_matches, etag_headers, \
+    not_modified_response
 from utils import verify_jwt_user
 
 router = APIRouter()
@@ -78,14 +78,20 @@ async def get_supplier_details(
 
 @router.get("/suppliers-list-get")
 async def get_suppliers_list(
-        _: dict = Depends(verify_jwt_user(required_level=3))
+        request: Request,
+        user_data: dict = Depends(verify_jwt_user(required_level=3))
 ):
     """
     Retrieve a list of suppliers.
+    Answers 304 to an If-None-Match naming the current suppliers version.
     """
+    etag = request_etag(request, user_data['tenant'], await get_sync_versions(["suppliers"]))
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified_response(etag)
+
     suppliers_data = await get_suppliers_list_ps()
     suppliers_list = get_formatted_suppliers_list(suppliers_data)
-    return JSONResponse(content=suppliers_list, status_code=200)
+    return JSONResponse(content=suppliers_list, status_code=200, headers=etag_headers(etag))
 
 
 @router.post("/remove-supplier")
@@ -1,20 +1,28 @@
 import asyncio
+import json
+import time
 from typing import Optional
 
 from dotenv import load_dotenv
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 
 from Models import CheckSyncRequest, GetListsRequest
-from db import get_sync, fetch_suppliers_list, fetch_salesmen_list, fetch_tailors_list, fetch_users_list, \
-    fetch_entities_list, get_products_list_for_sync, get_rolls_list_for_sync
-from helpers import format_date, get_formatted_products_for_sync_list, \
-    get_formatted_rolls_for_sync_list
+from db import get_sync, get_products_list_for_sync, get_rolls_list_for_sync, stream_inventory_changes, \
+    get_reference_lists, LIST_FETCHERS, get_sync_versions, get_list_versions
+from helpers import JSONResponse, format_date, get_formatted_products_for_sync_list, \
+    get_formatted_rolls_for_sync_list, streaming_response, dict_sections, negotiate_payload, request_etag, \
+    etag_matches, etag_headers, not_modified_response
 from utils import verify_jwt_user
+from utils.conn import current_db, release_request_connections
+from utils.events import subscribe_changes, RESYNC
 
 router = APIRouter()
 load_dotenv(override=True)
 
+SSE_HEARTBEAT_SECONDS = 25  # below the idle timeouts of the proxies in front of us
+SSE_RETRY_MILLISECONDS = 5000
+
 
 @router.post("/check-sync")
 async def check_sync(
@@ -29,53 +37,131 @@ async def check_sync(
     return JSONResponse(content=last_sync, status_code=200)
 
 
+@router.get("/sync-state")
+async def get_sync_state(
+        _: dict = Depends(verify_jwt_user(required_level=1))
+):
+    """
+    Version of every syncs key in one call, so a client can tell which of its
+    lists are stale without a /check-sync round trip per key.
+    """
+    return JSONResponse(content=await get_sync_versions(), status_code=200)
+
+
+@router.get("/changes-stream")
+async def get_changes_stream(
+        user_data: dict = Depends(verify_jwt_user(required_level=1))
+):
+    """
+    Server-sent events announcing changes to the tenant's data, in place of polling
+    /check-sync, /notifications-for-user-get and the list endpoints:
+
+    - `state`: every syncs key's version, sent first (as /sync-state)
+    - `change`: {"key", "version"} whenever a syncs key is stamped, e.g. "bills",
+      "inventory", "notifications", "users"
+    - `resync`: events may have been lost; re-read /sync-state
+    - `expired`: the access token expired; reconnect with a fresh one
+
+    Events come from the tenant's Postgres NOTIFYs through one listener connection
+    per tenant in this worker; an open stream holds no pooled connection.
+    """
+    return StreamingResponse(_change_events(current_db.get(), user_data['expires']),
+                             media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {data}\n\n".encode()
+
+
+async def _change_events(db_name, expires):
+    async with subscribe_changes(db_name) as queue:
+        versions = await get_sync_versions()
+        await release_request_connections()  # don't pin a pooled connection for the stream's lifetime
+        yield f"retry: {SSE_RETRY_MILLISECONDS}\n".encode() + _sse("state", json.dumps(versions))
+
+        while True:
+            remaining = expires - time.time() if expires else SSE_HEARTBEAT_SECONDS
+            if remaining <= 0:
+                yield _sse("expired", "{}")
+                return
+            try:
+                item = await asyncio.wait_for(queue.get(), min(remaining, SSE_HEARTBEAT_SECONDS))
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            yield _sse("resync", "{}") if item is RESYNC else _sse("change", item)
+
+
 @router.post("/get-lists")
 async def get_lists(
         request: GetListsRequest,
-        _: dict = Depends(verify_jwt_user(required_level=2)),
+        http_request: Request,
+        user_data: dict = Depends(verify_jwt_user(required_level=2)),
 ):
-    # Supported keys and their fetch functions
-    list_fetchers = {
-        "suppliers": fetch_suppliers_list,
-        "salesmen": fetch_salesmen_list,
-        "tailors": fetch_tailors_list,
-        "users": fetch_users_list,
-        "entities": fetch_entities_list
-    }
+    """
+    Id/name lists for the requested keys, as JSON or in the negotiated compact
+    format (see helpers.streaming.negotiate_payload).
+
+    Tagged with the lists' versions: an If-None-Match naming the current tag is
+    answered 304 without loading or encoding anything.
+    """
     keys = request.keys
     # If "all" is requested, replace keys with all supported keys
     if "all" in keys:
-        keys = list(list_fetchers.keys())
+        keys = list(LIST_FETCHERS.keys())
 
-    invalid_keys = [k for k in keys if k not in list_fetchers]
+    invalid_keys = [k for k in keys if k not in LIST_FETCHERS]
     if invalid_keys:
         raise HTTPException(status_code=400, detail=f"Invalid list keys requested: {invalid_keys}")
 
-    results = {}
-    for key in keys:
-        fetcher = list_fetchers[key]
-        results[key] = await fetcher()
+    versions = await get_list_versions(keys)
+    etag = request_etag(http_request, user_data['tenant'], versions, keys, negotiate_payload(http_request.headers))
+    if etag_matches(http_request.headers.get("if-none-match"), etag):
+        return not_modified_response(etag)
 
-    return JSONResponse(content=results, status_code=200)
+    results = await get_reference_lists(keys, versions)
+
+    response = await streaming_response(dict_sections(results), http_request.headers)
+    response.headers.update(etag_headers(etag))
+    return response
 
 
 @router.post("/get-inventory-lists")
 async def get_inventory_lists(
+        request: Request,
         oldSync: Optional[str] = None,
+        cursor: Optional[str] = None,
         _: dict = Depends(verify_jwt_user(required_level=1)),
 ):
-
-    products_data, rolls_data = await asyncio.gather(
-        get_products_list_for_sync(oldSync),
-        get_rolls_list_for_sync(oldSync)
-    )
-
-    products_list = get_formatted_products_for_sync_list(products_data)
-    rolls_list = get_formatted_rolls_for_sync_list(rolls_data)
-
-    results = {
-        "products": products_list,
-        "rolls": rolls_list,
-    }
-
-    return JSONResponse(content=results, status_code=200)
+    """
+    Products and rolls changed since `cursor`, with the codes deleted since then
+    and the cursor for the next call. Without a cursor (or with one that can no
+    longer be used) everything is returned and `full` tells the client to replace
+    its copy. `oldSync` serves app versions that still sync by timestamp.
+
+    Streamed as it is read from the database: one JSON object by default, one
+    line per product/roll with `Accept: application/x-ndjson`, or columnar blocks
+    (JSON or msgpack), optionally zstd/gzip compressed, as negotiated by
+    helpers.streaming.negotiate_payload.
+    """
+    if oldSync and not cursor:
+        products_data, rolls_data = await asyncio.gather(
+            get_products_list_for_sync(oldSync),
+            get_rolls_list_for_sync(oldSync)
+        )
+        results = {
+            "products": get_formatted_products_for_sync_list(products_data),
+            "rolls": get_formatted_rolls_for_sync_list(rolls_data),
+        }
+        return JSONResponse(content=results, status_code=200)
+
+    return await streaming_response(_format_inventory_sections(stream_inventory_changes(cursor)),
+                                    request.headers)
+
+
+async def _format_inventory_sections(sections):
+    formatters = {"products": get_formatted_products_for_sync_list, "rolls": get_formatted_rolls_for_sync_list}
+    async for key, value in sections:
+        formatter = formatters.get(key)
+        yield key, formatter(value) if formatter else value
@@ -2,12 +2,11 @@ from typing import Optional
 
 from dotenv import load_dotenv
 from fastapi import APIRouter, Depends, Form, File, UploadFile
-from fastapi.responses import JSONResponse
 
 from Models import RemoveUserRequest
 from db import remove_user_ps, handle_image_update, remember_users_action, insert_new_user, update_user, \
     get_users_list_ps, edit_employment_info_ps, get_profile_data_ps, get_employment_info_ps
-from helpers import classify_image_upload, get_formatted_users_list
+from helpers import JSONResponse, classify_image_upload, get_formatted_users_list
 from utils import verify_jwt_user
 
 router = APIRouter()
@@ -5,3 +5,7 @@ from . import backup
 from . import notification
 from . import cleanup
 from . import exchange
+from . import search_keys
+from . import stock
+from . import dashboard
+from . import migrations
@@ -0,0 +1,37 @@
+from celery_app import celery_app
+from db import get_all_gallery_db_names, verify_dashboard_counters
+from helpers import run_async
+from utils import set_current_db, flatbed
+
+
+@celery_app.task
+def verify_counters():
+    """
+    Task that checks every tenant's dashboard counters against the
+    get_dashboard_data() procedure and corrects the ones that differ. The
+    triggers should leave nothing to correct, so every correction is reported.
+    """
+
+    async def run_for_all_tenants():
+        try:
+            set_current_db("pardaaf_main")
+            db_names = await get_all_gallery_db_names()
+
+            for db_name in db_names:
+                try:
+                    set_current_db(db_name)
+                    drift = await verify_dashboard_counters()
+                    if drift:
+                        details = ", ".join(f"{name} {old}->{new}" for name, (old, new) in drift.items())
+                        await flatbed("warning", f"Corrected dashboard counter drift: {details}")
+
+                except Exception as tenant_error:
+                    await flatbed("exception", f"In celery verify_counters: {tenant_error}")
+                    continue  # move to next tenant
+
+        except Exception as e:
+            set_current_db("pardaaf_main")
+            await flatbed("exception", f"In celery verify_counters: {e}")
+            return {"status": "error", "error": str(e)}
+
+    run_async(run_for_all_tenants())
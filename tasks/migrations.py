@@ -0,0 +1,12 @@
+from celery_app import celery_app
+from db import migrate_all_tenants
+from helpers import run_async
+
+
+@celery_app.task
+def migrate_tenants():
+    """
+    Task that applies the pending schema migrations (db/migrations.py) to every
+    tenant database. Run it on deploy; the daily run sets up galleries added since.
+    """
+    run_async(migrate_all_tenants())
@@ -7,7 +7,8 @@ from utils import set_current_db, flatbed
 @celery_app.task
 def scheduled_notify_salesman_tailor():
     """
-    Scheduled task that checks due bills and notifies related salesmen and tailors.
+    Scheduled task that checks overdue and due bills and notifies related salesmen
+    and tailors, reporting the notifications created per tenant.
     """
 
     async def run_for_all_tenants():
@@ -17,13 +18,18 @@ def scheduled_notify_salesman_tailor():
 
             # Step 2: Fetch all gallery db_names
             db_names = await get_all_gallery_db_names()
+            created = {}
 
             for db_name in db_names:
                 try:
                     # Step 3: Switch to each tenant DB
                     set_current_db(db_name)
 
-                    await check_due_add_notification_for_related_staff()
+                    counts = await check_due_add_notification_for_related_staff()
+                    if any(counts.values()):
+                        created[db_name] = counts
+                        details = ", ".join(f"{name}: {count}" for name, count in counts.items())
+                        await flatbed("info", f"Due bill notifications created ({details})")
 
                 except Exception as tenant_error:
                     await flatbed("exception", f"In celery notify_salesman_tailor: {tenant_error}")
@@ -34,4 +40,6 @@ def scheduled_notify_salesman_tailor():
             await flatbed("exception", f"In celery notify_salesman_tailor: {e}")
             return {"status": "error", "error": str(e)}
 
-    run_async(run_for_all_tenants())
+        return {"status": "ok", "created": created}
+
+    return run_async(run_for_all_tenants())
@@ -0,0 +1,37 @@
+from celery_app import celery_app
+from db import get_all_gallery_db_names, backfill_bill_search_keys
+from helpers import run_async
+from utils import set_current_db, flatbed
+
+
+@celery_app.task
+def backfill_search_keys():
+    """
+    Task that recomputes the normalized customer name/number keys on every
+    tenant's bills, e.g. of bills written by SQL procedures; the columns and
+    the first backfill come with the tenant migrations. Safe to rerun; only
+    changed rows are written.
+    """
+
+    async def run_for_all_tenants():
+        try:
+            set_current_db("pardaaf_main")
+            db_names = await get_all_gallery_db_names()
+
+            for db_name in db_names:
+                try:
+                    set_current_db(db_name)
+                    updated = await backfill_bill_search_keys()
+                    if updated:
+                        await flatbed("info", f"Backfilled search keys for {updated} bills")
+
+                except Exception as tenant_error:
+                    await flatbed("exception", f"In celery backfill_search_keys: {tenant_error}")
+                    continue  # move to next tenant
+
+        except Exception as e:
+            set_current_db("pardaaf_main")
+            await flatbed("exception", f"In celery backfill_search_keys: {e}")
+            return {"status": "error", "error": str(e)}
+
+    run_async(run_for_all_tenants())
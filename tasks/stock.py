@@ -0,0 +1,41 @@
+from celery_app import celery_app
+from db import get_all_gallery_db_names, reconcile_product_stock
+from helpers import run_async
+from utils import set_current_db, flatbed
+
+
+@celery_app.task
+def reconcile_stock():
+    """
+    Task that recounts every tenant's product stock totals from the rolls and
+    repairs the ones that drifted. The triggers should leave nothing to repair,
+    so every repaired product is reported.
+    """
+
+    async def run_for_all_tenants():
+        try:
+            set_current_db("pardaaf_main")
+            db_names = await get_all_gallery_db_names()
+
+            for db_name in db_names:
+                try:
+                    set_current_db(db_name)
+                    repaired = await reconcile_product_stock()
+                    if repaired:
+                        details = ", ".join(
+                            f"{row['product_code']} ({row['old_quantity']}->{row['quantity']}cm, "
+                            f"{row['old_active_rolls']}->{row['active_rolls']} rolls, "
+                            f"{row['old_stock_value']}->{row['stock_value']})"
+                            for row in repaired[:20])
+                        await flatbed("warning", f"Repaired stock drift for {len(repaired)} products: {details}")
+
+                except Exception as tenant_error:
+                    await flatbed("exception", f"In celery reconcile_stock: {tenant_error}")
+                    continue  # move to next tenant
+
+        except Exception as e:
+            set_current_db("pardaaf_main")
+            await flatbed("exception", f"In celery reconcile_stock: {e}")
+            return {"status": "error", "error": str(e)}
+
+    run_async(run_for_all_tenants())
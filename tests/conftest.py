@@ -0,0 +1,71 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+# The application's packages (db, helpers, utils, ...) live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import conn as conn_module  # noqa: E402
+from utils.conn import RequestScope, request_scope, set_current_db  # noqa: E402
+
+
+class FakePool:
+    """Hands out numbered connections, yielding to the loop first as a real acquire would."""
+
+    def __init__(self):
+        self.handed_out = 0
+        self.checked_out = set()
+
+    async def acquire(self):
+        await asyncio.sleep(0)
+        self.handed_out += 1
+        self.checked_out.add(self.handed_out)
+        return self.handed_out
+
+    async def release(self, conn):
+        self.checked_out.remove(conn)
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = FakePool()
+
+    async def get_connection_pool(db_name):
+        return pool
+
+    monkeypatch.setattr(conn_module, "get_connection_pool", get_connection_pool)
+    set_current_db("test_tenant")
+    yield pool
+    conn_module.pool_stats.pop("test_tenant", None)
+
+
+class FakeTransaction:
+    def __init__(self, log):
+        self.log = log
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, *exc):
+        self.log.append("rollback" if exc_type else "commit")
+        return False
+
+
+@pytest.fixture
+def transactions(monkeypatch):
+    log = []
+    monkeypatch.setattr(conn_module.ConnectionHandle, "transaction", lambda self: FakeTransaction(log),
+                        raising=False)
+    return log
+
+
+async def in_scope(body):
+    scope = RequestScope()
+    token = request_scope.set(scope)
+    try:
+        return await body()
+    finally:
+        request_scope.reset(token)
+        await scope.close()
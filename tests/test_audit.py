@@ -0,0 +1,41 @@
+import asyncio
+
+from conftest import in_scope
+from db import audit
+from utils.conn import unit_of_work
+
+
+def _record_inserts(monkeypatch):
+    inserted = []
+
+    class Insert:
+        async def execute(self, conn, *args):
+            inserted.append((conn.conn, args[1]))
+
+    monkeypatch.setattr(audit, "INSERT_USER_ACTION_AT", Insert())
+    return inserted
+
+
+def test_action_inside_unit_of_work_is_inserted_in_its_transaction(pool, transactions, monkeypatch):
+    inserted = _record_inserts(monkeypatch)
+    queued = len(audit._queue)
+
+    async def body():
+        async with unit_of_work() as conn:
+            await audit.queue_user_action("user", "Bill Added: B1")
+            return conn.conn
+
+    conn = asyncio.run(in_scope(body))
+    assert inserted == [(conn, "Bill Added: B1")]
+    assert len(audit._queue) == queued
+    assert transactions == ["commit"]
+
+
+def test_action_outside_unit_of_work_is_queued(pool, monkeypatch):
+    inserted = _record_inserts(monkeypatch)
+    monkeypatch.setattr(audit, "_ensure_writer", lambda: None)
+    monkeypatch.setattr(audit, "_queue", audit.deque())
+
+    asyncio.run(in_scope(lambda: audit.queue_user_action("user", "Product updated: P1")))
+    assert inserted == []
+    assert [row[2] for row in audit._queue] == ["Product updated: P1"]
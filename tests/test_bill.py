@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from db import bill
+
+HISTORY = [{"amount": 100, "action": "created"}, {"amount": 50, "action": "payment"},
+           {"amount": 25, "action": "payment"}]
+
+
+class History:
+    """The payment history queries: the whole array, or its entries numbered from 1 and paged newest first."""
+
+    def __init__(self, history):
+        self.history = history
+        self.calls = []
+
+    async def fetchval(self, conn, code):
+        self.calls.append((code,))
+        return self.history
+
+    async def fetch(self, conn, code, before_n, limit):
+        self.calls.append((code, before_n, limit))
+        rows = [{"n": n, "event": event} for n, event in enumerate(self.history, 1)
+                if before_n is None or n < before_n]
+        return rows[::-1][:limit]
+
+
+@pytest.fixture
+def history(pool, monkeypatch):
+    history = History(HISTORY)
+    monkeypatch.setattr(bill, "BILL_PAYMENT_HISTORY", history)
+    monkeypatch.setattr(bill, "BILL_PAYMENT_HISTORY_PAGE", history)
+    return history
+
+
+def test_unpaged_history_is_all_of_it_oldest_first(history):
+    assert asyncio.run(bill.get_payment_history_ps("B1")) == (HISTORY, None)
+    assert history.calls == [("B1",)]
+
+
+def test_bill_without_history_has_an_empty_one(history):
+    history.history = None
+    assert asyncio.run(bill.get_payment_history_ps("B1")) == ([], None)
+
+
+def test_history_pages_newest_first(history):
+    first, cursor = asyncio.run(bill.get_payment_history_ps("B1", limit=2))
+    assert first == HISTORY[:0:-1]
+    assert history.calls == [("B1", None, 3)]
+
+    rest, cursor = asyncio.run(bill.get_payment_history_ps("B1", cursor=cursor))
+    assert rest == HISTORY[:1]
+    assert history.calls[-1][:2] == ("B1", 2)
+    assert cursor is None
+
+
+def test_history_cursor_belongs_to_its_bill(history):
+    _, cursor = asyncio.run(bill.get_payment_history_ps("B1", limit=1))
+    with pytest.raises(HTTPException):
+        asyncio.run(bill.get_payment_history_ps("B2", cursor=cursor))
+
+
+def test_due_reminders_go_out_in_one_statement(pool, monkeypatch):
+    calls, bumped = [], []
+
+    class Notify:
+        async def fetch(self, conn, *args):
+            calls.append(args)
+            return [{"name": "overdue", "created": 2}, {"name": "today", "created": 0},
+                    {"name": "tomorrow", "created": 1}]
+
+    async def bump_sync_versions(conn, keys):
+        bumped.append(keys)
+
+    monkeypatch.setattr(bill, "NOTIFY_DUE_BILLS", Notify())
+    monkeypatch.setattr(bill, "bump_sync_versions", bump_sync_versions)
+
+    created = asyncio.run(bill.check_due_add_notification_for_related_staff())
+    assert created == {"overdue": 2, "today": 0, "tomorrow": 1}
+    names, first_days, last_days, types, messages = calls[0]
+    assert names == ["overdue", "today", "tomorrow"]
+    assert first_days == [-bill.OVERDUE_REMINDER_DAYS, 0, 1] and last_days == [-1, 0, 1]
+    assert types == ["bill_overdue_alert", "bill_due_alert", "bill_due_alert"]
+    assert all("{bill_code}" in message for message in messages)
+    assert bumped == [["notifications"]]
+
+
+def test_no_reminders_no_notifications_bump(pool, monkeypatch):
+    bumped = []
+
+    class Notify:
+        async def fetch(self, conn, *args):
+            return [{"name": name, "created": 0} for name, *_ in bill.DUE_REMINDER_WINDOWS]
+
+    async def bump_sync_versions(conn, keys):
+        bumped.append(keys)
+
+    monkeypatch.setattr(bill, "NOTIFY_DUE_BILLS", Notify())
+    monkeypatch.setattr(bill, "bump_sync_versions", bump_sync_versions)
+
+    assert not any(asyncio.run(bill.check_due_add_notification_for_related_staff()).values())
+    assert bumped == []
@@ -0,0 +1,129 @@
+import asyncio
+
+from db import changes
+from helpers import encode_cursor
+from utils import conn as conn_module
+
+
+class Rows:
+    """A query standing in for a registered one: answers with fixed rows, records its arguments."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    async def fetch(self, conn, *args):
+        self.calls.append(args)
+        return self.rows
+
+    async def fetchrow(self, conn, *args):
+        self.calls.append(args)
+        return self.rows
+
+    async def cursor(self, conn, *args):
+        self.calls.append(args)
+        rows = list(self.rows)
+
+        class Cursor:
+            async def fetch(self, n):
+                batch = rows[:n]
+                del rows[:n]
+                return batch
+
+        return Cursor()
+
+
+class Transaction:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def _fake_log(monkeypatch, xmin, xmax, changed=(), products=(), rolls=()):
+    monkeypatch.setattr(conn_module.ConnectionHandle, "transaction", lambda self, **options: Transaction(),
+                        raising=False)
+    queries = {
+        "SNAPSHOT_BOUNDS": Rows({"xmin": xmin, "xmax": xmax}),
+        "CHANGES_SINCE": Rows([{"kind": kind, "code": code, "deleted": deleted} for kind, code, deleted in changed]),
+        "PRODUCTS_BY_CODES": Rows(list(products)),
+        "ROLLS_BY_CODES": Rows(list(rolls)),
+    }
+    for name, query in queries.items():
+        monkeypatch.setattr(changes, name, query)
+    return queries
+
+
+def _stream(cursor, batch_size=2):
+    async def collect():
+        return [item async for item in changes.stream_inventory_changes(cursor, batch_size)]
+
+    return asyncio.run(collect())
+
+
+def test_cursor_carries_the_snapshot_xmin():
+    assert changes._cursor_xmin(encode_cursor(changes.CURSOR_VERSION, 1234)) == 1234
+
+
+def test_unusable_cursors_are_ignored():
+    assert changes._cursor_xmin(None) is None
+    assert changes._cursor_xmin("not a cursor") is None
+    assert changes._cursor_xmin(encode_cursor(changes.CURSOR_VERSION - 1, 1234)) is None  # sequence-based
+    assert changes._cursor_xmin(encode_cursor(changes.CURSOR_VERSION, "1234")) is None
+
+
+def test_incremental_sync_sends_changes_from_the_cursor_on(pool, monkeypatch):
+    queries = _fake_log(monkeypatch, xmin=120, xmax=125,
+                        changed=[("product", "P1", False), ("roll", "R1", False), ("roll", "R2", True),
+                                 ("product", "P2", True)],
+                        products=[{"product_code": "P1"}], rolls=[{"roll_code": "R1"}])
+
+    items = _stream(encode_cursor(changes.CURSOR_VERSION, 100))
+    assert queries["CHANGES_SINCE"].calls == [(100,)]
+    assert queries["PRODUCTS_BY_CODES"].calls == [(["P1"],)]
+    assert queries["ROLLS_BY_CODES"].calls == [(["R1"],)]
+    assert items[0] == ("cursor", encode_cursor(changes.CURSOR_VERSION, 120))
+    assert items[1] == ("full", False)
+    assert ("deletedRolls", ["R2"]) in items
+    assert ("deletedProducts", ["P2"]) in items
+
+
+def test_cursor_from_another_cluster_gives_a_full_sync(pool, monkeypatch):
+    queries = _fake_log(monkeypatch, xmin=10, xmax=12,
+                        products=[{"product_code": code} for code in ("P1", "P2", "P3")])
+
+    items = _stream(encode_cursor(changes.CURSOR_VERSION, 5000))
+    assert queries["CHANGES_SINCE"].calls == []
+    assert queries["PRODUCTS_BY_CODES"].calls == [(None,)]
+    assert items[1] == ("full", True)
+    batches = [value for key, value in items if key == "products"]
+    assert batches == [[], [{"product_code": "P1"}, {"product_code": "P2"}], [{"product_code": "P3"}]]
+
+
+def test_every_key_is_sent_even_without_changes(pool, monkeypatch):
+    _fake_log(monkeypatch, xmin=7, xmax=7)
+
+    items = _stream(encode_cursor(changes.CURSOR_VERSION, 7))
+    assert [key for key, _ in items] == ["cursor", "full", "products", "rolls", "deletedProducts", "deletedRolls"]
+
+
+def test_changes_are_recorded_in_one_statement_and_bump_inventory(monkeypatch):
+    recorded, bumped = [], []
+
+    class Record:
+        async def execute(self, conn, *args):
+            recorded.append(args)
+
+    async def bump_sync_versions(conn, keys):
+        bumped.append(keys)
+
+    monkeypatch.setattr(changes, "RECORD_CHANGES", Record())
+    monkeypatch.setattr(changes, "bump_sync_versions", bump_sync_versions)
+
+    asyncio.run(changes.record_changes("conn", [("roll", "R1", True), ("product", "P1", False)]))
+    assert recorded == [(["roll", "product"], ["R1", "P1"], [True, False])]
+    assert bumped == [["inventory"]]
+
+    asyncio.run(changes.record_changes("conn", []))
+    assert len(recorded) == 1
@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+
+from conftest import in_scope
+from utils import conn as conn_module
+from utils.conn import after_commit, connection_context, unit_of_work
+
+
+def test_gather_in_fresh_scope_releases_every_connection(pool):
+    async def query():
+        async with connection_context() as handle:
+            await asyncio.sleep(0)
+            return handle.conn
+
+    async def body():
+        return await asyncio.gather(query(), query(), query())
+
+    asyncio.run(in_scope(body))
+    assert pool.checked_out == set()
+    assert conn_module.pool_stats["test_tenant"].in_use == 0
+
+
+def test_sequential_calls_share_the_request_connection(pool):
+    async def query():
+        async with connection_context() as handle:
+            return handle.conn
+
+    async def body():
+        return [await query(), await query()]
+
+    first, second = asyncio.run(in_scope(body))
+    assert first == second
+    assert pool.handed_out == 1
+    assert pool.checked_out == set()
+
+
+def test_nested_calls_reuse_the_outer_connection(pool):
+    async def body():
+        async with connection_context() as outer:
+            async with connection_context() as inner:
+                return outer.conn, inner.conn
+
+    outer, inner = asyncio.run(in_scope(body))
+    assert outer == inner
+    assert pool.checked_out == set()
+
+
+def test_failed_acquire_is_retried_and_not_released(pool, monkeypatch):
+    acquire = pool.acquire
+    failures = [ConnectionError("refused")]
+
+    async def flaky_acquire():
+        if failures:
+            raise failures.pop()
+        return await acquire()
+
+    monkeypatch.setattr(pool, "acquire", flaky_acquire)
+
+    async def body():
+        with pytest.raises(ConnectionError):
+            async with connection_context():
+                pass
+        async with connection_context() as handle:
+            return handle.conn
+
+    assert asyncio.run(in_scope(body)) == 1
+    assert pool.checked_out == set()
+
+
+def test_unit_of_work_outside_a_request_releases_its_connection(pool, transactions):
+    async def body():
+        async with unit_of_work() as handle:
+            return handle.conn
+
+    asyncio.run(body())
+    assert pool.checked_out == set()
+
+
+def test_after_commit_runs_once_the_unit_of_work_commits(pool, transactions):
+    async def callback(name):
+        transactions.append(name)
+
+    async def body():
+        assert not after_commit(callback, "outside")
+        async with unit_of_work():
+            assert after_commit(callback, "first")
+            async with unit_of_work():  # nested: still run by the outermost one
+                assert after_commit(callback, "second")
+            transactions.append("body done")
+
+    asyncio.run(in_scope(body))
+    assert transactions == ["commit", "body done", "commit", "first", "second"]
+
+
+def test_after_commit_work_is_dropped_on_rollback(pool, transactions):
+    async def callback():
+        transactions.append("ran")
+
+    async def body():
+        with pytest.raises(ValueError):
+            async with unit_of_work():
+                after_commit(callback)
+                raise ValueError
+
+    asyncio.run(in_scope(body))
+    assert transactions == ["rollback"]
+
+
+def test_recreated_pool_closes_the_old_one_only_after_the_swap(monkeypatch):
+    class ClosingPool:
+        def __init__(self):
+            self.closed = False
+
+        async def close(self):
+            await asyncio.sleep(0)
+            self.closed = True
+
+    old_pool, new_pool = ClosingPool(), ClosingPool()
+
+    async def create_pool(db_name):
+        assert conn_module.connection_pools[db_name] is old_pool and not old_pool.closed
+        conn_module.pool_stats[db_name].max_size = 4
+        return new_pool
+
+    monkeypatch.setattr(conn_module, "_create_pool", create_pool)
+    monkeypatch.setattr(conn_module, "connection_pools", conn_module.OrderedDict(grown_tenant=old_pool))
+    stats = conn_module._get_stats("grown_tenant")
+    stats.max_size, stats.peak = 2, 3
+
+    async def body():
+        pool = await conn_module.get_connection_pool("grown_tenant")
+        await conn_module.close_all_pools()
+        return pool
+
+    try:
+        assert asyncio.run(body()) is new_pool
+    finally:
+        conn_module.pool_stats.pop("grown_tenant", None)
+    assert old_pool.closed and new_pool.closed
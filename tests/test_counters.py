@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+from db import counters
+
+
+class Statement:
+    def __init__(self, name, log, row=None):
+        self.name = name
+        self.log = log
+        self.row = row
+
+    async def execute(self, conn, *args):
+        self.log.append((self.name, *args))
+
+    async def fetchrow(self, conn, *args):
+        self.log.append((self.name, *args))
+        return self.row
+
+
+def _fake_reads(monkeypatch, fail_fold=False):
+    folds, reads = [], []
+
+    async def fold_dashboard_counters():
+        folds.append(counters.current_db.get())
+        if fail_fold:
+            raise RuntimeError("fold failed")
+
+    async def flatbed(level, message):
+        pass
+
+    monkeypatch.setattr(counters, "fold_dashboard_counters", fold_dashboard_counters)
+    monkeypatch.setattr(counters, "flatbed", flatbed)
+    monkeypatch.setattr(counters, "DASHBOARD_COUNTERS", Statement("read", reads, {"total_products": 3}))
+    monkeypatch.setattr(counters, "_last_fold", {"test_tenant": time.monotonic() - counters.COUNTER_FOLD_INTERVAL_SECONDS - 1})
+    return folds, reads
+
+
+def test_reads_fold_the_deltas_at_most_once_per_interval(pool, monkeypatch):
+    folds, reads = _fake_reads(monkeypatch)
+
+    assert asyncio.run(counters.get_dashboard_counters()) == {"total_products": 3}
+    asyncio.run(counters.get_dashboard_counters())
+    assert folds == ["test_tenant"]
+    assert len(reads) == 2
+
+
+def test_failed_fold_still_answers(pool, monkeypatch):
+    folds, reads = _fake_reads(monkeypatch, fail_fold=True)
+
+    assert asyncio.run(counters.get_dashboard_counters()) == {"total_products": 3}
+    assert folds == ["test_tenant"] and len(reads) == 1
+
+
+def _verify(monkeypatch, log, **drift):
+    row = {}
+    for column in (*counters.COUNTER_COLUMNS, "today_expenses"):
+        row[f"expected_{column}"] = 10
+        row[column] = drift.get(column, 10)
+    for name in ("LOCK_COUNTED_TABLES", "FOLD_COUNTER_DELTAS", "FOLD_EXPENSE_DELTAS",
+                 "SET_DASHBOARD_COUNTERS", "SET_TODAY_EXPENSES"):
+        monkeypatch.setattr(counters, name, Statement(name, log))
+    monkeypatch.setattr(counters, "COUNTERS_WITH_EXPECTED", Statement("COUNTERS_WITH_EXPECTED", log, row))
+    return asyncio.run(counters.verify_dashboard_counters())
+
+
+def test_matching_counters_are_left_alone(pool, transactions, monkeypatch):
+    assert _verify(monkeypatch, transactions) == {}
+    assert transactions == [("LOCK_COUNTED_TABLES",), ("FOLD_COUNTER_DELTAS",), ("FOLD_EXPENSE_DELTAS",),
+                            ("COUNTERS_WITH_EXPECTED",), "commit"]
+
+
+def test_drifted_counters_are_reset_to_the_expected_figures(pool, transactions, monkeypatch):
+    assert _verify(monkeypatch, transactions, bills_pending=9) == {"bills_pending": (9, 10)}
+    assert ("SET_DASHBOARD_COUNTERS", *(10,) * len(counters.COUNTER_COLUMNS)) in transactions
+    assert "SET_TODAY_EXPENSES" not in [step[0] for step in transactions]
+
+
+def test_drifted_expenses_only_reset_today(pool, transactions, monkeypatch):
+    assert _verify(monkeypatch, transactions, today_expenses=0) == {"today_expenses": (0, 10)}
+    assert ("SET_TODAY_EXPENSES", 10) in transactions
+    assert "SET_DASHBOARD_COUNTERS" not in [step[0] for step in transactions]
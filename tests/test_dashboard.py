@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+import pytest
+
+from db import dashboard
+from utils import set_current_db
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    """Dashboard snapshots built from counting fakes, with Redis treated as down."""
+    builds = []
+
+    async def get_dashboard_data_ps():
+        builds.append(time.time())
+        return {"totalProducts": len(builds)}
+
+    async def get_recent_activities_preview():
+        return []
+
+    monkeypatch.setattr(dashboard, "redis_up", lambda: False)
+    monkeypatch.setattr(dashboard, "get_dashboard_data_ps", get_dashboard_data_ps)
+    monkeypatch.setattr(dashboard, "get_recent_activities_preview", get_recent_activities_preview)
+    monkeypatch.setattr(dashboard, "_snapshots", {})
+    monkeypatch.setattr(dashboard, "_snapshot_builds", {})
+    set_current_db("test_tenant")
+    return builds
+
+
+def _snapshot_after(seconds_ago):
+    dashboard._snapshots["test_tenant"] = ("0", time.time() - seconds_ago, {"totalProducts": 0})
+
+
+def _get_snapshot():
+    async def get():
+        data = await dashboard.get_dashboard_snapshot()
+        await asyncio.gather(*dashboard._snapshot_builds.values())  # let a background build finish
+        return data
+
+    return asyncio.run(get())
+
+
+def test_cold_tenant_waits_for_a_build(builds):
+    assert _get_snapshot() == {"totalProducts": 1, "recentActivities": []}
+    assert dashboard._snapshots["test_tenant"][0] == "0"
+
+
+def test_fresh_snapshot_is_served_as_is(builds):
+    _snapshot_after(dashboard.DASHBOARD_FRESH_SECONDS / 2)
+    assert _get_snapshot() == {"totalProducts": 0}
+    assert builds == []
+
+
+def test_stale_snapshot_is_served_while_rebuilt(builds):
+    _snapshot_after((dashboard.DASHBOARD_FRESH_SECONDS + dashboard.DASHBOARD_STALE_SECONDS) / 2)
+    assert _get_snapshot() == {"totalProducts": 0}
+    assert len(builds) == 1
+    assert dashboard._snapshots["test_tenant"][2]["totalProducts"] == 1
+
+
+def test_expired_snapshot_is_rebuilt_first(builds):
+    _snapshot_after(dashboard.DASHBOARD_STALE_SECONDS + 1)
+    assert _get_snapshot()["totalProducts"] == 1
+
+
+def test_concurrent_requests_share_one_build(builds):
+    async def get_many():
+        return await asyncio.gather(*(dashboard.get_dashboard_snapshot() for _ in range(5)))
+
+    assert len({id(data) for data in asyncio.run(get_many())}) == 1
+    assert len(builds) == 1
+
+
+def test_invalidation_drops_the_snapshot(builds):
+    _snapshot_after(0)
+    asyncio.run(dashboard.invalidate_dashboard())
+    assert "test_tenant" not in dashboard._snapshots
@@ -0,0 +1,46 @@
+from starlette.requests import Request
+
+from helpers import request_etag, etag_matches, etag_headers, not_modified_response
+
+
+def _request(path, query=""):
+    return Request({"type": "http", "method": "GET", "path": path, "query_string": query.encode(), "headers": []})
+
+
+def test_tag_follows_tenant_path_query_and_versions():
+    versions = {"bills": "2026-01-01T00:00:00.000001"}
+    tag = request_etag(_request("/bills-list", "date=1&state=2"), "tenant", versions)
+
+    assert tag.startswith('"') and tag.endswith('"')
+    assert request_etag(_request("/bills-list", "date=1&state=2"), "tenant", dict(versions)) == tag
+    assert request_etag(_request("/bills-list", "date=1&state=2"), "other", versions) != tag
+    assert request_etag(_request("/bills-list", "date=1&state=3"), "tenant", versions) != tag
+    assert request_etag(_request("/products-list", "date=1&state=2"), "tenant", versions) != tag
+    assert request_etag(_request("/bills-list", "date=1&state=2"), "tenant",
+                        {"bills": "2026-01-01T00:00:00.000002"}) != tag
+    assert request_etag(_request("/bills-list", "date=1&state=2"), "tenant", versions, "2026-01-02") != tag
+
+
+def test_query_parameter_order_does_not_matter():
+    versions = {"bills": "1"}
+    assert request_etag(_request("/bills-list", "date=1&state=2"), "tenant", versions) == \
+        request_etag(_request("/bills-list", "state=2&date=1"), "tenant", versions)
+
+
+def test_if_none_match_comparison_is_weak():
+    tag = '"abc"'
+    assert etag_matches('"abc"', tag)
+    assert etag_matches('W/"abc"', tag)
+    assert etag_matches('"old", W/"abc"', tag)
+    assert etag_matches("*", tag)
+    assert not etag_matches('"abd"', tag)
+    assert not etag_matches(None, tag)
+    assert not etag_matches("", tag)
+
+
+def test_not_modified_carries_the_tag():
+    response = not_modified_response('"abc"')
+    assert response.status_code == 304
+    assert response.headers["etag"] == '"abc"'
+    assert response.headers["cache-control"] == etag_headers('"abc"')["Cache-Control"]
+    assert response.body == b""
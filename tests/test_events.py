@@ -0,0 +1,78 @@
+import asyncio
+
+from utils import events
+
+
+class ListenConnection:
+    """Accepts the listener's LISTEN and lets the test deliver notifications."""
+
+    def __init__(self):
+        self.listeners = {}
+        self.closed = False
+
+    def add_termination_listener(self, callback):
+        pass
+
+    async def add_listener(self, channel, callback):
+        self.listeners[channel] = callback
+
+    def notify(self, payload):
+        self.listeners[events.CHANGES_CHANNEL](self, 0, events.CHANGES_CHANNEL, payload)
+
+    async def execute(self, sql):
+        pass
+
+    def is_closed(self):
+        return self.closed
+
+    def terminate(self):
+        self.closed = True
+
+
+def _listener(*queues):
+    # Without __init__, which starts listening right away
+    listener = events.TenantListener.__new__(events.TenantListener)
+    listener.subscribers = set(queues)
+    return listener
+
+
+def test_notifications_reach_every_subscriber():
+    first, second = asyncio.Queue(maxsize=2), asyncio.Queue(maxsize=2)
+    _listener(first, second)._broadcast('{"key": "bills"}')
+    assert first.get_nowait() == second.get_nowait() == '{"key": "bills"}'
+
+
+def test_subscriber_falling_behind_is_told_to_resync():
+    behind, keeping_up = asyncio.Queue(maxsize=2), asyncio.Queue(maxsize=2)
+    listener = _listener(behind, keeping_up)
+    listener._broadcast("a")
+    listener._broadcast("b")
+    keeping_up.get_nowait()
+    keeping_up.get_nowait()
+
+    listener._broadcast("c")
+    assert behind.qsize() == 1 and behind.get_nowait() is events.RESYNC
+    assert keeping_up.get_nowait() == "c"
+
+
+def test_one_listener_per_tenant_while_subscribed(monkeypatch):
+    connections = []
+
+    async def connect_unpooled(db_name):
+        connections.append(ListenConnection())
+        return connections[-1]
+
+    monkeypatch.setattr(events, "connect_unpooled", connect_unpooled)
+    monkeypatch.setattr(events, "_listeners", {})
+
+    async def subscribe_twice():
+        async with events.subscribe_changes("test_tenant") as first:
+            async with events.subscribe_changes("test_tenant") as second:
+                assert len(connections) == 1
+                connections[0].notify('{"key": "inventory"}')
+                assert first.get_nowait() == second.get_nowait() == '{"key": "inventory"}'
+            assert "test_tenant" in events._listeners
+        assert events._listeners == {}
+
+    asyncio.run(subscribe_twice())
+    assert connections[0].closed
@@ -0,0 +1,60 @@
+import asyncio
+import csv
+import datetime
+import io
+import zipfile
+from xml.etree import ElementTree
+
+from helpers.export import csv_chunks, xlsx_chunks
+
+SHEET_NS = {"s": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+HEADER = ("Date", "User", "Action")
+ROWS = [
+    (datetime.date(2026, 1, 2), "ali", "=HYPERLINK(\"http://x\")"),
+    (datetime.date(2026, 1, 3), "<b>&\"sara\"", "-5 metres cut"),
+    (datetime.date(2026, 1, 4), None, -5),
+]
+
+
+async def _batches():
+    yield ROWS[:2]
+    yield ROWS[2:]
+
+
+def _collect(chunks):
+    async def body():
+        return b"".join([chunk async for chunk in chunks])
+
+    return asyncio.run(body())
+
+
+def test_csv_keeps_typed_text_from_becoming_formulas():
+    text = _collect(csv_chunks(HEADER, _batches())).decode()
+    assert text.startswith("﻿")
+    rows = list(csv.reader(io.StringIO(text[1:])))
+    assert rows == [
+        list(HEADER),
+        ["2026-01-02", "ali", "'=HYPERLINK(\"http://x\")"],
+        ["2026-01-03", "<b>&\"sara\"", "'-5 metres cut"],
+        ["2026-01-04", "", "-5"],
+    ]
+
+
+def test_xlsx_is_a_valid_workbook_with_escaped_text():
+    data = _collect(xlsx_chunks(HEADER, _batches(), sheet_name='R&D "x"'))
+    with zipfile.ZipFile(io.BytesIO(data)) as workbook:
+        assert workbook.testzip() is None
+        assert {"[Content_Types].xml", "_rels/.rels", "xl/workbook.xml", "xl/_rels/workbook.xml.rels",
+                "xl/worksheets/sheet1.xml"} <= set(workbook.namelist())
+        sheet_name = ElementTree.fromstring(workbook.read("xl/workbook.xml")).find(".//s:sheet", SHEET_NS).get("name")
+        sheet = ElementTree.fromstring(workbook.read("xl/worksheets/sheet1.xml"))
+
+    assert sheet_name == 'R&D "x"'
+    rows = [[cell.findtext(".//s:t", namespaces=SHEET_NS) or cell.findtext("s:v", namespaces=SHEET_NS)
+             for cell in row] for row in sheet.iterfind(".//s:row", SHEET_NS)]
+    assert rows == [
+        list(HEADER),
+        ["2026-01-02", "ali", "=HYPERLINK(\"http://x\")"],  # inline strings are never formulas
+        ["2026-01-03", "<b>&\"sara\"", "-5 metres cut"],
+        ["2026-01-04", None, "-5"],
+    ]
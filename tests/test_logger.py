@@ -0,0 +1,26 @@
+import asyncio
+
+from utils import logger
+
+
+def test_summary_is_kept_until_the_email_goes_out(monkeypatch, caplog):
+    results = ["Error sending email: connection refused", "Email sent successfully!"]
+    sent = []
+
+    async def send_mail(subject, recipient_email, body):
+        sent.append(subject)
+        return results.pop(0)
+
+    monkeypatch.setattr(logger, "send_mail", send_mail)
+    monkeypatch.setattr(logger, "_unsent", {})
+    digest = logger.LogDigest("tenant", "exception", "In fn: boom", 0.0)
+    digest.add(3, 0.0, 1.0)
+    logger._unsent[("tenant", "exception", "In fn: boom")] = digest
+
+    asyncio.run(logger._send_summary(force=True))
+    assert logger._unsent[("tenant", "exception", "In fn: boom")].count == 3
+    assert "could not send the summary email" in caplog.text
+
+    asyncio.run(logger._send_summary(force=True))
+    assert logger._unsent == {}
+    assert sent == ["flatbed: 3 events (1 distinct)"] * 2
@@ -0,0 +1,36 @@
+import pytest
+
+from helpers import RowMapper, make_product_dic, make_roll_dic
+
+
+def test_fields_are_keyed_transformed_and_defaulted():
+    mapper = RowMapper("test", ("user_id", ("total", "amount", float), ("tags", None, list)),
+                       key_mappings={"user_id": "id"}, transformers={"user_id": str})
+    rows = mapper([{"user_id": 7, "amount": 3}, {"user_id": None, "amount": 4}])
+    assert rows == [{"id": "7", "total": 3.0, "tags": []}, {"id": None, "total": 4.0, "tags": []}]
+    assert rows[0]["tags"] is not rows[1]["tags"]
+
+
+def test_every_column_is_camel_cased_without_fields():
+    assert RowMapper("test")([{"bill_code": "B1", "due-date": None}]) == [{"billCode": "B1", "dueDate": None}]
+
+
+def test_optional_columns_are_left_out_when_missing_or_none():
+    roll = {"product_code": "P1", "roll_code": "R1", "quantity": 100, "color": "A", "image_url": None,
+            "cost_per_metre": 5}
+    assert "archived" not in make_roll_dic(roll)
+    assert "archived" not in make_roll_dic({**roll, "archived": None})
+    assert make_roll_dic({**roll, "archived": True})["archived"] is True
+
+
+def test_missing_required_column_is_reported():
+    with pytest.raises(KeyError, match="product"):
+        make_product_dic({"product_code": "P1"})
+
+
+def test_each_column_set_gets_its_own_function():
+    mapper = RowMapper("test", ("a", "b"), optional=("b",))
+    assert mapper([{"a": 1}]) == [{"a": 1}]
+    assert mapper([{"b": 2, "a": 1}]) == [{"a": 1, "b": 2}]
+    assert len(mapper._compiled) == 2
+    assert mapper([]) == []
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from db import migrations
+from db.queries import Query
+
+
+class FakeConnection:
+    """Records the statements run on it and answers the applied migrations query."""
+
+    def __init__(self, applied=(), fail_on=None):
+        self.applied = list(applied)
+        self.fail_on = fail_on
+        self.statements = []
+        self.closed = False
+
+    async def execute(self, sql, *args, timeout=None):
+        if sql == self.fail_on:
+            raise RuntimeError("statement failed")
+        self.statements.append(sql)
+        if sql == migrations.RECORD_MIGRATION.sql:
+            self.applied.append(args[0])
+
+    async def fetch(self, sql, *args, timeout=None):
+        return [{"name": name} for name in self.applied]
+
+    async def close(self):
+        self.closed = True
+
+
+def _statement(sql):
+    return Query(f"test_{sql}", sql, (), (), None)
+
+
+def _migrate(monkeypatch, conn, steps):
+    async def connect_unpooled(db_name):
+        return conn
+
+    monkeypatch.setattr(migrations, "connect_unpooled", connect_unpooled)
+    monkeypatch.setattr(migrations, "MIGRATIONS", steps)
+    return asyncio.run(migrations.migrate_tenant("test_tenant"))
+
+
+def test_pending_migrations_run_in_order_and_are_recorded(monkeypatch):
+    conn = FakeConnection(applied=["0001_a"])
+    steps = (("0001_a", (_statement("a"),)), ("0002_b", (_statement("b1"), _statement("b2"))),
+             ("0003_c", (_statement("c"),)))
+
+    assert _migrate(monkeypatch, conn, steps) == ["0002_b", "0003_c"]
+    run = [sql for sql in conn.statements if sql in ("a", "b1", "b2", "c")]
+    assert run == ["b1", "b2", "c"]
+    assert conn.applied == ["0001_a", "0002_b", "0003_c"]
+    assert conn.closed
+
+
+def test_failed_migration_is_not_recorded(monkeypatch):
+    conn = FakeConnection(fail_on="b2")
+    steps = (("0001_a", (_statement("a"),)), ("0002_b", (_statement("b1"), _statement("b2"))),
+             ("0003_c", (_statement("c"),)))
+
+    with pytest.raises(RuntimeError):
+        _migrate(monkeypatch, conn, steps)
+    assert conn.applied == ["0001_a"]
+    assert "c" not in conn.statements
+    assert conn.closed
+
+
+def test_session_lock_is_taken_before_anything_runs(monkeypatch):
+    conn = FakeConnection()
+    _migrate(monkeypatch, conn, (("0001_a", (_statement("a"),)),))
+    assert conn.statements[0] == migrations.MIGRATIONS_SESSION_LOCK.sql
+
+
+def test_function_steps_get_the_connection(monkeypatch):
+    conn = FakeConnection()
+    seen = []
+
+    async def backfill(step_conn):
+        seen.append(step_conn)
+
+    assert _migrate(monkeypatch, conn, (("0001_a", (_statement("a"), backfill)),)) == ["0001_a"]
+    assert seen == [conn]
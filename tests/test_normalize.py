@@ -0,0 +1,31 @@
+from helpers import normalize_name, normalize_phone
+
+
+def test_name_variants_share_one_key():
+    assert normalize_name("علي  كريمي") == normalize_name("علی کریمی") == "علی کریمی"
+    assert normalize_name("مـحـمـد") == "محمد"  # tatweel
+    assert normalize_name("نور‌الله") == "نور الله"  # ZWNJ typed for a space
+    assert normalize_name("مُحَمَّد") == "محمد"  # diacritics
+    assert normalize_name("  Ali   KARIMI ") == "ali karimi"
+
+
+def test_empty_names_give_an_empty_key():
+    assert normalize_name(None) == normalize_name("") == ""
+
+
+def test_afghan_numbers_share_the_national_key():
+    key = "799123456"
+    for phone in ("0799123456", "+93 799 123 456", "0093799123456", "93799123456", "۰۷۹۹۱۲۳۴۵۶", key):
+        assert normalize_phone(phone) == key
+
+
+def test_partly_typed_numbers_lose_the_calling_code_too():
+    for query in ("+93799", "0093799", "93799", "+93 0799", "0799"):
+        assert normalize_phone(query) == "799"
+    assert "799123456".startswith(normalize_phone("+937991"))
+
+
+def test_other_numbers_keep_their_digits():
+    assert normalize_phone("+1 (415) 555-0100") == "14155550100"
+    assert normalize_phone("931234567890") == "931234567890"  # longer than an Afghan number
+    assert normalize_phone(None) == ""
@@ -0,0 +1,35 @@
+import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from helpers import Keyset
+from helpers.pagination import PAGE_SIZE_DEFAULT
+
+
+def _rows(n):
+    day = datetime.date(2026, 1, 1)
+    return [{"bill_date": day, "bill_code": f"B{i:03}"} for i in range(n, 0, -1)]
+
+
+def _keyset(cursor=None, limit=None):
+    return Keyset(cursor, limit, [0, 1], sort_column="bill_date", key_column="bill_code", sort_type=datetime.date)
+
+
+def test_without_cursor_or_limit_the_whole_list_is_returned():
+    keyset = _keyset()
+    assert keyset.args == (None, None, None)
+    rows = _rows(PAGE_SIZE_DEFAULT + 5)
+    assert keyset.page(rows) == (rows, None)
+
+
+def test_pages_follow_each_other_and_are_bound_to_their_filters():
+    rows = _rows(5)
+    first, cursor = _keyset(limit=2).page(rows[:3])
+    assert [row["bill_code"] for row in first] == ["B005", "B004"]
+
+    keyset = _keyset(cursor)
+    assert keyset.args == (datetime.date(2026, 1, 1), "B004", PAGE_SIZE_DEFAULT + 1)
+
+    with pytest.raises(HTTPException):
+        Keyset(cursor, None, [0, 2], sort_column="bill_date", key_column="bill_code", sort_type=datetime.date)
@@ -0,0 +1,53 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+from db import search_index, sync
+from db.search_index import SearchIndex
+from utils.events import RESYNC
+
+
+def _product(code, name, archived=False):
+    return {"product_code": code, "name": name, "category": 1, "quantity": 0, "price_per_metre": 100,
+            "description": None, "material": None, "fabric_height_cm": None, "weight_per_metre": None,
+            "opacity_level": None, "texture": None, "image_url": None, "archived": archived}
+
+
+def test_archived_products_are_found_by_code_but_not_searched():
+    index = SearchIndex()
+    index.put_product(_product("P1", "Velvet"))
+    index.put_product(_product("P2", "Velvet blue", archived=True))
+
+    assert [p["productCode"] for p in index.search("velvet", product_field="name")] == ["P1"]
+    assert index.product_and_roll("P2")["productCode"] == "P2"
+
+    index.put_product(_product("P2", "Velvet blue"))  # restored
+    assert len(index.search("velvet", product_field="name")) == 2
+
+
+def test_changes_from_other_workers_make_the_index_stale(monkeypatch):
+    queue = asyncio.Queue()
+
+    @asynccontextmanager
+    async def subscribe_changes(db_name):
+        yield queue
+
+    monkeypatch.setattr(search_index, "subscribe_changes", subscribe_changes)
+    monkeypatch.setattr(sync, "_own_versions", sync.deque([("tenant", "bills", "v-own")]))
+    monkeypatch.setattr(search_index, "_changes_seen", search_index.defaultdict(int))
+
+    async def body():
+        await search_index._start_watching("tenant")
+        for item in (json.dumps({"key": "bills", "version": "v-own"}),
+                     json.dumps({"key": "suppliers", "version": "v1"}),
+                     json.dumps({"key": "inventory", "version": "v2"}),
+                     json.dumps({"key": "users", "version": "v3"}),
+                     RESYNC):
+            queue.put_nowait(item)
+        while not queue.empty():
+            await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        search_index._stop_watching("tenant")
+
+    asyncio.run(body())
+    assert search_index._changes_seen["tenant"] == 3
@@ -0,0 +1,52 @@
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from uuid import UUID
+
+import pytest
+
+from helpers import JSONResponse, dumps_json, loads_json, serialization
+from helpers.serialization import json_param
+
+VALUE = {
+    "date": date(2026, 1, 2),
+    "at": datetime(2026, 1, 2, 3, 4, 5, 678901),
+    "atUtc": datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+    "id": UUID("12345678-1234-5678-1234-567812345678"),
+    "price": Decimal("12.50"),
+    "name": "پرده",
+    1: [None, True],
+}
+
+EXPECTED = ('{"date":"2026-01-02","at":"2026-01-02T03:04:05","atUtc":"2026-01-02T03:04:05+00:00",'
+            '"id":"12345678-1234-5678-1234-567812345678","price":12.5,"name":"پرده","1":[null,true]}')
+
+
+@pytest.fixture(params=["orjson", "json"])
+def encoder(request, monkeypatch):
+    if request.param == "json":
+        monkeypatch.setattr(serialization, "orjson", None)
+    elif serialization.orjson is None:
+        pytest.skip("orjson is not installed")
+    return request.param
+
+
+def test_both_encoders_give_the_api_format(encoder):
+    assert dumps_json(VALUE) == EXPECTED.encode()
+
+
+def test_round_trip(encoder):
+    assert loads_json(dumps_json({"a": [1, 2.5, "x"]})) == {"a": [1, 2.5, "x"]}
+
+
+def test_unknown_types_are_refused(encoder):
+    with pytest.raises(TypeError):
+        dumps_json({"a": object()})
+
+
+def test_json_params_pass_text_through():
+    assert json_param('[{"fabric": 1}]') == '[{"fabric": 1}]'
+    assert json_param([{"fabric": 1, "at": date(2026, 1, 2)}]) == '[{"fabric":1,"at":"2026-01-02"}]'
+
+
+def test_responses_use_the_same_encoder():
+    assert JSONResponse(VALUE).body == EXPECTED.encode()
@@ -0,0 +1,33 @@
+import asyncio
+
+from db import stock
+
+
+class Statement:
+    def __init__(self, name, log, rows=()):
+        self.name = name
+        self.log = log
+        self.rows = list(rows)
+
+    async def execute(self, conn, *args):
+        self.log.append(self.name)
+
+    async def fetch(self, conn, *args):
+        self.log.append(self.name)
+        return self.rows
+
+
+def test_reconciliation_recounts_under_the_table_lock(pool, transactions, monkeypatch):
+    repaired = [{"product_code": "P1", "old_quantity": 10, "quantity": 12}]
+    monkeypatch.setattr(stock, "LOCK_STOCK_TABLES", Statement("lock", transactions))
+    monkeypatch.setattr(stock, "RECONCILE_PRODUCT_STOCK", Statement("reconcile", transactions, repaired))
+
+    assert asyncio.run(stock.reconcile_product_stock()) == repaired
+    assert transactions == ["lock", "reconcile", "commit"]
+    assert not pool.checked_out
+
+
+def test_triggers_and_recount_value_rolls_alike():
+    # Per-roll rounding in both, so the deltas add up to what a recount finds
+    assert stock.ROLL_VALUE in stock.STOCK_AGGREGATE
+    assert f"r.sign * {stock.ROLL_VALUE}" in stock.CREATE_PRODUCT_STOCK.sql
@@ -0,0 +1,57 @@
+import asyncio
+import datetime
+import json
+from decimal import Decimal
+
+from helpers import JSONResponse
+from helpers.streaming import json_object_chunks, ndjson_chunks
+
+
+async def _sections(pairs):
+    for pair in pairs:
+        yield pair
+
+
+def _collect(chunks):
+    async def body():
+        return b"".join([chunk async for chunk in chunks])
+
+    return asyncio.run(body())
+
+
+PRODUCTS = [{"productCode": "P1", "price": Decimal("12.5"), "updatedAt": datetime.datetime(2026, 1, 2, 3, 4, 5)},
+            {"productCode": "P2", "price": 7, "updatedAt": None}]
+SECTIONS = [
+    ("cursor", "abc"),
+    ("full", True),
+    ("products", []),
+    ("products", PRODUCTS[:1]),
+    ("products", PRODUCTS[1:]),
+    ("rolls", []),
+    ("deletedProducts", []),
+    ("deletedProducts", ["P9"]),
+    ("deletedProducts", ["P10", "P11"]),
+]
+
+
+def test_json_object_chunks_match_the_buffered_response():
+    buffered = {"cursor": "abc", "full": True, "products": PRODUCTS, "rolls": [],
+                "deletedProducts": ["P9", "P10", "P11"]}
+    streamed = _collect(json_object_chunks(_sections(SECTIONS)))
+    assert streamed == JSONResponse(content=buffered).body
+
+
+def test_json_object_chunks_of_nothing_is_an_empty_object():
+    assert _collect(json_object_chunks(_sections([]))) == JSONResponse(content={}).body
+
+
+def test_ndjson_chunks_give_a_header_line_then_one_line_per_item():
+    lines = _collect(ndjson_chunks(_sections(SECTIONS))).decode().splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"cursor": "abc", "full": True},
+        {"products": json.loads(JSONResponse(content=PRODUCTS[0]).body)},
+        {"products": json.loads(JSONResponse(content=PRODUCTS[1]).body)},
+        {"deletedProducts": "P9"},
+        {"deletedProducts": "P10"},
+        {"deletedProducts": "P11"},
+    ]
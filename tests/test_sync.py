@@ -0,0 +1,66 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from db import sync
+from utils import set_current_db
+
+
+@pytest.fixture
+def fetched(monkeypatch):
+    """Reference lists served from counting fetchers, with Redis treated as down."""
+    fetched = []
+
+    def fetcher(key):
+        async def fetch():
+            fetched.append(key)
+            return [{"id": len(fetched), "name": key}]
+        return fetch
+
+    monkeypatch.setattr(sync, "LIST_FETCHERS", {key: (fetcher(key), sync_key) for key, sync_key in
+                                                (("suppliers", "suppliers"), ("users", "users"),
+                                                 ("tailors", "users"))})
+    monkeypatch.setattr(sync, "_cached_lists", {})
+    monkeypatch.setattr(sync, "_redis_down_until", float("inf"))
+    set_current_db("test_tenant")
+    return fetched
+
+
+def test_lists_are_fetched_once_per_version(fetched):
+    versions = {"suppliers": "v1", "users": "v1"}
+
+    first = asyncio.run(sync.get_reference_lists(["suppliers", "users"], versions))
+    again = asyncio.run(sync.get_reference_lists(["suppliers", "users"], versions))
+    assert sorted(fetched) == ["suppliers", "users"]
+    assert again == first
+    assert list(again) == ["suppliers", "users"]
+
+
+def test_new_version_refetches_only_that_list(fetched):
+    asyncio.run(sync.get_reference_lists(["suppliers", "users"], {"suppliers": "v1", "users": "v1"}))
+    fetched.clear()
+
+    lists = asyncio.run(sync.get_reference_lists(["suppliers", "users"], {"suppliers": "v1", "users": "v2"}))
+    assert fetched == ["users"]
+    assert lists["users"] == [{"id": 1, "name": "users"}]
+
+
+def test_cache_is_per_tenant(fetched):
+    versions = {"suppliers": "v1"}
+    asyncio.run(sync.get_reference_lists(["suppliers"], versions))
+    set_current_db("other_tenant")
+    asyncio.run(sync.get_reference_lists(["suppliers"], versions))
+    assert fetched == ["suppliers", "suppliers"]
+
+
+def test_versions_follow_the_syncs_keys(fetched, pool, monkeypatch):
+    class Syncs:
+        async def fetch(self, conn, keys):
+            return [{"key": "users", "value": datetime(2026, 1, 2, 3, 4, 5, 6)}]
+
+    monkeypatch.setattr(sync, "GET_SYNCS", Syncs())
+    versions = asyncio.run(sync.get_list_versions(["tailors", "suppliers", "users"]))
+    # Never stamped: "0" until its first write; full precision otherwise
+    assert versions == {"tailors": "2026-01-02T03:04:05.000006", "suppliers": "0",
+                        "users": "2026-01-02T03:04:05.000006"}
@@ -3,5 +3,5 @@ from .logger import flatbed
 from .auth import create_jwt_token, verify_jwt_user, set_db_from_tenant, \
     create_refresh_token, verify_refresh_token
 from .bucket import upload_image_to_r2, delete_image_from_r2
-from .conn import set_current_db
+from .conn import set_current_db, unit_of_work
 from .backup import backup_to_gdrive, cleanup_old_backups
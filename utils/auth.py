@@ -100,5 +100,6 @@ def validate_payload(payload: dict):
         "user_id": sub,
         "username": username,
         "level": level,
-        "tenant": tenant
+        "tenant": tenant,
+        "expires": payload.get("exp")  # unix time the token stops being valid
     }
@@ -1,4 +1,8 @@
+import asyncio
 import os
+import sys
+import time
+from collections import OrderedDict, defaultdict
 from contextlib import asynccontextmanager
 from contextvars import ContextVar
 
@@ -10,63 +14,551 @@ load_dotenv(override=True)
 
 current_db = ContextVar("current_db")
 
-# Dictionary to hold async connections for different databases
-connection_pools = {}
+# Connection budget for this worker, shared by every tenant pool.
+# Keep POOL_BUDGET * workers comfortably below Postgres max_connections.
+POOL_BUDGET = int(os.getenv("DB_POOL_BUDGET", 40))
+POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 0))
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+POOL_INITIAL_SIZE = int(os.getenv("DB_POOL_INITIAL_SIZE", 4))  # for tenants with no traffic history yet
+POOL_IDLE_TTL_SECONDS = int(os.getenv("DB_POOL_IDLE_TTL", 600))  # close tenant pools unused for this long
+CONN_IDLE_TTL_SECONDS = int(os.getenv("DB_CONN_IDLE_TTL", 120))  # reap idle connections inside a pool
+SWEEP_INTERVAL_SECONDS = 30
+TRAFFIC_WINDOW_SECONDS = 300
+WARMUP_CONCURRENCY = int(os.getenv("DB_WARMUP_CONCURRENCY", 4))
+STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 256))  # must hold every registered db query
+HOLD_WARN_SECONDS = float(os.getenv("DB_HOLD_WARN_SECONDS", 5))  # report connections held longer than this
+
+# Async connection pools for different databases, least recently used first
+connection_pools = OrderedDict()
+
+# In-flight pool constructions, so concurrent requests for a cold tenant share one pool
+_pool_creations = {}
+
+# Replaced pools closing in the background once their connections are back
+_retiring_pools = set()
+
+# Per-tenant traffic stats, kept across evictions so a re-created pool is sized from history
+pool_stats = {}
+
+# Connections currently checked out, to spot leaks
+_active_handles = set()
+
+# Per calling db function: acquire wait and hold times
+usage_stats = defaultdict(lambda: {"count": 0, "waitTotal": 0.0, "waitMax": 0.0, "holdTotal": 0.0, "holdMax": 0.0})
+
+_last_sweep = 0.0
+
+
+class PoolStats:
+    """Observed traffic for one tenant, used to size its pool."""
+
+    __slots__ = ("in_use", "peak", "window_started", "last_used", "max_size")
+
+    def __init__(self):
+        self.in_use = 0
+        self.peak = None
+        self.window_started = time.monotonic()
+        self.last_used = self.window_started
+        self.max_size = 0  # size of the currently open pool, 0 when closed
+
+    def on_acquire(self):
+        now = time.monotonic()
+        if now - self.window_started > TRAFFIC_WINDOW_SECONDS:
+            # Start a new window, but let the old peak fade instead of dropping to zero
+            self.peak = max(self.in_use, (self.peak or 0) // 2)
+            self.window_started = now
+        self.in_use += 1
+        self.peak = max(self.peak or 0, self.in_use)
+        self.last_used = now
+
+    def on_release(self):
+        self.in_use = max(self.in_use - 1, 0)
+        self.last_used = time.monotonic()
+
+    def target_size(self):
+        """Peak concurrency plus headroom, clamped to the per-pool limits."""
+        if self.peak is None:
+            return min(POOL_INITIAL_SIZE, POOL_MAX_SIZE)
+        wanted = self.peak + max(self.peak // 2, 1)
+        return max(1, min(wanted, POOL_MAX_SIZE))
+
+
+def _get_stats(db_name):
+    stats = pool_stats.get(db_name)
+    if stats is None:
+        stats = pool_stats[db_name] = PoolStats()
+    return stats
+
+
+def _reserved_connections():
+    return sum(_get_stats(name).max_size for name in connection_pools)
+
+
+async def _close_pool(db_name):
+    pool = connection_pools.pop(db_name, None)
+    _get_stats(db_name).max_size = 0
+    if pool is not None:
+        await pool.close()
+
+
+async def _evict_idle_pools(needed):
+    """
+    Close least recently used tenant pools that have no checked-out connections
+    until `needed` connections fit in the budget.
+    """
+    for db_name in list(connection_pools):
+        if POOL_BUDGET - _reserved_connections() >= needed:
+            return
+        # A pool being re-created keeps serving until its replacement is in place
+        if _get_stats(db_name).in_use == 0 and db_name not in _pool_creations:
+            await _close_pool(db_name)
+
+
+async def _sweep_idle_pools():
+    """Close tenant pools that haven't been used for POOL_IDLE_TTL_SECONDS."""
+    global _last_sweep
+    now = time.monotonic()
+    if now - _last_sweep < SWEEP_INTERVAL_SECONDS:
+        return
+    _last_sweep = now
+
+    for db_name in list(connection_pools):
+        stats = _get_stats(db_name)
+        if stats.in_use == 0 and now - stats.last_used > POOL_IDLE_TTL_SECONDS:
+            await _close_pool(db_name)
+
+    for handle in list(_active_handles):
+        if not handle.reported and now - handle.acquired_at > HOLD_WARN_SECONDS:
+            handle.reported = True
+            _report_long_hold(handle, now - handle.acquired_at, "still held")
+
+
+def _connect_params(db_name):
+    return {
+        "user": os.getenv("DB_USER"),
+        "password": os.getenv("DB_PASSWORD"),
+        "database": db_name,
+        "host": os.getenv("DB_HOST"),
+        "port": os.getenv("DB_PORT"),
+    }
+
+
+async def connect_unpooled(db_name):
+    """
+    A connection of its own, outside the pools and the connection budget, for
+    long-lived sessions such as LISTEN or migrations. The caller closes it.
+    """
+    return await asyncpg.connect(**_connect_params(db_name))
+
+
+async def _init_connection(conn):
+    """
+    Setup of every new pooled connection: json and jsonb columns come back as
+    Python values, decoded once here, and parameters of either type take them.
+    """
+    from helpers.serialization import json_param, loads_json  # helpers depends on utils
+    for type_name in ("json", "jsonb"):
+        await conn.set_type_codec(type_name, schema="pg_catalog", encoder=json_param, decoder=loads_json,
+                                  format="text")
+
+
+async def _create_pool(db_name):
+    stats = _get_stats(db_name)
+    size = stats.target_size()
+
+    await _evict_idle_pools(size)
+    # Under pressure shrink the new pool to what is left, but always allow one connection
+    size = max(1, min(size, POOL_BUDGET - _reserved_connections()))
+
+    pool = await asyncpg.create_pool(
+        **_connect_params(db_name),
+        min_size=min(POOL_MIN_SIZE, size),
+        max_size=size,
+        max_inactive_connection_lifetime=CONN_IDLE_TTL_SECONDS,
+        statement_cache_size=STATEMENT_CACHE_SIZE,
+        init=_init_connection
+    )
+    stats.max_size = size
+    return pool
+
+
+async def _close_retired_pool(db_name, pool):
+    try:
+        await pool.close()  # waits for the connections still checked out to be released
+    except Exception as e:
+        from utils.logger import flatbed  # logger itself depends on this module
+        await flatbed('exception', f"In _close_retired_pool for {db_name}: {e}")
+
+
+def _retire_pool(db_name, pool):
+    task = asyncio.ensure_future(_close_retired_pool(db_name, pool))
+    _retiring_pools.add(task)
+    task.add_done_callback(_retiring_pools.discard)
+
+
+async def _replace_pool(db_name, recreate):
+    """
+    Open the tenant's pool. On re-creation the old pool keeps serving until the
+    new one is in place, then drains and closes in the background, so callers
+    that already hold it are never handed a closed pool.
+    """
+    stats = _get_stats(db_name)
+    old_pool = connection_pools.get(db_name) if recreate else None
+    old_size = stats.max_size
+    if old_pool is not None:
+        stats.max_size = 0  # its share of the budget passes to the new pool
+    try:
+        pool = await _create_pool(db_name)
+    except BaseException:
+        if old_pool is not None and connection_pools.get(db_name) is old_pool:
+            stats.max_size = old_size
+        raise
+    connection_pools[db_name] = pool
+    if old_pool is not None:
+        _retire_pool(db_name, old_pool)
+    return pool
+
+
+def _forget_creation(db_name, task):
+    if _pool_creations.get(db_name) is task:
+        del _pool_creations[db_name]
+    if not task.cancelled():
+        task.exception()  # retrieved by the waiters, mark it seen if they were all cancelled
+
+
+async def _open_pool(db_name, recreate=False):
+    """
+    Single-flight pool construction: the first caller starts it, everyone
+    arriving while it runs awaits the same task instead of opening a duplicate pool.
+    """
+    task = _pool_creations.get(db_name)
+    if task is None:
+        task = asyncio.ensure_future(_replace_pool(db_name, recreate))
+        _pool_creations[db_name] = task
+        task.add_done_callback(lambda t: _forget_creation(db_name, t))
+    # Shielded so a cancelled request doesn't abort the pool the others are waiting for
+    return await asyncio.shield(task)
 
 
 async def get_connection_pool(db_name):
     """
     Returns a connection pool for the given database name.
-    Creates a new pool if it doesn't exist.
+    Creates a new pool if it doesn't exist, evicting idle tenant pools
+    to stay inside the worker's connection budget.
+    """
+    await _sweep_idle_pools()
+
+    pool = connection_pools.get(db_name)
+    if pool is None:
+        pool = await _open_pool(db_name)
+    elif db_name not in _pool_creations:
+        stats = _get_stats(db_name)
+        # Traffic has outgrown the size the pool was opened with: while nothing is
+        # checked out of it, re-create it at the larger size
+        if stats.in_use == 0 and stats.target_size() > stats.max_size \
+                and POOL_BUDGET - _reserved_connections() >= stats.target_size() - stats.max_size:
+            pool = await _open_pool(db_name, recreate=True)
+
+    if db_name in connection_pools:
+        connection_pools.move_to_end(db_name)
+    return pool
+
+
+async def warm_up_pools(db_names, hot_statements=(), concurrency=WARMUP_CONCURRENCY):
+    """
+    Pre-create pools for the given tenants and prepare hot statements on their
+    first connection, so the type introspection and connection setup are paid
+    before traffic arrives. Only as many tenants as fit the budget are warmed.
+
+    Returns:
+        dict: {db_name: True/False} whether warming succeeded.
     """
-    if db_name not in connection_pools:
-        db_host = os.getenv("DB_HOST")
-        db_port = os.getenv("DB_PORT")
-        db_user = os.getenv("DB_USER")
-        db_password = os.getenv("DB_PASSWORD")
+    db_names = list(db_names)[:max(1, POOL_BUDGET // max(POOL_INITIAL_SIZE, 1))]
+    semaphore = asyncio.Semaphore(concurrency)
 
-        connection_pools[db_name] = await asyncpg.create_pool(
-            user=db_user,
-            password=db_password,
-            database=db_name,
-            host=db_host,
-            port=db_port,
-            min_size=1,
-            max_size=10  # Adjust based on expected traffic
-        )
+    async def warm(db_name):
+        async with semaphore:
+            pool = await get_connection_pool(db_name)
+            async with pool.acquire() as conn:
+                for sql in hot_statements:
+                    await conn.prepare(sql)
 
-    return connection_pools[db_name]
+    results = await asyncio.gather(*(warm(db_name) for db_name in db_names), return_exceptions=True)
+    return {db_name: not isinstance(result, BaseException) for db_name, result in zip(db_names, results)}
 
 
 def set_current_db(db_name):
     current_db.set(db_name)
 
 
-async def get_connection():
-    """Gets a connection from the pool based on the current database context."""
-    db_name = current_db.get()
+class ConnectionHandle:
+    """
+    A checked-out connection bound to the pool it came from, so it is released
+    there even if current_db changed meanwhile. Proxies the asyncpg connection API.
+    """
+
+    __slots__ = ("conn", "pool", "db_name", "caller", "wait_time", "acquired_at", "reported")
+
+    def __init__(self, conn, pool, db_name, caller, wait_time):
+        self.conn = conn
+        self.pool = pool
+        self.db_name = db_name
+        self.caller = caller
+        self.wait_time = wait_time
+        self.acquired_at = time.monotonic()
+        self.reported = False
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+    async def release(self):
+        hold_time = time.monotonic() - self.acquired_at
+        _active_handles.discard(self)
+        try:
+            await self.pool.release(self.conn)
+        finally:
+            _get_stats(self.db_name).on_release()
+            _record_usage(self, hold_time)
+
+
+def _caller_name():
+    """Name of the first function outside this module and contextlib, i.e. the db/* function."""
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_globals.get("__name__") in (__name__, "contextlib"):
+        frame = frame.f_back
+    if frame is None:
+        return "unknown"
+    return f"{frame.f_globals.get('__name__')}.{frame.f_code.co_name}"
+
+
+def _record_usage(handle, hold_time):
+    usage = usage_stats[handle.caller]
+    usage["count"] += 1
+    usage["waitTotal"] += handle.wait_time
+    usage["waitMax"] = max(usage["waitMax"], handle.wait_time)
+    usage["holdTotal"] += hold_time
+    usage["holdMax"] = max(usage["holdMax"], hold_time)
+    if hold_time > HOLD_WARN_SECONDS and not handle.reported:
+        _report_long_hold(handle, hold_time, "held")
+
+
+def _report_long_hold(handle, seconds, state):
+    from utils.logger import flatbed  # logger itself depends on this module
+
+    message = (f"Connection to {handle.db_name} {state} for {seconds:.1f}s by {handle.caller} "
+               f"(waited {handle.wait_time:.3f}s to acquire)")
+    # Don't make the release path wait for the log write
+    asyncio.ensure_future(flatbed('warning', message))
+
+
+async def _acquire(db_name, caller=None):
     pool = await get_connection_pool(db_name)
-    conn = await pool.acquire()
-    return conn
+    stats = _get_stats(db_name)
+    stats.on_acquire()
+    started = time.monotonic()
+    try:
+        conn = await pool.acquire()
+    except BaseException:
+        stats.on_release()
+        raise
+    handle = ConnectionHandle(conn, pool, db_name, caller or _caller_name(), time.monotonic() - started)
+    _active_handles.add(handle)
+    return handle
+
+
+async def get_connection():
+    """Gets a connection handle from the pool based on the current database context."""
+    return await _acquire(current_db.get())
 
 
 async def release_connection(conn):
-    """Releases the connection back to the pool."""
-    db_name = current_db.get()
-    pool = await get_connection_pool(db_name)
-    await pool.release(conn)
+    """Releases the connection back to the pool it was acquired from."""
+    await conn.release()
+
+
+class RequestScope:
+    """
+    Connections borrowed for the lifetime of one request, at most one per tenant DB.
+    The task currently inside connection_context() owns the connection; other
+    tasks of the same request (asyncio.gather) fall back to their own pool connection.
+    A task becomes the owner before it starts acquiring, so concurrent tasks never
+    acquire the request's connection twice.
+    """
+
+    __slots__ = ("connections", "owners", "after_commit")
+
+    def __init__(self):
+        self.connections = {}  # db_name -> future of the ConnectionHandle
+        self.owners = {}  # db_name -> [task, depth]
+        self.after_commit = {}  # db_name -> [(callback, args)] of the open unit_of_work
+
+    async def close(self):
+        connections, self.connections = self.connections, {}
+        self.owners.clear()
+        for acquiring in connections.values():
+            try:
+                handle = await acquiring
+            except Exception:
+                continue  # the acquire failed, and its caller got the error
+            await handle.release()
+
+
+request_scope = ContextVar("request_scope", default=None)
 
 
 @asynccontextmanager
 async def connection_context():
-    conn = await get_connection()
+    """
+    Yields a ConnectionHandle for the current database. Inside a request scope the
+    request's connection is reused, so nested and sequential db/* calls share one checkout.
+    """
+    scope = request_scope.get()
+    db_name = current_db.get()
+    task = asyncio.current_task()
+    owner = scope.owners.get(db_name) if scope is not None else None
+
+    if scope is None or (owner is not None and owner[0] is not task):
+        handle = await _acquire(db_name)
+        try:
+            yield handle
+        finally:
+            await handle.release()
+        return
+
+    if owner is None:
+        owner = scope.owners[db_name] = [task, 0]
+    owner[1] += 1
+    try:
+        acquiring = scope.connections.get(db_name)
+        if acquiring is None:
+            # Kept in the scope while it runs, so close() releases it even if this task is cancelled
+            acquiring = scope.connections[db_name] = asyncio.ensure_future(_acquire(db_name, _caller_name()))
+        try:
+            handle = await asyncio.shield(acquiring)
+        except Exception:
+            if scope.connections.get(db_name) is acquiring:
+                del scope.connections[db_name]  # the next call tries again
+            raise
+        yield handle
+    finally:
+        owner[1] -= 1
+        if owner[1] == 0:
+            scope.owners.pop(db_name, None)
+
+
+async def release_request_connections():
+    """
+    Hand the current request's connections back to their pools now instead of when
+    the response ends, e.g. before a long-lived streaming response. A later db/*
+    call in the request simply checks out a connection again.
+    """
+    scope = request_scope.get()
+    if scope is not None:
+        await scope.close()
+
+
+def in_unit_of_work() -> bool:
+    """True inside a unit_of_work() for the current tenant: connection_context() then yields its transaction."""
+    scope = request_scope.get()
+    return scope is not None and current_db.get() in scope.after_commit
+
+
+def after_commit(callback, *args) -> bool:
+    """
+    Queue `await callback(*args)` to run once the current tenant's unit_of_work has
+    committed, e.g. dropping a cache or re-reading a row into the search index, so
+    nothing reads the write's data before it is visible to everyone; it is dropped
+    if the unit of work rolls back. Returns False when no unit of work is open:
+    the write commits with the caller's own transaction, so the caller runs it now.
+    """
+    scope = request_scope.get()
+    pending = scope.after_commit.get(current_db.get()) if scope is not None else None
+    if pending is None:
+        return False
+    pending.append((callback, args))
+    return True
+
+
+@asynccontextmanager
+async def unit_of_work():
+    """
+    Runs the enclosed db/* calls for the current tenant on one connection inside
+    one transaction, e.g. a write and its remember_users_action row.
+    Rolls back if the block raises. Work queued with after_commit() runs once
+    the outermost unit of work has committed.
+    """
+    scope = request_scope.get()
+    token = request_scope.set(RequestScope()) if scope is None else None
+    scope = request_scope.get()
+    db_name = current_db.get()
+    outermost = db_name not in scope.after_commit
+    pending = scope.after_commit.setdefault(db_name, [])
     try:
-        yield conn
+        async with connection_context() as conn:
+            try:
+                async with conn.transaction():
+                    yield conn
+            finally:
+                if outermost:
+                    del scope.after_commit[db_name]
+        if outermost:
+            for callback, args in pending:
+                await callback(*args)
     finally:
-        await release_connection(conn)
+        if token is not None:
+            await request_scope.get().close()
+            request_scope.reset(token)
+
+
+class RequestConnectionMiddleware:
+    """ASGI middleware opening a RequestScope per HTTP request and releasing its connections at the end."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_connections = RequestScope()
+        token = request_scope.set(request_connections)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_scope.reset(token)
+            await request_connections.close()
+
+
+def get_connection_usage():
+    """Acquire wait and hold times per calling db function, for sizing pools."""
+    return {
+        caller: {
+            **usage,
+            "waitAvg": usage["waitTotal"] / usage["count"],
+            "holdAvg": usage["holdTotal"] / usage["count"],
+        }
+        for caller, usage in usage_stats.items() if usage["count"]
+    }
+
+
+def get_pool_stats():
+    """Snapshot of the open tenant pools, for diagnostics."""
+    return {
+        db_name: {
+            "maxSize": _get_stats(db_name).max_size,
+            "inUse": _get_stats(db_name).in_use,
+            "peak": _get_stats(db_name).peak,
+            "size": pool.get_size(),
+            "idle": pool.get_idle_size(),
+        }
+        for db_name, pool in connection_pools.items()
+    }
 
 
 async def close_all_pools():
     """Closes all connection pools when shutting down the application."""
-    for pool in connection_pools.values():
-        await pool.close()
+    for db_name in list(connection_pools):
+        await _close_pool(db_name)
+    if _retiring_pools:
+        await asyncio.gather(*_retiring_pools)
@@ -0,0 +1,122 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+from utils.conn import connect_unpooled
+
+# Postgres channel the db write paths NOTIFY on (db/sync.py). Every tenant has its own
+# database, so a listener only ever hears its own tenant's changes.
+CHANGES_CHANNEL = "pardaaf_changes"
+
+SUBSCRIBER_QUEUE_SIZE = 100  # a subscriber this far behind is told to resync instead
+LISTEN_READY_TIMEOUT_SECONDS = 5
+LISTEN_KEEPALIVE_SECONDS = int(os.getenv("LISTEN_KEEPALIVE", 60))  # notices a silently dropped connection
+LISTEN_RETRY_MAX_SECONDS = 60
+
+# Put on a subscriber's queue when events may have been lost: the listener reconnected,
+# or the subscriber fell behind. It should re-read the versions it cares about.
+RESYNC = object()
+
+# One listener per tenant database with subscribers in this worker
+_listeners = {}
+
+
+class TenantListener:
+    """
+    One LISTEN connection for a tenant database, fanning its notifications out to
+    every subscriber queue in this worker. Runs while it has subscribers and
+    reconnects with backoff when the connection is lost.
+
+    The connection is opened outside the pools (connect_unpooled), so each
+    tenant with open subscriptions costs one connection beyond DB_POOL_BUDGET.
+    """
+
+    def __init__(self, db_name):
+        self.db_name = db_name
+        self.subscribers = set()
+        self.listening = asyncio.Event()
+        self.resync_on_connect = False  # subscribers may have missed events while it wasn't listening
+        self.task = asyncio.ensure_future(self._run())
+
+    def _on_notify(self, _conn, _pid, _channel, payload):
+        self._broadcast(payload)
+
+    def _broadcast(self, item):
+        for queue in self.subscribers:
+            try:
+                queue.put_nowait(item)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC)
+
+    async def _run(self):
+        from utils.logger import flatbed  # logger itself depends on utils.conn
+
+        delay = 1
+        while True:
+            conn = None
+            try:
+                conn = await connect_unpooled(self.db_name)
+                lost = asyncio.Event()
+                conn.add_termination_listener(lambda _: lost.set())
+                await conn.add_listener(CHANGES_CHANNEL, self._on_notify)
+                self.listening.set()
+                if self.resync_on_connect:
+                    self.resync_on_connect = False
+                    self._broadcast(RESYNC)  # anything NOTIFYed while we were away is gone
+                delay = 1
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), LISTEN_KEEPALIVE_SECONDS)
+                    except asyncio.TimeoutError:
+                        await conn.execute("SELECT 1")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await flatbed('warning', f"Change listener for {self.db_name} lost: {e}")
+            finally:
+                self.listening.clear()
+                if conn is not None and not conn.is_closed():
+                    conn.terminate()
+            self.resync_on_connect = True
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, LISTEN_RETRY_MAX_SECONDS)
+
+    async def close(self):
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+
+
+@asynccontextmanager
+async def subscribe_changes(db_name):
+    """
+    Queue of the tenant's change notifications (JSON strings, see db/sync.py) and
+    RESYNC markers, for as long as the block runs. Waits briefly for the tenant's
+    listener to be up, so a state read right after entering misses nothing.
+    """
+    listener = _listeners.get(db_name)
+    if listener is None:
+        listener = _listeners[db_name] = TenantListener(db_name)
+    queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    listener.subscribers.add(queue)
+    try:
+        try:
+            await asyncio.wait_for(listener.listening.wait(), LISTEN_READY_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            listener.resync_on_connect = True  # RESYNC once it is up
+        yield queue
+    finally:
+        listener.subscribers.discard(queue)
+        if not listener.subscribers and _listeners.get(db_name) is listener:
+            del _listeners[db_name]
+            await listener.close()
+
+
+async def close_change_listeners():
+    """Stop every tenant listener when shutting down the application."""
+    for db_name in list(_listeners):
+        await _listeners.pop(db_name).close()
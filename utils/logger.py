@@ -1,16 +1,209 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
 from utils.email_sender import send_mail
 from utils.config import ADMIN_EMAIL
-from utils.conn import get_connection, release_connection
+from utils.conn import current_db, get_connection, release_connection, set_current_db
+
+LOG_BUFFER_SIZE = int(os.getenv("LOG_BUFFER_SIZE", 10000))  # oldest entries are dropped beyond this
+LOG_FLUSH_INTERVAL_SECONDS = float(os.getenv("LOG_FLUSH_INTERVAL", 2))
+LOG_EMAIL_INTERVAL_SECONDS = int(os.getenv("LOG_EMAIL_INTERVAL", 300))  # at most one summary email per interval
+LOG_EMAIL_MAX_DIGESTS = 50  # distinct messages listed in one summary email
+LOG_ACQUIRE_TIMEOUT_SECONDS = 5
+
+# Where flatbed reports its own failures: it can't log them through itself
+logger = logging.getLogger(__name__)
+
+# Entries waiting to be written: (db_name, prefix, message, logged_at)
+_buffer = deque(maxlen=LOG_BUFFER_SIZE)
+
+# Digests whose DB write failed, retried on the next flush: db_name -> {(prefix, message): LogDigest}
+_unwritten = {}
+
+# Digests not yet included in a summary email: (db_name, prefix, message) -> LogDigest
+_unsent = {}
+
+_dropped = 0
+_last_email = 0.0
+_drain_task = None
+
+
+class LogDigest:
+    """Identical log entries collapsed into one, with how often and when they were seen."""
+
+    __slots__ = ("db_name", "prefix", "message", "count", "first_seen", "last_seen")
+
+    def __init__(self, db_name, prefix, message, logged_at):
+        self.db_name = db_name
+        self.prefix = prefix
+        self.message = message
+        self.count = 0
+        self.first_seen = logged_at
+        self.last_seen = logged_at
+
+    def add(self, count, first_seen, last_seen):
+        self.count += count
+        self.first_seen = min(self.first_seen, first_seen)
+        self.last_seen = max(self.last_seen, last_seen)
+
+    def merge_into(self, digests, key):
+        digest = digests.get(key)
+        if digest is None:
+            digest = digests[key] = LogDigest(self.db_name, self.prefix, self.message, self.first_seen)
+        digest.add(self.count, self.first_seen, self.last_seen)
+
+    def log_message(self):
+        if self.count == 1:
+            return self.message
+        return f"{self.message} (repeated {self.count}x)"
 
 
 # logs function
 async def flatbed(prefix, message):
-    await send_mail(f"{prefix}", ADMIN_EMAIL, message)
-    conn = await get_connection()
+    """
+    Queue a log entry for the current tenant's log table and the admin email.
+
+    Never touches the database or SMTP itself: a background task drains the
+    queue, so logging adds no latency or pool pressure to the caller.
+    """
+    global _dropped
+    if len(_buffer) == _buffer.maxlen:
+        _dropped += 1
+    _buffer.append((current_db.get(None), prefix, str(message), time.time()))
+    _ensure_drain_task()
+
+
+def _ensure_drain_task():
+    global _drain_task
+    loop = asyncio.get_running_loop()
+    if _drain_task is None or _drain_task.done() or _drain_task.get_loop() is not loop:
+        _drain_task = loop.create_task(_drain_forever())
+
+
+async def _drain_forever():
+    while True:
+        await asyncio.sleep(LOG_FLUSH_INTERVAL_SECONDS)
+        try:
+            await flush_logs()
+        except Exception as e:
+            # Can't log through flatbed here without feeding the failure back into itself
+            logger.exception("flatbed flush failed: %s", e)
+
+
+def _collect_digests():
+    """Drain the buffer, collapsing identical entries per tenant."""
+    digests = {}
+    while _buffer:
+        db_name, prefix, message, logged_at = _buffer.popleft()
+        key = (db_name, prefix, message)
+        digest = digests.get(key)
+        if digest is None:
+            digest = digests[key] = LogDigest(db_name, prefix, message, logged_at)
+        digest.add(1, logged_at, logged_at)
+    return digests
+
+
+async def _write_digests(db_name, digests):
+    """Bulk insert one tenant's digests into its log table, keeping them for retry on failure."""
+    set_current_db(db_name)  # only affects this task's context
+    try:
+        conn = await asyncio.wait_for(get_connection(), LOG_ACQUIRE_TIMEOUT_SECONDS)
+        try:
+            await conn.copy_records_to_table(
+                "log",
+                records=[(d.prefix, d.log_message()) for d in digests.values()],
+                columns=("prefix", "message")
+            )
+        finally:
+            await release_connection(conn)
+    except Exception as e:
+        pending = _unwritten.setdefault(db_name, {})
+        for key, digest in digests.items():
+            if key in pending or len(pending) < LOG_BUFFER_SIZE:
+                digest.merge_into(pending, key)
+        logger.warning("flatbed could not write %d log entries to %s: %s", len(digests), db_name, e)
+
+
+async def _send_summary(force=False):
+    """Email the digests collected since the last summary, at most once per LOG_EMAIL_INTERVAL_SECONDS."""
+    global _dropped, _last_email
+    if not _unsent and not _dropped:
+        return
+    now = time.monotonic()
+    if not force and _last_email and now - _last_email < LOG_EMAIL_INTERVAL_SECONDS:
+        return
+    _last_email = now
+
+    digests = sorted(_unsent.values(), key=lambda d: d.count, reverse=True)
+    dropped = _dropped
+    # Taken out while the mail is sent, so entries logged meanwhile start the next summary
+    _unsent.clear()
+    _dropped = 0
+
+    if len(digests) == 1 and digests[0].count == 1 and not dropped:
+        subject, body = digests[0].prefix, digests[0].message
+    else:
+        total = sum(d.count for d in digests)
+        lines = [
+            f"[{d.prefix}] {d.db_name or '-'} x{d.count} "
+            f"({time.strftime('%H:%M:%S', time.localtime(d.first_seen))}"
+            f" - {time.strftime('%H:%M:%S', time.localtime(d.last_seen))}): {d.message}"
+            for d in digests[:LOG_EMAIL_MAX_DIGESTS]
+        ]
+        if len(digests) > LOG_EMAIL_MAX_DIGESTS:
+            lines.append(f"... and {len(digests) - LOG_EMAIL_MAX_DIGESTS} more distinct messages")
+        if dropped:
+            lines.append(f"{dropped} entries were dropped because the log buffer was full")
+        subject, body = f"flatbed: {total} events ({len(digests)} distinct)", "\n\n".join(lines)
+
     try:
-        await conn.execute(
-            "INSERT INTO log (prefix, message) VALUES ($1, $2);",
-            prefix, message
-        )
-    finally:
-        await release_connection(conn)
+        result = await send_mail(subject, ADMIN_EMAIL, body)
+    except Exception as e:
+        result = f"Error sending email: {e}"
+    if result.startswith("Error"):
+        # Put the digests back for the next summary rather than losing them
+        for digest in digests:
+            digest.merge_into(_unsent, (digest.db_name, digest.prefix, digest.message))
+        _dropped += dropped
+        logger.warning("flatbed could not send the summary email: %s", result)
+
+
+async def flush_logs(force_email=False):
+    """Write queued entries to each tenant's log table and send the summary email if it is due."""
+    digests = _collect_digests()
+
+    by_db = {}
+    for (db_name, prefix, message), digest in digests.items():
+        digest.merge_into(_unsent, (db_name, prefix, message))
+        if db_name is not None:
+            by_db.setdefault(db_name, {})[(prefix, message)] = digest
+    for db_name, pending in list(_unwritten.items()):
+        del _unwritten[db_name]
+        batch = by_db.setdefault(db_name, {})
+        for key, digest in pending.items():
+            digest.merge_into(batch, key)
+
+    if by_db:
+        await asyncio.gather(*(_write_digests(db_name, batch) for db_name, batch in by_db.items()))
+    await _send_summary(force_email)
+
+
+def start_log_sink():
+    """Start draining flatbed entries on the running loop (also started lazily by flatbed)."""
+    _ensure_drain_task()
+
+
+async def stop_log_sink():
+    """Stop the background drain and write out whatever is still queued."""
+    global _drain_task
+    if _drain_task is not None and not _drain_task.done():
+        _drain_task.cancel()
+        try:
+            await _drain_task
+        except asyncio.CancelledError:
+            pass
+    _drain_task = None
+    await flush_logs(force_email=True)